@@ -4,16 +4,92 @@
 
 import os
 import re
+import sys
+import time
+import getpass
+import tempfile
 import maya.cmds as cmds
+import maya.utils
 from functools import partial
 
 scroll_list = None
+repository_root = ""
+pipeline_library_path = os.environ.get("VFX_PIPELINE_LIBRARY", os.path.join(repository_root, "SourceCode", "Pseudocode", "Pipeline Library"))
 naming_convention = r"^[A-Z]{1,3}_([A-Z]{1}[a-z]+)+$"
 
 scene_types = ["Asset", "Sequence"]
 asset_types = ["setPiece", "set", "prop", "character"]
 seq_types = ["animation", "layout", "light"]
 
+#Alembic job flags shared by every published asset
+alembic_flags = ["-renderableOnly", "-uvWrite", "-writeFaceSets", "-worldSpace", "-writeVisibility", "-dataFormat ogawa"]
+#Per asset type Alembic overrides, e.g. {"setPiece": {"frame_range": (1, 1)}, "character": {"flags": alembic_flags + ["-stripNamespaces"]}}
+alembic_type_overrides = {}
+
+#Sequence shot caches: asset group -> cache kind the Lighting Tool sorts by (_char, _prop, _cam)
+sequence_cache_kinds = {"character": "char", "prop": "prop", "setPiece": "prop", "set": "prop"}
+#Shots with at least this many frames are cached in parallel frame-range segments
+chunked_cache_min_frames = 200
+chunked_cache_workers = None
+#Stitched caches compared with a single-process export of the same range on every chunked publish (needs PyAlembic)
+chunked_cache_verify_assets = 1
+#Background publish workers kept alive while jobs are queued
+publish_queue_workers = 1
+#Staged publishing: export to local disk, then upload with this many parallel streams (and optional cap in Mbit/s)
+publish_staging = False
+transfer_streams = 4
+transfer_limit_mbps = None
+#Turn identical meshes into instances of one shape before exporting, for the asset types built from repeated pieces
+publish_instance_duplicates = False
+instance_duplicate_types = ["set", "setPiece"]
+#Verification problems written to the log, the command line tool reports all of them
+verify_log_limit = 50
+#Retention: versions kept per asset before older ones move to the compressed archive; versions referenced
+#by a lighting scene and anything younger than retention_min_age_days are always kept
+retention_keep_saved = 3
+retention_keep_published = 5
+retention_min_age_days = 14
+#Shots listed per published version in the impact report
+impact_log_limit = 20
+#Rows shown in the save and publish lists, the filter fields narrow down longer folders
+list_display_limit = 1000
+#Rows per page of the Asset Catalog results
+catalog_page_size = 50
+catalog_types = ["All Types"] + asset_types + ["char", "cam", "scene"]
+catalog_page = 1
+#Planned publishes estimated to take longer than this offer to go to the publish queue instead
+plan_queue_seconds = 600
+
+if pipeline_library_path not in sys.path:
+    sys.path.append(pipeline_library_path)
+import pipeline_profiler as profiler
+import asset_catalog
+import asset_tree
+import chunked_alembic_cache
+import dependency_index
+import list_model
+import publish_estimates
+import publish_promote
+import publish_queue
+import publish_retention
+import publish_steps
+import publish_transfer
+import publish_verify
+import scene_references
+import shot_manifest
+import thumbnails
+import version_reservation
+
+save_list_model = list_model.FilterListModel()
+publish_list_model = list_model.FilterListModel()
+#Folder listings of the asset browser, re-read only when a folder changes
+browser_cache = asset_tree.DirectoryCache()
+#Child shown under folders not expanded yet so they get an expand arrow without being read
+browser_placeholder = "/.unexpanded"
+#Looks up the preview of the selected file off the UI thread, created with the preview panel
+thumbnail_loader = None
+preview_source = None
+
 #=======================================          
 #----------------DEFS-------------------f
 #=======================================
@@ -21,6 +97,7 @@ seq_types = ["animation", "layout", "light"]
 #Function for saving file assets as a .MB cache
 #Function to get value of a text field
     
+@profiler.timed("saveFiles", "save")
 def saveFiles():
       
     #Save path is getting assigned from a Current Save Directory Textfield
@@ -44,7 +121,7 @@ def saveFiles():
                     asset_name = asset.split("|")[-1].split(":")[-1]  # Get the object name without the namespace
                     export_dir = "{0}/{1}/{2}".format(save_dir, asset_type, asset_name)
                     print("Asset Name: ", asset_name)
-                    file_name = "{0}_layout_v{1}.mb".format(asset_name, str(GetNextVersionNumber(asset_name, asset_type)).zfill(3))                   
+                    file_name = "{0}_layout_v{1}.mb".format(asset_name, str(ReserveVersionNumber(export_dir, asset_name)).zfill(3))                   
                     
                     print("Export directory: ", export_dir)  
                     #if folder doesn't exist create it                                                                                                 
@@ -55,7 +132,10 @@ def saveFiles():
                     
                     #Maya Binary Saving
                     export_file = export_dir + "/" + file_name       
-                    cmds.file(export_file, force=True, type="mayaBinary", preserveReferences=True, exportSelected=True)
+                    with profiler.span("save_maya_binary", "save", asset=asset_name):
+                        publish_steps.export_asset_scoped(cmds, asset, export_file, "mayaBinary")
+                    asset_catalog.record_files([export_file], log=addLog)
+                    thumbnails.queue_previews([export_file], log=addLog)
                     print("Exporting Maya Binary Done.")
                     addLog("Exporting Maya Done.")
                 cmds.confirmDialog(title="Finished Saving Assets", message="Exporting .MB File Done.\nFile saved at: " + export_file)                       
@@ -67,109 +147,391 @@ def saveFiles():
         print("Directory textfield is empty! Please set root directory first.")
         addLog("Directory textfield is empty! Please set root directory first.")        
 
+#Function collecting the asset roots to publish with their versioned export files and Alembic job
+#Dry runs (reserve=False) plan the next free versions without claiming them
+def collectPublishEntries(publish_dir, reserve=True):
+    entries = []
+    for asset_type in asset_types:
+        print("Collecting asset type: ", asset_type)
+        addLog("Collecting asset type: " + asset_type)
+        asset_group = "|" + asset_type
+        
+        if cmds.objExists(asset_group):                
+            asset_roots = cmds.listRelatives(asset_group, children=True, fullPath=True)
+            
+            for asset in asset_roots:
+                asset_name = asset.split("|")[-1].split(":")[-1]  # Get the object name without the namespace
+                export_dir = "{0}/{1}/{2}".format(publish_dir, asset_type, asset_name)
+                version_number = ReserveVersionNumber(export_dir, asset_name) if reserve else GetLatestVersionNumber(export_dir, asset_name) + 1
+                version = str(version_number).zfill(3)
+                print("Asset Name: ", asset_name)
+                print("Export directory: ", export_dir) 
+                files = {
+                    "cache": "{0}/cache/{1}_layout_v{2}.mb".format(export_dir, asset_name, version),
+                    "alembic": "{0}/alembic/{1}_layout_v{2}.abc".format(export_dir, asset_name, version),
+                    "fbx": "{0}/fbx/{1}_layout_v{2}.fbx".format(export_dir, asset_name, version)
+                }
+                entries.append({"asset_type": asset_type, "root": asset, "name": asset_name, "files": files,
+                                "asset_dir": export_dir, "prefix": asset_name + "_layout", "version": version_number,
+                                "alembic_job": getAlembicJob(asset, asset_type),
+                                "instance_duplicates": publish_instance_duplicates and asset_type in instance_duplicate_types})
+        else:
+            print("Asset group doesn't exist.")
+            addLog("Asset group doesn't exist. " + asset_group)
+    return entries
+
 #Functions for publishing file assets as .FBX, .ABC or .MB
+@profiler.timed("publishFiles", "publish")
 def publishFiles():
     
     #Publish path is getting assigned from a Current Save Directory Textfield
     publish_dir = getTextFieldValue(publish_text_field)
     print("CURRENT PUBLISH PATH: " + publish_dir)
-
+    
     if publish_dir != "":
-        
-        publish_dir = publish_dir + "/assets" 
-                                 
-        for asset_type in asset_types:
-            print("Exporting asset type: ", asset_type)
-            addLog("Exporting asset type: " + asset_type)
-            asset_group = "|" + asset_type
-            
-            if cmds.objExists(asset_group):                
-                print("Selected object exist")
-                asset_roots = cmds.listRelatives(asset_group, children=True, fullPath=True)
-                
-                for asset in asset_roots:
-                    asset_name = asset.split("|")[-1].split(":")[-1]  # Get the object name without the namespace
-                    export_dir = "{0}/{1}/{2}".format(publish_dir, asset_type, asset_name)
-                    print("Asset Name: ", asset_name)
-                    file_name = "{0}_layout_v{1}.mb".format(asset_name, str(GetNextVersionNumber(asset_name, asset_type)).zfill(3))                   
-                    
-                    print("Export directory: ", export_dir) 
-                    
-                    #Maya Binary publishing 
-                    #if folder doesn't exist create it        
-                    try:
-                        os.makedirs(export_dir + "/cache")               
-                    except OSError:
-                        print(export_dir + "/cache" + " ALREADY EXISTS!")                  
-                                                       
-                    export_file = export_dir + "/cache/" + file_name                                                 
-                    cmds.file(export_file, force=True, type="mayaBinary", preserveReferences=True, exportSelected=True)
-                    #cmds.confirmDialog(title="Finished Publishing Assets", message="Exporting .MB File Done.\nFile saved at: " + export_file)    
-                     
-                    #Alembic Publishing 
-                    file_name = "{0}_layout_v{1}.abc".format(asset_name, str(GetNextVersionNumber(asset_name, asset_type)).zfill(3))   
-                    try:
-                        os.makedirs(export_dir + "/alembic")               
-                    except OSError:
-                        print(export_dir + "/alembic" + " ALREADY EXISTS!") 
-                    
-                    export_file = export_dir + "/alembic/" + file_name                                                                  
-                    alembic_args = [
-                    '-renderableOnly',
-                    '-file ' + export_file,
-                    '-uvWrite',
-                    '-writeFaceSets',
-                    '-worldSpace',
-                    '-writeVisibility',
-                    '-dataFormat ogawa',
-                    '-root ' + asset,
-                    '-fr %d %d' % (cmds.playbackOptions(q=True, min=True), cmds.playbackOptions(q=True, max=True))
-                    ]
-                    print(alembic_args)
-                    cmds.AbcExport(j = " ".join(alembic_args))
-                    #cmds.confirmDialog(title="Finished Publishing Assets", message="Exporting .ABC File Done.\nFile saved at: " + export_file)    
-                    
-                    #FBX Publishing
-                    file_name = "{0}_layout_v{1}.fbx".format(asset_name, str(GetNextVersionNumber(asset_name, asset_type)).zfill(3))    
-                    try:
-                        os.makedirs(export_dir + "/fbx")               
-                    except OSError:
-                        print(export_dir + "/fbx" + " ALREADY EXISTS!")
-                                     
-                    export_file = export_dir + "/fbx/" + file_name     
-                    cmds.file(export_file, force=True, options="v=0;", type="FBX export", pr=True,  ea=True)
-                    #cmds.confirmDialog(title="Finished Publishing Assets", message="Exporting .FBX File Done.\nFile saved at: " + export_file)                 
-                
-                cmds.confirmDialog(title="Finished Publishing Assets", message="Exporting .MB/.ABC/.FBX File Done.\nFile saved at: " + export_dir)                         
-                print("Exporting Maya Binary Done.")
-                addLog("Exporting Maya Done.")
-                print("Publishing Alembic Assets Done.")
-                addLog("Publishing Alembic Assets Done.")    
-                print("Publishing FBX Assets Done.")
-                addLog("Publishing FBX Assets Done.")                 
-                                                                                                                                                             
-            else:
-                print("Asset group doesn't exist.")
-                addLog("Asset group doesn't exist. " + asset_group)               
+        entries = collectPublishEntries(publish_dir + "/assets")
+        if entries and publish_staging:
+            #Export to local disk and upload in the background, the versions appear once verified on the share
+            staged = publish_transfer.staged_entries(entries)
+            publish_steps.run_publish_steps(cmds, staged, log=addLog, write_index=False)
+            job_ids = publish_transfer.submit_staged(staged)
+            publish_transfer.ensure_transfer_workers(transfer_streams, transfer_limit_mbps)
+            addLog("Uploading {0} staged versions to {1} in the background.".format(len(job_ids), publish_dir))
+            reportPublishImpact([(entry["asset_dir"], entry["prefix"], entry["version"]) for entry in entries])
+            refreshPublishQueue()
+        elif entries:
+            publish_steps.run_publish_steps(cmds, entries, log=addLog)
+            print("Publishing Assets Done.")
+            reportPublishImpact([(entry["asset_dir"], entry["prefix"], entry["version"]) for entry in entries])
+            cmds.confirmDialog(title="Finished Publishing Assets", message="Exporting .MB/.ABC/.FBX File Done.\nFile saved at: " + publish_dir)                         
     else:
         print("Directory textfield is empty! Please set root directory first.")
         addLog("Directory textfield is empty! Please set root directory first.")            
+
+#Function listing the files a publish would write with time and size estimates from earlier publishes, without exporting
+@profiler.timed("planPublishFiles", "publish")
+def planPublishFiles():
+    publish_dir = getTextFieldValue(publish_text_field)
+    root_dir = getTextFieldValue(root_text_field)
+    if publish_dir == "" or root_dir == "":
+        print("Directory textfield is empty! Please set root directory first.")
+        addLog("Directory textfield is empty! Please set root directory first.")
+        return
+    
+    entries = collectPublishEntries(publish_dir + "/assets", reserve=False)
+    if not entries:
+        addLog("Nothing to publish.")
+        return
+    history = publish_estimates.PublishHistory.for_root(root_dir)
+    plan = publish_estimates.plan_publish(history, entries, publish_estimates.measure_entries(cmds, entries))
+    lines = publish_estimates.format_plan_lines(plan)
+    for line in lines:
+        print(line)
+        addLog(line)
+    
+    message = lines[-1]
+    if plan["seconds"] >= plan_queue_seconds:
+        message += "\n\nThis is a long publish, consider sending it to the publish queue."
+    choice = cmds.confirmDialog(title="Publish Plan", message=message, button=["Publish Now", "Send To Queue", "Close"],
+                                defaultButton="Close", cancelButton="Close", dismissString="Close")
+    if choice == "Publish Now":
+        publishFiles()
+    elif choice == "Send To Queue":
+        queuePublishFiles()
+
+#Function checking the published files against the checksums recorded when they were published
+@profiler.timed("verifyPublishedFiles", "publish")
+def verifyPublishedFiles(full=False):
+    publish_dir = getTextFieldValue(publish_text_field)
+    if publish_dir == "":
+        print("Directory textfield is empty! Please set root directory first.")
+        addLog("Directory textfield is empty! Please set root directory first.")
+        return
+    
+    report = publish_verify.verify_tree(publish_dir, full=full)
+    for state, file_path, detail in report["problems"][:verify_log_limit]:
+        addLog("{0}: {1} {2}".format(state.upper(), file_path, detail))
+    if len(report["problems"]) > verify_log_limit:
+        addLog("... {0} more, run publish_verify.py for the full report".format(len(report["problems"]) - verify_log_limit))
+    addLog("Verify: " + publish_verify.summary_line(report))
+
+#Function for publishing in a background worker, so the artist can keep working while it exports
+@profiler.timed("queuePublishFiles", "publish")
+def queuePublishFiles():
+    publish_dir = getTextFieldValue(publish_text_field)
+    if publish_dir == "":
+        print("Directory textfield is empty! Please set root directory first.")
+        addLog("Directory textfield is empty! Please set root directory first.")
+        return
+    
+    entries = collectPublishEntries(publish_dir + "/assets")
+    if not entries:
+        addLog("Nothing to publish.")
+        return
+    
+    #The worker opens a snapshot of the scene as it is now, unsaved changes included
+    queue = publish_queue.PublishQueue()
+    snapshot_file = queue.new_snapshot_path()
+    with profiler.span("queue_snapshot", "publish", assets=len(entries)):
+        cmds.file(snapshot_file, force=True, type="mayaBinary", preserveReferences=True, exportAll=True)
+    
+    scene_name = os.path.basename(cmds.file(q=True, sceneName=True) or "untitled")
+    label = "{0}: {1} assets".format(scene_name, len(entries))
+    job_id = queue.submit("publish_assets", label, {"scene": snapshot_file, "entries": entries, "source_scene": scene_name,
+                                                         "staging": publish_staging})
+    started = queue.ensure_workers(publish_queue_workers)
+    addLog("Queued publish job #{0} ({1}).".format(job_id, label))
+    if started:
+        addLog("Started {0} publish worker(s).".format(len(started)))
+    refreshPublishQueue()
+
+#Function showing queued, running and finished publish jobs with their timings
+def refreshPublishQueue():
+    queue = publish_queue.PublishQueue()
+    queue.recover()
+    clearTextScrollList(publish_queue_list)
+    now = time.time()
+    cmds.textScrollList(publish_queue_list, edit=True, append=[publish_queue.format_job(job, now) for job in queue.jobs()])
+    clearTextScrollList(upload_queue_list)
+    cmds.textScrollList(upload_queue_list, edit=True, append=[publish_queue.format_job(job, now) for job in publish_transfer.transfer_queue().jobs()])
+
+#Function to switch between publishing straight to the share and staging locally with a background upload
+def togglePublishStaging(enabled):
+    global publish_staging
+    publish_staging = enabled
+    addLog("Publishing to local staging with background upload." if enabled else "Publishing straight to the publish share.")
+
+#Function to switch instancing of duplicate meshes before export on or off
+def togglePublishInstancing(enabled):
+    global publish_instance_duplicates
+    publish_instance_duplicates = enabled
+    addLog("Instancing duplicate meshes of {0} assets for the export, undone once the files are written.".format(", ".join(instance_duplicate_types)) if enabled
+           else "Publishing meshes as they are in the scene.")
+
+#Function writing the step timings of the selected finished jobs to the log
+def logPublishJobTimings():
+    queue = publish_queue.PublishQueue()
+    for line in cmds.textScrollList(publish_queue_list, query=True, selectItem=True) or []:
+        job = queue.get(int(line.split()[0].lstrip("#")))
+        if job is None or not job["result"]:
+            continue
+        if job["kind"] == "promote_assets":
+            for report in job["result"]["reports"]:
+                addLog("Job #{0}: {1} v{2} {3}".format(job["id"], report["name"], str(report["version"]).zfill(3),
+                                                       report["error"] or "converted in {0:.2f}s".format(report["seconds"])))
+            continue
+        seconds = job["result"]["seconds"]
+        addLog("Job #{0}: .mb {1:.2f}s, FBX {2:.2f}s, Alembic {3:.2f}s".format(job["id"], seconds["cache"], seconds["fbx"], seconds["alembic"]))
+        for asset in job["result"]["assets"]:
+            addLog("  {0}: {1:.2f} MB".format(asset["name"], sum(asset["sizes"].values()) / 1048576.0))
+
+#Function cancelling the selected jobs that have not started yet
+def cancelPublishJobs():
+    queue = publish_queue.PublishQueue()
+    for line in cmds.textScrollList(publish_queue_list, query=True, selectItem=True) or []:
+        job_id = int(line.split()[0].lstrip("#"))
+        if queue.cancel(job_id):
+            addLog("Cancelled publish job #{0}.".format(job_id))
+    refreshPublishQueue()
+
+#Function starting workers for queued jobs left over from a previous session
+def startPublishWorkers():
+    started = publish_queue.PublishQueue().ensure_workers(publish_queue_workers)
+    started += publish_transfer.ensure_transfer_workers(transfer_streams, transfer_limit_mbps)
+    addLog("Started {0} publish worker(s).".format(len(started)) if started else "Publish workers are already running.")
+    refreshPublishQueue()
+
+#Function removing finished jobs and their scene snapshots from the queue
+def clearFinishedPublishJobs():
+    addLog("Removed {0} finished publish jobs.".format(publish_queue.PublishQueue().clear_finished()))
+    addLog("Removed {0} finished uploads.".format(publish_transfer.transfer_queue().clear_finished()))
+    refreshPublishQueue()
                 
 
-def GetLatestVersionNumber(asset_name, asset_type):
-    dir = "{0}/{1}/{2}".format(save_dir, asset_type, asset_name)
-    found = False
-    count = 1
-    while found == False:
-        if not os.path.isfile(dir + "/{0}_layout_v{1}.abc".format(asset_name, str(count).zfill(3))):
-            found = True
-            count = count - 1
-        else:
-            count = count + 1
-    return count
+#Function opening the index of which lighting scenes use which asset and cache versions, brought up to date
+def getDependencyIndex():
+    scene_dirs = [directory for directory in scene_references.lighting_scene_dirs(getTextFieldValue(root_text_field)) if os.path.isdir(directory)]
+    if not scene_dirs:
+        return None
+    index = dependency_index.DependencyIndex(scene_dirs)
+    with profiler.span("dependency_index_update", "publish"):
+        result = index.update()
+    if result["scanned"] or result["removed"]:
+        print("Dependency index: {0} scenes re-read, {1} removed".format(result["scanned"], result["removed"]))
+    return index
+
+#Function logging the lighting shots still using older versions of what was just published
+@profiler.timed("reportPublishImpact", "publish")
+def reportPublishImpact(published):
+    index = getDependencyIndex()
+    if index is None:
+        return
+    for asset_dir, prefix, version in published:
+        outdated = index.outdated_scenes(prefix, version, asset_dir)
+        if not outdated:
+            continue
+        shots = sorted(set("{0} (v{1})".format(row["shot"], str(row["version"]).zfill(3)) for row in outdated))
+        addLog("{0} v{1}: {2} shots use older versions".format(prefix, str(version).zfill(3), len(shots)))
+        for shot in shots[:impact_log_limit]:
+            addLog("  " + shot)
+        if len(shots) > impact_log_limit:
+            addLog("  ... {0} more, run dependency_index.py outdated {1} {2}".format(len(shots) - impact_log_limit, prefix, version))
+
+#Function reporting which shots use older versions of the assets in the open scene than the latest published
+def reportSceneAssetImpact():
+    publish_dir = getTextFieldValue(publish_text_field)
+    if publish_dir == "":
+        print("Directory textfield is empty! Please set root directory first.")
+        addLog("Directory textfield is empty! Please set root directory first.")
+        return
+    
+    published = []
+    for asset_type in asset_types:
+        if cmds.objExists("|" + asset_type):
+            for asset in cmds.listRelatives("|" + asset_type, children=True, fullPath=True) or []:
+                asset_name = asset.split("|")[-1].split(":")[-1]
+                export_dir = "{0}/assets/{1}/{2}".format(publish_dir, asset_type, asset_name)
+                latest = GetLatestVersionNumber(export_dir, asset_name)
+                if latest:
+                    published.append((export_dir, asset_name + "_layout", latest))
+    reportPublishImpact(published)
+    addLog("Impact report done for {0} published assets.".format(len(published)))
+
+#Function planning which old versions go to the archive, and archiving them when apply is set
+@profiler.timed("archiveOldVersions", "publish")
+def archiveOldVersions(apply=False):
+    save_dir = getTextFieldValue(save_text_field)
+    publish_dir = getTextFieldValue(publish_text_field)
+    if save_dir == "" or publish_dir == "":
+        print("Directory textfield is empty! Please set root directory first.")
+        addLog("Directory textfield is empty! Please set root directory first.")
+        return
+    
+    index = getDependencyIndex()
+    if index is None:
+        addLog("No lighting scene folder found, versions referenced by lighting scenes cannot be protected.")
+        return
+    referenced = index.referenced_files()
+    plan = publish_retention.plan_retention([save_dir + "/assets"], retention_keep_saved, referenced, retention_min_age_days)
+    plan += publish_retention.plan_retention([publish_dir], retention_keep_published, referenced, retention_min_age_days)
+    addLog("Retention: {0} old versions, {1:.1f} MB ({2} referenced files kept).".format(
+        len(plan), sum(item["bytes"] for item in plan) / 1048576.0, len(referenced)))
+    if not apply:
+        for item in plan[:verify_log_limit]:
+            addLog("  {0} v{1}".format(item["prefix"], str(item["version"]).zfill(3)))
+        return
+    
+    for bundle_path, versions, original_bytes, bundle_bytes in publish_retention.archive_versions(plan, log=print):
+        addLog("Archived {0} versions into {1} ({2:.1f} MB -> {3:.1f} MB)".format(
+            len(versions), os.path.basename(bundle_path), original_bytes / 1048576.0, bundle_bytes / 1048576.0))
+    listArchivedVersions()
+
+#Function listing the archived versions of every asset and shot
+def listArchivedVersions():
+    clearTextScrollList(retention_archive_list)
+    items = []
+    for directory in [getTextFieldValue(save_text_field) + "/assets", getTextFieldValue(publish_text_field)]:
+        for asset_dir, directory_names, file_names in os.walk(directory):
+            if publish_retention.archive_dir_name in directory_names:
+                for (prefix, version) in sorted(publish_retention.archived_versions(asset_dir)):
+                    items.append("{0} v{1}  {2}".format(prefix, str(version).zfill(3), asset_dir))
+            directory_names[:] = [name for name in directory_names if not name.startswith(".")]
+    cmds.textScrollList(retention_archive_list, edit=True, append=items)
 
-def GetNextVersionNumber(asset_name, asset_type):
-    return GetLatestVersionNumber(asset_name, asset_type) + 1
+#Function restoring the selected archived versions to their folders
+def restoreArchivedVersions():
+    for line in cmds.textScrollList(retention_archive_list, query=True, selectItem=True) or []:
+        prefix, version, asset_dir = line.split(None, 2)
+        restored = publish_retention.restore_version(asset_dir, prefix, int(version.lstrip("v")), log=print)
+        addLog("Restored {0} {1} ({2} files).".format(prefix, version, len(restored)))
+    listArchivedVersions()
+
+#Function for publishing the Alembic caches of the open sequence shot (animation/layout scenes)
+@profiler.timed("publishSequenceCaches", "publish")
+def publishSequenceCaches():
+    scene_file = cmds.file(q=True, sceneName=True)
+    shot_match = re.match(r"^(?P<shot>(?P<episode>[A-Za-z]+\d+)_\d+)", os.path.basename(scene_file or ""))
+    if not shot_match:
+        print("Save the shot as <episode>_<shot>_vNNN.mb before publishing caches.")
+        addLog("Save the shot as <episode>_<shot>_vNNN.mb before publishing caches.")
+        return
+    
+    shot = shot_match.group("shot")
+    cache_dir = "{0}/sequence/{1}/{2}/cache".format(publish_dir, shot_match.group("episode"), shot)
+    try:
+        os.makedirs(cache_dir)
+    except OSError:
+        print(cache_dir + " ALREADY EXISTS!")
+    
+    cache_roots = []
+    for asset_type, cache_kind in sequence_cache_kinds.items():
+        if cmds.objExists("|" + asset_type):
+            for asset in cmds.listRelatives("|" + asset_type, children=True, fullPath=True) or []:
+                cache_roots.append((asset, cache_kind))
+    for camera_shape in cmds.ls(type="camera"):
+        camera = cmds.listRelatives(camera_shape, parent=True, fullPath=True)[0]
+        if camera.split("|")[-1] not in ["persp", "top", "front", "side"]:
+            cache_roots.append((camera, "cam"))
+    
+    cache_jobs = []
+    for root, cache_kind in cache_roots:
+        cache_name = "{0}_{1}_{2}".format(shot, root.split("|")[-1].split(":")[-1], cache_kind)
+        version_number = version_reservation.reserve_version(cache_dir, cache_name, {"scene": scene_file})
+        version = str(version_number).zfill(3)
+        cache_jobs.append({"name": cache_name, "root": root, "file": "{0}/{1}_v{2}.abc".format(cache_dir, cache_name, version), "flags": alembic_flags,
+                           "version": version_number})
+    if not cache_jobs:
+        addLog("No assets or cameras to cache in " + shot)
+        return
+    
+    frame_range = (int(cmds.playbackOptions(q=True, min=True)), int(cmds.playbackOptions(q=True, max=True)))
+    if frame_range[1] - frame_range[0] + 1 < chunked_cache_min_frames:
+        publish_steps.export_alembic_jobs(cmds, [(job["name"], job["file"], " ".join(job["flags"] + ['-fr %d %d' % frame_range, '-root ' + job["root"]])) for job in cache_jobs], addLog)
+    else:
+        #Workers open a snapshot of the scene as it is now, unsaved changes included
+        snapshot_file = os.path.join(tempfile.gettempdir(), "{0}_cache_snapshot_{1}.mb".format(shot, os.getpid()))
+        cmds.file(snapshot_file, force=True, type="mayaBinary", preserveReferences=True, exportAll=True)
+        try:
+            with profiler.span("publish_chunked_alembic", "publish", assets=len(cache_jobs)):
+                reports = chunked_alembic_cache.export_chunked(snapshot_file, cache_jobs, frame_range, workers=chunked_cache_workers,
+                                                               verify=chunked_cache_verify_assets, log=addLog)
+        finally:
+            os.remove(snapshot_file)
+        for report in reports:
+            addLog("Alembic: {0} {1:.2f} MB".format(report["name"], report["size"] / 1048576.0))
+        mismatched = [report["name"] for report in reports if report.get("differences")]
+        if mismatched:
+            addLog("FAIL: Chunked caches differ from the single-process export, not publishing them: " + ", ".join(mismatched))
+            return
+    
+    publish_steps.index_versions([{"asset_dir": cache_dir, "prefix": job["name"], "version": job["version"], "files": {"alembic": job["file"]}}
+                                  for job in cache_jobs])
+    #The Lighting Tool builds the shot from this manifest instead of listing the cache folder
+    shot_manifest.record_caches(os.path.dirname(cache_dir), cache_jobs)
+    print("Publishing Sequence Caches Done.")
+    addLog("Publishing Sequence Caches Done.")
+    reportPublishImpact([(cache_dir, job["name"], job["version"]) for job in cache_jobs])
+    cmds.confirmDialog(title="Finished Publishing Caches", message="Exporting shot .ABC Files Done.\nFiles saved at: " + cache_dir)
+
+#Function building the AbcExport job string of one asset root, the export step adds the -file
+def getAlembicJob(asset, asset_type):
+    overrides = alembic_type_overrides.get(asset_type, {})
+    frame_range = overrides.get("frame_range") or (cmds.playbackOptions(q=True, min=True), cmds.playbackOptions(q=True, max=True))
+    alembic_args = list(overrides.get("flags", alembic_flags)) + [
+        '-fr %d %d' % tuple(frame_range),
+        '-root ' + asset
+    ]
+    return " ".join(alembic_args)
+
+#Function returning the highest version saved, published or reserved in an asset folder
+@profiler.timed("GetLatestVersionNumber", "versioning")
+def GetLatestVersionNumber(export_dir, asset_name):
+    return version_reservation.latest_version(export_dir, asset_name + "_layout")
+
+#Function reserving the next version of an asset, unique even when several artists or workers publish it at once
+@profiler.timed("ReserveVersionNumber", "versioning")
+def ReserveVersionNumber(export_dir, asset_name):
+    return version_reservation.reserve_version(export_dir, asset_name + "_layout", {"scene": cmds.file(q=True, sceneName=True), "user": getpass.getuser()})
 
 #=======================================          
 #------------------UI-------------------
@@ -225,6 +587,7 @@ def setAssetType(asset_type_menu):
         addLog(message)
     
 #Function for adding messages to the log scroll list   
+@profiler.timed("addLog", "ui")
 def addLog(message):
     cmds.textScrollList(log_scroll_list, edit=True, append=[message])
     # Scroll to the last item in the list to show the bottom
@@ -233,55 +596,179 @@ def addLog(message):
         last_item_index = num_items 
         cmds.textScrollList(log_scroll_list, edit=True, showIndexedItem=last_item_index)
 
-#Function for outputing files to the publish list 
-def addSaveItem(item):
-    cmds.textScrollList(save_scroll_list, edit=True, append=[item])
-    num_items = cmds.textScrollList(save_scroll_list, query=True, numberOfItems=True)
-    if num_items > 0:
-        last_item_index = num_items  
-        cmds.textScrollList(save_scroll_list, edit=True, showIndexedItem=last_item_index)
-              
+#Function returning the sorted file names of a folder
+def listFiles(directory):
+    return sorted(entry.name for entry in os.scandir(directory) if entry.is_file())
+
+#Function showing the first matching rows of a list model in a scroll list with one append
+def showListRows(scroll_list, model):
+    rows = model.rows(0, list_display_limit)
+    if model.row_count() > list_display_limit:
+        rows.append("... {0} more, type to filter".format(model.row_count() - list_display_limit))
+    clearTextScrollList(scroll_list)
+    cmds.textScrollList(scroll_list, edit=True, append=rows)
+
+#Function filtering a scroll list as the artist types
+def filterList(scroll_list, model, text):
+    model.set_filter(text)
+    showListRows(scroll_list, model)
+
 #Function for outputing files to the save list 
 def addSaveListItems(save_dir):
-    saveFileList = []
-    saveFileList.clear() #clear list
-    clearTextScrollList(save_scroll_list) #clear scroll list
-    
-    for file_path in os.listdir(save_dir):
-        # check if current file_path is a file
-        if os.path.isfile(os.path.join(save_dir, file_path)):
-            # add filename to list
-            saveFileList.append(file_path)                       
-    i = 0  
-    while i < len(saveFileList):
-        addSaveItem(saveFileList[i])
-        i = i + 1       
+    save_list_model.set_entries(listFiles(save_dir))
+    showListRows(save_scroll_list, save_list_model)
     
 #Function for outputing files to the publish list 
-def addPublishItem(item):
-    cmds.textScrollList(publish_scroll_list, edit=True, append=[item])
-    num_items = cmds.textScrollList(save_scroll_list, query=True, numberOfItems=True)
-    if num_items > 0:
-        last_item_index = num_items  
-        cmds.textScrollList(publish_scroll_list, edit=True, showIndexedItem=last_item_index)
-        
-#Function for outputing files to the save list 
 def addPublishListItems(publish_dir):
-    publishFileList = []
-    publishFileList.clear() #clear list
-    clearTextScrollList(publish_scroll_list) #clear scroll list
-    
-    for file_path in os.listdir(publish_dir):
-        # check if current file_path is a file
-        if os.path.isfile(os.path.join(publish_dir, file_path)):
-            # add filename to list
-            publishFileList.append(file_path)
-                        
-    i = 0  
-    while i < len(publishFileList):
-        addPublishItem(publishFileList[i])
-        i = i + 1       
+    publish_list_model.set_entries(listFiles(publish_dir))
+    showListRows(publish_scroll_list, publish_list_model)
         
+#Function filling the asset browser with the saved and published folders, read further as they are expanded
+def resetAssetBrowser():
+    cmds.treeView(asset_browser, edit=True, removeAll=True)
+    for root_dir in [save_dir, publish_dir]:
+        if os.path.isdir(root_dir):
+            addBrowserItem(root_dir, "", root_dir, True)
+
+#Function adding one file or folder to the asset browser
+def addBrowserItem(item_path, parent_path, label, is_dir):
+    cmds.treeView(asset_browser, edit=True, addItem=(item_path, parent_path))
+    cmds.treeView(asset_browser, edit=True, displayLabel=(item_path, label))
+    if is_dir:
+        cmds.treeView(asset_browser, edit=True, addItem=(item_path + browser_placeholder, item_path))
+        cmds.treeView(asset_browser, edit=True, displayLabel=(item_path + browser_placeholder, "..."))
+        cmds.treeView(asset_browser, edit=True, expandItem=(item_path, False))
+
+#Function listing a folder when it is expanded and dropping its rows again when it is collapsed
+@profiler.timed("expandBrowserItem", "ui")
+def expandBrowserItem(item_path, expanded):
+    children = cmds.treeView(asset_browser, query=True, children=item_path) or []
+    for child in children:
+        if child != item_path and cmds.treeView(asset_browser, query=True, itemExists=child):
+            cmds.treeView(asset_browser, edit=True, removeItem=child)
+    if not int(expanded):
+        cmds.treeView(asset_browser, edit=True, addItem=(item_path + browser_placeholder, item_path))
+        return
+    try:
+        entries = browser_cache.entries(item_path)
+    except OSError as error:
+        addLog("Cannot read {0}: {1}".format(item_path, error))
+        return
+    #Child folders get their version and size label once they are expanded themselves
+    for entry in entries:
+        addBrowserItem(entry["path"], item_path, asset_tree.entry_label(entry), entry["is_dir"])
+    summary = asset_tree.version_summary(browser_cache, item_path)
+    if summary:
+        cmds.treeView(asset_browser, edit=True, displayLabel=(item_path, asset_tree.folder_label(os.path.basename(item_path), summary)))
+
+#Function publishing the saved versions selected in the asset browser as they are, in a background worker,
+#instead of exporting them from the open scene again (folders promote the latest saved version of each asset)
+def promoteSavedVersions():
+    saved_files = []
+    for item_path in cmds.treeView(asset_browser, query=True, selectItem=True) or []:
+        if os.path.isdir(item_path):
+            saved_files.extend(publish_promote.latest_saved_files(item_path))
+        elif item_path.lower().endswith(".mb"):
+            saved_files.append(item_path)
+    if not saved_files:
+        addLog("Select saved asset versions or folders in the asset browser to promote.")
+        return
+    
+    queue = publish_queue.PublishQueue()
+    label = "Promote: {0} saved versions".format(len(saved_files))
+    job_id = queue.submit("promote_assets", label, {"files": saved_files, "flags": alembic_flags})
+    started = queue.ensure_workers(publish_queue_workers)
+    addLog("Queued promote job #{0} ({1}).".format(job_id, label))
+    if started:
+        addLog("Started {0} publish worker(s).".format(len(started)))
+    refreshPublishQueue()
+
+#Function opening the asset catalog of the root directory
+def getAssetCatalog():
+    root_dir = getTextFieldValue(root_text_field)
+    if root_dir == "":
+        print("Directory textfield is empty! Please set root directory first.")
+        addLog("Directory textfield is empty! Please set root directory first.")
+        return None
+    return asset_catalog.AssetCatalog.for_root(root_dir)
+
+#Function showing one page of the catalogued files matching the catalog search and filters
+@profiler.timed("searchCatalog", "ui")
+def searchCatalog(page=1):
+    global catalog_page
+    catalog = getAssetCatalog()
+    if catalog is None:
+        return
+    asset_type = cmds.optionMenu(catalog_type_menu, query=True, value=True)
+    days = cmds.intField(catalog_days_field, query=True, value=True)
+    min_mb = cmds.floatField(catalog_min_size_field, query=True, value=True)
+    result = catalog.page(page, catalog_page_size, search=getTextFieldValue(catalog_search_field),
+                          asset_type=None if asset_type == catalog_types[0] else asset_type,
+                          since=time.time() - days * 86400.0 if days else None,
+                          min_size=min_mb * 1048576 if min_mb else None,
+                          latest=bool(cmds.checkBox(catalog_latest_checkbox, query=True, value=True)))
+    catalog_page = result["page"]
+    clearTextScrollList(catalog_result_list)
+    cmds.textScrollList(catalog_result_list, edit=True, append=[
+        "{0} v{1} .{2}  {3:.1f} MB  {4} {5}  {6}".format(row["name"], str(row["version"]).zfill(3), row["format"], row["size"] / 1048576.0,
+                                                       row["author"], time.strftime("%Y-%m-%d %H:%M", time.localtime(row["published"])), row["stage"])
+        for row in result["rows"]])
+    cmds.text(catalog_page_label, edit=True, label="Page {0} of {1}, {2} files".format(result["page"], result["pages"], result["total"]))
+
+#Function reconciling the asset catalog with the saved and published folders
+@profiler.timed("crawlCatalog", "ui")
+def crawlCatalog():
+    catalog = getAssetCatalog()
+    if catalog is None:
+        return
+    result = catalog.crawl(getTextFieldValue(root_text_field))
+    addLog("Catalog: {0} added, {1} updated, {2} removed ({3} folders read, {4} unchanged) in {5:.2f}s".format(
+        result["added"], result["updated"], result["removed"], result["folders_read"], result["folders_skipped"], result["seconds"]))
+    searchCatalog(catalog_page)
+
+#Function showing the preview of a saved or published file, looked up in the background
+def showPreview(file_path):
+    global thumbnail_loader, preview_source
+    if thumbnail_loader is None:
+        thumbnail_loader = thumbnails.ThumbnailLoader(on_ready=lambda source, image_file: maya.utils.executeDeferred(setPreviewImage, source, image_file))
+    preview_source = file_path
+    cmds.text(preview_label, edit=True, label="Loading preview...")
+    thumbnail_loader.request(file_path)
+
+#Function putting a finished preview lookup into the preview panel, unless another file was selected since
+def setPreviewImage(source, image_file):
+    if source != preview_source:
+        return
+    if image_file:
+        cmds.image(preview_image, edit=True, image=image_file)
+        cmds.text(preview_label, edit=True, label=os.path.basename(source))
+    elif source.lower().endswith(thumbnails.preview_extensions):
+        cmds.text(preview_label, edit=True, label="No preview yet: " + os.path.basename(source))
+
+#Function previewing the file selected in the save or publish list
+def previewListSelection(scroll_list, directory):
+    selected = cmds.textScrollList(scroll_list, query=True, selectItem=True) or []
+    if selected and os.path.isfile(os.path.join(directory, selected[-1])):
+        showPreview(os.path.join(directory, selected[-1]))
+
+#Function previewing the file selected in the asset browser
+def previewBrowserSelection():
+    selected = cmds.treeView(asset_browser, query=True, selectItem=True) or []
+    if selected and os.path.isfile(selected[-1]):
+        showPreview(selected[-1])
+
+#Function queueing preview renders of the saved and published files that have none yet
+def queueAllPreviews():
+    file_paths = []
+    for root_dir in [save_dir, publish_dir]:
+        for directory, dir_names, file_names in os.walk(root_dir):
+            dir_names[:] = [dir_name for dir_name in dir_names if not dir_name.startswith(".")]
+            file_paths.extend(os.path.join(directory, file_name) for file_name in file_names
+                              if file_name.lower().endswith(thumbnails.preview_extensions))
+    cache = thumbnails.ThumbnailCache()
+    job_ids = thumbnails.queue_previews([file_path for file_path in file_paths if not cache.lookup(file_path)], log=addLog)
+    addLog("Queued {0} preview renders.".format(len(job_ids)))
+
 #Function for getting value out of text field
 def getTextFieldValue(text_field):
     value = cmds.textField(text_field, query=True, text=True)
@@ -297,6 +784,27 @@ def clearTextScrollList(scroll_list):
     print("Clear scroll list " + scroll_list)
     cmds.textScrollList(scroll_list, edit=True, removeAll=True)
     
+#Function to start or stop recording timings
+def toggleProfiling(enabled, with_cprofile=False):
+    if enabled:
+        profiler.enable(with_cprofile=with_cprofile)
+        addLog("Recording publish timings.")
+    else:
+        profiler.disable()
+        addLog("Stopped recording publish timings.")
+
+#Function for writing the timing summary to the log
+def logProfileSummary():
+    for line in profiler.summary_lines() or ["No timings recorded."]:
+        addLog(line)
+
+#Function for exporting the recorded timings
+def exportProfile():
+    export_dir = cmds.fileDialog2(fileMode=3, caption="Export Timings To", okCaption="Export")
+    if export_dir:
+        for exported_file in profiler.export_session(export_dir[0], prefix="save_publish_profile"):
+            addLog("Exported timings: " + exported_file)
+
 #Function to open file dialog when setting root directory
 def open_file_dialog():
     root_dir = cmds.fileDialog2(fileMode=3, caption="Select Root Directory", okCaption="Set Directory")
@@ -320,6 +828,7 @@ def open_file_dialog():
         addLog("Setting publish directory: " + publish_dir)
         updateTextField(publish_text_field, publish_dir)  
         addPublishListItems(publish_dir)      
+        resetAssetBrowser()
         
     else:
         cmds.error("Root directory not selected.")
@@ -396,10 +905,18 @@ def createUI():
         allowMultiSelection = True, 
         width = window_width,
         height = 200,
-        append = []  
+        append = [],
+        selectCommand = lambda: previewListSelection(save_scroll_list, save_dir)
     )
     cmds.setParent('..')
     
+    #Filter Save List
+    cmds.rowLayout(numberOfColumns=2, columnWidth2 = (column1_width, column2_width)) 
+    cmds.text(label="Filter Asset List:")
+    cmds.textField(placeholderText="Type to filter...", width=250,
+                   textChangedCommand=lambda text: filterList(save_scroll_list, save_list_model, text))
+    cmds.setParent('..')  # End the rowLayout
+    
     #Refresh Asset List
     cmds.rowLayout(numberOfColumns=2, columnWidth2 = (column1_width, column2_width)) 
     cmds.text(label="Refresh Asset List:")
@@ -447,10 +964,18 @@ def createUI():
         allowMultiSelection = True, 
         width = window_width,
         height = 200,
-        append = []  
+        append = [],
+        selectCommand = lambda: previewListSelection(publish_scroll_list, publish_dir)
     )
     cmds.setParent('..')
     
+    #Publish Filter List
+    cmds.rowLayout(numberOfColumns=2, columnWidth2 = (column1_width, column2_width)) 
+    cmds.text(label="Filter Asset List:")
+    cmds.textField(placeholderText="Type to filter...", width=250,
+                   textChangedCommand=lambda text: filterList(publish_scroll_list, publish_list_model, text))
+    cmds.setParent('..')  # End the rowLayout
+    
     #Publish Refresh Asset List
     cmds.rowLayout(numberOfColumns=2, columnWidth2 = (column1_width, column2_width)) 
     cmds.text(label="Refresh Asset List:")
@@ -480,6 +1005,243 @@ def createUI():
     cmds.button(label="Publish Assets", command='publishFiles()', width=100)
     cmds.setParent('..')  # End the rowLayout
 
+    #Dry run with estimates
+    cmds.rowLayout(numberOfColumns=3, columnWidth3=(column1_width, column2_width, column3_width))
+    cmds.text(label="Plan Publish (Dry Run):")
+    cmds.button(label="Plan Publish", command=lambda x: planPublishFiles(), width=100)
+    cmds.setParent('..')  # End the rowLayout
+
+    #Verify published files
+    cmds.rowLayout(numberOfColumns=3, columnWidth3=(column1_width, column2_width, column3_width))
+    cmds.text(label="Verify Published Files:")
+    cmds.button(label="Verify Changed", command=lambda x: verifyPublishedFiles(), width=100)
+    cmds.button(label="Verify All", command=lambda x: verifyPublishedFiles(full=True), width=100)
+    cmds.setParent('..')  # End the rowLayout
+
+    #Shots using the published assets
+    cmds.rowLayout(numberOfColumns=3, columnWidth3=(column1_width, column2_width, column3_width))
+    cmds.text(label="Shots Using Assets:")
+    cmds.button(label="Impact Report", command=lambda x: reportSceneAssetImpact(), width=100)
+    cmds.setParent('..')  # End the rowLayout
+
+    #Stage locally and upload in the background
+    cmds.rowLayout(numberOfColumns=2, columnWidth2 = (column1_width, column2_width))
+    cmds.text(label="Slow Publish Share:")
+    cmds.checkBox(label="Stage Locally, Upload In Background", value=publish_staging, changeCommand=lambda enabled: togglePublishStaging(enabled))
+    cmds.setParent('..')  # End the rowLayout
+
+    #Instance identical meshes before exporting
+    cmds.rowLayout(numberOfColumns=2, columnWidth2 = (column1_width, column2_width))
+    cmds.text(label="Duplicate Meshes:")
+    cmds.checkBox(label="Instance Before Export ({0})".format(", ".join(instance_duplicate_types)), value=publish_instance_duplicates,
+                  changeCommand=lambda enabled: togglePublishInstancing(enabled))
+    cmds.setParent('..')  # End the rowLayout
+
+    #Publish Shot Caches
+    cmds.rowLayout(numberOfColumns=3, columnWidth3=(column1_width, column2_width, column3_width))
+    cmds.text(label="Publish Shot Caches:")
+    cmds.button(label="Publish Caches", command='publishSequenceCaches()', width=100)
+    cmds.setParent('..')  # End the rowLayout
+
+#--------------Init Asset Browser--------------- 
+
+    create_section("Asset Browser", ic_window)
+
+    #Saved and published folders, listed as they are expanded
+    cmds.rowLayout(numberOfColumns = 1, columnWidth1 = column1_width)
+    global asset_browser
+    asset_browser = cmds.treeView(
+        numberOfButtons = 0,
+        allowReparenting = False,
+        width = window_width,
+        height = 250,
+        expandCollapseCommand = expandBrowserItem,
+        selectionChangedCommand = previewBrowserSelection
+    )
+    cmds.setParent('..')
+
+    #Refresh browser
+    cmds.rowLayout(numberOfColumns=2, columnWidth2 = (column1_width, column2_width)) 
+    cmds.text(label="Refresh Asset Browser:")
+    cmds.button(label="Refresh Browser", command=lambda x: resetAssetBrowser(), width=100)
+    cmds.setParent('..')  # End the rowLayout
+
+    #Publish saved versions without re-exporting them
+    cmds.rowLayout(numberOfColumns=2, columnWidth2 = (column1_width, column2_width)) 
+    cmds.text(label="Promote Saved Versions:")
+    cmds.button(label="Promote Selected", command=lambda x: promoteSavedVersions(), width=100)
+    cmds.setParent('..')  # End the rowLayout
+
+#--------------Init Preview--------------- 
+
+    create_section("Preview", ic_window)
+
+    #Preview of the file selected in the lists or the browser
+    cmds.rowLayout(numberOfColumns=2, columnWidth2 = (thumbnails.thumbnail_size + 10, column2_width))
+    global preview_image, preview_label
+    preview_image = cmds.image(width=thumbnails.thumbnail_size, height=thumbnails.thumbnail_size)
+    preview_label = cmds.text(label="Select a file to preview.", align="left")
+    cmds.setParent('..')  # End the rowLayout
+
+    #Render missing previews
+    cmds.rowLayout(numberOfColumns=2, columnWidth2 = (column1_width, column2_width)) 
+    cmds.text(label="Render Missing Previews:")
+    cmds.button(label="Queue Previews", command=lambda x: queueAllPreviews(), width=100)
+    cmds.setParent('..')  # End the rowLayout
+
+#--------------Init Asset Catalog--------------- 
+
+    create_section("Asset Catalog", ic_window)
+
+    #Catalog search
+    cmds.rowLayout(numberOfColumns=2, columnWidth2 = (column1_width, column2_width))
+    cmds.text(label="Search Names:")
+    global catalog_search_field
+    catalog_search_field = cmds.textField(placeholderText="e.g. chair lay", width=250, changeCommand=lambda text: searchCatalog())
+    cmds.setParent('..')  # End the rowLayout
+
+    #Catalog filters
+    cmds.rowLayout(numberOfColumns=3, columnWidth3=(column1_width, column2_width, column3_width))
+    cmds.text(label="Type:")
+    global catalog_type_menu, catalog_latest_checkbox
+    catalog_type_menu = cmds.optionMenu(width=140)
+    [cmds.menuItem(label=catalog_type) for catalog_type in catalog_types]
+    catalog_latest_checkbox = cmds.checkBox(label="Latest Versions Only", value=True)
+    cmds.setParent('..')  # End the rowLayout
+    cmds.rowLayout(numberOfColumns=4, columnWidth4=(column1_width, 60, 90, 60))
+    cmds.text(label="Published In Last Days:")
+    global catalog_days_field, catalog_min_size_field
+    catalog_days_field = cmds.intField(value=0, minValue=0, width=60)
+    cmds.text(label="Min Size (MB):")
+    catalog_min_size_field = cmds.floatField(value=0, minValue=0, width=60)
+    cmds.setParent('..')  # End the rowLayout
+
+    #Catalog results scroll list
+    cmds.rowLayout(numberOfColumns = 1, columnWidth1 = column1_width)
+    global catalog_result_list
+    catalog_result_list = cmds.textScrollList(
+        numberOfRows = 10,  
+        allowMultiSelection = True, 
+        width = window_width,
+        height = 200,
+        append = []  
+    )
+    cmds.setParent('..')
+
+    #Catalog paging
+    cmds.rowLayout(numberOfColumns=3, columnWidth3=(column1_width, column2_width, column3_width))
+    cmds.button(label="Previous Page", command=lambda x: searchCatalog(catalog_page - 1), width=100)
+    global catalog_page_label
+    catalog_page_label = cmds.text(label="Page 1 of 1")
+    cmds.button(label="Next Page", command=lambda x: searchCatalog(catalog_page + 1), width=100)
+    cmds.setParent('..')  # End the rowLayout
+    cmds.rowLayout(numberOfColumns=3, columnWidth3=(column1_width, column2_width, column3_width))
+    cmds.text(label="Catalog:")
+    cmds.button(label="Search", command=lambda x: searchCatalog(), width=100)
+    cmds.button(label="Re-crawl", command=lambda x: crawlCatalog(), width=100)
+    cmds.setParent('..')  # End the rowLayout
+
+#--------------Init Publish Queue--------------- 
+
+    create_section("Publish Queue", ic_window)
+
+    #Queue publish
+    cmds.rowLayout(numberOfColumns=3, columnWidth3=(column1_width, column2_width, column3_width))
+    cmds.text(label="Publish In Background:")
+    cmds.button(label="Queue Publish", command='queuePublishFiles()', width=100)
+    cmds.setParent('..')  # End the rowLayout
+
+    #Publish job scroll list
+    cmds.rowLayout(numberOfColumns = 1, columnWidth1 = column1_width)
+    global publish_queue_list
+    publish_queue_list = cmds.textScrollList(
+        numberOfRows = 8,  
+        allowMultiSelection = True, 
+        width = window_width,
+        height = 160,
+        append = []  
+    )
+    cmds.setParent('..')
+
+    #Upload scroll list
+    cmds.rowLayout(numberOfColumns = 2, columnWidth2 = (column1_width, column2_width))
+    cmds.text(label="Uploads To Share:")
+    cmds.setParent('..')  # End the rowLayout
+    cmds.rowLayout(numberOfColumns = 1, columnWidth1 = column1_width)
+    global upload_queue_list
+    upload_queue_list = cmds.textScrollList(
+        numberOfRows = 6,  
+        allowMultiSelection = True, 
+        width = window_width,
+        height = 120,
+        append = []  
+    )
+    cmds.setParent('..')
+
+    #Queue controls
+    cmds.rowLayout(numberOfColumns=3, columnWidth3=(column1_width, column2_width, column3_width))
+    cmds.button(label="Refresh Jobs", command=lambda x: refreshPublishQueue(), width=100)
+    cmds.button(label="Log Job Timings", command=lambda x: logPublishJobTimings(), width=100)
+    cmds.button(label="Cancel Jobs", command=lambda x: cancelPublishJobs(), width=100)
+    cmds.setParent('..')  # End the rowLayout
+    cmds.rowLayout(numberOfColumns=3, columnWidth3=(column1_width, column2_width, column3_width))
+    cmds.button(label="Start Workers", command=lambda x: startPublishWorkers(), width=100)
+    cmds.button(label="Clear Finished", command=lambda x: clearFinishedPublishJobs(), width=100)
+    cmds.setParent('..')  # End the rowLayout
+
+#--------------Init Retention--------------- 
+
+    create_section("Retention", ic_window)
+
+    #Archive old versions
+    cmds.rowLayout(numberOfColumns=3, columnWidth3=(column1_width, column2_width, column3_width))
+    cmds.text(label="Old Versions:")
+    cmds.button(label="Preview", command=lambda x: archiveOldVersions(), width=100)
+    cmds.button(label="Archive Old Versions", command=lambda x: archiveOldVersions(apply=True), width=100)
+    cmds.setParent('..')  # End the rowLayout
+
+    #Archived versions scroll list
+    cmds.rowLayout(numberOfColumns = 1, columnWidth1 = column1_width)
+    global retention_archive_list
+    retention_archive_list = cmds.textScrollList(
+        numberOfRows = 6,  
+        allowMultiSelection = True, 
+        width = window_width,
+        height = 120,
+        append = []  
+    )
+    cmds.setParent('..')
+
+    #Archive controls
+    cmds.rowLayout(numberOfColumns=3, columnWidth3=(column1_width, column2_width, column3_width))
+    cmds.text(label="Archived Versions:")
+    cmds.button(label="List Archived", command=lambda x: listArchivedVersions(), width=100)
+    cmds.button(label="Restore Selected", command=lambda x: restoreArchivedVersions(), width=100)
+    cmds.setParent('..')  # End the rowLayout
+
+#--------------Init Profiling--------------- 
+
+    create_section("Profiling", ic_window)
+
+    #Record timings
+    cmds.rowLayout(numberOfColumns = 2, columnWidth2 = (column1_width, column2_width))
+    cmds.text(label="Record Timings:")
+    global profile_cprofile_box
+    profile_cprofile_box = cmds.checkBox(label="Include cProfile", value=False)
+    cmds.setParent('..')  # End the rowLayout
+    cmds.rowLayout(numberOfColumns = 2, columnWidth2 = (column1_width, column2_width))
+    cmds.text(label="")
+    cmds.checkBox(label="Record Save/Publish Timings", value=profiler.enabled,
+                  changeCommand=lambda enabled: toggleProfiling(enabled, cmds.checkBox(profile_cprofile_box, query=True, value=True)))
+    cmds.setParent('..')  # End the rowLayout
+
+    #Summary and export
+    cmds.rowLayout(numberOfColumns = 3, columnWidth3 = (column1_width, column2_width, column3_width))
+    cmds.text(label="Timings:")
+    cmds.button(label="Log Summary", command=lambda x: logProfileSummary(), width=100)
+    cmds.button(label="Export", command=lambda x: exportProfile(), width=100)
+    cmds.setParent('..')  # End the rowLayout
+
 #--------------Init Logs-------------------- 
   
     create_section("Log Messages", ic_window)
@@ -507,6 +1269,7 @@ def createUI():
     cmds.button(parent=ic_layout, label="Reset UI", command="reloadSavePublishTool()")     
     cmds.separator(parent=ic_layout, style="single", height=15, width = window_width)   
     cmds.showWindow(ic_window) 
+    refreshPublishQueue()
 
 #------------Window Reload------------------
 
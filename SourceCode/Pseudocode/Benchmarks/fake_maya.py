@@ -0,0 +1,545 @@
+# Script Name: Fake Maya Backend
+# Description: In-memory stand-in for maya.cmds so the tools can be loaded and timed outside Maya.
+#Only the scene queries the tools rely on are modelled (ls, listRelatives, getAttr, xform, file,
+#referenceQuery, sets, listHistory, polyInfo, parent, ...). Loading a reference reads its whole file, the part of a real load that scales
+#with the cache size. UI commands are accepted and return control names so the tool scripts can
+#build their windows at import time.
+#
+#World space values are translation only: rotation and scale of parents are not composed.
+
+import os
+import sys
+import types
+import importlib.util
+
+transform_defaults = {
+    "translateX": 0.0, "translateY": 0.0, "translateZ": 0.0,
+    "rotateX": 0.0, "rotateY": 0.0, "rotateZ": 0.0,
+    "scaleX": 1.0, "scaleY": 1.0, "scaleZ": 1.0,
+    "rotatePivotX": 0.0, "rotatePivotY": 0.0, "rotatePivotZ": 0.0,
+    "scalePivotX": 0.0, "scalePivotY": 0.0, "scalePivotZ": 0.0,
+    "visibility": True,
+}
+camera_defaults = {
+    "horizontalFilmAperture": 1.417, "verticalFilmAperture": 0.797,
+    "focalLength": 35.0, "fStop": 5.6,
+}
+#Meshes built with geometry also hold flat object space points, face vertex counts/indices and flat uvs
+mesh_defaults = {"faces": 0, "vertices": 0, "points": (), "face_counts": (), "face_connects": (), "uvs": ()}
+type_defaults = {"transform": transform_defaults, "camera": camera_defaults, "mesh": mesh_defaults}
+
+#Bytes written per exported node (and per frame for Alembic) so output sizes scale like real exports
+bytes_per_node = 64
+#A mesh exports like one node per this many faces
+faces_per_node = 100
+_zero_block = bytes(1048576)
+
+
+class FakeScene(object):
+    """
+    Node graph keyed by unique short name. Attributes are only stored when they differ from the type
+    defaults so million-node scenes stay small.
+    """
+
+    def __init__(self):
+        self.node_type = {}
+        self.parent = {}
+        self.children = {}
+        self.attrs = {}
+        self.selection = []
+        self.references = {}
+        #Members of each set (shading engines), and the nodes connected into each node
+        self.set_members = {}
+        self.inputs = {}
+        #Instanced mesh nodes -> the mesh they share their geometry with
+        self.instance_of = {}
+        self.playback_range = (1, 100)
+        self.scene_name = ""
+
+    def create_node(self, node_type, name, parent=None, **attrs):
+        self.node_type[name] = node_type
+        self.parent[name] = parent
+        if parent is not None:
+            self.children.setdefault(parent, []).append(name)
+        if attrs:
+            self.attrs[name] = dict(attrs)
+        return name
+
+    def connect(self, source, destination):
+        self.inputs.setdefault(destination, []).append(source)
+
+    def add_reference(self, file_path, loaded=True):
+        reference_node = os.path.splitext(os.path.basename(file_path))[0] + "RN"
+        self.references[file_path] = {"loaded": loaded, "node": reference_node}
+
+    def full_path(self, name):
+        path = []
+        while name is not None:
+            path.append(name)
+            name = self.parent[name]
+        return "|" + "|".join(reversed(path))
+
+    def resolve(self, name):
+        short_name = name.split("|")[-1]
+        if short_name not in self.node_type:
+            raise ValueError("No object matches name: " + name)
+        return short_name
+
+    def get_attr(self, name, attr):
+        name = self.instance_of.get(name, name)
+        node_attrs = self.attrs.get(name)
+        if node_attrs and attr in node_attrs:
+            return node_attrs[attr]
+        return type_defaults.get(self.node_type[name], {}).get(attr, 0.0)
+
+    def set_attr(self, name, attr, value):
+        self.attrs.setdefault(name, {})[attr] = value
+
+    def delete(self, name):
+        #Set members are dropped when the set is queried
+        for node in [name] + self.descendants(name):
+            if self.parent[node] is not None:
+                self.children[self.parent[node]].remove(node)
+            for table in (self.node_type, self.parent, self.children, self.attrs, self.inputs, self.instance_of):
+                table.pop(node, None)
+
+    def descendants(self, name):
+        found = []
+        stack = list(reversed(self.children.get(name, [])))
+        while stack:
+            child = stack.pop()
+            found.append(child)
+            stack.extend(reversed(self.children.get(child, [])))
+        return found
+
+    def export_weight(self, names):
+        """
+        Nodes an export of names writes, meshes counting by their faces and instances as one node.
+        """
+        return sum(max(1, self.get_attr(name, "faces") // faces_per_node) if self.node_type[name] == "mesh" and name not in self.instance_of
+                   else 1 for name in names)
+
+    def world_translation(self, name):
+        world = [0.0, 0.0, 0.0]
+        while name is not None:
+            for axis, attr in enumerate(("translateX", "translateY", "translateZ")):
+                world[axis] += self.get_attr(name, attr)
+            name = self.parent[name]
+        return world
+
+
+class FakeCmds(object):
+
+    def __init__(self, scene=None):
+        self.scene = scene or FakeScene()
+        self.controls = {}
+        self.exports = []
+        self._control_count = 0
+        self._poly_info = {}
+
+    #------------------------------- scene queries -------------------------------
+
+    def ls(self, *names, **kwargs):
+        scene = self.scene
+        node_type = kwargs.get("type")
+        names = [name for node in names for name in (node if isinstance(node, (list, tuple)) else [node])]
+        if kwargs.get("sl") or kwargs.get("selection"):
+            found = list(scene.selection)
+        elif names:
+            found = [scene.resolve(name) for name in names if name.split("|")[-1] in scene.node_type]
+        else:
+            found = list(scene.node_type)
+        if node_type:
+            node_types = node_type if isinstance(node_type, (list, tuple)) else [node_type]
+            found = [name for name in found if scene.node_type[name] in node_types]
+        if kwargs.get("uuid"):
+            return [scene.instance_of.get(name, name) for name in found]
+        if kwargs.get("long") or kwargs.get("l"):
+            found = [scene.full_path(name) for name in found]
+        if kwargs.get("showType") or kwargs.get("st"):
+            return [value for name in found for value in (name, scene.node_type[name.split("|")[-1]])]
+        return found
+
+    def listRelatives(self, node, parent=False, children=False, fullPath=False, type=None,
+                      allDescendents=False, shapes=False, p=False, c=False, f=False, ad=False):
+        scene = self.scene
+        name = scene.resolve(node)
+        if parent or p:
+            found = [scene.parent[name]] if scene.parent[name] is not None else []
+        elif allDescendents or ad:
+            found = scene.descendants(name)
+        else:
+            found = list(scene.children.get(name, []))
+        if type:
+            found = [child for child in found if scene.node_type[child] == type]
+        if shapes:
+            found = [child for child in found if scene.node_type[child] != "transform"]
+        if not found:
+            return None
+        if fullPath or f:
+            return [scene.full_path(child) for child in found]
+        return found
+
+    def polyEvaluate(self, *nodes, **kwargs):
+        names = []
+        for node in nodes:
+            names.extend(node if isinstance(node, (list, tuple)) else [node])
+        if (kwargs.get("face") or kwargs.get("f")) and (kwargs.get("vertex") or kwargs.get("v")):
+            #Several flags answer with a dict
+            return {"vertex": self.polyEvaluate(names, vertex=True), "face": self.polyEvaluate(names, face=True)}
+        if kwargs.get("face") or kwargs.get("f"):
+            return sum(int(self.scene.get_attr(self.scene.resolve(name), "faces")) for name in names)
+        if kwargs.get("vertex") or kwargs.get("v"):
+            return sum(int(self.scene.get_attr(self.scene.resolve(name), "vertices")) for name in names)
+        return 0
+
+    def sets(self, *names, **kwargs):
+        if kwargs.get("query") or kwargs.get("q"):
+            members = self.scene.set_members.get(self.scene.resolve(names[0]), [])
+            return [member for member in members if member.split(".")[0] in self.scene.node_type] or None
+        if kwargs.get("forceElement") or kwargs.get("fe"):
+            self.scene.set_members.setdefault(self.scene.resolve(kwargs.get("forceElement") or kwargs.get("fe")), []).extend(
+                self.scene.resolve(name) for name in names)
+        return None
+
+    def polyInfo(self, mesh, faceToVertex=False, fv=False):
+        counts = self.scene.get_attr(self.scene.resolve(mesh), "face_counts")
+        connects = self.scene.get_attr(self.scene.resolve(mesh), "face_connects")
+        #Formatted once per topology, the copies of a mesh share their tuples
+        cached = self._poly_info.get(id(connects))
+        if cached is None or cached[0] is not connects:
+            lines, start = [], 0
+            for face, count in enumerate(counts):
+                lines.append("FACE {0:>6}:{1} \n".format(face, "".join("{0:>7}".format(index) for index in connects[start:start + count])))
+                start += count
+            cached = self._poly_info[id(connects)] = (connects, lines)
+        return list(cached[1])
+
+    def polyEditUV(self, components, query=False, q=False, **kwargs):
+        return list(self.scene.get_attr(self.scene.resolve(components.split(".")[0]), "uvs")) or None
+
+    def delete(self, *nodes):
+        for node in nodes:
+            for name in (node if isinstance(node, (list, tuple)) else [node]):
+                self.scene.delete(self.scene.resolve(name))
+
+    def parent(self, node, new_parent, add=False, shape=False, addObject=False, s=False):
+        #Only instancing a shape under another transform (parent -add -shape) is modelled
+        scene = self.scene
+        master = scene.resolve(node)
+        master = scene.instance_of.get(master, master)
+        instance_index = 1
+        while "{0}Instance{1}".format(master, instance_index) in scene.node_type:
+            instance_index += 1
+        name = "{0}Instance{1}".format(master, instance_index)
+        scene.create_node(scene.node_type[master], name, parent=scene.resolve(new_parent))
+        scene.instance_of[name] = master
+        return [scene.full_path(name)]
+
+    def listHistory(self, node, **kwargs):
+        #The node and everything upstream of it
+        found = [self.scene.resolve(node)]
+        seen = set(found)
+        for name in found:
+            for source in self.scene.inputs.get(name, []):
+                if source not in seen:
+                    seen.add(source)
+                    found.append(source)
+        return found
+
+    def objExists(self, name):
+        return name.split("|")[-1] in self.scene.node_type
+
+    def createNode(self, node_type, name=None, parent=None, **kwargs):
+        scene = self.scene
+        base_name = name or node_type + "1"
+        name = base_name
+        while name in scene.node_type:
+            name = "{0}{1}".format(base_name, len(scene.node_type))
+        return scene.create_node(node_type, name, parent=scene.resolve(parent) if parent else None)
+
+    def addAttr(self, node, longName=None, dataType=None, attributeType=None, **kwargs):
+        self.scene.set_attr(self.scene.resolve(node), longName, "" if dataType == "string" else 0.0)
+
+    def attributeQuery(self, attr, node=None, exists=False):
+        name = self.scene.resolve(node)
+        return attr in self.scene.attrs.get(name, {}) or attr in type_defaults.get(self.scene.node_type[name], {})
+
+    def nodeType(self, name):
+        return self.scene.node_type[self.scene.resolve(name)]
+
+    def getAttr(self, plug):
+        node, attr = plug.rsplit(".", 1)
+        return self.scene.get_attr(self.scene.resolve(node), attr)
+
+    def setAttr(self, plug, value, **kwargs):
+        node, attr = plug.rsplit(".", 1)
+        self.scene.set_attr(self.scene.resolve(node), attr, value)
+
+    def xform(self, node, query=False, translation=False, worldSpace=False, piv=False, matrix=False,
+              q=False, t=False, ws=False, m=False, objectSpace=False):
+        scene = self.scene
+        if ".vtx[" in node:
+            #Flat object space xyz of the mesh's vertices
+            return list(scene.get_attr(scene.resolve(node.split(".")[0]), "points"))
+        name = scene.resolve(node)
+        if scene.node_type[name] != "transform":
+            raise RuntimeError("xform: Object " + node + " is not a transform")
+        world = scene.world_translation(name) if (worldSpace or ws) else \
+            [scene.get_attr(name, attr) for attr in ("translateX", "translateY", "translateZ")]
+        if piv:
+            rotate_pivot = [world[axis] + scene.get_attr(name, "rotatePivot" + "XYZ"[axis]) for axis in range(3)]
+            scale_pivot = [world[axis] + scene.get_attr(name, "scalePivot" + "XYZ"[axis]) for axis in range(3)]
+            return rotate_pivot + scale_pivot
+        if matrix or m:
+            return [1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0] + world + [1.0]
+        return world
+
+    def select(self, *nodes, **kwargs):
+        if kwargs.get("clear") or kwargs.get("cl"):
+            self.scene.selection = []
+            return
+        selected = []
+        for node in nodes:
+            selected.extend(node if isinstance(node, (list, tuple)) else [node])
+        selected = [self.scene.resolve(node) for node in selected]
+        if kwargs.get("add"):
+            self.scene.selection.extend(selected)
+        else:
+            self.scene.selection = selected
+
+    def playbackOptions(self, q=False, query=False, min=False, max=False, minTime=False, maxTime=False):
+        if min or minTime:
+            return self.scene.playback_range[0]
+        return self.scene.playback_range[1]
+
+    def referenceQuery(self, file_path, isLoaded=False, rfn=False, referenceNode=False, filename=False):
+        reference = self.scene.references[file_path]
+        if isLoaded:
+            return reference["loaded"]
+        if rfn or referenceNode:
+            return reference["node"]
+        return file_path
+
+    #------------------------------- file IO -------------------------------
+
+    def _write_export(self, file_path, node_count, frames=1):
+        directory = os.path.dirname(file_path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        # Really written (not sparse) so export time scales with the exported data like it does in Maya
+        size = remaining = max(1, node_count) * frames * bytes_per_node
+        with open(file_path, "wb") as export_file:
+            while remaining > 0:
+                chunk = min(remaining, len(_zero_block))
+                export_file.write(_zero_block[:chunk])
+                remaining -= chunk
+        #Sizes are kept here because exporters write to temp paths that are renamed afterwards
+        self.exports.append((file_path, node_count, frames, size))
+
+    def _read_reference(self, file_path):
+        if os.path.isfile(file_path):
+            with open(file_path, "rb") as reference_file:
+                while reference_file.read(len(_zero_block)):
+                    pass
+
+    def file(self, *args, **kwargs):
+        scene = self.scene
+        if kwargs.get("q") or kwargs.get("query"):
+            if kwargs.get("reference") or kwargs.get("r"):
+                return list(scene.references)
+            if kwargs.get("sceneName") or kwargs.get("sn"):
+                return scene.scene_name
+            return None
+        if kwargs.get("rename"):
+            scene.scene_name = kwargs["rename"]
+            return scene.scene_name
+        if kwargs.get("loadReference") or kwargs.get("lr"):
+            reference_node = kwargs.get("loadReference") or kwargs.get("lr")
+            file_path = [path for path, reference in scene.references.items() if reference["node"] == reference_node][0]
+            if args and args[0] != file_path:
+                scene.references[args[0]] = scene.references.pop(file_path)
+                file_path = args[0]
+            scene.references[file_path]["loaded"] = True
+            self._read_reference(file_path)
+            return file_path
+        if kwargs.get("unloadReference") or kwargs.get("ur"):
+            reference_node = kwargs.get("unloadReference") or kwargs.get("ur")
+            for reference in scene.references.values():
+                if reference["node"] == reference_node:
+                    reference["loaded"] = False
+            return reference_node
+        if kwargs.get("reference") or kwargs.get("r"):
+            deferred = kwargs.get("deferReference") or kwargs.get("dr")
+            scene.add_reference(args[0], loaded=not deferred)
+            if not deferred:
+                self._read_reference(args[0])
+            return args[0]
+        if kwargs.get("exportAll") or kwargs.get("ea"):
+            self._write_export(args[0], len(scene.node_type))
+            return args[0]
+        if kwargs.get("exportSelected") or kwargs.get("es"):
+            exported = set()
+            for name in scene.selection:
+                exported.add(name)
+                exported.update(scene.descendants(name))
+            self._write_export(args[0], scene.export_weight(exported))
+            return args[0]
+        return None
+
+    def AbcExport(self, j=None, jobArg=None):
+        jobs = j or jobArg
+        if isinstance(jobs, str):
+            jobs = [jobs]
+        start, end = self.scene.playback_range
+        for job in jobs:
+            tokens = job.split()
+            roots = [tokens[index + 1] for index, token in enumerate(tokens) if token == "-root"]
+            file_path = tokens[tokens.index("-file") + 1]
+            if "-fr" in tokens:
+                index = tokens.index("-fr")
+                start, end = float(tokens[index + 1]), float(tokens[index + 2])
+            node_count = sum(1 + self.scene.export_weight(self.scene.descendants(self.scene.resolve(root))) for root in roots)
+            self._write_export(file_path, node_count, int(end - start) + 1)
+
+    #------------------------------- UI -------------------------------
+
+    def _control(self, name=None):
+        if name is None or name not in self.controls:
+            if name is None:
+                self._control_count += 1
+                name = "fakeControl{0}".format(self._control_count)
+            self.controls[name] = {"items": [], "text": "", "value": None}
+        return name
+
+    def textScrollList(self, name=None, **kwargs):
+        name = self._control(name)
+        control = self.controls[name]
+        if kwargs.get("query") or kwargs.get("q"):
+            if kwargs.get("numberOfItems"):
+                return len(control["items"])
+            if kwargs.get("allItems") or kwargs.get("ai"):
+                return list(control["items"])
+            if kwargs.get("selectItem") or kwargs.get("si"):
+                return []
+            return None
+        if kwargs.get("removeAll"):
+            control["items"] = []
+        if kwargs.get("append"):
+            append = kwargs["append"]
+            control["items"].extend(append if isinstance(append, (list, tuple)) else [append])
+        return name
+
+    def textField(self, name=None, **kwargs):
+        name = self._control(name)
+        if kwargs.get("query") or kwargs.get("q"):
+            return self.controls[name]["text"]
+        if "text" in kwargs:
+            self.controls[name]["text"] = kwargs["text"]
+        return name
+
+    def optionMenu(self, name=None, **kwargs):
+        name = self._control(name)
+        if kwargs.get("query") or kwargs.get("q"):
+            return self.controls[name]["value"]
+        return name
+
+    def checkBox(self, name=None, **kwargs):
+        name = self._control(name)
+        if kwargs.get("query") or kwargs.get("q"):
+            return bool(self.controls[name]["value"])
+        if "value" in kwargs:
+            self.controls[name]["value"] = kwargs["value"]
+        return name
+
+    def window(self, name=None, **kwargs):
+        if kwargs.get("query") or kwargs.get("q") or kwargs.get("exists"):
+            return name in self.controls
+        return self._control(name)
+
+    def fileDialog2(self, **kwargs):
+        return None
+
+    def confirmDialog(self, **kwargs):
+        return "Sure"
+
+    def warning(self, message):
+        print("Warning: " + message)
+
+    def error(self, message):
+        raise RuntimeError(message)
+
+    def __getattr__(self, command):
+        # Layouts, buttons, separators and the rest of the UI only need to hand back a name
+        def ui_command(*args, **kwargs):
+            if kwargs.get("query") or kwargs.get("q"):
+                return None
+            return self._control(args[0] if args and isinstance(args[0], str) else None)
+        return ui_command
+
+
+class _QtStubType(type):
+    #Class level lookups such as Qt.DisplayRole
+    def __getattr__(cls, name):
+        return _QtStub()
+
+
+class _QtStub(object, metaclass=_QtStubType):
+    """Accepts any Qt construction or call, enough for the Lighting Tool to define its classes."""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __call__(self, *args, **kwargs):
+        return _QtStub()
+
+    def __getattr__(self, name):
+        return _QtStub()
+
+
+def _stub_module(name, **attributes):
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    module.__getattr__ = lambda attribute: _QtStub
+    sys.modules[name] = module
+    return module
+
+
+def install(scene=None):
+    """
+    Register the fake maya.cmds (and Qt stubs) in sys.modules and return the FakeCmds instance.
+    """
+    fake_cmds = FakeCmds(scene)
+    cmds_module = types.ModuleType("maya.cmds")
+    for attribute in dir(fake_cmds):
+        if not attribute.startswith("_"):
+            setattr(cmds_module, attribute, getattr(fake_cmds, attribute))
+    cmds_module.__getattr__ = fake_cmds.__getattr__
+    cmds_module.fake = fake_cmds
+
+    maya_module = types.ModuleType("maya")
+    maya_module.__path__ = []
+    maya_module.cmds = cmds_module
+    sys.modules["maya"] = maya_module
+    sys.modules["maya.cmds"] = cmds_module
+    maya_module.OpenMayaUI = _stub_module("maya.OpenMayaUI")
+    maya_module.utils = _stub_module("maya.utils")
+
+    pyside_module = _stub_module("PySide2")
+    pyside_module.__path__ = []
+    pyside_module.QtWidgets = _stub_module("PySide2.QtWidgets")
+    pyside_module.QtCore = _stub_module("PySide2.QtCore")
+    pyside_module.QtGui = _stub_module("PySide2.QtGui")
+    _stub_module("shiboken2")
+    return fake_cmds
+
+
+def load_tool(script_path, module_name="benchmarked_tool"):
+    """
+    Execute a tool script against the installed fake backend and return it as a module, so its globals
+    (save_dir, publish_text_field, ...) can be set before calling into it.
+    """
+    spec = importlib.util.spec_from_file_location(module_name, script_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
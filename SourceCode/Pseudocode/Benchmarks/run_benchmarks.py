@@ -0,0 +1,1226 @@
+# Script Name: Pipeline Benchmarks
+# Description: Times the Integrity Check, Save/Publish and Lighting tools outside Maya against the fake
+#maya.cmds backend and synthetic scenes/publish trees, records every run in a history file and fails
+#when a result regresses past the threshold against the recent baseline.
+#
+#Usage:
+#   python run_benchmarks.py                                  default sizes
+#   python run_benchmarks.py --scene-sizes 1000 100000 1000000
+#   python run_benchmarks.py --only integrity --threshold 0.5 --no-record
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import contextlib
+import platform
+import tempfile
+import statistics
+import types
+import multiprocessing
+
+benchmark_dir = os.path.dirname(os.path.abspath(__file__))
+pseudocode_dir = os.path.dirname(benchmark_dir)
+tool_paths = {
+    "integrity": os.path.join(pseudocode_dir, "Integrity Check Tool", "IntegrityCheck.py"),
+    "publish": os.path.join(pseudocode_dir, "Asset Publishing System Tool", "AssetPublishingSystem.py"),
+    "lighting": os.path.join(pseudocode_dir, "Lighting Scene Builder Tool", "Lighting_Tool_Final.py"),
+}
+os.environ.setdefault("VFX_PIPELINE_LIBRARY", os.path.join(pseudocode_dir, "Pipeline Library"))
+#Kept outside the source tree so benchmark runs leave the working copy clean
+default_history_path = os.environ.get("VFX_BENCHMARK_HISTORY", os.path.join(os.path.expanduser("~"), ".vfx_pipeline", "benchmark_history.jsonl"))
+
+if benchmark_dir not in sys.path:
+    sys.path.insert(0, benchmark_dir)
+import fake_maya
+import synthetic_data
+
+sys.path.append(os.environ["VFX_PIPELINE_LIBRARY"])
+import asset_catalog
+import asset_tree
+import cache_proxies
+import chunked_alembic_cache
+import dependency_index
+import duplicate_geometry
+import file_dependencies
+import list_model
+import performance_budget
+import publish_estimates
+import publish_index
+import publish_promote
+import publish_retention
+import publish_steps
+import publish_transfer
+import publish_verify
+import scene_references
+import shot_manifest
+import thumbnails
+import version_reservation
+
+#Registered benchmark groups: name -> function(options, work_dir) yielding (result name, seconds, details)
+benchmarks = {}
+
+
+def benchmark(group_name):
+    def decorator(function):
+        benchmarks[group_name] = function
+        return function
+    return decorator
+
+
+def best_time(function, repeat):
+    """
+    Best wall time of repeat calls, the least noisy estimate for regression checks.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+fake_cmds = fake_maya.install()
+loaded_tools = {}
+
+
+def tool(tool_name):
+    if tool_name not in loaded_tools:
+        loaded_tools[tool_name] = fake_maya.load_tool(tool_paths[tool_name], "benchmarked_" + tool_name)
+    return loaded_tools[tool_name]
+
+#------------------------------- BENCHMARKS -------------------------------
+
+
+@benchmark("integrity")
+def integrity_checks(options, work_dir):
+    integrity_tool = tool("integrity")
+    published = synthetic_data.build_publish_tree(os.path.join(work_dir, "integrity"), assets_per_type=5, version_depth=3)
+    references = [file_path for file_path in published if file_path.endswith("_v001.mb")]
+
+    for scene_size in options.scene_sizes:
+        fake_cmds.scene = synthetic_data.build_scene(scene_size, reference_paths=references)
+        fake_cmds.scene.selection = fake_cmds.ls(type="transform")[:min(scene_size, 20000)]
+        for category in integrity_tool.check_categories:
+            for check_name in integrity_tool.checks_in_category(category):
+                seconds = best_time(lambda: integrity_tool.run_checks([check_name]), options.repeat)
+                yield "integrity.{0}.{1}".format(check_name, scene_size), seconds, {"transforms": scene_size}
+            seconds = best_time(lambda: integrity_tool.run_category_checks(category), options.repeat)
+            yield "integrity.run_all_{0}.{1}".format(category.lower().replace(" ", "_"), scene_size), seconds, {"transforms": scene_size}
+
+
+@benchmark("budget")
+def performance_budget_checks(options, work_dir):
+    """
+    Performance Budget checks over a scene of meshed, textured assets against a project budget file, and
+    the per-asset mesh counts against one polyEvaluate per mesh. The measurements must match the scene
+    and the offenders must come most expensive first.
+    """
+    integrity_tool = tool("integrity")
+    root_dir = os.path.join(work_dir, "budget")
+    texture_dir = os.path.join(root_dir, "textures")
+    os.makedirs(texture_dir)
+    textures = []
+    for resolution in [1024, 2048, 4096, 8192, 16384]:
+        textures.append((os.path.join(texture_dir, "tile_{0}.exr".format(resolution)), resolution))
+        with open(textures[-1][0], "wb") as texture_file:
+            texture_file.write(bytes(resolution * 16))
+    textures.append((os.path.join(texture_dir, "missing_2048.exr"), 2048))
+    with open(os.path.join(root_dir, performance_budget.budget_file_name), "w") as budget_file:
+        json.dump(dict((asset_type, {"texture_mb": 0.3}) for asset_type in synthetic_data.asset_types), budget_file)
+    integrity_tool.root_folder = os.path.join(root_dir, "asset_final", "published", "assets")
+    groups = integrity_tool.export_asset_groups
+    scene = fake_cmds.scene = synthetic_data.build_scene(options.budget_assets * 10, pieces_per_asset=9, piece_faces=(500, 50000),
+                                                         textures=textures)
+    details = {"assets": options.budget_assets, "meshes": options.budget_assets * 9}
+
+    def per_mesh_counts():
+        counts = {}
+        for mesh in fake_cmds.ls(type="mesh", long=True):
+            asset_counts = counts.setdefault(performance_budget.asset_of(mesh, groups), [0, 0])
+            asset_counts[0] += fake_cmds.polyEvaluate(mesh, face=True)
+            asset_counts[1] += fake_cmds.polyEvaluate(mesh, vertex=True)
+        return counts
+
+    yield "budget.mesh_counts.per_mesh", best_time(per_mesh_counts, options.repeat), details
+    yield "budget.mesh_counts.per_asset", best_time(lambda: performance_budget.mesh_counts(fake_cmds, groups), options.repeat), details
+    yield "budget.run_all", best_time(lambda: integrity_tool.run_category_checks("Performance Budget"), options.repeat), details
+
+    stats = performance_budget.scene_stats(fake_cmds, groups)
+    texture_sizes = dict((texture_path, os.path.getsize(texture_path)) for texture_path, resolution in textures if os.path.isfile(texture_path))
+    for (asset_type, asset_name), asset_stats in stats.items():
+        meshes = [name for name in scene.descendants(asset_name) if scene.node_type[name] == "mesh"]
+        file_paths = set(scene.get_attr(file_node, "fileTextureName") for file_node in scene.inputs[asset_name + "SG"])
+        expected = (sum(scene.get_attr(mesh, "faces") for mesh in meshes), sum(scene.get_attr(mesh, "vertices") for mesh in meshes),
+                    sum(texture_sizes.get(file_path, 0) for file_path in file_paths) / 1048576.0,
+                    sorted(file_path for file_path in file_paths if file_path not in texture_sizes))
+        if (asset_stats["faces"], asset_stats["vertices"], asset_stats["texture_mb"], sorted(asset_stats["missing"])) != expected:
+            raise AssertionError("{0} measured {1}, the scene holds {2}".format(asset_name, asset_stats, expected))
+    offenders = performance_budget.over_budget(stats, performance_budget.load_budgets(root_dir), sorted(performance_budget.metric_labels))
+    ratios = [offender["ratio"] for offender in offenders]
+    if not offenders or ratios != sorted(ratios, reverse=True) or any(ratio <= 1.0 for ratio in ratios):
+        raise AssertionError("Offenders are not over budget or not sorted by cost: {0}".format(ratios[:10]))
+    shutil.rmtree(root_dir, ignore_errors=True)
+
+
+@benchmark("external_files")
+def external_files(options, work_dir):
+    """
+    External file check of a scene whose file nodes share a pool of textures, some missing: an exists call
+    per node against the deduplicated pooled stat, cold and from the shared cache, and the integrity check.
+    """
+    integrity_tool = tool("integrity")
+    texture_dir = os.path.join(work_dir, "external_textures")
+    os.makedirs(texture_dir)
+    textures = [(os.path.join(texture_dir, "texture{0}.exr".format(index)), 1024) for index in range(options.external_textures)]
+    missing = set(file_path for file_path, resolution in textures[::50])
+    for file_path, resolution in textures:
+        if file_path not in missing:
+            open(file_path, "wb").close()
+    scene = fake_cmds.scene = synthetic_data.build_scene(options.external_assets * 10, pieces_per_asset=9, piece_faces=(100, 100),
+                                                         textures=textures)
+    file_nodes = fake_cmds.ls(type="file")
+    details = {"file_nodes": len(file_nodes)}
+
+    yield "external_files.exists_per_node", best_time(
+        lambda: [os.path.exists(fake_cmds.getAttr(file_node + ".fileTextureName")) for file_node in file_nodes], options.repeat), details
+    external_paths = file_dependencies.scene_paths(fake_cmds)
+    details["paths"] = len(external_paths)
+    yield "external_files.scene_paths", best_time(lambda: file_dependencies.scene_paths(fake_cmds), options.repeat), details
+    yield "external_files.check_cold", best_time(
+        lambda: file_dependencies.check_paths(external_paths, [texture_dir], cache=file_dependencies.StatCache()), options.repeat), details
+    cache = file_dependencies.StatCache()
+    file_dependencies.check_paths(external_paths, [texture_dir], cache=cache)
+    yield "external_files.check_cached", best_time(lambda: file_dependencies.check_paths(external_paths, [texture_dir], cache=cache),
+                                                   options.repeat), details
+    file_dependencies.shared_cache.clear()
+    yield "external_files.integrity_check", best_time(lambda: integrity_tool.run_checks(["check_external_files"]), options.repeat), details
+
+    results = file_dependencies.check_paths(external_paths, [work_dir], cache=cache)
+    used = set(scene.get_attr(file_node, "fileTextureName") for file_node in file_nodes)
+    found_missing = set(result["path"] for result in results if result["status"] == "missing")
+    if len(results) != len(used) or found_missing != missing & used or any(result["off_share"] for result in results):
+        raise AssertionError("{0} paths, {1} missing, expected {2} and {3}".format(len(results), len(found_missing), len(used), len(missing & used)))
+    if not all(result["cached"] for result in results) or sum(len(result["plugs"]) for result in results) != len(file_nodes):
+        raise AssertionError("Cached results were stat'ed again or file nodes were lost")
+
+
+@benchmark("duplicates")
+def duplicate_meshes(options, work_dir):
+    """
+    Duplicate mesh detection over a scene of copied props, against reading and hashing every mesh without
+    the vertex/face count buckets, and the integrity check. A smaller scene of heavier meshes is then
+    instanced, and the scoped exports of its sets are compared before and after. The groups found must be
+    the copies the scene was built with, and none may be left after instancing.
+    """
+    integrity_tool = tool("integrity")
+    roots = ["|set", "|setPiece"]
+    scene, expected = synthetic_data.build_duplicate_scene(options.duplicate_meshes)
+    fake_cmds.scene = scene
+    details = {"meshes": options.duplicate_meshes}
+
+    def hash_all():
+        digests = {}
+        for mesh in duplicate_geometry.mesh_shapes(fake_cmds, roots):
+            digests.setdefault(duplicate_geometry.geometry_hash(*duplicate_geometry.read_mesh(fake_cmds, mesh)), []).append(mesh)
+        return [meshes for meshes in digests.values() if len(meshes) > 1]
+
+    yield "duplicates.hash_all", best_time(hash_all, options.repeat), details
+    yield "duplicates.find", best_time(lambda: duplicate_geometry.find_duplicates(fake_cmds, roots), options.repeat), details
+    yield "duplicates.integrity_check", best_time(lambda: integrity_tool.run_checks(["check_duplicate_meshes"]), options.repeat), details
+    groups = duplicate_geometry.find_duplicates(fake_cmds, roots)
+    if sorted(sorted(group["meshes"]) for group in groups) != expected:
+        raise AssertionError("Found {0} duplicate groups, the scene holds {1}".format(len(groups), len(expected)))
+
+    scene, expected = synthetic_data.build_duplicate_scene(options.duplicate_export_meshes, shape_pool=50, grid_range=(10, 20))
+    fake_cmds.scene = scene
+    export_dir = os.path.join(work_dir, "duplicates")
+
+    def scoped_exports(variant):
+        #Published files are never overwritten, every run exports to an emptied folder
+        shutil.rmtree(os.path.join(export_dir, variant), ignore_errors=True)
+        del fake_cmds.exports[:]
+        for root in roots:
+            publish_steps.export_asset_scoped(fake_cmds, root, os.path.join(export_dir, variant, root.strip("|") + ".fbx"), "FBX export", options="v=0;")
+        return sum(size for file_path, _, _, size in fake_cmds.exports)
+
+    details = {"meshes": options.duplicate_export_meshes}
+    seconds = best_time(lambda: scoped_exports("copies"), options.repeat)
+    written = {"copies": scoped_exports("copies")}
+    yield "duplicates.export_fbx.copies", seconds, dict(details, bytes_written=written["copies"])
+    groups = duplicate_geometry.find_duplicates(fake_cmds, roots)
+    start_time = time.perf_counter()
+    instanced = duplicate_geometry.instance_duplicates(fake_cmds, groups, log=lambda message: None)
+    yield "duplicates.instance", time.perf_counter() - start_time, dict(details, instanced=instanced, **duplicate_geometry.savings(groups))
+    seconds = best_time(lambda: scoped_exports("instanced"), options.repeat)
+    written["instanced"] = scoped_exports("instanced")
+    yield "duplicates.export_fbx.instanced", seconds, dict(details, bytes_written=written["instanced"])
+
+    copies = sum(len(group) - 1 for group in expected)
+    if instanced != copies or duplicate_geometry.find_duplicates(fake_cmds, roots):
+        raise AssertionError("Instanced {0} of {1} copies or duplicates are left".format(instanced, copies))
+    if written["instanced"] >= written["copies"]:
+        raise AssertionError("Instancing did not shrink the export: {0} -> {1} bytes".format(written["copies"], written["instanced"]))
+    shutil.rmtree(export_dir, ignore_errors=True)
+
+
+@benchmark("versions")
+def version_resolution(options, work_dir):
+    publish_tool = tool("publish")
+    lighting_tool = tool("lighting")
+
+    for version_depth in options.version_depths:
+        tree_dir = os.path.join(work_dir, "versions_{0}".format(version_depth))
+        synthetic_data.build_publish_tree(tree_dir, assets_per_type=options.assets_per_type, version_depth=version_depth)
+        assets_dir = os.path.join(tree_dir, "asset_final", "published", "assets")
+
+        def resolve_all():
+            for asset_type in synthetic_data.asset_types:
+                for asset_index in range(options.assets_per_type):
+                    asset_name = "{0}Asset{1}".format(asset_type, asset_index)
+                    publish_tool.GetLatestVersionNumber(os.path.join(assets_dir, asset_type, asset_name), asset_name)
+
+        seconds = best_time(resolve_all, options.repeat)
+        yield "versions.GetLatestVersionNumber.depth{0}".format(version_depth), seconds, \
+            {"assets": options.assets_per_type * len(synthetic_data.asset_types)}
+
+        shots = synthetic_data.build_sequence_tree(tree_dir, version_depth=version_depth)
+
+        def latest_caches():
+            for cache_dir in shots:
+                lighting_tool.MyWindow.get_latest_cache_file(None, cache_dir, ['.abc', '.fbx'])
+
+        seconds = best_time(latest_caches, options.repeat)
+        yield "versions.get_latest_cache_file.depth{0}".format(version_depth), seconds, {"shots": len(shots)}
+
+
+@benchmark("compare")
+def compare_versions(options, work_dir):
+    lighting_tool = tool("lighting")
+    for entry_count in options.compare_sizes:
+        cache_list, ref_list = synthetic_data.build_version_lists(entry_count)
+        seconds = best_time(lambda: lighting_tool.MyWindow.compare_versions(None, cache_list, ref_list), options.repeat)
+        yield "compare.compare_versions.{0}".format(entry_count), seconds, {"entries": entry_count}
+
+
+@benchmark("publish")
+def publish_traversal(options, work_dir):
+    publish_tool = tool("publish")
+    for asset_count in options.publish_sizes:
+        fake_cmds.scene = synthetic_data.build_scene(asset_count * 10, pieces_per_asset=9)
+        publish_dir = os.path.join(work_dir, "publish_{0}".format(asset_count))
+        publish_tool.save_dir = os.path.join(publish_dir, "saved")
+        fake_cmds.textField(publish_tool.publish_text_field, edit=True, text=publish_dir)
+
+        def publish():
+            shutil.rmtree(os.path.join(publish_dir, "assets"), ignore_errors=True)
+            del fake_cmds.exports[:]
+            publish_tool.publishFiles()
+
+        seconds = best_time(publish, options.repeat)
+        written = sum(size for file_path, _, _, size in fake_cmds.exports)
+        yield "publish.publishFiles.{0}".format(asset_count), seconds, {"assets": asset_count, "bytes_written": written}
+
+@benchmark("publish_plan")
+def publish_plan(options, work_dir):
+    """
+    Dry-run plan of a publish against the publish itself. The first publish records the history; the plan
+    of the second must list exactly the files it then writes, without reserving versions, and estimate
+    their size within 10%.
+    """
+    publish_tool = tool("publish")
+    for asset_count in options.publish_sizes:
+        fake_cmds.scene = synthetic_data.build_scene(asset_count * 10, pieces_per_asset=9, piece_faces=(500, 50000))
+        root_dir = os.path.join(work_dir, "plan_{0}".format(asset_count))
+        publish_dir = os.path.join(root_dir, "asset_final", "published")
+        publish_tool.save_dir = os.path.join(root_dir, "asset_wips", "saved")
+        fake_cmds.textField(publish_tool.root_text_field, edit=True, text=root_dir)
+        fake_cmds.textField(publish_tool.publish_text_field, edit=True, text=publish_dir)
+        details = {"assets": asset_count}
+        publish_tool.publishFiles()
+
+        yield "publish_plan.plan.{0}".format(asset_count), best_time(publish_tool.planPublishFiles, options.repeat), details
+        entries = publish_tool.collectPublishEntries(publish_dir + "/assets", reserve=False)
+        if entries[0]["version"] != 2:
+            raise AssertionError("Planning reserved versions, the next publish would write v{0}".format(entries[0]["version"]))
+        plan = publish_estimates.plan_publish(publish_estimates.PublishHistory.for_root(root_dir), entries,
+                                              publish_estimates.measure_entries(fake_cmds, entries))
+
+        del fake_cmds.exports[:]
+        start_time = time.perf_counter()
+        publish_tool.publishFiles()
+        yield "publish_plan.publish.{0}".format(asset_count), time.perf_counter() - start_time, details
+        planned = [planned_file["path"] for asset in plan["assets"] for planned_file in asset["files"].values()]
+        missing = [file_path for file_path in planned if not os.path.isfile(file_path)]
+        if missing or len(planned) != len(fake_cmds.exports):
+            raise AssertionError("The plan listed {0} files, the publish wrote {1} ({2} planned files missing)".format(
+                len(planned), len(fake_cmds.exports), len(missing)))
+        actual_bytes = sum(os.path.getsize(file_path) for file_path in planned)
+        if plan["unknown"] or abs(plan["bytes"] - actual_bytes) > actual_bytes * 0.1:
+            raise AssertionError("Planned {0} bytes, the publish wrote {1}".format(plan["bytes"], actual_bytes))
+        shutil.rmtree(root_dir, ignore_errors=True)
+
+@benchmark("promote")
+def promote(options, work_dir):
+    """
+    Promotion of saved asset versions through the stub converter with one and N conversions at once, and
+    with the .mb copied instead of hardlinked. Each run publishes a new version of every asset, which must
+    be indexed with its Alembic and FBX, the linked .mb sharing the saved file's inode.
+    """
+    root_dir = os.path.join(work_dir, "promote")
+    saved_files = []
+    for index in range(options.promote_assets):
+        asset_type = synthetic_data.asset_types[index % len(synthetic_data.asset_types)]
+        asset_name = "{0}Asset{1}".format(asset_type, index)
+        asset_dir = os.path.join(root_dir, "asset_wips", "saved", "assets", asset_type, asset_name)
+        os.makedirs(asset_dir)
+        saved_files.append(os.path.join(asset_dir, synthetic_data.version_file_name(asset_name, 1, ".mb")))
+        with open(saved_files[-1], "wb") as saved_file:
+            saved_file.write(os.urandom(options.promote_kb * 1024))
+    os.environ["VFX_STUB_CONVERT_SECONDS"] = str(options.promote_convert_seconds)
+    converter_command = publish_promote.stub_converter_command()
+    details = {"assets": options.promote_assets}
+
+    runs = [("workers{0}".format(workers), workers, True) for workers in sorted(set([1, options.promote_workers]))]
+    runs.append(("copy.workers{0}".format(options.promote_workers), options.promote_workers, False))
+    for variant, workers, link in runs:
+        start_time = time.perf_counter()
+        reports = publish_promote.promote_saved(saved_files, workers, converter_command, frame_range=(1, 2), link=link, log=lambda message: None)
+        yield "promote.{0}".format(variant), time.perf_counter() - start_time, details
+        for saved_file, report in zip(saved_files, reports):
+            if report["error"]:
+                raise AssertionError("Promoting {0} failed: {1}".format(saved_file, report["error"]))
+            files = report["files"]
+            record = publish_index.read_version(os.path.dirname(os.path.dirname(files["cache"])), report["name"] + "_layout", report["version"])
+            if record is None or sorted(record["files"]) != ["alembic", "cache", "fbx"]:
+                raise AssertionError("{0} v{1} was not indexed".format(report["name"], report["version"]))
+            if os.path.getsize(files["alembic"]) != 2 * os.path.getsize(saved_file) or not os.path.isfile(files["fbx"]):
+                raise AssertionError("The converted files of {0} are wrong".format(report["name"]))
+            if (report["mb"] == "link") != (os.stat(files["cache"]).st_ino == os.stat(saved_file).st_ino) or report["mb"] != ("link" if link else "copy"):
+                raise AssertionError("The .mb of {0} was not {1}".format(report["name"], "linked" if link else "copied"))
+    shutil.rmtree(root_dir, ignore_errors=True)
+
+@benchmark("publish_scope")
+def publish_scope(options, work_dir):
+    """
+    Scoped per-asset FBX exports against the old behaviour, where every asset's FBX exported the whole
+    scene (exportAll). The .mb step scales the same way once it exports the selected asset.
+    """
+    publish_tool = tool("publish")
+    for asset_count in options.publish_sizes:
+        fake_cmds.scene = synthetic_data.build_scene(asset_count * 10, pieces_per_asset=9)
+        asset_roots = []
+        for asset_type in synthetic_data.asset_types:
+            asset_roots.extend(fake_cmds.listRelatives("|" + asset_type, children=True, fullPath=True) or [])
+        export_dir = os.path.join(work_dir, "scope_{0}".format(asset_count))
+
+        def scoped():
+            #Published files are never overwritten, every run exports to an emptied folder
+            shutil.rmtree(os.path.join(export_dir, "scoped"), ignore_errors=True)
+            del fake_cmds.exports[:]
+            for asset in asset_roots:
+                asset_name = asset.split("|")[-1]
+                publish_steps.export_asset_scoped(fake_cmds, asset, os.path.join(export_dir, "scoped", asset_name + ".fbx"), "FBX export", options="v=0;")
+
+        def export_all():
+            del fake_cmds.exports[:]
+            for asset in asset_roots:
+                asset_name = asset.split("|")[-1]
+                fake_cmds.file(os.path.join(export_dir, "export_all", asset_name + ".fbx"), force=True, options="v=0;", type="FBX export", pr=True, ea=True)
+
+        for variant, function in (("scoped_fbx", scoped), ("export_all_fbx", export_all)):
+            seconds = best_time(function, options.repeat)
+            written = sum(size for file_path, _, _, size in fake_cmds.exports)
+            yield "publish_scope.{0}.{1}".format(variant, asset_count), seconds, {"assets": asset_count, "bytes_written": written}
+        shutil.rmtree(export_dir, ignore_errors=True)
+
+@benchmark("publish_queue")
+def publish_queue_blocking(options, work_dir):
+    """
+    Time the artist's session is blocked by queueing a publish (snapshot and submit) and the time a
+    worker takes to drain those jobs in-process.
+    """
+    import publish_queue_worker
+    publish_tool = tool("publish")
+    publish_tool.publish_queue_workers = 0
+    for asset_count in options.publish_sizes:
+        fake_cmds.scene = synthetic_data.build_scene(asset_count * 10, pieces_per_asset=9)
+        publish_dir = os.path.join(work_dir, "queued_{0}".format(asset_count))
+        publish_tool.save_dir = os.path.join(publish_dir, "saved")
+        fake_cmds.textField(publish_tool.publish_text_field, edit=True, text=publish_dir)
+        queue = publish_queue_worker.publish_queue.PublishQueue()
+
+        seconds = best_time(publish_tool.queuePublishFiles, options.repeat)
+        yield "publish_queue.submit.{0}".format(asset_count), seconds, {"assets": asset_count}
+
+        start = time.perf_counter()
+        jobs_run = publish_queue_worker.drain(queue, fake_cmds, "benchmark", idle_exit_seconds=0.01, poll_seconds=0.001)
+        failed = [job["error"] for job in queue.jobs() if job["status"] == "failed"]
+        if failed:
+            raise AssertionError("Queued publish failed: {0}".format(failed[0]))
+        yield "publish_queue.drain.{0}".format(asset_count), time.perf_counter() - start, {"assets": asset_count, "jobs": jobs_run}
+        queue.clear_finished()
+
+def _race_publisher(asset_dir, prefix, publishes, export_seconds, start_barrier, reserve):
+    """
+    One of many processes publishing the same asset: take a version, export for export_seconds, then write
+    its file. reserve=False reproduces the old probe-the-disk numbering for comparison.
+    """
+    start_barrier.wait()
+    for _ in range(publishes):
+        if reserve:
+            version = version_reservation.reserve_version(asset_dir, prefix)
+            final_path = os.path.join(asset_dir, "cache", "{0}_v{1}.mb".format(prefix, str(version).zfill(3)))
+            with version_reservation.atomic_output(final_path) as temp_file:
+                time.sleep(export_seconds)
+                with open(temp_file, "wb") as export_file:
+                    export_file.write(b"%d\n" % os.getpid())
+        else:
+            version = version_reservation.latest_version(asset_dir, prefix) + 1
+            final_path = os.path.join(asset_dir, "cache", "{0}_v{1}.mb".format(prefix, str(version).zfill(3)))
+            time.sleep(export_seconds)
+            with open(final_path, "wb") as export_file:
+                export_file.write(b"%d\n" % os.getpid())
+
+@benchmark("version_race")
+def version_race(options, work_dir):
+    """
+    Dozens of processes publishing the same asset at once. Fails unless every reserved version is unique
+    and complete; the unreserved variant reports how many publishes the old numbering overwrote.
+    """
+    context = multiprocessing.get_context("spawn")
+    expected = options.race_processes * options.race_publishes
+    for variant, reserve in (("reserved", True), ("probe_disk", False)):
+        asset_dir = os.path.join(work_dir, "race_{0}".format(variant), "prop", "chair")
+        os.makedirs(os.path.join(asset_dir, "cache"))
+        start_barrier = context.Barrier(options.race_processes)
+        processes = [context.Process(target=_race_publisher, args=(asset_dir, "chair_layout", options.race_publishes, options.race_export_seconds, start_barrier, reserve))
+                     for _ in range(options.race_processes)]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        seconds = time.perf_counter() - start
+        if any(process.exitcode for process in processes):
+            raise AssertionError("A {0} publisher process failed".format(variant))
+
+        published = os.listdir(os.path.join(asset_dir, "cache"))
+        if reserve:
+            leftovers = [file_name for file_name in published if file_name.startswith(version_reservation.temp_prefix)]
+            if len(published) != expected or leftovers:
+                raise AssertionError("{0} publishes produced {1} versions ({2} temp files left)".format(expected, len(published), len(leftovers)))
+        yield "version_race.{0}.{1}x{2}".format(variant, options.race_processes, options.race_publishes), seconds, \
+            {"publishes": expected, "versions": len(published), "lost": expected - len(published)}
+
+def _staged_versions(staging_dir, publish_root, version_count, file_bytes):
+    """
+    Staged entries of version_count assets with .mb/.abc/.fbx files of file_bytes each, written to staging.
+    """
+    entries = []
+    for asset_index in range(version_count):
+        asset_name = "propAsset{0}".format(asset_index)
+        asset_dir = os.path.join(publish_root, "assets", "prop", asset_name)
+        entries.append({"name": asset_name, "asset_dir": asset_dir, "prefix": asset_name + "_layout", "version": 1,
+                        "files": dict((file_format, os.path.join(asset_dir, file_format, synthetic_data.version_file_name(asset_name, 1, extension)))
+                                      for file_format, extension in synthetic_data.publish_formats.items())})
+    staged = publish_transfer.staged_entries(entries, staging_dir)
+    for entry in staged:
+        for file_path in entry["files"].values():
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with open(file_path, "wb") as staged_file:
+                staged_file.write(os.urandom(file_bytes))
+    return staged
+
+@benchmark("transfer")
+def transfer(options, work_dir):
+    """
+    Upload of staged versions to a publish folder with 1 and N streams, under a bandwidth cap, and after an
+    interrupted copy. Fails unless every version is verified, indexed and the resume skipped the copied part.
+    """
+    file_bytes = options.transfer_kb * 1024
+    variants = [("streams1", 1, None), ("streams{0}".format(options.transfer_streams), options.transfer_streams, None),
+                ("capped{0}mbps".format(options.transfer_limit_mbps), options.transfer_streams, options.transfer_limit_mbps)]
+    for variant, streams, limit_mbps in variants:
+        staging_dir = os.path.join(work_dir, "staging_" + variant)
+        publish_root = os.path.join(work_dir, "share_" + variant)
+        staged = _staged_versions(staging_dir, publish_root, options.transfer_versions, file_bytes)
+        queue = publish_transfer.transfer_queue(staging_dir)
+        publish_transfer.submit_staged(staged, staging_dir)
+
+        start = time.perf_counter()
+        publish_transfer.run_worker(queue, streams, limit_mbps, idle_exit_seconds=0.05, poll_seconds=0.01)
+        seconds = time.perf_counter() - start
+        missing = [entry["name"] for entry in staged if publish_index.read_version(entry["asset_dir"], entry["prefix"], 1) is None]
+        if missing:
+            raise AssertionError("{0}: {1} versions were not indexed after the upload".format(variant, len(missing)))
+        transferred = options.transfer_versions * len(synthetic_data.publish_formats) * file_bytes
+        yield "transfer.{0}.{1}x{2}kb".format(variant, options.transfer_versions, options.transfer_kb), seconds, \
+            {"bytes_written": transferred, "mbps": transferred * 8 / 1048576.0 / seconds}
+
+    #A worker killed halfway through a file leaves its partial copy on the share
+    staging_dir = os.path.join(work_dir, "staging_resume")
+    staged = _staged_versions(staging_dir, os.path.join(work_dir, "share_resume"), 1, file_bytes)
+    source, destination = staged[0]["files"]["cache"], staged[0]["publish_files"]["cache"]
+    os.makedirs(os.path.dirname(destination))
+    with open(source, "rb") as source_file, open(publish_transfer.partial_path(destination), "wb") as partial_file:
+        partial_file.write(source_file.read(file_bytes // 2))
+    queue = publish_transfer.transfer_queue(staging_dir)
+    job_id = publish_transfer.submit_staged(staged, staging_dir)[0]
+    start = time.perf_counter()
+    publish_transfer.run_worker(queue, 1, idle_exit_seconds=0.05, poll_seconds=0.01)
+    seconds = time.perf_counter() - start
+    result = queue.get(job_id)["result"]
+    if result is None or result["files"]["cache"]["bytes_sent"] != file_bytes - file_bytes // 2:
+        raise AssertionError("Resumed transfer did not continue from the partial copy: {0}".format(queue.get(job_id)["error"]))
+    yield "transfer.resume.{0}kb".format(options.transfer_kb), seconds, {"resumed_from": result["files"]["cache"]["resumed_from"]}
+
+@benchmark("verify")
+def verify_published(options, work_dir):
+    """
+    Checking a published tree against its manifest: a naive serial read of every file, the parallel
+    memory-mapped full pass, and the default pass that skips files whose size and mtime are unchanged.
+    Fails unless a corrupted and a truncated file are both reported.
+    """
+    tree_dir = os.path.join(work_dir, "verify_tree")
+    file_bytes = options.verify_kb * 1024
+    created = synthetic_data.build_publish_tree(tree_dir, assets_per_type=options.assets_per_type, version_depth=options.verify_depth,
+                                                file_bytes=file_bytes)
+    published_root = os.path.join(tree_dir, "asset_final", "published")
+    entries = {}
+    for file_path in created:
+        format_dir = os.path.dirname(file_path)
+        asset_dir = os.path.dirname(format_dir)
+        file_name = os.path.basename(file_path)
+        prefix, version = file_name.rsplit("_v", 1)
+        entry = entries.setdefault((asset_dir, int(version.split(".")[0])),
+                                   {"asset_dir": asset_dir, "prefix": prefix, "version": int(version.split(".")[0]), "files": {}})
+        entry["files"][os.path.basename(format_dir)] = file_path
+    publish_steps.index_versions(list(entries.values()))
+    details = {"files": len(created), "bytes_written": len(created) * file_bytes}
+
+    def serial_read():
+        for file_path in created:
+            with open(file_path, "rb") as read_file:
+                hashlib.sha256(read_file.read()).hexdigest()
+
+    yield "verify.serial_read.{0}files".format(len(created)), best_time(serial_read, options.repeat), details
+    yield "verify.parallel_full.{0}files".format(len(created)), \
+        best_time(lambda: publish_verify.verify_tree(published_root, full=True), options.repeat), details
+    yield "verify.changed_only.{0}files".format(len(created)), \
+        best_time(lambda: publish_verify.verify_tree(published_root), options.repeat), details
+
+    #Flip a byte without touching size or mtime, and truncate another file
+    corrupted, truncated = created[0], created[-1]
+    stat = os.stat(corrupted)
+    with open(corrupted, "r+b") as damaged_file:
+        first_byte = damaged_file.read(1)
+        damaged_file.seek(0)
+        damaged_file.write(bytes([first_byte[0] ^ 0xFF]))
+    os.utime(corrupted, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    with open(truncated, "r+b") as damaged_file:
+        damaged_file.truncate(file_bytes // 2)
+    counts = publish_verify.verify_tree(published_root, full=True)["counts"]
+    if counts["corrupt"] != 1 or counts["size_changed"] != 1:
+        raise AssertionError("Verification missed damaged files: {0}".format(counts))
+    shutil.rmtree(tree_dir, ignore_errors=True)
+
+@benchmark("retention")
+def retention(options, work_dir):
+    """
+    Version lookups in deep asset and shot folders before and after archiving everything but the newest
+    --retention-keep versions. Fails unless an archived version restores byte for byte and the next
+    reserved version still follows the archived ones.
+    """
+    publish_tool = tool("publish")
+    lighting_tool = tool("lighting")
+    tree_dir = os.path.join(work_dir, "retention_tree")
+    created = synthetic_data.build_publish_tree(tree_dir, assets_per_type=options.assets_per_type, version_depth=options.retention_depth,
+                                                file_bytes=1024)
+    shots = synthetic_data.build_sequence_tree(tree_dir, version_depth=options.retention_depth)
+    published_root = os.path.join(tree_dir, "asset_final", "published")
+    assets_dir = os.path.join(published_root, "assets")
+    asset_dirs = [(os.path.join(assets_dir, asset_type, "{0}Asset{1}".format(asset_type, asset_index)), "{0}Asset{1}".format(asset_type, asset_index))
+                  for asset_type in synthetic_data.asset_types for asset_index in range(options.assets_per_type)]
+
+    def resolve_all():
+        for asset_dir, asset_name in asset_dirs:
+            publish_tool.GetLatestVersionNumber(asset_dir, asset_name)
+
+    def latest_caches():
+        for cache_dir in shots:
+            lighting_tool.MyWindow.get_latest_cache_file(None, cache_dir, ['.abc', '.fbx'])
+
+    details = {"assets": len(asset_dirs), "shots": len(shots), "depth": options.retention_depth}
+    yield "retention.GetLatestVersionNumber.before", best_time(resolve_all, options.repeat), details
+    yield "retention.get_latest_cache_file.before", best_time(latest_caches, options.repeat), details
+
+    start = time.perf_counter()
+    plan = publish_retention.plan_retention([published_root], options.retention_keep)
+    archived = publish_retention.archive_versions(plan, log=lambda message: None)
+    seconds = time.perf_counter() - start
+    yield "retention.archive.{0}versions".format(len(plan)), seconds, \
+        dict(details, bytes_written=sum(bundle_bytes for bundle_path, versions, original_bytes, bundle_bytes in archived))
+
+    yield "retention.GetLatestVersionNumber.after", best_time(resolve_all, options.repeat), details
+    yield "retention.get_latest_cache_file.after", best_time(latest_caches, options.repeat), details
+
+    #Round trip the oldest version of the first asset
+    original = created[0]
+    asset_dir, prefix, version = scene_references.parse_version_file(original)
+    if os.path.exists(original):
+        raise AssertionError("{0} was not archived".format(original))
+    bundle_path, entry = publish_retention.archived_versions(asset_dir)[(prefix, version)]
+    expected = dict((file_info["member"], file_info["sha256"]) for file_info in entry["files"])
+    restored = publish_retention.restore_version(asset_dir, prefix, version, log=lambda message: None)
+    for file_path in restored:
+        if publish_index.file_sha256(file_path) != expected[os.path.relpath(file_path, asset_dir).replace(os.sep, "/")]:
+            raise AssertionError("{0} did not restore intact".format(file_path))
+    if version_reservation.reserve_version(asset_dir, prefix) != options.retention_depth + 1:
+        raise AssertionError("Archiving let {0} reuse a version number".format(prefix))
+    shutil.rmtree(tree_dir, ignore_errors=True)
+
+@benchmark("dependencies")
+def dependencies(options, work_dir):
+    """
+    Finding the lighting scenes that use a cache: reading every scene for each lookup, against the
+    dependency index (full build, incremental update with nothing changed, and lookups). Fails unless the
+    index returns the same scenes as the scan, also after one scene was re-saved.
+    """
+    tree_dir = os.path.join(work_dir, "dependency_tree")
+    shots = synthetic_data.build_sequence_tree(tree_dir, episodes=options.dependency_episodes, version_depth=3)
+    scenes = synthetic_data.build_lighting_scenes(tree_dir, shots, scene_kb=options.dependency_scene_kb)
+    scene_dirs = [os.path.join(tree_dir, "asset_wips", "saved", "sequence")]
+    lookups = [os.path.basename(references[0]).rsplit("_v", 1)[0] for references in list(scenes.values())[:options.dependency_lookups]]
+    details = {"scenes": len(scenes), "lookups": len(lookups)}
+
+    def scan_lookups():
+        found = {}
+        for scene_file in scene_references.find_scenes(scene_dirs):
+            for file_path in scene_references.scene_references(scene_file):
+                found.setdefault(scene_references.parse_version_file(file_path)[1], set()).add(scene_file)
+        return [found.get(prefix, set()) for prefix in lookups]
+
+    yield "dependencies.scan.{0}scenes".format(len(scenes)), best_time(scan_lookups, options.repeat), details
+
+    def build_index():
+        index_path = os.path.join(work_dir, "dependency_index.db")
+        if os.path.exists(index_path):
+            os.remove(index_path)
+        dependency_index.DependencyIndex(scene_dirs, index_path).update()
+
+    yield "dependencies.index_build.{0}scenes".format(len(scenes)), best_time(build_index, options.repeat), details
+    index = dependency_index.DependencyIndex(scene_dirs, os.path.join(work_dir, "dependency_index.db"))
+    yield "dependencies.index_update_unchanged.{0}scenes".format(len(scenes)), best_time(index.update, options.repeat), details
+
+    def index_lookups():
+        return [set(row["scene"] for row in index.scenes_using(prefix)) for prefix in lookups]
+
+    yield "dependencies.index_lookups.{0}scenes".format(len(scenes)), best_time(index_lookups, options.repeat), details
+
+    #Re-save one scene without its first reference, the next update must notice
+    scene_file, references = next(iter(scenes.items()))
+    with open(scene_file) as scene:
+        lines = scene.readlines()
+    with open(scene_file, "w") as scene:
+        scene.writelines(line for line in lines if references[0].replace(os.sep, "/") not in line)
+    os.utime(scene_file, (time.time() + 10, time.time() + 10))
+    if index.update()["scanned"] != 1:
+        raise AssertionError("Incremental update did not re-read exactly the changed scene")
+    expected = [set(scene_references.normalize_path(os.path.abspath(scene)) for scene in found) for found in scan_lookups()]
+    if index_lookups() != expected:
+        raise AssertionError("Dependency index lookups differ from scanning the scenes")
+    shutil.rmtree(tree_dir, ignore_errors=True)
+
+@benchmark("shot_load")
+def shot_load(options, work_dir):
+    """
+    Resolving the caches to build every shot from: listing and parsing each cache folder like the
+    Lighting Tool's fallback, against reading the shot manifests. Fails unless both pick the same files,
+    and a pinned or as-of build picks the older version.
+    """
+    lighting_tool = tool("lighting")
+    tree_dir = os.path.join(work_dir, "shot_load_tree")
+    shots = synthetic_data.build_sequence_tree(tree_dir, episodes=options.shot_load_episodes, version_depth=options.shot_load_depth)
+    details = {"shots": len(shots), "depth": options.shot_load_depth}
+
+    def scan_shots():
+        return dict((cache_dir, sorted(lighting_tool.MyWindow.get_latest_cache_file(None, cache_dir, ['.abc', '.fbx'])))
+                    for cache_dir in shots)
+
+    yield "shot_load.scan.depth{0}".format(options.shot_load_depth), best_time(scan_shots, options.repeat), details
+
+    start = time.perf_counter()
+    for cache_dir in shots:
+        shot_manifest.build_from_directory(os.path.dirname(cache_dir))
+    yield "shot_load.manifest_rebuild.depth{0}".format(options.shot_load_depth), time.perf_counter() - start, details
+
+    def manifest_shots():
+        resolved = {}
+        for cache_dir in shots:
+            shot_dir = os.path.dirname(cache_dir)
+            resolved[cache_dir] = sorted(os.path.basename(cache["path"])
+                                         for cache in shot_manifest.resolve(shot_manifest.read_manifest(shot_dir), shot_dir))
+        return resolved
+
+    yield "shot_load.manifest.depth{0}".format(options.shot_load_depth), best_time(manifest_shots, options.repeat), details
+    if manifest_shots() != scan_shots():
+        raise AssertionError("Shot manifests resolve different caches than scanning the cache folders")
+
+    #Publish one more version of a cache, then check pins and as-of dates still reach the previous one
+    cache_dir, file_names = next(iter(shots.items()))
+    shot_dir = os.path.dirname(cache_dir)
+    cache_name, latest = file_names[-1].rsplit("_v", 1)
+    latest = int(latest.split(".")[0])
+    before_publish = time.time()
+    new_file = os.path.join(cache_dir, "{0}_v{1}.abc".format(cache_name, str(latest + 1).zfill(3)))
+    open(new_file, "wb").close()
+    start = time.perf_counter()
+    shot_manifest.record_caches(shot_dir, [{"name": cache_name, "file": new_file, "version": latest + 1}])
+    yield "shot_load.record_caches", time.perf_counter() - start, details
+
+    def chosen(**resolve_options):
+        manifest = shot_manifest.read_manifest(shot_dir)
+        return dict((cache["name"], cache["version"]) for cache in shot_manifest.resolve(manifest, shot_dir, **resolve_options))[cache_name]
+
+    if chosen() != latest + 1 or chosen(as_of=before_publish) != latest:
+        raise AssertionError("As-of build did not pick the version published before the date")
+    shot_manifest.set_pin(shot_dir, cache_name, latest - 1)
+    if chosen() != latest - 1:
+        raise AssertionError("Pinned cache did not resolve to its pinned version")
+    shutil.rmtree(tree_dir, ignore_errors=True)
+
+@benchmark("proxy_import")
+def proxy_import(options, work_dir):
+    """
+    Building a shot through the Lighting Tool's import_func with full references against proxy
+    stand-ins, then swapping a tenth of the stand-ins to full and back. The fake backend reads a cache
+    when its reference loads, so the gap grows with --proxy-cache-kb.
+    """
+    lighting_tool = tool("lighting")
+    cache_dir = os.path.join(work_dir, "proxy_caches")
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_files = []
+    for cache_index in range(options.proxy_caches):
+        cache_file = os.path.join(cache_dir, "cnr01_010_item{0}_prop_v001.abc".format(cache_index))
+        with open(cache_file, "wb") as write_file:
+            write_file.write(os.urandom(options.proxy_cache_kb * 1024))
+        cache_files.append(cache_file)
+    details = {"caches": len(cache_files), "bytes_written": len(cache_files) * options.proxy_cache_kb * 1024}
+
+    def build_shot(proxy):
+        fake_cmds.scene = fake_maya.FakeScene()
+        window = types.SimpleNamespace(proxy_checkbox=types.SimpleNamespace(isChecked=lambda: proxy))
+        for cache_file in cache_files:
+            lighting_tool.MyWindow.import_func(window, cache_file)
+
+    yield "proxy_import.full.{0}caches".format(len(cache_files)), best_time(lambda: build_shot(False), options.repeat), details
+    yield "proxy_import.proxy.{0}caches".format(len(cache_files)), best_time(lambda: build_shot(True), options.repeat), details
+
+    stand_in_nodes = [info["node"] for info in cache_proxies.stand_ins(fake_cmds)][:max(1, len(cache_files) // 10)]
+    swapped, seconds = cache_proxies.swap(fake_cmds, stand_in_nodes, "full", log=lambda message: None)
+    yield "proxy_import.swap_to_full.{0}caches".format(len(stand_in_nodes)), seconds, details
+    states = [info["state"] for info in cache_proxies.stand_ins(fake_cmds)]
+    if swapped != len(stand_in_nodes) or states.count("full") != len(stand_in_nodes):
+        raise AssertionError("Swapping to full left stand-ins in the wrong state: {0} full".format(states.count("full")))
+    swapped, seconds = cache_proxies.swap(fake_cmds, stand_in_nodes, "proxy", log=lambda message: None)
+    yield "proxy_import.swap_to_proxy.{0}caches".format(len(stand_in_nodes)), seconds, details
+    if any(reference["loaded"] for reference in fake_cmds.scene.references.values()):
+        raise AssertionError("Swapping back to proxies left full references loaded")
+    fake_cmds.scene = fake_maya.FakeScene()
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+@benchmark("lists")
+def long_lists(options, work_dir):
+    """
+    Filling the tools' lists with --list-entries files: the old per-item textScrollList append against
+    the Save/Publish Tool's bulk refresh and the Lighting Tool's cache list models, then type-ahead
+    filtering checked against a plain scan.
+    """
+    publish_tool = tool("publish")
+    lighting_tool = tool("lighting")
+    list_dir = os.path.join(work_dir, "long_list")
+    os.makedirs(list_dir, exist_ok=True)
+    kinds = ["char", "prop", "cam"]
+    names = ["ep{0:02d}_sh{1:03d}_item{2}_{3}_v{4:03d}.abc".format(index % 20, index % 400, index, kinds[index % 3], index % 50 + 1)
+             for index in range(options.list_entries)]
+    for name in names:
+        open(os.path.join(list_dir, name), "w").close()
+    details = {"entries": len(names)}
+
+    def per_item_append():
+        #What addSaveListItems did before: append, count and scroll once per file
+        scroll_list = fake_cmds.textScrollList()
+        for name in sorted(os.listdir(list_dir)):
+            if os.path.isfile(os.path.join(list_dir, name)):
+                fake_cmds.textScrollList(scroll_list, edit=True, append=[name])
+                item_count = fake_cmds.textScrollList(scroll_list, query=True, numberOfItems=True)
+                fake_cmds.textScrollList(scroll_list, edit=True, showIndexedItem=item_count)
+
+    yield "lists.per_item_append.{0}".format(len(names)), best_time(per_item_append, options.repeat), details
+    yield "lists.publish_refresh.{0}".format(len(names)), \
+        best_time(lambda: publish_tool.addSaveListItems(list_dir), options.repeat), details
+    shown = fake_cmds.textScrollList(publish_tool.save_scroll_list, query=True, allItems=True)
+    if shown[:-1] != sorted(names)[:publish_tool.list_display_limit]:
+        raise AssertionError("The save list does not show the first {0} files".format(publish_tool.list_display_limit))
+
+    cache_views = dict((kind, types.SimpleNamespace(model=lambda cache_model=lighting_tool.CacheListModel(): cache_model)) for kind in kinds)
+    window = types.SimpleNamespace(listView_charcache=cache_views["char"], listView_propcache=cache_views["prop"],
+                                   listView_camcache=cache_views["cam"], get_cache_path=lambda: list_dir)
+    yield "lists.lighting_populate.{0}".format(len(names)), \
+        best_time(lambda: lighting_tool.MyWindow.set_cache_list(window, names), options.repeat), details
+    if sum(cache_view.model().entries.row_count() for cache_view in cache_views.values()) != len(names):
+        raise AssertionError("The cache lists lost entries")
+
+    #Typing "sh123 item12" one key at a time, every key filtering the whole list
+    typed = "sh123 item12"
+    model = list_model.FilterListModel(names)
+
+    def type_ahead():
+        model.set_filter("")
+        for length in range(1, len(typed) + 1):
+            model.set_filter(typed[:length])
+
+    yield "lists.type_ahead.{0}keys.{1}".format(len(typed), len(names)), best_time(type_ahead, options.repeat), details
+    expected = [name for name in names if all(word in name.lower() for word in typed.split())]
+    if model.rows() != expected:
+        raise AssertionError("Type-ahead filter matched {0} entries, a scan matched {1}".format(model.row_count(), len(expected)))
+    model.set_filter("sh12")
+    if model.rows() != [name for name in names if "sh12" in name]:
+        raise AssertionError("Deleting filter characters did not widen the matches again")
+    shutil.rmtree(list_dir, ignore_errors=True)
+
+@benchmark("browser")
+def asset_browser(options, work_dir):
+    """
+    Opening one asset in the Save/Publish Tool's lazy asset browser against walking and stat-ing the
+    whole published tree, cold, warm (listings cached) and after a new version was published.
+    """
+    publish_tool = tool("publish")
+    browser_root = os.path.join(work_dir, "browser")
+    synthetic_data.build_publish_tree(browser_root, options.assets_per_type, options.browser_depth)
+    assets_dir = os.path.join(browser_root, "asset_final", "published", "assets").replace(os.sep, "/")
+    asset_name = "propAsset0"
+    asset_dir = assets_dir + "/prop/" + asset_name
+    details = {"assets": options.assets_per_type * len(synthetic_data.asset_types), "depth": options.browser_depth}
+
+    def walk_tree():
+        for directory, directory_names, file_names in os.walk(assets_dir):
+            for file_name in file_names:
+                os.stat(os.path.join(directory, file_name))
+
+    def open_asset():
+        for item_path in [assets_dir, assets_dir + "/prop", asset_dir]:
+            publish_tool.expandBrowserItem(item_path, 1)
+
+    def open_cold():
+        publish_tool.browser_cache = asset_tree.DirectoryCache()
+        open_asset()
+
+    yield "browser.full_walk.depth{0}".format(options.browser_depth), best_time(walk_tree, options.repeat), details
+    yield "browser.open_asset_cold.depth{0}".format(options.browser_depth), best_time(open_cold, options.repeat), details
+    #The assets folder, the prop folder, the asset and its three format folders
+    if publish_tool.browser_cache.scans != 6:
+        raise AssertionError("Opening one asset read {0} folders".format(publish_tool.browser_cache.scans))
+    yield "browser.open_asset_warm.depth{0}".format(options.browser_depth), best_time(open_asset, options.repeat), details
+    if publish_tool.browser_cache.scans != 6:
+        raise AssertionError("Unchanged folders were read again")
+
+    new_version = options.browser_depth + 1
+    #Folder mtimes can be coarse, make sure the new version lands on a later one
+    time.sleep(0.01)
+    with open(os.path.join(asset_dir, "alembic", synthetic_data.version_file_name(asset_name, new_version, ".abc")), "wb") as version_file:
+        version_file.write(b"x" * 1024)
+    start_time = time.perf_counter()
+    open_asset()
+    yield "browser.open_asset_changed.depth{0}".format(options.browser_depth), time.perf_counter() - start_time, details
+    if publish_tool.browser_cache.scans != 7:
+        raise AssertionError("Publishing a version re-read {0} folders instead of one".format(publish_tool.browser_cache.scans - 6))
+    summary = asset_tree.version_summary(publish_tool.browser_cache, asset_dir)
+    if summary != {asset_name + "_layout": (new_version, 1024)}:
+        raise AssertionError("Asset browser summary is {0}".format(summary))
+    shutil.rmtree(browser_root, ignore_errors=True)
+
+@benchmark("catalog")
+def catalog(options, work_dir):
+    """
+    "Props changed this week over a size" and name searches answered by the asset catalog against a walk
+    of the published tree, plus the cold, unchanged and one-version-added crawls that keep it in sync.
+    """
+    catalog_root = os.path.join(work_dir, "catalog")
+    synthetic_data.build_publish_tree(catalog_root, options.assets_per_type, options.catalog_depth, file_bytes=0)
+    published_dir = os.path.join(catalog_root, "asset_final", "published")
+    asset_dir = os.path.join(published_dir, "assets", "prop", "propAsset1")
+    #Every third version of the props is large
+    for version in range(1, options.catalog_depth + 1, 3):
+        with open(os.path.join(asset_dir, "alembic", synthetic_data.version_file_name("propAsset1", version, ".abc")), "wb") as large_file:
+            large_file.write(b"x" * 4096)
+    details = {"files": options.assets_per_type * len(synthetic_data.asset_types) * options.catalog_depth * 3}
+    since = time.time() - 7 * 86400.0
+
+    def walk_query():
+        found = []
+        for directory, directory_names, file_names in os.walk(os.path.join(published_dir, "assets", "prop")):
+            for file_name in file_names:
+                stat = os.stat(os.path.join(directory, file_name))
+                if stat.st_size >= 4096 and stat.st_mtime >= since:
+                    found.append(file_name)
+        return found
+
+    asset_catalog_db = asset_catalog.AssetCatalog.for_root(catalog_root)
+    start_time = time.perf_counter()
+    result = asset_catalog_db.crawl(catalog_root)
+    yield "catalog.crawl_cold", time.perf_counter() - start_time, dict(details, folders=result["folders_read"])
+    yield "catalog.crawl_unchanged", best_time(lambda: asset_catalog_db.crawl(catalog_root), options.repeat), details
+    if asset_catalog_db.crawl(catalog_root)["folders_read"]:
+        raise AssertionError("An unchanged tree was read again")
+    new_file = os.path.join(asset_dir, "fbx", synthetic_data.version_file_name("propAsset1", options.catalog_depth + 1, ".fbx"))
+    time.sleep(0.01)
+    open(new_file, "wb").close()
+    start_time = time.perf_counter()
+    result = asset_catalog_db.crawl(catalog_root)
+    yield "catalog.crawl_one_added", time.perf_counter() - start_time, details
+    if (result["added"], result["folders_read"]) != (1, 1):
+        raise AssertionError("Adding one version gave {0}".format(result))
+
+    yield "catalog.walk_query", best_time(walk_query, options.repeat), details
+    filters = {"asset_type": "prop", "min_size": 4096, "since": since}
+    rows = []
+    yield "catalog.query", best_time(lambda: rows.extend(asset_catalog_db.query(limit=100000, **filters)), options.repeat), details
+    if sorted(os.path.basename(row["path"]) for row in asset_catalog_db.query(limit=100000, **filters)) != sorted(walk_query()):
+        raise AssertionError("The catalog query does not match the walk")
+    yield "catalog.search_latest", best_time(lambda: asset_catalog_db.query(search="prop asset1", latest=True), options.repeat), details
+    latest = asset_catalog_db.query(search="prop asset1", latest=True, limit=100000)
+    expected = set(["propAsset1_layout_v{0}.{1}".format(str(options.catalog_depth).zfill(3), extension) for extension in ["mb", "abc"]] +
+                   ["propAsset1_layout_v{0}.fbx".format(str(options.catalog_depth + 1).zfill(3))])
+    if set(os.path.basename(row["path"]) for row in latest if row["name"] == "propAsset1") != expected:
+        raise AssertionError("Latest versions of propAsset1 are {0}".format([row["path"] for row in latest]))
+    last_page = asset_catalog_db.page(10 ** 6, 50)["page"]
+    yield "catalog.last_page", best_time(lambda: asset_catalog_db.page(last_page, 50), options.repeat), details
+    shutil.rmtree(catalog_root, ignore_errors=True)
+
+@benchmark("thumbnails")
+def thumbnail_previews(options, work_dir):
+    """
+    Preview renders through the stub renderer with one and N worker threads, repeat lookups answered from
+    the cache, a republished copy reusing the image of the same content, and eviction down to a size cap.
+    """
+    source_dir = os.path.join(work_dir, "thumbnail_sources")
+    os.makedirs(source_dir)
+    sources = []
+    for index in range(options.thumbnail_files):
+        sources.append(os.path.join(source_dir, synthetic_data.version_file_name("propAsset{0}".format(index), 1, ".mb")))
+        with open(sources[-1], "wb") as source_file:
+            source_file.write(os.urandom(1024))
+    details = {"files": options.thumbnail_files}
+    os.environ["VFX_STUB_RENDER_SECONDS"] = str(options.thumbnail_render_seconds)
+
+    for workers in sorted(set([1, options.thumbnail_workers])):
+        thumbnail_dir = os.path.join(work_dir, "thumbnails_{0}".format(workers))
+        cache = thumbnails.ThumbnailCache(thumbnail_dir)
+        queue = thumbnails.thumbnail_queue(thumbnail_dir)
+        thumbnails.queue_previews(sources, workers=0, thumbnail_dir=thumbnail_dir)
+        start_time = time.perf_counter()
+        thumbnails.run_worker(queue, cache, workers, "stub", idle_exit_seconds=0.05, poll_seconds=0.01)
+        yield "thumbnails.render.workers{0}".format(workers), time.perf_counter() - start_time, details
+        missing = [source for source in sources if cache.lookup(source) is None]
+        if missing:
+            raise AssertionError("{0} previews were not rendered with {1} workers".format(len(missing), workers))
+
+    def load_all():
+        loader = thumbnails.ThumbnailLoader(cache, workers=4)
+        for source in sources:
+            loader.request(source)
+        loader.wait()
+        ready = loader.take_ready()
+        loader.shutdown()
+        if len(ready) != len(sources) or not all(image_file for source, image_file in ready):
+            raise AssertionError("Cached previews were not found by the loader")
+    yield "thumbnails.load_cached", best_time(load_all, options.repeat), details
+
+    #An unchanged file published again gets the same image without a render
+    copy_file = os.path.join(source_dir, synthetic_data.version_file_name("propAsset0", 2, ".mb"))
+    shutil.copyfile(sources[0], copy_file)
+    result = thumbnails.render_job(cache, {"payload": {"source": copy_file}}, "stub")
+    if result["rendered"] or cache.lookup(copy_file) != cache.lookup(sources[0]):
+        raise AssertionError("A copy of rendered content was rendered again")
+
+    image_bytes = cache.total_bytes() // options.thumbnail_files
+    start_time = time.perf_counter()
+    removed, freed = cache.evict(image_bytes * (options.thumbnail_files // 2))
+    yield "thumbnails.evict_half", time.perf_counter() - start_time, dict(details, removed=removed)
+    if cache.total_bytes() > image_bytes * (options.thumbnail_files // 2) or cache.lookup(sources[0]) is None:
+        raise AssertionError("Eviction left {0} bytes or dropped the most recently used preview".format(cache.total_bytes()))
+
+@benchmark("chunked_cache")
+def chunked_cache(options, work_dir):
+    """
+    Chunked shot caching through the stub exporter, checked against a single-process export.
+    """
+    exporter_command = chunked_alembic_cache.stub_exporter_command()
+    for frame_count in options.cache_frames:
+        cache_dir = os.path.join(work_dir, "chunked_{0}".format(frame_count))
+        jobs = [{"name": "cnr01_010_item{0}_prop".format(index), "root": "|prop|item{0}".format(index),
+                 "file": os.path.join(cache_dir, "cnr01_010_item{0}_prop_v001.abc".format(index))} for index in range(options.cache_assets)]
+
+        reports = []
+
+        def export_verify():
+            #Published caches are never overwritten, every run exports to an emptied folder
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            reports.append(chunked_alembic_cache.export_chunked(
+                "stub.mb", jobs, (1, frame_count), chunk_count=options.cache_chunks, exporter_command=exporter_command,
+                verify=True, log=lambda message: None))
+
+        seconds = best_time(export_verify, options.repeat)
+        mismatches = [report["name"] for report in reports[-1] if report["differences"]]
+        if mismatches:
+            raise AssertionError("Chunked caches differ from the single-process export: {0}".format(mismatches))
+        yield "chunked_cache.export_verify.{0}f".format(frame_count), seconds, \
+            {"assets": options.cache_assets, "chunks": len(reports[-1][0]["segments"])}
+
+#------------------------------- HISTORY -------------------------------
+
+
+def load_history(history_path):
+    history = []
+    if os.path.isfile(history_path):
+        with open(history_path) as history_file:
+            for line in history_file:
+                if line.strip():
+                    history.append(json.loads(line))
+    return history
+
+
+def baseline(history, result_name, window):
+    """
+    Median of the last window recorded values for result_name, or None without history.
+    """
+    values = [run["results"][result_name]["seconds"] for run in history if result_name in run.get("results", {})]
+    if not values:
+        return None
+    return statistics.median(values[-window:])
+
+
+def find_regressions(results, history, threshold, window, min_seconds):
+    regressions = []
+    for result_name, result in results.items():
+        reference = baseline(history, result_name, window)
+        # Sub-millisecond timings are dominated by noise
+        if reference is None or max(reference, result["seconds"]) < min_seconds:
+            continue
+        if result["seconds"] > reference * (1.0 + threshold):
+            regressions.append((result_name, reference, result["seconds"]))
+    return regressions
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Benchmark the VFX pipeline tools against a fake maya.cmds backend.")
+    parser.add_argument("--only", nargs="+", choices=sorted(benchmarks), help="benchmark groups to run")
+    parser.add_argument("--scene-sizes", nargs="+", type=int, default=[1000, 10000, 100000], help="transforms per synthetic scene")
+    parser.add_argument("--version-depths", nargs="+", type=int, default=[5, 50], help="versions per asset in the synthetic trees")
+    parser.add_argument("--assets-per-type", type=int, default=25)
+    parser.add_argument("--compare-sizes", nargs="+", type=int, default=[1000, 5000])
+    parser.add_argument("--publish-sizes", nargs="+", type=int, default=[10, 100], help="assets per synthetic publish")
+    parser.add_argument("--cache-frames", nargs="+", type=int, default=[240, 2400], help="shot lengths for chunked caching")
+    parser.add_argument("--cache-assets", type=int, default=20)
+    parser.add_argument("--cache-chunks", type=int, default=4)
+    parser.add_argument("--race-processes", type=int, default=32, help="processes publishing the same asset at once")
+    parser.add_argument("--race-publishes", type=int, default=5, help="publishes per racing process")
+    parser.add_argument("--race-export-seconds", type=float, default=0.05, help="simulated export time of each racing publish")
+    parser.add_argument("--transfer-versions", type=int, default=20, help="staged versions uploaded per transfer run")
+    parser.add_argument("--transfer-kb", type=int, default=1024, help="size of each staged file")
+    parser.add_argument("--transfer-streams", type=int, default=4)
+    parser.add_argument("--transfer-limit-mbps", type=int, default=200, help="bandwidth cap of the capped transfer run")
+    parser.add_argument("--verify-depth", type=int, default=5, help="versions per asset in the verified tree")
+    parser.add_argument("--verify-kb", type=int, default=256, help="size of each verified file")
+    parser.add_argument("--retention-depth", type=int, default=50, help="versions per asset and shot cache before archiving")
+    parser.add_argument("--retention-keep", type=int, default=5, help="versions kept per asset and shot cache")
+    parser.add_argument("--dependency-episodes", type=int, default=10, help="episodes of 5 shots with 3 lighting scenes each")
+    parser.add_argument("--dependency-scene-kb", type=int, default=256, help="size of each synthetic lighting scene")
+    parser.add_argument("--dependency-lookups", type=int, default=20, help="caches looked up per run")
+    parser.add_argument("--shot-load-episodes", type=int, default=10, help="episodes of 5 shots in the shot load tree")
+    parser.add_argument("--shot-load-depth", type=int, default=50, help="published versions per shot cache")
+    parser.add_argument("--proxy-caches", type=int, default=300, help="caches imported per proxy_import shot")
+    parser.add_argument("--proxy-cache-kb", type=int, default=512, help="size of each proxy_import cache")
+    parser.add_argument("--catalog-depth", type=int, default=20, help="versions per asset in the catalog tree")
+    parser.add_argument("--browser-depth", type=int, default=50, help="versions per asset in the asset browser tree")
+    parser.add_argument("--list-entries", type=int, default=50000, help="files and caches in the long list benchmark")
+    parser.add_argument("--thumbnail-files", type=int, default=40, help="files rendered by the thumbnail workers")
+    parser.add_argument("--thumbnail-workers", type=int, default=4, help="worker threads of the parallel thumbnail run")
+    parser.add_argument("--thumbnail-render-seconds", type=float, default=0.1, help="simulated render time of each preview")
+    parser.add_argument("--promote-assets", type=int, default=20, help="saved asset versions promoted per run")
+    parser.add_argument("--promote-kb", type=int, default=1024, help="size of each saved .mb")
+    parser.add_argument("--promote-workers", type=int, default=4, help="conversions at once in the parallel promote run")
+    parser.add_argument("--promote-convert-seconds", type=float, default=0.2, help="simulated Maya start-up and conversion time")
+    parser.add_argument("--budget-assets", type=int, default=5000, help="assets of 9 meshes in the performance budget scene")
+    parser.add_argument("--external-assets", type=int, default=5000, help="assets of 2 file nodes in the external files scene")
+    parser.add_argument("--external-textures", type=int, default=500, help="texture files shared by the file nodes")
+    parser.add_argument("--duplicate-meshes", type=int, default=100000, help="meshes in the duplicate detection scene")
+    parser.add_argument("--duplicate-export-meshes", type=int, default=2000, help="heavier meshes instanced and exported")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--history", default=default_history_path)
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown against the baseline (0.25 = 25%%)")
+    parser.add_argument("--window", type=int, default=5, help="recent runs used for the baseline median")
+    parser.add_argument("--min-seconds", type=float, default=0.001)
+    parser.add_argument("--no-record", action="store_true", help="do not append this run to the history")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    history = load_history(options.history)
+    work_dir = tempfile.mkdtemp(prefix="vfx_benchmarks_")
+    #Queued publishes go to a throwaway queue instead of the artist's
+    os.environ["VFX_PUBLISH_QUEUE_DIR"] = os.path.join(work_dir, "publish_queue")
+    os.environ["VFX_PUBLISH_STAGING_DIR"] = os.path.join(work_dir, "staging")
+    #Publishes only queue their previews, the thumbnails group runs the workers itself
+    os.environ["VFX_THUMBNAIL_DIR"] = thumbnails.default_thumbnail_dir = os.path.join(work_dir, "thumbnails")
+    os.environ["VFX_THUMBNAIL_WORKERS"] = "0"
+    thumbnails.default_workers = 0
+    results = {}
+    quiet = open(os.devnull, "w")
+    try:
+        for group_name in options.only or list(benchmarks):
+            group = benchmarks[group_name](options, work_dir)
+            while True:
+                # The tools print every log line, keep them out of the report
+                with contextlib.redirect_stdout(quiet):
+                    result = next(group, None)
+                if result is None:
+                    break
+                result_name, seconds, details = result
+                results[result_name] = dict(details, seconds=seconds)
+                written = " {0:>14,} bytes".format(details["bytes_written"]) if "bytes_written" in details else ""
+                if "lost" in details:
+                    written += " {0:>5} of {1} publishes lost".format(details["lost"], details["publishes"])
+                print("{0:<60} {1:>10.4f} s{2}".format(result_name, seconds, written))
+                sys.stdout.flush()
+    finally:
+        quiet.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    regressions = find_regressions(results, history, options.threshold, options.window, options.min_seconds)
+    if not options.no_record:
+        run = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.node(),
+            "results": results,
+        }
+        if os.path.dirname(options.history) and not os.path.isdir(os.path.dirname(options.history)):
+            os.makedirs(os.path.dirname(options.history))
+        with open(options.history, "a") as history_file:
+            history_file.write(json.dumps(run) + "\n")
+
+    for result_name, reference, seconds in regressions:
+        print("REGRESSION: {0} took {1:.4f} s, baseline {2:.4f} s (+{3:.0%})".format(
+            result_name, seconds, reference, seconds / reference - 1.0))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+# Script Name: Synthetic Benchmark Data
+# Description: Generators for fake Maya scenes and for publish/save directory trees shaped like
+#asset_final/published and asset_wips/saved, used by the benchmark suite.
+
+import os
+import random
+
+from fake_maya import FakeScene
+
+asset_types = ["setPiece", "set", "prop", "character"]
+publish_formats = {"cache": ".mb", "alembic": ".abc", "fbx": ".fbx"}
+sequence_cache_kinds = ["char", "prop", "cam"]
+
+
+def build_scene(transform_count, pieces_per_asset=9, nan_ratio=0.001, bad_name_ratio=0.01,
+                off_origin_ratio=0.05, camera_count=4, reference_paths=(), seed=1, piece_faces=None, textures=()):
+    """
+    Build a FakeScene with roughly transform_count transforms grouped as |<asset type>|<asset>|<piece>,
+    plus the four startup cameras, camera_count shot cameras and a few unknown nodes. With piece_faces
+    (min, max) every piece gets a mesh shape with a random face count in that range. With textures, a
+    list of (file path, resolution), every asset's meshes are shaded with two file nodes picked from it.
+    """
+    random_values = random.Random(seed)
+    scene = FakeScene()
+
+    for camera_name in ["persp", "top", "front", "side"]:
+        scene.create_node("transform", camera_name)
+        scene.create_node("camera", camera_name + "Shape", parent=camera_name)
+    for camera_index in range(camera_count):
+        camera_name = "shotCam{0}".format(camera_index + 1)
+        scene.create_node("transform", camera_name)
+        scene.create_node("camera", camera_name + "Shape", parent=camera_name,
+                          focalLength=random_values.choice([35.0, 50.0, 37.5]))
+
+    for asset_type in asset_types:
+        scene.create_node("transform", asset_type)
+
+    asset_count = max(1, transform_count // (pieces_per_asset + 1))
+    for asset_index in range(asset_count):
+        asset_type = asset_types[asset_index % len(asset_types)]
+        asset_name = "{0}Asset{1}".format(asset_type, asset_index)
+        attrs = {}
+        if random_values.random() < off_origin_ratio:
+            attrs["translateX"] = random_values.uniform(-100.0, 100.0)
+        scene.create_node("transform", asset_name, parent=asset_type, **attrs)
+
+        for piece_index in range(pieces_per_asset):
+            piece_name = "{0}_piece{1}".format(asset_name, piece_index)
+            if random_values.random() < bad_name_ratio:
+                piece_name = "bad name " + piece_name
+            attrs = {}
+            if random_values.random() < nan_ratio:
+                attrs["rotateY"] = float("nan")
+            scene.create_node("transform", piece_name, parent=asset_name, **attrs)
+            if piece_faces:
+                faces = random_values.randint(*piece_faces)
+                scene.create_node("mesh", piece_name + "Shape", parent=piece_name, faces=faces, vertices=faces + faces // 10)
+
+        if piece_faces and textures:
+            shading_engine = scene.create_node("shadingEngine", asset_name + "SG")
+            scene.set_members[shading_engine] = [child + "Shape" for child in scene.children[asset_name]]
+            for channel in ["color", "normal"]:
+                texture_path, resolution = random_values.choice(textures)
+                file_node = scene.create_node("file", "{0}_{1}File".format(asset_name, channel), fileTextureName=texture_path,
+                                              outSizeX=resolution, outSizeY=resolution)
+                scene.connect(file_node, shading_engine)
+
+    for unknown_index in range(3):
+        scene.create_node("unknown", "unknownNode{0}".format(unknown_index))
+    for reference_path in reference_paths:
+        scene.add_reference(reference_path)
+    return scene
+
+
+def grid_geometry(columns, rows, size=1.0):
+    """
+    (points, face counts, face connects, uvs) of a flat grid of quads, as flat tuples like the fake meshes hold.
+    """
+    points, uvs = [], []
+    for row in range(rows + 1):
+        for column in range(columns + 1):
+            points.extend((column * size, 0.0, row * size))
+            uvs.extend((column / float(columns), row / float(rows)))
+    connects = []
+    for row in range(rows):
+        for column in range(columns):
+            corner = row * (columns + 1) + column
+            connects.extend((corner, corner + 1, corner + columns + 2, corner + columns + 1))
+    return tuple(points), (4,) * (rows * columns), tuple(connects), tuple(uvs)
+
+
+def build_duplicate_scene(mesh_count, pieces_per_asset=10, shape_pool=200, unique_ratio=0.2, grid_range=(1, 4), materials=8, seed=1):
+    """
+    Build a FakeScene of mesh_count meshes under |set|<asset>|<piece> and |setPiece|<asset>|<piece>. Most
+    meshes are copies of a pool of grid shapes (each with its own shading engine), placed with their own
+    transforms; unique_ratio of them have a pool shape's topology with moved vertices. Returns (scene,
+    sorted groups of the meshes that are copies of each other, as long names).
+    """
+    random_values = random.Random(seed)
+    scene = FakeScene()
+    for asset_type in ["set", "setPiece"]:
+        scene.create_node("transform", asset_type)
+    shading_engines = [scene.create_node("shadingEngine", "material{0}SG".format(index)) for index in range(materials)]
+    for shading_engine in shading_engines:
+        scene.set_members[shading_engine] = []
+    pool = []
+    for shape_index in range(shape_pool):
+        geometry = grid_geometry(random_values.randint(*grid_range), random_values.randint(*grid_range), random_values.uniform(0.5, 2.0))
+        pool.append((geometry, random_values.choice(shading_engines)))
+
+    copies = {}
+    for mesh_index in range(mesh_count):
+        asset_index, piece_index = divmod(mesh_index, pieces_per_asset)
+        asset_type = ["set", "setPiece"][asset_index % 2]
+        asset_name = "{0}Asset{1}".format(asset_type, asset_index)
+        if piece_index == 0:
+            scene.create_node("transform", asset_name, parent=asset_type)
+        piece_name = "{0}_piece{1}".format(asset_name, piece_index)
+        scene.create_node("transform", piece_name, parent=asset_name, translateX=random_values.uniform(-100.0, 100.0),
+                          rotateY=random_values.uniform(0.0, 360.0))
+        shape_index = random_values.randrange(shape_pool)
+        (points, face_counts, face_connects, uvs), shading_engine = pool[shape_index]
+        if random_values.random() < unique_ratio:
+            points = tuple(value + random_values.uniform(0.01, 0.1) for value in points)
+        else:
+            copies.setdefault(shape_index, []).append(piece_name + "Shape")
+        scene.create_node("mesh", piece_name + "Shape", parent=piece_name, faces=len(face_counts), vertices=len(points) // 3,
+                          points=points, face_counts=face_counts, face_connects=face_connects, uvs=uvs)
+        scene.set_members[shading_engine].append(piece_name + "Shape")
+
+    groups = sorted(sorted(scene.full_path(mesh) for mesh in meshes) for meshes in copies.values() if len(meshes) > 1)
+    return scene, groups
+
+
+def version_file_name(asset_name, version, extension):
+    return "{0}_layout_v{1}{2}".format(asset_name, str(version).zfill(3), extension)
+
+
+def build_publish_tree(root_dir, assets_per_type=10, version_depth=5, formats=publish_formats, file_bytes=0, seed=1):
+    """
+    Create asset_final/published/assets/<type>/<asset>/<format>/<asset>_layout_vNNN.<ext> with
+    version_depth versions per format, empty or holding file_bytes of random data. Returns the list of every
+    created file.
+    """
+    random_values = random.Random(seed)
+    created = []
+    assets_dir = os.path.join(root_dir, "asset_final", "published", "assets")
+    for asset_type in asset_types:
+        for asset_index in range(assets_per_type):
+            asset_name = "{0}Asset{1}".format(asset_type, asset_index)
+            for format_dir, extension in formats.items():
+                export_dir = os.path.join(assets_dir, asset_type, asset_name, format_dir)
+                os.makedirs(export_dir, exist_ok=True)
+                for version in range(1, version_depth + 1):
+                    file_path = os.path.join(export_dir, version_file_name(asset_name, version, extension))
+                    with open(file_path, "wb") as version_file:
+                        if file_bytes:
+                            version_file.write(random_values.getrandbits(file_bytes * 8).to_bytes(file_bytes, "little"))
+                    created.append(file_path)
+    return created
+
+
+def build_saved_tree(root_dir, assets_per_type=10, version_depth=5):
+    """
+    Create asset_wips/saved/assets/<type>/<asset>/<asset>_layout_vNNN.mb like saveFiles writes.
+    """
+    created = []
+    assets_dir = os.path.join(root_dir, "asset_wips", "saved", "assets")
+    for asset_type in asset_types:
+        for asset_index in range(assets_per_type):
+            asset_name = "{0}Asset{1}".format(asset_type, asset_index)
+            export_dir = os.path.join(assets_dir, asset_type, asset_name)
+            os.makedirs(export_dir, exist_ok=True)
+            for version in range(1, version_depth + 1):
+                file_path = os.path.join(export_dir, version_file_name(asset_name, version, ".mb"))
+                open(file_path, "wb").close()
+                created.append(file_path)
+    return created
+
+
+def build_sequence_tree(root_dir, episodes=2, shots_per_episode=5, caches_per_shot=30, version_depth=5):
+    """
+    Create asset_final/published/sequence/<episode>/<shot>/cache/<shot>_<name>_<kind>_vNNN.abc in the
+    layout the Lighting Tool browses. Returns {shot cache dir: [file names]}.
+    """
+    created = {}
+    sequence_dir = os.path.join(root_dir, "asset_final", "published", "sequence")
+    for episode_index in range(episodes):
+        episode = "cnr{0}".format(str(episode_index + 1).zfill(2))
+        for shot_index in range(shots_per_episode):
+            shot = "{0}_{1}".format(episode, str((shot_index + 1) * 10).zfill(3))
+            cache_dir = os.path.join(sequence_dir, episode, shot, "cache")
+            os.makedirs(cache_dir, exist_ok=True)
+            file_names = []
+            for cache_index in range(caches_per_shot):
+                kind = sequence_cache_kinds[cache_index % len(sequence_cache_kinds)]
+                for version in range(1, version_depth + 1):
+                    file_name = "{0}_item{1}_{2}_v{3}.abc".format(shot, cache_index, kind, str(version).zfill(3))
+                    open(os.path.join(cache_dir, file_name), "wb").close()
+                    file_names.append(file_name)
+            created[cache_dir] = file_names
+    return created
+
+
+def build_version_lists(entry_count, seed=1):
+    """
+    Return (cache_list, ref_list) of versioned cache names for compare_versions: the cache list holds the
+    latest versions and the reference list a mix of older, equal and missing entries.
+    """
+    random_values = random.Random(seed)
+    cache_list = []
+    ref_list = []
+    for entry_index in range(entry_count):
+        latest = random_values.randint(1, 20)
+        cache_list.append("shot_item{0}_prop_v{1}.abc".format(entry_index, str(latest).zfill(3)))
+        roll = random_values.random()
+        if roll < 0.8:
+            referenced = max(1, latest - random_values.randint(0, 2))
+            ref_list.append("shot_item{0}_prop_v{1}.abc".format(entry_index, str(referenced).zfill(3)))
+    random_values.shuffle(ref_list)
+    return cache_list, ref_list
+
+
+def build_lighting_scenes(root_dir, shots, scenes_per_shot=3, scene_kb=64, seed=1):
+    """
+    Write .ma lighting scenes under asset_wips/saved/sequence/<episode>/<shot>/ that reference a random older
+    or latest version of each cache in shots ({shot cache dir: [file names]}, see build_sequence_tree),
+    padded with scene_kb of node data. Returns {scene file: [referenced paths]}.
+    """
+    random_values = random.Random(seed)
+    created = {}
+    scene_root = os.path.join(root_dir, "asset_wips", "saved", "sequence")
+    padding = "createNode transform -n \"lightRig{0}\";\n\tsetAttr \".t\" -type \"double3\" 0 0 0 ;\n"
+    for cache_dir, file_names in sorted(shots.items()):
+        shot_dir = os.path.dirname(cache_dir)
+        shot = os.path.basename(shot_dir)
+        scene_dir = os.path.join(scene_root, os.path.basename(os.path.dirname(shot_dir)), shot)
+        os.makedirs(scene_dir, exist_ok=True)
+        caches = {}
+        for file_name in file_names:
+            caches.setdefault(file_name.rsplit("_v", 1)[0], []).append(file_name)
+        for scene_index in range(scenes_per_shot):
+            references = [os.path.join(cache_dir, random_values.choice(versions)) for versions in caches.values()]
+            scene_file = os.path.join(scene_dir, "{0}_light_v{1}.ma".format(shot, str(scene_index + 1).zfill(3)))
+            with open(scene_file, "w") as scene:
+                scene.write("//Maya ASCII 2023 scene\nrequires maya \"2023\";\n")
+                for reference_index, reference in enumerate(references):
+                    scene.write("file -rdi 1 -ns \"ref{0}\" -rfn \"ref{0}RN\" -typ \"Alembic\" \"{1}\";\n".format(
+                        reference_index, reference.replace(os.sep, "/")))
+                node_index = 0
+                while scene.tell() < scene_kb * 1024:
+                    scene.write(padding.format(node_index))
+                    node_index += 1
+            created[scene_file] = references
+    return created
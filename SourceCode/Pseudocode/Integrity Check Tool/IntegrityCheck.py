@@ -1,6 +1,22 @@
 import maya.cmds as cmds
 import re
 import os
+import sys
+import time
+import types
+import threading
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import maya.api.OpenMaya as om
+except ImportError:
+    om = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 #Global Vars
 scroll_list = None
@@ -10,32 +26,323 @@ root_folder = f"{repository_root}\asset_final\published\assets"
 text_fields = []  
 standard_focal_lengths = (12, 14, 16, 18, 21, 25, 27, 32, 35, 40, 50, 65, 75, 100, 135, 150)
 standard_fstop_values = (1.3, 2, 2.8, 4, 5.6, 8, 11, 16, 22)
+transform_tolerance = 0.0001
 naming_convention = r".*"
 export_asset_groups = ["setPiece", "set", "prop", "character"]
+check_plugin_dir = os.environ.get("INTEGRITY_CHECK_PLUGIN_DIR", os.path.join(repository_root, "integrity_check_plugins"))
+check_plugin_entry_point_group = "vfx_integrity_checks"
+pipeline_library_path = os.environ.get("VFX_PIPELINE_LIBRARY", os.path.join(repository_root, "SourceCode", "Pseudocode", "Pipeline Library"))
 import math
 
+if pipeline_library_path not in sys.path:
+    sys.path.append(pipeline_library_path)
+import pipeline_profiler as profiler
+import asset_catalog
+import duplicate_geometry
+import file_dependencies
+import performance_budget
+
+#---------------------------CHECK RESULT CACHE--------------------------------------------------
+# Per-check, per-node results are kept between runs. Maya callbacks evict a node's entries as soon as
+# it is added, removed, renamed, reparented or has an attribute changed (and its descendants' entries
+# when it is renamed or reparented), so a re-run only evaluates the nodes that are dirty. Without callbacks every run is evaluated from scratch.
+
+check_result_cache = {}
+cache_callback_ids = []
+watched_nodes = {}
+cache_tracking = False
+
+def invalidate_node(node_name):
+    for cache in check_result_cache.values():
+        cache.pop(node_name, None)
+
+def clear_check_cache():
+    check_result_cache.clear()
+    file_dependencies.shared_cache.clear()
+    addLog("CACHE: Cleared cached check results")
+
+def _node_key(node):
+    # Match the names cmds.ls returns: partial paths for DAG nodes, plain names otherwise
+    if node.hasFn(om.MFn.kDagNode):
+        return om.MDagPath.getAPathTo(node).partialPathName()
+    return om.MFnDependencyNode(node).name()
+
+def invalidate_descendants(dag_path):
+    # Results such as the hierarchy check's read the full path, which changes with any parent's name or place
+    dag_iterator = om.MItDag()
+    dag_iterator.reset(dag_path)
+    dag_iterator.next()
+    while not dag_iterator.isDone():
+        invalidate_node(dag_iterator.partialPathName())
+        dag_iterator.next()
+
+def _on_node_changed(node, *args):
+    invalidate_node(_node_key(node))
+
+def _on_node_removed(node, *args):
+    invalidate_node(_node_key(node))
+    callback_id = watched_nodes.pop(om.MObjectHandle(node).hashCode(), None)
+    if callback_id is not None:
+        om.MMessage.removeCallback(callback_id)
+
+def _on_node_renamed(node, previous_name, *args):
+    invalidate_node(previous_name)
+    invalidate_node(_node_key(node))
+    if node.hasFn(om.MFn.kDagNode):
+        invalidate_descendants(om.MDagPath.getAPathTo(node))
+
+def _on_dag_changed(message, child, parent, *args):
+    invalidate_node(child.partialPathName())
+    invalidate_descendants(child)
+
+def _on_attribute_changed(message, plug, other_plug, *args):
+    invalidate_node(_node_key(plug.node()))
+
+def _on_scene_changed(*args):
+    check_result_cache.clear()
+    for callback_id in watched_nodes.values():
+        om.MMessage.removeCallback(callback_id)
+    watched_nodes.clear()
+
+def watch_node(node_name):
+    selection = om.MSelectionList()
+    try:
+        selection.add(node_name)
+    except RuntimeError:
+        return
+    node = selection.getDependNode(0)
+    node_hash = om.MObjectHandle(node).hashCode()
+    if node_hash not in watched_nodes:
+        watched_nodes[node_hash] = om.MNodeMessage.addAttributeChangedCallback(node, _on_attribute_changed)
+
+def start_dirty_tracking():
+    global cache_tracking
+    if cache_tracking or om is None:
+        return
+    cache_callback_ids.append(om.MDGMessage.addNodeAddedCallback(_on_node_changed, "dependNode"))
+    cache_callback_ids.append(om.MDGMessage.addNodeRemovedCallback(_on_node_removed, "dependNode"))
+    cache_callback_ids.append(om.MNodeMessage.addNameChangedCallback(om.MObject.kNullObj, _on_node_renamed))
+    cache_callback_ids.append(om.MDagMessage.addAllDagChangesCallback(_on_dag_changed))
+    for scene_message in (om.MSceneMessage.kAfterNew, om.MSceneMessage.kAfterOpen, om.MSceneMessage.kAfterImport,
+                          om.MSceneMessage.kAfterLoadReference, om.MSceneMessage.kAfterUnloadReference):
+        cache_callback_ids.append(om.MSceneMessage.addCallback(scene_message, _on_scene_changed))
+    cache_tracking = True
+
+def stop_dirty_tracking():
+    global cache_tracking
+    if om is None:
+        return
+    _on_scene_changed()
+    for callback_id in cache_callback_ids:
+        om.MMessage.removeCallback(callback_id)
+    del cache_callback_ids[:]
+    cache_tracking = False
+
+def evaluate_nodes_cached(cache_key, nodes, evaluate_node):
+    """
+    Return {node: errors} for every node, only calling evaluate_node on nodes without a valid cached result.
+    """
+    cache = check_result_cache.setdefault(cache_key, {})
+    if not cache_tracking:
+        cache.clear()
+
+    results = {}
+    hits = 0
+    for node in nodes:
+        if node in cache:
+            results[node] = cache[node]
+            hits += 1
+        else:
+            results[node] = evaluate_node(node)
+            if cache_tracking:
+                cache[node] = results[node]
+                watch_node(node)
+
+    # Forget nodes that are no longer part of the scene
+    for stale_node in [node for node in cache if node not in results]:
+        del cache[stale_node]
+
+    if cache_tracking or profiler.enabled:
+        check_name = cache_key[0] if isinstance(cache_key, tuple) else cache_key
+        hit_rate = (hits / len(nodes)) if nodes else 0.0
+        addLog(f"CACHE: {check_name} reused {hits}/{len(nodes)} node results ({hit_rate:.0%} hit rate)")
+    return results
+
+#---------------------------CHECK REGISTRY------------------------------------------------------
+# Every check declares its UI category, the scene data it reads and whether it can run on a worker
+# thread. The runner fetches each data set once per run and shares it among the checks; checks that
+# touch Maya directly must stay on the main thread.
+
+check_categories = ["General", "Layout", "Transform", "Performance Budget"]
+category_descriptions = {
+    "General": "Runs on all nodes in the scene",
+    "Layout": "Runs on all non-startup cameras in the scene",
+    "Transform": "Only runs only on selected Nodes",
+    "Performance Budget": "Runs on the assets in the export groups, against the budgets of their type and for meshes that could be instances",
+}
+check_registry = {}
+scene_data_providers = {}
+scene_data = None
+check_labels = {}
+pending_logs = []
+
+def register_check(label, category, reads=(), parallel=False, name=None):
+    """
+    Decorator adding a check function to the registry under the given UI category.
+    """
+    def decorator(check_function):
+        check_name = name or check_function.__name__
+        if category not in check_categories:
+            check_categories.append(category)
+        check_registry[check_name] = {
+            "name": check_name,
+            "label": label,
+            "category": category,
+            "reads": tuple(reads),
+            "parallel": parallel,
+            "function": check_function,
+        }
+        return check_function
+    return decorator
+
+def register_scene_data(data_name):
+    """
+    Decorator adding a provider for a named scene data set that checks can declare in reads.
+    """
+    def decorator(provider):
+        scene_data_providers[data_name] = provider
+        return provider
+    return decorator
+
+def get_scene_data(data_name):
+    # Shared result while a batch of checks is running, fresh query otherwise
+    if scene_data is not None and data_name in scene_data:
+        return scene_data[data_name]
+    data = scene_data_providers[data_name]()
+    if scene_data is not None:
+        scene_data[data_name] = data
+    return data
+
+def checks_in_category(category):
+    return [check["name"] for check in check_registry.values() if check["category"] == category]
+
+def load_check_plugins():
+    """
+    Register studio checks from the vfx_integrity_checks entry point group and from check_plugin_dir.
+    Each plugin exposes a register(api) callable.
+    """
+    api = types.SimpleNamespace(
+        cmds=cmds,
+        register_check=register_check,
+        register_scene_data=register_scene_data,
+        get_scene_data=get_scene_data,
+        evaluate_nodes_cached=evaluate_nodes_cached,
+        addLog=addLog,
+    )
+    plugins = []
+    try:
+        from importlib.metadata import entry_points
+        found_entry_points = entry_points()
+        if hasattr(found_entry_points, "select"):
+            found_entry_points = found_entry_points.select(group=check_plugin_entry_point_group)
+        else:
+            found_entry_points = found_entry_points.get(check_plugin_entry_point_group, [])
+        plugins.extend((entry_point.name, entry_point.load) for entry_point in found_entry_points)
+    except ImportError:
+        pass
+
+    if os.path.isdir(check_plugin_dir):
+        for file_name in sorted(os.listdir(check_plugin_dir)):
+            if file_name.endswith(".py") and not file_name.startswith("_"):
+                plugins.append((file_name, lambda file_name=file_name: _load_plugin_file(file_name).register))
+
+    for plugin_name, load_register in plugins:
+        try:
+            load_register()(api)
+        except Exception as error:
+            cmds.warning(f"Could not load integrity check plugin {plugin_name}: {error}")
+
+def _load_plugin_file(file_name):
+    module_name = "integrity_check_plugin_" + os.path.splitext(file_name)[0]
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(check_plugin_dir, file_name))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+#---------------------------SCENE DATA----------------------------------------------------------
+
+@register_scene_data("transforms")
+def get_transforms():
+    return cmds.ls(type="transform")
+
+@register_scene_data("unknown_nodes")
+def get_unknown_nodes():
+    return cmds.ls(type="unknown")
+
+@register_scene_data("references")
+def get_references():
+    # reference file path -> loaded state
+    return {file: cmds.referenceQuery(file, isLoaded=True) for file in cmds.file(reference=True, q=True)}
+
+@register_scene_data("cameras")
+def get_cameras():
+    return get_camera_relatives()
+
+@register_scene_data("selection")
+def get_selection():
+    return cmds.ls(sl=True)
+
+@register_scene_data("selection_transforms")
+def get_selection_transforms():
+    return read_world_transforms(get_scene_data("selection"))
+
+@register_scene_data("external_paths")
+def get_external_paths():
+    return file_dependencies.scene_paths(cmds, cmds.workspace(q=True, rootDirectory=True))
+
+@register_scene_data("performance_stats")
+def get_performance_stats():
+    # Budgets and publish history come from the project the root folder belongs to
+    folder = root_folder[0] if isinstance(root_folder, list) and root_folder else root_folder
+    root_dir = performance_budget.project_root(folder) if folder else None
+    try:
+        budgets = performance_budget.load_budgets(root_dir)
+    except ValueError as error:
+        addLog(f"ERROR: {error}, using the default budgets")
+        budgets = performance_budget.default_budgets
+    frames = int(cmds.playbackOptions(q=True, max=True) - cmds.playbackOptions(q=True, min=True)) + 1
+    stats = performance_budget.scene_stats(cmds, export_asset_groups, om, performance_budget.project_history(root_dir), frames)
+    return stats, budgets
+
+@register_scene_data("duplicate_meshes")
+def get_duplicate_meshes():
+    roots = ["|" + group for group in export_asset_groups if cmds.objExists("|" + group)]
+    return duplicate_geometry.find_duplicates(cmds, roots, om) if roots else []
+
 #---------------------------GENERAL CHECKS------------------------------------------------------
 
+def naming_convention_errors(asset):
+    if asset not in export_asset_groups and not re.match(naming_convention, asset):
+        return [asset]
+    return []
+
+@register_check("Check Asset Naming Convention", "General", reads=["transforms"])
 def check_naming_convention():
-    error_nodes = []
-    passed = True
     # Get all transform nodes in the scene
-    transform_nodes = cmds.ls(type="transform")
-    for asset in transform_nodes:
-        global naming_convention
-        if asset not in export_asset_groups:
-            if not re.match(naming_convention, asset):
-                passed = False
-                error_nodes.append(asset)
+    transform_nodes = get_scene_data("transforms")
+    results = evaluate_nodes_cached(("check_naming_convention", naming_convention), transform_nodes, naming_convention_errors)
+    error_nodes = [error for errors in results.values() for error in errors]
+    passed = not error_nodes
     
     if not passed:
         addLog(f"FAIL: Naming Convention Check. Error Nodes: {error_nodes}")
     
     return passed
 
+@register_check("Check Unknown Nodes", "General", reads=["unknown_nodes"], parallel=True)
 def check_unknown_nodes():
     passed = True
-    unknown_nodes = cmds.ls(type="unknown")
+    unknown_nodes = get_scene_data("unknown_nodes")
     if unknown_nodes:
         passed = False
     
@@ -44,57 +351,65 @@ def check_unknown_nodes():
 
     return passed
 
-def check_nan_values():
-    passed = True
-    transform_assets = cmds.ls(type="transform")
+def nan_value_errors(asset):
     error_nodes = []
+    attributes_to_check = ["translateX", "translateY", "translateZ", "rotateX", "rotateY", "rotateZ", "scaleX", "scaleY", "scaleZ"]
     
-    for asset in transform_assets:
-        attributes_to_check = ["translateX", "translateY", "translateZ", "rotateX", "rotateY", "rotateZ", "scaleX", "scaleY", "scaleZ"]
-        
-        for attr in attributes_to_check:
-            attr_value = cmds.getAttr(f"{asset}.{attr}")
-            if math.isnan(attr_value):
-                error_nodes.append(f"{asset}.{attr}")
-                passed = False
+    for attr in attributes_to_check:
+        attr_value = cmds.getAttr(f"{asset}.{attr}")
+        if math.isnan(attr_value):
+            error_nodes.append(f"{asset}.{attr}")
+
+    return error_nodes
+
+@register_check("Check Nan Values", "General", reads=["transforms"])
+def check_nan_values():
+    transform_assets = get_scene_data("transforms")
+    results = evaluate_nodes_cached("check_nan_values", transform_assets, nan_value_errors)
+    error_nodes = [error for errors in results.values() for error in errors]
+    passed = not error_nodes
 
     if not passed:
         addLog(f"FAIL: {error_nodes} has NaN value")
 
     return passed
 
+def node_hierarchy_errors(asset):
+    errors = []
+    asset_parents = cmds.listRelatives(asset, parent=True, fullPath=True)
+    if asset_parents:
+        for asset_parent in asset_parents:
+            asset_parent = asset_parent.replace('|', "").rstrip()
+
+            if (str(asset_parent) not in export_asset_groups):
+                errors.append(f"FAIL: Node Hierarhcy of {asset} does not match correct export groups. Supported: {export_asset_groups}")
+    else:
+        #if no asset parents, check if a correct group
+        if asset.replace('|', "") not in export_asset_groups:
+            errors.append(f"FAIL: Node Hierarchy of {asset} does not have a parent group. Supported: {export_asset_groups} ")
+
+    return errors
+
+@register_check("Check Node Hierarchy", "General", reads=["transforms"])
 def check_node_hierarchy():
     global export_asset_groups
     passed = True
-    assets = cmds.ls(type="transform")  # Assuming you have selected asset objects.
-    error_nodes = []
+    assets = get_scene_data("transforms")  # Assuming you have selected asset objects.
+    assets = [asset for asset in assets if asset not in ["front","top","side","persp","setPiece","set","character","prop"]] #not default camera
+    results = evaluate_nodes_cached(("check_node_hierarchy", tuple(export_asset_groups)), assets, node_hierarchy_errors)
     for asset in assets:
-        if asset not in ["front","top","side","persp","setPiece","set","character","prop"]: #not default camera
-            asset_parents = cmds.listRelatives(asset, parent=True, fullPath=True)
-            if asset_parents:
-                for asset_parent in asset_parents:
-                    asset_parent = asset_parent.replace('|', "").rstrip()
-
-                    if (str(asset_parent) not in export_asset_groups):
-                        print(asset_parent)
-                        print(export_asset_groups)
-                        addLog(f"FAIL: Node Hierarhcy of {asset} does not match correct export groups. Supported: {export_asset_groups}")
-                        error_nodes.append(asset)
-                        passed = False
-            else:
-                #if no asset parents, check if a correct group
-                if asset.replace('|', "") not in export_asset_groups:
-                    addLog(f"FAIL: Node Hierarchy of {asset} does not have a parent group. Supported: {export_asset_groups} ")
-                    error_nodes.append(asset)
-                    passed = False
+        for message in results[asset]:
+            addLog(message)
+            passed = False
 
     return passed
 
+@register_check("Check Reference Errors", "General", reads=["references"], parallel=True)
 def check_reference_errors():
     error_nodes = []
     passed = True
     
-    unloaded_reference_files = [file for file in cmds.file(reference=True, q=True) if not cmds.referenceQuery(file, isLoaded=True)]
+    unloaded_reference_files = [file for file, loaded in get_scene_data("references").items() if not loaded]
     if unloaded_reference_files:
         passed = False
         error_nodes = unloaded_reference_files
@@ -104,6 +419,7 @@ def check_reference_errors():
 
     return passed
 
+@register_check("Check Reference Versions", "General", reads=["references"], parallel=True)
 def check_reference_versions():
     global root_folder
     passed = True
@@ -112,9 +428,25 @@ def check_reference_versions():
         addLog("ERROR: No Root Folder Specified")
         passed = False
     else:
-        for reference_file_path in [file for file in cmds.file(reference=True, q=True) if cmds.referenceQuery(file, isLoaded=True)]:
+        catalogs = {}
+        for reference_file_path in [file for file, loaded in get_scene_data("references").items() if loaded]:
             reference_filename = os.path.basename(reference_file_path)
 
+            # Published references are looked up in their project's asset catalog when it has one
+            fields = asset_catalog.describe_file(reference_file_path)
+            latest_version = None
+            if fields:
+                if fields["root"] not in catalogs:
+                    catalog_path = asset_catalog.default_catalog_path(fields["root"])
+                    catalogs[fields["root"]] = asset_catalog.AssetCatalog(catalog_path) if os.path.isfile(catalog_path) else None
+                if catalogs[fields["root"]]:
+                    latest_version = catalogs[fields["root"]].latest_version(reference_file_path)
+            if latest_version is not None:
+                if latest_version > fields["version"]:
+                    addLog(f"NEW VERSION ALERT: {fields['prefix']}_v{str(latest_version).zfill(3)}>>{reference_filename}")
+                    passed = False
+                continue
+
             directory_path = os.path.dirname(reference_file_path)
             full_path = str(directory_path)
             filenames_in_directory = [os.path.basename(path) for path in os.listdir(full_path)]
@@ -126,6 +458,30 @@ def check_reference_versions():
     
     return passed
 
+@register_check("Check External Files", "General", reads=["external_paths"], parallel=True)
+def check_external_files():
+    # Without configured shares, files outside the root folder's project are off share
+    share_roots = file_dependencies.default_share_roots()
+    folder = root_folder[0] if isinstance(root_folder, list) and root_folder else root_folder
+    project_dir = performance_budget.project_root(folder) if folder else None
+    if not share_roots and project_dir:
+        share_roots = [project_dir]
+
+    external_paths = get_scene_data("external_paths")
+    start_time = time.perf_counter()
+    results = file_dependencies.check_paths(external_paths, share_roots)
+    failures, warnings = file_dependencies.report_lines(results)
+    for failure in failures:
+        addLog(f"FAIL: External file {failure}")
+    for warning in warnings:
+        addLog(f"SLOW: External file {warning}")
+
+    statted = [result for result in results if not result["cached"]]
+    slowest = max([result["seconds"] for result in statted] or [0.0])
+    addLog(f"FILES: {len(results)} external files ({len(results) - len(statted)} cached) checked in "
+           f"{time.perf_counter() - start_time:.2f}s, slowest stat {slowest:.3f}s")
+    return not failures
+
 #---------------------------LAYOUT CHECKS----------------------------------------dfd--------------
 
 def get_camera_relatives():
@@ -139,6 +495,7 @@ def get_camera_relatives():
     
     return relatives
 
+@register_check(" Check Aspect Ratio 16:9 ", "Layout", reads=["cameras"])
 def check_camera_aspect_ratio():
     """
     Check if the camera aperture of selected camera is in a 16:9 aspect ratio.
@@ -146,7 +503,7 @@ def check_camera_aspect_ratio():
     passed = True
     error_nodes = []
 
-    for cam_shp in get_camera_relatives():
+    for cam_shp in get_scene_data("cameras"):
         camera_name = cmds.listRelatives(cam_shp[0], parent=True)[0]
         horizontal_aperture = cmds.getAttr(cam_shp[0] + ".horizontalFilmAperture")
         vertical_aperture = cmds.getAttr(cam_shp[0] + ".verticalFilmAperture")
@@ -159,12 +516,13 @@ def check_camera_aspect_ratio():
         addLog(f"FAIL: Aspect Ratio is not 16:9, Error Nodes: {error_nodes}")
     return passed
 
+@register_check(" Check Focal Lengths ", "Layout", reads=["cameras"])
 def check_focal_lengths():
     passed = True
     error_nodes = []
     global standard_focal_lengths
 
-    for cam_shp in get_camera_relatives():
+    for cam_shp in get_scene_data("cameras"):
         camera_name = cmds.listRelatives(cam_shp[0], parent=True)[0]
         focal_length = cmds.getAttr(cam_shp[0] + ".focalLength")
         if not(focal_length in standard_focal_lengths):
@@ -175,12 +533,13 @@ def check_focal_lengths():
         addLog(f"FAIL: Focal Lengths not standardized, Error Nodes: {error_nodes}")
     return passed
 
+@register_check(" Check F-Stop Values ", "Layout", reads=["cameras"])
 def check_fstop_values():
     passed = True
     error_nodes = []
     global standard_fstop_values
 
-    for cam_shp in get_camera_relatives():
+    for cam_shp in get_scene_data("cameras"):
         camera_name = cmds.listRelatives(cam_shp[0], parent=True)[0]
         focal_length = cmds.getAttr(cam_shp[0] + ".fStop")
         if not(focal_length in standard_fstop_values):
@@ -193,49 +552,134 @@ def check_fstop_values():
 
 #---------------------------SET PIECE CHECKS------------------------------------------------------
 
+def read_world_transforms(nodes):
+    """
+    Read the world translation and pivots of every node in one pass.
+    Returns (transform_nodes, translations, pivots, read_errors): translations rows are [x, y, z], pivot rows are
+    [rotate pivot xyz, scale pivot xyz] like xform(piv=True), read_errors maps unreadable nodes to the reason.
+    """
+    transform_nodes = []
+    translations = []
+    pivots = []
+    read_errors = {}
+    nodes = list(dict.fromkeys(nodes))
+
+    if om is None:
+        for node in nodes:
+            try:
+                translations.append(cmds.xform(node, query=True, translation=True, worldSpace=True))
+                pivots.append(cmds.xform(node, query=True, piv=True, worldSpace=True))
+                transform_nodes.append(node)
+            except (RuntimeError, ValueError):
+                read_errors[node] = "has no transform/pivot"
+        return transform_nodes, translations, pivots, read_errors
+
+    selection = om.MSelectionList()
+    listed_nodes = []
+    for node in nodes:
+        listed_count = selection.length()
+        try:
+            selection.add(node)
+        except RuntimeError:
+            read_errors[node] = "does not exist"
+            continue
+        if selection.length() > listed_count:
+            listed_nodes.append(node)
+
+    for index, node in enumerate(listed_nodes):
+        try:
+            dag_path = selection.getDagPath(index)
+        except TypeError:
+            read_errors[node] = "is not a DAG node"
+            continue
+        if not dag_path.hasFn(om.MFn.kTransform):
+            read_errors[node] = "has no transform/pivot"
+            continue
+        transform_fn = om.MFnTransform(dag_path)
+        matrix = dag_path.inclusiveMatrix()
+        rotate_pivot = transform_fn.rotatePivot(om.MSpace.kWorld)
+        scale_pivot = transform_fn.scalePivot(om.MSpace.kWorld)
+        transform_nodes.append(node)
+        translations.append([matrix[12], matrix[13], matrix[14]])
+        pivots.append([rotate_pivot.x, rotate_pivot.y, rotate_pivot.z, scale_pivot.x, scale_pivot.y, scale_pivot.z])
+
+    return transform_nodes, translations, pivots, read_errors
+
+def rows_off_origin(rows, tolerance):
+    """
+    Indices of the rows with any component further than tolerance from zero.
+    """
+    if not rows:
+        return []
+    if np is not None:
+        return np.flatnonzero(np.any(np.abs(np.asarray(rows, dtype=float)) > tolerance, axis=1)).tolist()
+    return [index for index, row in enumerate(rows) if any(abs(value) > tolerance for value in row)]
+
+def log_read_errors(read_errors):
+    for node, reason in read_errors.items():
+        addLog(f"FAIL: {node} {reason}")
+
+@register_check(" Check Transform at Origin ", "Transform", reads=["selection_transforms"])
 def check_transform_at_origin():
-    passed = True
-    error_nodes = []
-    try:
-        assets = cmds.ls(sl=True)
-        if assets:
-            for asset in assets:
-                transform_position = cmds.xform(asset, query=True, translation=True, worldSpace=True)
-                formatted_position = [round(val, 4) for val in transform_position]
-                if not (formatted_position == [0.0000, 0.0000, 0.0000]):
-                    passed=False
-                    error_nodes.append(asset)
-    except:
-        addLog("This node has no transform/pivot")
+    transform_nodes, translations, pivots, read_errors = get_scene_data("selection_transforms")
+    error_nodes = [transform_nodes[index] for index in rows_off_origin(translations, transform_tolerance)]
+    passed = not error_nodes and not read_errors
 
-    if not passed:
+    log_read_errors(read_errors)
+    if error_nodes:
         addLog(f"FAIL: Transform is not at origin. Error Nodes: {error_nodes}")
 
     return passed
 
+@register_check("Check Pivot at Origin", "Transform", reads=["selection_transforms"])
 def check_pivot_at_origin():
-    passed = True
-    error_nodes = []
-    try:
-        assets = cmds.ls(sl=True)
+    transform_nodes, translations, pivots, read_errors = get_scene_data("selection_transforms")
+    error_nodes = [transform_nodes[index] for index in rows_off_origin(pivots, transform_tolerance)]
+    passed = not error_nodes and not read_errors
 
-        if assets:
-            for asset in assets:
-                pivot = cmds.xform(asset, query=True, piv=True, worldSpace=True)
-                formatted_pivot = [round(val, 4) for val in pivot]
+    log_read_errors(read_errors)
+    if error_nodes:
+        addLog(f"FAIL: Transform pivot not at origin. Error Nodes: {error_nodes}")
 
-                if not formatted_pivot == [0.0000, 0.0000, 0.0000, 0.0000, 0.0000, 0.0000]:
-                    passed=False
-                    error_nodes.append(asset)
-    
-    except:
-        addLog("This node has no transform/pivot")
+    return passed
 
-    if not passed:
-        addLog(f"FAIL: Transform pivot not at origin. Error Nodes: {error_nodes}")
+#---------------------------PERFORMANCE BUDGET CHECKS------------------------------------------------------
+
+def log_budget_offenders(metrics):
+    # Most expensive first: the offenders furthest over their budget
+    stats, budgets = get_scene_data("performance_stats")
+    offenders = performance_budget.over_budget(stats, budgets, metrics)
+    for offender in offenders:
+        addLog("FAIL: Over budget: " + performance_budget.format_offender(offender, stats[(offender["asset_type"], offender["asset"])]))
+    return not offenders
+
+@register_check("Check Polycount Budget", "Performance Budget", reads=["performance_stats"], parallel=True)
+def check_polycount_budget():
+    return log_budget_offenders(["faces", "vertices"])
+
+@register_check("Check Texture Budget", "Performance Budget", reads=["performance_stats"], parallel=True)
+def check_texture_budget():
+    passed = log_budget_offenders(["texture_size", "texture_mb"])
+    stats, budgets = get_scene_data("performance_stats")
+    missing_files = sorted(set(file_path for asset_stats in stats.values() for file_path in asset_stats["missing"]))
+    if missing_files:
+        addLog(f"FAIL: Texture files not found: {missing_files}")
+        passed = False
 
     return passed
 
+@register_check("Check Export Size Budget", "Performance Budget", reads=["performance_stats"], parallel=True)
+def check_export_size_budget():
+    return log_budget_offenders(["export_mb"])
+
+@register_check("Check Duplicate Meshes", "Performance Budget", reads=["duplicate_meshes"], parallel=True)
+def check_duplicate_meshes():
+    # Identical meshes that could be instances of one shape, the largest savings first
+    groups = get_scene_data("duplicate_meshes")
+    for line in duplicate_geometry.format_groups(groups):
+        addLog(f"FAIL: Duplicate meshes: {line}")
+    return not groups
+
 #---------------------------UI FUNCTIONS------------------------------------------------------
 
 def pick_root():
@@ -252,8 +696,7 @@ def reset_results():
         cmds.text(text_field, edit=True, backgroundColor=(0.2667, 0.2667, 0.2667))
     cmds.textScrollList(scroll_list, edit=True, removeAll=True)
     
-def run_check(check_function, text_field):
-    result = check_function()
+def show_check_result(text_field, result):
     if result == True:
         cmds.text(text_field, edit=True, backgroundColor=(0.56, 0.93, 0.56))
     elif result == False:
@@ -261,28 +704,50 @@ def run_check(check_function, text_field):
     else:
         cmds.text(text_field, edit=True, backgroundColor=(0.2667, 0.2667, 0.2667))
 
+def timed_check(check_function):
+    with profiler.span(check_function.__name__, "integrity_check"):
+        return check_function()
+
+def run_check(check_function, text_field):
+    result = timed_check(check_function)
+    show_check_result(text_field, result)
+
     return result
-        
-def run_all_general_checks(naming_convention_text, node_hierarchy_label, unknown_nodes_label, nan_values_label, reference_errors_label, reference_versions_label):
-    reset_results()
-    run_check(check_naming_convention, naming_convention_text)
-    run_check(check_node_hierarchy,node_hierarchy_label)
-    run_check(check_unknown_nodes, unknown_nodes_label)
-    run_check(check_nan_values, nan_values_label)
-    run_check(check_reference_errors, reference_errors_label)
-    run_check(check_reference_versions, reference_versions_label)
 
+def run_checks(check_names):
+    """
+    Run the named checks, fetching every declared data set once and running parallel-safe checks on a thread pool.
+    """
+    global scene_data
+    checks = [check_registry[check_name] for check_name in check_names]
+    results = {}
+    scene_data = {}
+    try:
+        for data_name in dict.fromkeys(data_name for check in checks for data_name in check["reads"]):
+            get_scene_data(data_name)
+
+        parallel_checks = [check for check in checks if check["parallel"]]
+        if parallel_checks:
+            with ThreadPoolExecutor(max_workers=min(len(parallel_checks), os.cpu_count() or 1)) as pool:
+                futures = {check["name"]: pool.submit(timed_check, check["function"]) for check in parallel_checks}
+            for check_name, future in futures.items():
+                results[check_name] = future.result()
+            flush_pending_logs()
+
+        for check in checks:
+            if check["parallel"]:
+                show_check_result(check_labels[check["name"]], results[check["name"]])
+            else:
+                results[check["name"]] = run_check(check["function"], check_labels[check["name"]])
+    finally:
+        scene_data = None
+        flush_pending_logs()
 
-def run_all_layout_checks(aspect_ratio_text, focal_length_text, fstop_text):
-    reset_results()
-    run_check(check_camera_aspect_ratio, aspect_ratio_text)
-    run_check(check_focal_lengths, focal_length_text)
-    run_check(check_fstop_values, fstop_text)
+    return results
 
-def run_all_setpiece_checks(transform_at_origin_label, pivot_at_origin_label):
+def run_category_checks(category):
     reset_results()
-    run_check(check_transform_at_origin, transform_at_origin_label)
-    run_check(check_pivot_at_origin, pivot_at_origin_label)
+    return run_checks(checks_in_category(category))
 
 def create_section(section_title, parent):
     return cmds.frameLayout(label=section_title, collapsable=True, collapse=False, parent=parent, marginWidth=10, marginHeight=10)
@@ -297,6 +762,10 @@ def create_errornode_bar(parent):
     )
 
 def addLog(message):
+    # Checks running on worker threads must not touch the UI, their logs are flushed afterwards
+    if threading.current_thread() is not threading.main_thread():
+        pending_logs.append(message)
+        return
     print("LOG: " + message)
     global scroll_list
     cmds.textScrollList(scroll_list, edit=True, append=[message])
@@ -306,6 +775,28 @@ def addLog(message):
         last_item_index = num_items  # Index of the last item
         cmds.textScrollList(scroll_list, edit=True, showIndexedItem=last_item_index)
 
+def flush_pending_logs():
+    while pending_logs:
+        addLog(pending_logs.pop(0))
+
+def toggle_profiling(enabled, with_cprofile=False):
+    if enabled:
+        profiler.enable(with_cprofile=with_cprofile)
+        addLog("PROFILE: Recording check timings")
+    else:
+        profiler.disable()
+        addLog("PROFILE: Stopped recording check timings")
+
+def log_profile_summary():
+    for line in profiler.summary_lines() or ["No timings recorded"]:
+        addLog("PROFILE: " + line)
+
+def export_profile():
+    export_dir = cmds.fileDialog2(dialogStyle=2, fileMode=3, caption="Export Timings To")
+    if export_dir:
+        for exported_file in profiler.export_session(export_dir[0], prefix="integrity_check_profile"):
+            addLog("PROFILE: Exported " + exported_file)
+
 def create_ui():
     """
     Create the UI for running integrity checks in Maya.
@@ -316,7 +807,6 @@ def create_ui():
     window_height = 800
     column1_width = 200
     column2_width = 100
-    column3_width = 10
     if (cmds.window("IntegrityChecker_Window", q=True, exists=True)):
         cmds.deleteUI("IntegrityChecker_Window", window=True)
 
@@ -324,100 +814,45 @@ def create_ui():
     ic_layout = cmds.columnLayout(adjustableColumn=True)
 
     global text_fields
-    text_fields = []  
-
-    #---------------------------GENERAL--------------------------------------------------
-    create_section("General", ic_window)
-    cmds.button(label="Pick Root Folder", command='pick_root()')
     global root_display
     global root_folder
-    root_display = cmds.textScrollList(
-    numberOfRows=1,  # Set the number of visible rows
-    width=100,
-    height=30,
-    append=[root_folder]
-    )
-    cmds.text("Runs on all nodes in the scene")    
-
-    asset_naming_row = cmds.rowLayout(numberOfColumns=3, columnWidth3=(column1_width, column2_width, column3_width))
-    naming_convention_text = cmds.text(label="Check Asset Naming Convention")
-    text_fields.append(naming_convention_text)
-    cmds.button(label="Run Check", command=lambda *args: run_check(check_naming_convention, naming_convention_text))
-    cmds.setParent('..')  
-
-    node_hierarchy_row = cmds.rowLayout(numberOfColumns=3, columnWidth3=(column1_width, column2_width, column3_width))
-    node_hierarchy_label = cmds.text(label="Check Node Hierarchy")
-    text_fields.append(node_hierarchy_label)
-    cmds.button(label="Run Check", command=lambda *args: run_check(check_node_hierarchy, node_hierarchy_label))
-    cmds.setParent('..')  
-
-    unknown_nodes_row = cmds.rowLayout(numberOfColumns=3, columnWidth3=(column1_width, column2_width, column3_width))
-    unknown_nodes_label = cmds.text(label="Check Unknown Nodes")
-    text_fields.append(unknown_nodes_label)
-    cmds.button(label="Run Check", command=lambda *args: run_check(check_unknown_nodes, unknown_nodes_label))
-    cmds.setParent('..')  
-
-    check_nan_row = cmds.rowLayout(numberOfColumns=3, columnWidth3=(column1_width, column2_width, column3_width))
-    nan_values_label = cmds.text(label="Check Nan Values")
-    text_fields.append(nan_values_label)
-    cmds.button(label="Run Check", command=lambda *args: run_check(check_nan_values, nan_values_label, check_nan_row))
-    cmds.setParent('..')  
-
-    reference_errors_row = cmds.rowLayout(numberOfColumns=3, columnWidth3=(column1_width, column2_width, column3_width))
-    reference_errors_label = cmds.text(label="Check Reference Errors")
-    text_fields.append(reference_errors_label)
-    cmds.button(label="Run Check", command=lambda *args: run_check(check_reference_errors, reference_errors_label))
-    cmds.setParent('..')  
-
-    cmds.rowLayout(numberOfColumns=3, columnWidth3=(column1_width, column2_width, column3_width))
-    reference_versions_label = cmds.text(label="Check Reference Versions")
-    text_fields.append(reference_versions_label)
-    cmds.button(label="Run Check", command=lambda *args: run_check(check_reference_versions, reference_versions_label))
-    cmds.setParent('..')  
-
-    cmds.button(label="Run All General Checks", command=lambda *args: run_all_general_checks(naming_convention_text, node_hierarchy_label, unknown_nodes_label, nan_values_label, reference_errors_label, reference_versions_label))
-
-    #---------------------------LAYOUT------------------------------------------------------
-    create_section("Layout", ic_window)
-    cmds.text("Runs on all non-startup cameras in the scene")    
-
-    cmds.rowLayout(numberOfColumns=2, columnWidth2=(column1_width, column2_width))
-    aspect_ratio_text = cmds.text(label=" Check Aspect Ratio 16:9 ")
-    text_fields.append(aspect_ratio_text)
-    cmds.button(label="Run Check", command=lambda *args: run_check(check_camera_aspect_ratio, aspect_ratio_text))
-    cmds.setParent('..')  
-
-    cmds.rowLayout(numberOfColumns=2, columnWidth2=(column1_width, column2_width))
-    focal_length_text = cmds.text(label=" Check Focal Lengths ")
-    text_fields.append(focal_length_text)
-    cmds.button(label="Run Check", command=lambda *args: run_check(check_focal_lengths, focal_length_text))
-    cmds.setParent('..')  
-
-    cmds.rowLayout(numberOfColumns=2, columnWidth2=(column1_width, column2_width))
-    fstop_text = cmds.text(label=" Check F-Stop Values ")
-    text_fields.append(fstop_text)
-    cmds.button(label="Run Check", command=lambda *args: run_check(check_fstop_values, fstop_text))
-    cmds.setParent('..')  
-
-    cmds.button(label="Run All Layout Checks", command=lambda *args: run_all_layout_checks(aspect_ratio_text, focal_length_text, fstop_text))
-    # #---------------------------SET-PIECES--------------------------------------------------
-    create_section("Transform", ic_window)
-
-    cmds.text("Only runs only on selected Nodes")    
-
-    cmds.rowLayout(numberOfColumns=2, columnWidth2=(column1_width, column2_width))
-    transform_at_origin_label = cmds.text(label=" Check Transform at Origin ")
-    text_fields.append(transform_at_origin_label)
-    cmds.button(label="Run Check", command=lambda *args: run_check(check_transform_at_origin, transform_at_origin_label))
-    cmds.setParent('..')  
-
-    cmds.rowLayout(numberOfColumns=2, columnWidth2=(column1_width, column2_width))
-    pivot_at_origin_label = cmds.text(label="Check Pivot at Origin")
-    text_fields.append(pivot_at_origin_label)
-    cmds.button(label="Run Check",  command=lambda *args: run_check(check_pivot_at_origin, pivot_at_origin_label))
-    cmds.setParent('..')  
-
-    cmds.button(label="Run Transform Checks", command=lambda *args: run_all_setpiece_checks(transform_at_origin_label, pivot_at_origin_label))
+    text_fields = []  
+
+    load_check_plugins()
+    check_labels.clear()
+
+    for category in check_categories:
+        create_section(category, ic_window)
+
+        if category == "General":
+            cmds.button(label="Pick Root Folder", command='pick_root()')
+            root_display = cmds.textScrollList(
+            numberOfRows=1,  # Set the number of visible rows
+            width=100,
+            height=30,
+            append=[root_folder]
+            )
+
+        cmds.text(category_descriptions.get(category, ""))
+
+        for check_name in checks_in_category(category):
+            check = check_registry[check_name]
+            cmds.rowLayout(numberOfColumns=2, columnWidth2=(column1_width, column2_width))
+            check_label = cmds.text(label=check["label"])
+            text_fields.append(check_label)
+            check_labels[check_name] = check_label
+            cmds.button(label="Run Check", command=lambda *args, check_name=check_name: run_checks([check_name]))
+            cmds.setParent('..')  
+
+        cmds.button(label=f"Run All {category} Checks", command=lambda *args, category=category: run_category_checks(category))
+
+    #---------------------------PROFILING---------------------------------------------------
+    create_section("Profiling", ic_window)
+    cprofile_box = cmds.checkBox(label="Include cProfile", value=False)
+    cmds.checkBox(label="Record Check Timings", value=profiler.enabled,
+                  changeCommand=lambda enabled: toggle_profiling(enabled, cmds.checkBox(cprofile_box, q=True, value=True)))
+    cmds.button(label="Log Timing Summary", command=lambda *args: log_profile_summary())
+    cmds.button(label="Export Timings (JSON / Chrome Trace / cProfile)", command=lambda *args: export_profile())
 
     # Show the window--------------------------------------------------------------------------------------
     cmds.showWindow(ic_window)
@@ -435,5 +870,11 @@ def create_ui():
     )
     
     cmds.button(label="Clear Logs", command='reset_results()', parent=ic_layout)
+    cmds.button(label="Clear Check Cache", command=lambda *args: clear_check_cache(), parent=ic_layout)
+
+    # Results are reused between runs while the window is open
+    stop_dirty_tracking()
+    start_dirty_tracking()
+    cmds.scriptJob(uiDeleted=[ic_window, stop_dirty_tracking], runOnce=True)
 
 create_ui()
\ No newline at end of file
@@ -1,17 +1,106 @@
 # -*- coding:utf-8 -*-
 import os
 import re
+import sys
 
 import shiboken2
 import maya.cmds as cmds
 import maya.OpenMayaUI as OpenMayaUI
 
+from PySide2.QtCore import QDateTime, QAbstractListModel, QModelIndex, Qt, \
+    QSize, QTimer
+from PySide2.QtGui import QIcon
 from PySide2.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, \
-    QListWidget, QComboBox, QDialog, QAbstractItemView
+    QListView, QComboBox, QDialog, QAbstractItemView, QCheckBox, QFileDialog, \
+    QDateTimeEdit, QLineEdit
 
 root_path = "Root to Repository "
 sequence_path = f'{root_path}\asset_final\published\sequence' #To get the published assets from the published folder
 #sequence_path = 'D:/MACOSX/sequence/' #local published folder for testing
+pipeline_library_path = os.environ.get(
+    'VFX_PIPELINE_LIBRARY',
+    os.path.join(root_path, 'SourceCode', 'Pseudocode', 'Pipeline Library'))
+
+if pipeline_library_path not in sys.path:
+    sys.path.append(pipeline_library_path)
+import pipeline_profiler as profiler
+import asset_catalog
+import cache_proxies
+import dependency_index
+import list_model
+import scene_references
+import shot_manifest
+import thumbnails
+
+#Folders of the saved lighting scenes, indexed to find which scenes use which cache versions
+lighting_scene_dirs = scene_references.lighting_scene_dirs(root_path)
+#Catalog of the published files, listing episodes, shots and caches without walking the share
+asset_catalog_path = asset_catalog.default_catalog_path(root_path)
+#Size of the cache previews shown in the lists
+preview_icon_size = 48
+
+
+class CacheListModel(QAbstractListModel):
+    """
+    Qt model over a list_model.FilterListModel: the view asks only
+    for the rows it draws, so thousands of caches cost no widgets.
+    Previews of the drawn rows are looked up by the thumbnail loader
+    and shown once add_previews receives them.
+    """
+
+    def __init__(self, parent=None, thumbnail_loader=None):
+        super(CacheListModel, self).__init__(parent)
+        self.entries = list_model.FilterListModel()
+        self.thumbnail_loader = thumbnail_loader
+        self.directory = ''
+        self.icons = {}
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self.entries.row_count()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            return self.entries.row(index.row())
+        if role == Qt.DecorationRole and self.thumbnail_loader:
+            cache_name = self.entries.row(index.row())
+            if cache_name not in self.icons:
+                #Asked once per row, the icon appears when the lookup ends
+                self.icons[cache_name] = None
+                self.thumbnail_loader.request(
+                    os.path.join(self.directory, cache_name))
+            return self.icons[cache_name]
+        return None
+
+    def set_entries(self, entries, directory=''):
+        """Replace every row in one reset."""
+        self.beginResetModel()
+        self.entries.set_entries(entries)
+        self.directory = directory
+        self.icons = {}
+        self.endResetModel()
+
+    def add_previews(self, previews):
+        """Show finished preview lookups, [(cache path, image or None)]."""
+        changed = False
+        for source, image_file in previews:
+            cache_name = os.path.basename(source)
+            if image_file and os.path.dirname(source) == self.directory \
+                    and cache_name in self.icons:
+                self.icons[cache_name] = QIcon(image_file)
+                changed = True
+        if changed and self.rowCount():
+            self.dataChanged.emit(
+                self.index(0), self.index(self.rowCount() - 1),
+                [Qt.DecorationRole])
+
+    def set_filter(self, text):
+        self.beginResetModel()
+        self.entries.set_filter(text)
+        self.endResetModel()
 
 
 def getMayaWindow():
@@ -28,6 +117,10 @@ class MyWindow(QDialog):
         self.resize(600, 450)
         self.setWindowTitle('Lighting Tool')
 
+        self.asset_catalog = None
+        if os.path.isfile(asset_catalog_path):
+            self.asset_catalog = asset_catalog.AssetCatalog(asset_catalog_path)
+
         self.episode_combo_box = QComboBox()
         if os.path.exists(sequence_path):
             self.populate_episode_combo_box(
@@ -38,18 +131,27 @@ class MyWindow(QDialog):
         self.shot_combo_box = QComboBox()
         self.shot_combo_box.currentIndexChanged.connect(self.shot_change)
 
-        self.listView_charcache = QListWidget()  # create character ache list
-        self.listView_charcache.setSelectionMode(
-            QAbstractItemView.ExtendedSelection
-            )  
-        self.listView_propcache = QListWidget()  # create prop cache list
-        self.listView_propcache.setSelectionMode(
-            QAbstractItemView.ExtendedSelection
-            )  
-        self.listView_camcache = QListWidget()  #  create camera cache list
-        self.listView_camcache.setSelectionMode(
-            QAbstractItemView.ExtendedSelection
-            )  
+        self.listView_charcache = QListView()  # create character ache list
+        self.listView_propcache = QListView()  # create prop cache list
+        self.listView_camcache = QListView()  #  create camera cache list
+        #Previews are read from the thumbnail cache off the UI thread
+        self.thumbnail_loader = thumbnails.ThumbnailLoader()
+        for cache_view in [self.listView_charcache,
+                           self.listView_propcache,
+                           self.listView_camcache]:
+            cache_view.setModel(
+                CacheListModel(cache_view, self.thumbnail_loader))
+            cache_view.setSelectionMode(QAbstractItemView.ExtendedSelection)
+            cache_view.setIconSize(
+                QSize(preview_icon_size, preview_icon_size))
+            #Equal row heights let the view lay out only the visible rows
+            cache_view.setUniformItemSizes(True)
+        self.preview_timer = QTimer(self)
+        self.preview_timer.setInterval(100)
+        self.preview_timer.timeout.connect(self.show_ready_previews)
+        self.preview_timer.start()
+        self.cache_filter_edit = QLineEdit()  #type-ahead filter of the cache lists
+        self.cache_filter_edit.setPlaceholderText('Filter caches...')
 
         self.import_camera_bt = QPushButton('import_camera')  #import camera assets button
         self.import_select_character_bt = QPushButton(
@@ -59,19 +161,42 @@ class MyWindow(QDialog):
         self.import_allcache_bt = QPushButton('import_all')  #import all assets button
         self.check_allcache_bt = QPushButton('Check_version')  #version check button
         self.update_allcache_bt = QPushButton('Update_version')  #update button
+        self.check_shot_scenes_bt = QPushButton('Check_shot_scenes')  #scenes using older caches button
+        self.as_of_checkbox = QCheckBox('As_of_date')  #rebuild the shot as it was published then
+        self.as_of_edit = QDateTimeEdit(QDateTime.currentDateTime())
+        self.as_of_edit.setCalendarPopup(True)
+        self.pin_bt = QPushButton('Pin_selected')  #keep selected caches at their version
+        self.unpin_bt = QPushButton('Unpin_selected')  #follow the latest version again
+        self.proxy_checkbox = QCheckBox('Proxy_import')  #import characters and props as stand-ins
+        self.swap_full_bt = QPushButton('Swap_to_full')  #load full caches of selected stand-ins
+        self.swap_proxy_bt = QPushButton('Swap_to_proxy')  #back to stand-ins
+        self.profile_checkbox = QCheckBox('Record_timings')  #profiling toggle
+        self.profile_checkbox.setChecked(profiler.enabled)
+        self.export_profile_bt = QPushButton('Export_timings')  #timing export button
+
+        self.dependency_index = None
+        #Keep the dependency index current as lighting scenes are saved
+        self.scene_saved_job = cmds.scriptJob(
+            event=['SceneSaved', self.index_saved_scene])
 
         self.signal_connect()
 
         main_layout = QVBoxLayout()
         load_shot_layout = QHBoxLayout()
+        filter_layout = QHBoxLayout()
         cachelist_layout = QHBoxLayout()
         select_layout = QHBoxLayout()
         import_layout = QHBoxLayout()
         update_layout = QHBoxLayout()
+        manifest_layout = QHBoxLayout()
+        proxy_layout = QHBoxLayout()
+        profile_layout = QHBoxLayout()
 
         load_shot_layout.addWidget(self.episode_combo_box)
         load_shot_layout.addWidget(self.shot_combo_box)
 
+        filter_layout.addWidget(self.cache_filter_edit)
+
         cachelist_layout.addWidget(self.listView_charcache)
         cachelist_layout.addWidget(self.listView_propcache)
         cachelist_layout.addWidget(self.listView_camcache)
@@ -84,12 +209,29 @@ class MyWindow(QDialog):
 
         update_layout.addWidget(self.check_allcache_bt)
         update_layout.addWidget(self.update_allcache_bt)
+        update_layout.addWidget(self.check_shot_scenes_bt)
+
+        manifest_layout.addWidget(self.as_of_checkbox)
+        manifest_layout.addWidget(self.as_of_edit)
+        manifest_layout.addWidget(self.pin_bt)
+        manifest_layout.addWidget(self.unpin_bt)
+
+        proxy_layout.addWidget(self.proxy_checkbox)
+        proxy_layout.addWidget(self.swap_full_bt)
+        proxy_layout.addWidget(self.swap_proxy_bt)
+
+        profile_layout.addWidget(self.profile_checkbox)
+        profile_layout.addWidget(self.export_profile_bt)
 
         main_layout.addLayout(load_shot_layout)
+        main_layout.addLayout(filter_layout)
         main_layout.addLayout(cachelist_layout)
         main_layout.addLayout(select_layout)
         main_layout.addLayout(import_layout)
         main_layout.addLayout(update_layout)
+        main_layout.addLayout(manifest_layout)
+        main_layout.addLayout(proxy_layout)
+        main_layout.addLayout(profile_layout)
 
         self.setLayout(main_layout)
 
@@ -104,6 +246,93 @@ class MyWindow(QDialog):
         self.import_allcache_bt.clicked.connect(self.import_all_cache)
         self.check_allcache_bt.clicked.connect(self.check_cache_version)
         self.update_allcache_bt.clicked.connect(self.update_cache_version)
+        self.check_shot_scenes_bt.clicked.connect(self.check_shot_scenes)
+        self.cache_filter_edit.textChanged.connect(self.filter_cache_lists)
+        self.as_of_checkbox.toggled.connect(self.shot_change)
+        self.as_of_edit.dateTimeChanged.connect(self.as_of_change)
+        self.pin_bt.clicked.connect(self.pin_selected)
+        self.unpin_bt.clicked.connect(self.unpin_selected)
+        self.swap_full_bt.clicked.connect(
+            lambda: self.swap_selected('full'))
+        self.swap_proxy_bt.clicked.connect(
+            lambda: self.swap_selected('proxy'))
+        self.profile_checkbox.toggled.connect(self.toggle_profiling)
+        self.export_profile_bt.clicked.connect(self.export_profile)
+
+    def closeEvent(self, event):
+        self.preview_timer.stop()
+        self.thumbnail_loader.shutdown()
+        if cmds.scriptJob(exists=self.scene_saved_job):
+            cmds.scriptJob(kill=self.scene_saved_job, force=True)
+        super(MyWindow, self).closeEvent(event)
+
+    def get_dependency_index(self):
+        """Open the scene dependency index, None when there is no lighting scene folder."""
+        if self.dependency_index is None:
+            scene_dirs = [
+                scene_dir for scene_dir in lighting_scene_dirs
+                if os.path.isdir(scene_dir)]
+            if scene_dirs:
+                self.dependency_index = dependency_index.DependencyIndex(
+                    scene_dirs)
+        return self.dependency_index
+
+    def index_saved_scene(self):
+        """Re-index the references of the scene that was just saved."""
+        scene_file = cmds.file(q=True, sceneName=True)
+        index = self.get_dependency_index()
+        if index and scene_file:
+            scene_key = scene_references.normalize_path(scene_file)
+            if any(scene_key.startswith(scene_references.normalize_path(
+                    os.path.abspath(scene_dir))) for scene_dir in index.scene_dirs):
+                index.update_scene(scene_file)
+
+    @profiler.timed('check_shot_scenes', 'lighting')
+    def check_shot_scenes(self):
+        """List the lighting scenes still using older versions of the shot caches."""
+        index = self.get_dependency_index()
+        if index is None:
+            self.show_warning_dialog(
+                warningstr='No lighting scene folder to check',
+                high_version=[],
+                low_version=[])
+            return
+        index.update()
+        cache_path = self.get_cache_path()
+        shot_dir = os.path.dirname(cache_path)
+        outdated = []
+        for cache_file in self.get_cache_file(cache_path):
+            match = re.match(r'(.*)_v(\d+)\.', cache_file)
+            if match:
+                for row in index.outdated_scenes(
+                        match.group(1), int(match.group(2)), shot_dir):
+                    outdated.append('{0}  v{1} < {2}'.format(
+                        os.path.basename(row['scene']),
+                        str(row['version']).zfill(3),
+                        cache_file))
+        self.show_warning_dialog(
+            warningstr='\n'.join(sorted(outdated)) or
+            'All scenes use the latest caches',
+            high_version=[],
+            low_version=[])
+
+    def toggle_profiling(self, enabled):
+        """Start or stop recording import timings."""
+        if enabled:
+            profiler.enable()
+        else:
+            profiler.disable()
+
+    def export_profile(self):
+        """Export recorded timings as JSON and Chrome trace."""
+        export_dir = QFileDialog.getExistingDirectory(self, 'Export timings to')
+        if export_dir:
+            exported = profiler.export_session(
+                export_dir, prefix='lighting_tool_profile')
+            self.show_warning_dialog(
+                warningstr='Timings exported:\n' + '\n'.join(exported),
+                high_version=[],
+                low_version=[])
 
     def show_warning_dialog(
             self, warningstr,
@@ -133,30 +362,58 @@ class MyWindow(QDialog):
 
     def populate_episode_combo_box(self, sequence_path, combo_box):
 
-        episode_name_list = [
-            episode_name for episode_name in os.listdir(
-                sequence_path) if os.path.isdir(
-                    os.path.join(sequence_path, episode_name))]
+        if self.asset_catalog:
+            episode_name_list = self.asset_catalog.episodes()
+        else:
+            episode_name_list = [
+                episode_name for episode_name in os.listdir(
+                    sequence_path) if os.path.isdir(
+                        os.path.join(sequence_path, episode_name))]
         combo_box.addItem('')
         combo_box.addItems(episode_name_list)
 
     def clearcharlist(self):
         """clear character cache list"""
-        self.listView_charcache.clear()
+        self.listView_charcache.model().set_entries([])
 
     def clearproplist(self):
         """clear prop cache list"""
-        self.listView_propcache.clear()
+        self.listView_propcache.model().set_entries([])
 
     def clearcamlist(self):
         """clear camera cache list"""
-        self.listView_camcache.clear()
+        self.listView_camcache.model().set_entries([])
+
+    def filter_cache_lists(self, text):
+        for cache_view in [self.listView_charcache,
+                           self.listView_propcache,
+                           self.listView_camcache]:
+            cache_view.model().set_filter(text)
+
+    def show_ready_previews(self):
+        """Hand the previews looked up since the last tick to the lists."""
+        previews = self.thumbnail_loader.take_ready()
+        if previews:
+            for cache_view in [self.listView_charcache,
+                               self.listView_propcache,
+                               self.listView_camcache]:
+                cache_view.model().add_previews(previews)
+
+    def selected_texts(self, cache_view):
+        """Names of the selected rows of a cache list, top to bottom."""
+        return [
+            index.data() for index in sorted(
+                cache_view.selectionModel().selectedIndexes(),
+                key=lambda index: index.row())]
 
     def episode_change(self):
 
         episode = self.episode_combo_box.currentText()
         episode_path = os.path.join(sequence_path, episode)
         self.shot_combo_box.clear()
+        if self.asset_catalog:
+            self.shot_combo_box.addItems(self.asset_catalog.shots(episode))
+            return
         for shotname in os.listdir(episode_path):
             shotname_path = os.path.join(episode_path, shotname)
             if os.path.isdir(shotname_path):
@@ -180,12 +437,75 @@ class MyWindow(QDialog):
         return cache_path
 
     def get_cache_file(self, cachepath):
+        """
+        Cache files to build the shot from: read from the shot manifest,
+        else looked up in the asset catalog, else found by listing the
+        cache folder.
+        """
+        manifest = shot_manifest.read_manifest(os.path.dirname(cachepath))
+        if manifest is not None:
+            as_of = None
+            if self.as_of_checkbox.isChecked():
+                as_of = self.as_of_edit.dateTime().toSecsSinceEpoch()
+            return [
+                os.path.basename(cache['path']) for cache in
+                shot_manifest.resolve(
+                    manifest, os.path.dirname(cachepath), as_of)]
+        if self.asset_catalog and not self.as_of_checkbox.isChecked():
+            shot = '{0}/{1}'.format(
+                self.episode_combo_box.currentText(),
+                self.shot_combo_box.currentText())
+            rows = self.asset_catalog.query(
+                limit=100000, stage='published', shot=shot, step='cache',
+                latest=True, order_by='name', descending=False)
+            latest_files = {}
+            for row in rows:
+                latest_files.setdefault(
+                    row['prefix'], os.path.basename(row['path']))
+            if latest_files:
+                return list(latest_files.values())
         cache_list = []
         if os.path.exists(cachepath):
             cache_type = ['.abc', '.fbx']
             cache_list = self.get_latest_cache_file(cachepath, cache_type)
         return cache_list
 
+    def as_of_change(self):
+        if self.as_of_checkbox.isChecked():
+            self.shot_change()
+
+    def selected_cache_names(self):
+        selected = []
+        for cache_list in [self.listView_charcache,
+                           self.listView_propcache,
+                           self.listView_camcache]:
+            for cache_name in self.selected_texts(cache_list):
+                match = re.match(r'(.*)_v(\d+)\.', cache_name)
+                if match:
+                    selected.append((match.group(1), int(match.group(2))))
+        return selected
+
+    def pin_selected(self):
+        """Pin the selected caches to the version shown in the shot manifest."""
+        shot_dir = os.path.dirname(self.get_cache_path())
+        if shot_manifest.read_manifest(shot_dir) is None:
+            self.show_warning_dialog(
+                warningstr='This shot has no build manifest to pin in',
+                high_version=[],
+                low_version=[])
+            return
+        for cache_name, version in self.selected_cache_names():
+            shot_manifest.set_pin(shot_dir, cache_name, version)
+        self.shot_change()
+
+    def unpin_selected(self):
+        shot_dir = os.path.dirname(self.get_cache_path())
+        if shot_manifest.read_manifest(shot_dir) is None:
+            return
+        for cache_name, version in self.selected_cache_names():
+            shot_manifest.set_pin(shot_dir, cache_name, None)
+        self.shot_change()
+
     def get_latest_cache_file(self, target_path, cache_type):
 
         file_dict = {}
@@ -214,18 +534,28 @@ class MyWindow(QDialog):
         return cam_name
 
     def set_cache_list(self, cache_list):
-        for cache_name in cache_list:
-            if '_char' in cache_name:
-                self.listView_charcache.addItem(cache_name)
-            if '_prop' in cache_name:
-                self.listView_propcache.addItem(cache_name)
-            if '_cam' in cache_name:
-                self.listView_camcache.addItem(cache_name)
-
+        """Fill each cache list in one call."""
+        cache_path = self.get_cache_path()
+        self.listView_charcache.model().set_entries(
+            [cache_name for cache_name in cache_list if '_char' in cache_name],
+            cache_path)
+        self.listView_propcache.model().set_entries(
+            [cache_name for cache_name in cache_list if '_prop' in cache_name],
+            cache_path)
+        self.listView_camcache.model().set_entries(
+            [cache_name for cache_name in cache_list if '_cam' in cache_name],
+            cache_path)
+
+    @profiler.timed('import_func', 'lighting')
     def import_func(self, cache_path):
         """Import cache files."""
         namesp = os.path.splitext(
             os.path.basename(cache_path))[0].split('_v')[0]
+        if self.proxy_checkbox.isChecked() and not namesp.endswith('_cam'):
+            #Layout context only: a stand-in until it is swapped to full
+            cache_proxies.load_plugin(cmds)
+            cache_proxies.import_proxy(cmds, cache_path, namesp)
+            return
         cache_options = ';readAnimData=1;useAsAnimationCache=1'
         cmds.file(
             cache_path,
@@ -239,7 +569,8 @@ class MyWindow(QDialog):
 
     def import_camera(self):
         cachepath = self.get_cache_path()
-        cam_name = self.listView_camcache.item(0).text()
+        cam_model = self.listView_camcache.model().entries
+        cam_name = cam_model.row(0) if cam_model.row_count() else ''
         if cam_name:
             cam_cache_path = os.path.join(cachepath, cam_name)
             self.import_func(cam_cache_path)
@@ -252,11 +583,11 @@ class MyWindow(QDialog):
 
     def import_select_character(self):
         cache_path = self.get_cache_path()
-        if self.listView_charcache.selectedItems():
-            for charcachename in self.listView_charcache.selectedItems():
+        if self.selected_texts(self.listView_charcache):
+            for charcachename in self.selected_texts(self.listView_charcache):
                 cache_file_path = os.path.join(
                     cache_path,
-                    charcachename.text()
+                    charcachename
                     )
                 self.import_func(cache_file_path)
         else:
@@ -268,10 +599,10 @@ class MyWindow(QDialog):
 
     def import_select_prop(self):
         cache_path = self.get_cache_path()
-        if self.listView_propcache.selectedItems():
-            for propcachename in self.listView_propcache.selectedItems():
+        if self.selected_texts(self.listView_propcache):
+            for propcachename in self.selected_texts(self.listView_propcache):
                 cache_file_path = os.path.join(
-                    cache_path, propcachename.text())
+                    cache_path, propcachename)
                 self.import_func(cache_file_path)
         else:
             warningstr = 'The props to be imported are not selected'
@@ -324,8 +655,33 @@ class MyWindow(QDialog):
         ref_list = [
             os.path.basename(
                 ref_path) for ref_path in cmds.file(q=True, r=True)]
+        ref_list += [
+            os.path.basename(info['path'])
+            for info in cache_proxies.stand_ins(cmds)
+            if os.path.basename(info['path']) not in ref_list]
         return self.compare_versions(cache_list, ref_list)
 
+    @profiler.timed('swap_selected', 'lighting')
+    def swap_selected(self, state):
+        """
+        Swap the stand-ins selected in the viewport or the cache lists
+        to full caches or back to proxies.
+        """
+        selected_namespaces = set(
+            cache_name for cache_name, version in self.selected_cache_names())
+        selected_nodes = set(cmds.ls(selection=True, long=True) or [])
+        stand_in_nodes = [
+            info['node'] for info in cache_proxies.stand_ins(cmds)
+            if info['namespace'] in selected_namespaces or
+            info['node'] in selected_nodes]
+        if not stand_in_nodes:
+            self.show_warning_dialog(
+                warningstr='No proxies selected',
+                high_version=[],
+                low_version=[])
+            return
+        cache_proxies.swap(cmds, stand_in_nodes, state)
+
     def check_cache_version(self):
         """If a replacement version exists, show a warning dialog."""
         higher, replaces, lower, unique = self.get_cache_version_diff()
@@ -342,10 +698,16 @@ class MyWindow(QDialog):
         higher, replaces, lower, unique = self.get_cache_version_diff()
         cache_path = self.get_cache_path()
         if replaces:
+            proxies = dict(
+                (os.path.basename(info['path']), info['node'])
+                for info in cache_proxies.stand_ins(cmds))
             for index, value in enumerate(replaces):
                 refpath = os.path.join(cache_path, value)
-                refnode = cmds.referenceQuery(refpath, rfn=True)
                 newrefpath = os.path.join(cache_path, higher[index])
+                if value in proxies:
+                    cache_proxies.retarget(cmds, proxies[value], newrefpath)
+                    continue
+                refnode = cmds.referenceQuery(refpath, rfn=True)
                 cmds.file(
                     newrefpath,
                     loadReference=refnode,
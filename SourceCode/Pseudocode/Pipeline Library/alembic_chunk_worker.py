@@ -0,0 +1,34 @@
+# Script Name: Alembic Chunk Worker
+# Description: Headless mayapy worker for chunked_alembic_cache.py. Opens the scene named in the job spec
+#and exports every job over the spec's frame range with a single AbcExport call.
+#
+#Usage: mayapy alembic_chunk_worker.py <job spec json>
+
+import sys
+import json
+
+import maya.standalone
+
+
+def main(spec_path):
+    with open(spec_path) as spec_file:
+        spec = json.load(spec_file)
+
+    maya.standalone.initialize(name="python")
+    try:
+        import maya.cmds as cmds
+        cmds.loadPlugin("AbcExport", quiet=True)
+        cmds.file(spec["scene"], open=True, force=True)
+
+        start, end = spec["frame_range"]
+        alembic_jobs = [
+            " ".join(list(job["flags"]) + ["-fr %d %d" % (start, end), "-root " + job["root"], "-file " + job["file"]])
+            for job in spec["jobs"]
+        ]
+        cmds.AbcExport(j=alembic_jobs)
+    finally:
+        maya.standalone.uninitialize()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1])
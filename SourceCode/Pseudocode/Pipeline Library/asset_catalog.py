@@ -0,0 +1,450 @@
+# Script Name: Asset Catalog
+# Description: SQLite catalog of every saved and published version file of a project: asset type, name,
+#step, version, format, size, author, time and path, one row per file. The Save/Publish Tool adds rows as
+#it saves and publishes, so the tools can query the catalog instead of walking folders: "props published
+#this week over 1 GB" or a name search is one indexed query, and long results come back a page at a time.
+#
+#Names are searched word by word through SQLite's FTS5 index (camelCase and _ split words, words match as
+#prefixes: "cha lay" finds chair_layout). SQLite builds without FTS5 fall back to LIKE.
+#
+#The catalog is <root>/.asset_catalog.db (or VFX_ASSET_CATALOG) and keeps the default rollback journal as
+#it sits on the project share. Files copied, archived or deleted outside the tools are picked up by the
+#crawl command, which only stats the files of folders whose mtime changed since the last crawl.
+#
+#Usage:
+#   python asset_catalog.py crawl <root> [--full]
+#   python asset_catalog.py query <root> --type prop --stage published --days 7 --min-mb 1024
+#   python asset_catalog.py query <root> --search "chair lay" --latest --page 2 --page-size 50
+
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import getpass
+import argparse
+from contextlib import contextmanager
+
+library_dir = os.path.dirname(os.path.abspath(__file__))
+if library_dir not in sys.path:
+    sys.path.append(library_dir)
+import scene_references
+import shot_manifest
+import version_reservation
+
+catalog_file_name = ".asset_catalog.db"
+#Folders below the project root holding each stage
+stage_dirs = {"saved": ("asset_wips", "saved"), "published": ("asset_final", "published")}
+default_page_size = 100
+sort_columns = ["published", "size", "name", "version", "type"]
+#camelCase words keep their trailing digits: propAsset1 -> prop, asset1
+_word_pattern = re.compile(r"[A-Z]+(?![a-z])\d*|[A-Z]?[a-z]+\d*|\d+")
+
+_schema = """
+CREATE TABLE IF NOT EXISTS assets (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    folder TEXT NOT NULL,
+    asset_dir TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    type TEXT NOT NULL,
+    shot TEXT NOT NULL,
+    name TEXT NOT NULL,
+    step TEXT NOT NULL,
+    prefix TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    format TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    author TEXT NOT NULL,
+    published REAL NOT NULL,
+    mtime REAL NOT NULL,
+    terms TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS assets_type ON assets (type, published);
+CREATE INDEX IF NOT EXISTS assets_stage ON assets (stage, published);
+CREATE INDEX IF NOT EXISTS assets_published ON assets (published);
+CREATE INDEX IF NOT EXISTS assets_size ON assets (size);
+CREATE INDEX IF NOT EXISTS assets_versions ON assets (asset_dir, prefix, version);
+CREATE INDEX IF NOT EXISTS assets_folder ON assets (folder);
+CREATE INDEX IF NOT EXISTS assets_shot ON assets (shot);
+CREATE TABLE IF NOT EXISTS folders (
+    path TEXT PRIMARY KEY,
+    mtime INTEGER NOT NULL
+);
+"""
+
+_search_schema = """
+CREATE VIRTUAL TABLE IF NOT EXISTS asset_search USING fts5(terms, content='assets', content_rowid='id', prefix='2 3');
+CREATE TRIGGER IF NOT EXISTS assets_search_insert AFTER INSERT ON assets BEGIN
+    INSERT INTO asset_search (rowid, terms) VALUES (new.id, new.terms);
+END;
+CREATE TRIGGER IF NOT EXISTS assets_search_delete AFTER DELETE ON assets BEGIN
+    INSERT INTO asset_search (asset_search, rowid, terms) VALUES ('delete', old.id, old.terms);
+END;
+CREATE TRIGGER IF NOT EXISTS assets_search_update AFTER UPDATE OF terms ON assets BEGIN
+    INSERT INTO asset_search (asset_search, rowid, terms) VALUES ('delete', old.id, old.terms);
+    INSERT INTO asset_search (rowid, terms) VALUES (new.id, new.terms);
+END;
+"""
+
+_columns = ["path", "folder", "asset_dir", "stage", "type", "shot", "name", "step", "prefix", "version", "format",
+            "size", "author", "published", "mtime", "terms"]
+_upsert = "INSERT INTO assets ({0}) VALUES ({1}) ON CONFLICT (path) DO UPDATE SET {2}".format(
+    ", ".join(_columns), ", ".join("?" * len(_columns)),
+    ", ".join("{0} = excluded.{0}".format(column) for column in _columns if column not in ("path", "terms", "published")))
+
+
+def default_catalog_path(root_dir):
+    return os.environ.get("VFX_ASSET_CATALOG") or os.path.join(root_dir, catalog_file_name)
+
+
+def search_terms(name, prefix):
+    """
+    Words a file is found by: its name split at camelCase and _, plus the whole name and prefix.
+    """
+    words = [word.lower() for word in _word_pattern.findall(prefix)]
+    return " ".join(words + [name.lower(), prefix.lower()])
+
+
+def describe_file(file_path):
+    """
+    Catalog fields of a saved or published version file (root, stage, type, shot, name, step, prefix,
+    version, format, asset_dir, folder, path), or None for any other file.
+
+    Assets:  <root>/<stage dirs>/assets/<type>/<asset>/[<format dir>/]<asset>_<step>_vNNN.<ext>
+    Shots:   <root>/<stage dirs>/sequence/<episode>/<shot>/[cache/]<name>_vNNN.<ext>
+    """
+    #Names keep their case, the path keys are normalized like the other indexes
+    parts = os.path.normpath(os.path.abspath(os.path.expandvars(file_path))).split(os.sep)
+    path = scene_references.normalize_path(os.sep.join(parts))
+    match = scene_references.version_file_pattern.match(parts[-1])
+    if not match or parts[-1].startswith("."):
+        return None
+    for stage, (stage_dir, stage_sub_dir) in stage_dirs.items():
+        for index in range(len(parts) - 5):
+            if parts[index].lower() == stage_dir and parts[index + 1].lower() == stage_sub_dir:
+                break
+        else:
+            continue
+        kind, rest = parts[index + 2].lower(), parts[index + 3:]
+        prefix = match.group("prefix")
+        root_dir = os.sep.join(parts[:index])
+        if not root_dir or root_dir.endswith(":"):
+            root_dir += os.sep
+        fields = {"root": root_dir, "stage": stage, "prefix": prefix,
+                  "version": int(match.group("version")), "format": os.path.splitext(parts[-1])[1][1:].lower(),
+                  "path": path, "folder": os.path.dirname(path)}
+        fields["asset_dir"] = scene_references.parse_version_file(path)[0]
+        if kind == "assets" and len(rest) >= 3:
+            name = rest[1]
+            fields.update({"type": rest[0], "shot": "", "name": name,
+                           "step": prefix[len(name) + 1:] if prefix.startswith(name + "_") else ""})
+        elif kind == "sequence" and len(rest) >= 3:
+            fields.update({"type": shot_manifest.cache_kind(prefix) or "scene", "shot": rest[0] + "/" + rest[1],
+                           "name": prefix, "step": rest[2] if len(rest) > 3 else "scene"})
+        else:
+            return None
+        return fields
+    return None
+
+
+def _claim_author(asset_dir, prefix, version):
+    claim_path = os.path.join(asset_dir, version_reservation.claim_dir_name, "{0}_v{1}.claim".format(prefix, str(version).zfill(3)))
+    try:
+        with open(claim_path) as claim_file:
+            return json.load(claim_file).get("user") or ""
+    except (IOError, OSError, ValueError):
+        return ""
+
+
+def _file_owner(stat):
+    try:
+        import pwd
+        return pwd.getpwuid(stat.st_uid).pw_name
+    except (ImportError, KeyError):
+        return ""
+
+
+class AssetCatalog(object):
+
+    def __init__(self, catalog_path):
+        self.catalog_path = catalog_path
+        catalog_dir = os.path.dirname(os.path.abspath(catalog_path))
+        if not os.path.isdir(catalog_dir):
+            os.makedirs(catalog_dir, exist_ok=True)
+        connection = sqlite3.connect(catalog_path, timeout=30.0)
+        try:
+            connection.executescript(_schema)
+            try:
+                connection.executescript(_search_schema)
+                self.full_text = True
+            except sqlite3.OperationalError:
+                #SQLite built without FTS5: names are searched with LIKE
+                self.full_text = False
+        finally:
+            connection.close()
+
+    @classmethod
+    def for_root(cls, root_dir):
+        return cls(default_catalog_path(root_dir))
+
+    @contextmanager
+    def _transaction(self):
+        connection = sqlite3.connect(self.catalog_path, timeout=30.0, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+        finally:
+            connection.close()
+
+    def _row(self, fields, stat, author, published):
+        return dict(fields, size=stat.st_size, mtime=stat.st_mtime, author=author, published=published,
+                    terms=search_terms(fields["name"], fields["prefix"]))
+
+    def record(self, file_paths, author=None):
+        """
+        Add or update the rows of freshly saved or published files. Returns the number of files recorded.
+        """
+        author = author or getpass.getuser()
+        now = time.time()
+        rows = []
+        for file_path in file_paths:
+            fields = describe_file(file_path)
+            if fields:
+                rows.append(self._row(fields, os.stat(file_path), author, now))
+        with self._transaction() as connection:
+            connection.executemany(_upsert, [[row[column] for column in _columns] for row in rows])
+        return len(rows)
+
+    def remove(self, file_paths):
+        """
+        Drop the rows of files that were archived or deleted.
+        """
+        with self._transaction() as connection:
+            connection.executemany("DELETE FROM assets WHERE path = ?",
+                                   [(scene_references.normalize_path(os.path.abspath(file_path)),) for file_path in file_paths])
+
+    def crawl(self, root_dir, full=False):
+        """
+        Reconcile the catalog with the saved and published folders of root_dir. Only the files of folders
+        whose mtime changed since the last crawl are stat'ed, unless full. Returns {"added", "updated",
+        "removed", "folders_read", "folders_skipped", "seconds"}.
+        """
+        start_time = time.perf_counter()
+        result = {"added": 0, "updated": 0, "removed": 0, "folders_read": 0, "folders_skipped": 0}
+        with self._transaction() as connection:
+            known_folders = dict((row["path"], row["mtime"]) for row in connection.execute("SELECT path, mtime FROM folders"))
+        seen_folders = {}
+        pending = [os.path.join(root_dir, *stage_parts) for stage_parts in stage_dirs.values()]
+        while pending:
+            folder = pending.pop()
+            try:
+                folder_mtime = os.stat(folder).st_mtime_ns
+                entries = list(os.scandir(folder))
+            except OSError:
+                continue
+            folder_key = scene_references.normalize_path(os.path.abspath(folder))
+            seen_folders[folder_key] = folder_mtime
+            pending.extend(entry.path for entry in entries if not entry.name.startswith(".") and entry.is_dir())
+            if not full and known_folders.get(folder_key) == folder_mtime:
+                result["folders_skipped"] += 1
+                continue
+            result["folders_read"] += 1
+            with self._transaction() as connection:
+                self._reconcile_folder(connection, folder_key, folder_mtime, entries, result)
+        with self._transaction() as connection:
+            for folder_key in set(known_folders) - set(seen_folders):
+                result["removed"] += connection.execute("DELETE FROM assets WHERE folder = ?", (folder_key,)).rowcount
+                connection.execute("DELETE FROM folders WHERE path = ?", (folder_key,))
+        result["seconds"] = time.perf_counter() - start_time
+        return result
+
+    def _reconcile_folder(self, connection, folder_key, folder_mtime, entries, result):
+        known = dict((row["path"], (row["size"], row["mtime"]))
+                     for row in connection.execute("SELECT path, size, mtime FROM assets WHERE folder = ?", (folder_key,)))
+        found = set()
+        rows = []
+        for entry in entries:
+            if entry.name.startswith(".") or not entry.is_file():
+                continue
+            fields = describe_file(entry.path)
+            if not fields:
+                continue
+            found.add(fields["path"])
+            stat = entry.stat()
+            if known.get(fields["path"]) == (stat.st_size, stat.st_mtime):
+                continue
+            author = _claim_author(fields["asset_dir"], fields["prefix"], fields["version"]) or _file_owner(stat)
+            rows.append(self._row(fields, stat, author, stat.st_mtime))
+            result["updated" if fields["path"] in known else "added"] += 1
+        connection.executemany(_upsert, [[row[column] for column in _columns] for row in rows])
+        for path in set(known) - found:
+            connection.execute("DELETE FROM assets WHERE path = ?", (path,))
+            result["removed"] += 1
+        connection.execute("INSERT OR REPLACE INTO folders (path, mtime) VALUES (?, ?)", (folder_key, folder_mtime))
+
+    def _where(self, search=None, stage=None, asset_type=None, name=None, step=None, file_format=None, shot=None,
+               author=None, min_size=None, since=None, until=None, latest=False):
+        clauses = []
+        arguments = []
+        for column, value in [("stage", stage), ("type", asset_type), ("name", name), ("step", step),
+                              ("format", file_format), ("shot", shot), ("author", author)]:
+            if value:
+                clauses.append("assets.{0} = ?".format(column))
+                arguments.append(value)
+        for clause, value in [("assets.size >= ?", min_size), ("assets.published >= ?", since), ("assets.published <= ?", until)]:
+            if value is not None:
+                clauses.append(clause)
+                arguments.append(value)
+        words = [word for word in re.split(r"[\s_]+", (search or "").lower()) if word]
+        if words and self.full_text:
+            clauses.append("assets.id IN (SELECT rowid FROM asset_search WHERE asset_search MATCH ?)")
+            arguments.append(" ".join('"{0}"*'.format(word.replace('"', '""')) for word in words))
+        elif words:
+            for word in words:
+                clauses.append("assets.terms LIKE ?")
+                arguments.append("%" + word + "%")
+        if latest:
+            clauses.append("NOT EXISTS (SELECT 1 FROM assets newer WHERE newer.asset_dir = assets.asset_dir "
+                           "AND newer.prefix = assets.prefix AND newer.format = assets.format AND newer.version > assets.version)")
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", arguments
+
+    def _query(self, sql, arguments=()):
+        connection = sqlite3.connect(self.catalog_path, timeout=30.0)
+        connection.row_factory = sqlite3.Row
+        try:
+            return [dict(row) for row in connection.execute(sql, arguments)]
+        finally:
+            connection.close()
+
+    def query(self, order_by="published", descending=True, offset=0, limit=default_page_size, **filters):
+        """
+        Rows matching the filters as dicts, one page of limit rows from offset. Filters: search (name
+        words), stage, asset_type, name, step, file_format, shot, author, min_size (bytes), since and until
+        (seconds since the epoch) and latest (only the newest version of each file).
+        """
+        if order_by not in sort_columns:
+            raise ValueError("Unknown sort column {0}, expected one of {1}".format(order_by, sort_columns))
+        where, arguments = self._where(**filters)
+        sql = "SELECT path, stage, type, shot, name, step, prefix, version, format, size, author, published FROM assets{0} " \
+              "ORDER BY {1} {2}, id {2} LIMIT ? OFFSET ?".format(where, order_by, "DESC" if descending else "ASC")
+        return self._query(sql, arguments + [limit, offset])
+
+    def count(self, **filters):
+        where, arguments = self._where(**filters)
+        return self._query("SELECT COUNT(*) AS total FROM assets" + where, arguments)[0]["total"]
+
+    def page(self, page=1, page_size=default_page_size, order_by="published", descending=True, **filters):
+        """
+        One page of a query for the tools' lists: {"rows", "page", "pages", "total"}, pages counted from 1.
+        """
+        total = self.count(**filters)
+        pages = max(1, (total + page_size - 1) // page_size)
+        page = min(max(1, page), pages)
+        rows = self.query(order_by, descending, (page - 1) * page_size, page_size, **filters)
+        return {"rows": rows, "page": page, "pages": pages, "total": total}
+
+    def latest_version(self, file_path):
+        """
+        Newest catalogued version of the file's asset and format, or None when the catalog does not know it.
+        """
+        fields = describe_file(file_path)
+        if not fields:
+            return None
+        rows = self._query("SELECT MAX(version) AS version FROM assets WHERE asset_dir = ? AND prefix = ? AND format = ?",
+                           (fields["asset_dir"], fields["prefix"], fields["format"]))
+        return rows[0]["version"]
+
+    def episodes(self, stage="published"):
+        rows = self._query("SELECT DISTINCT shot FROM assets WHERE stage = ? AND shot != ''", (stage,))
+        return sorted(set(row["shot"].split("/")[0] for row in rows))
+
+    def shots(self, episode, stage="published"):
+        rows = self._query("SELECT DISTINCT shot FROM assets WHERE stage = ? AND shot LIKE ?", (stage, episode + "/%"))
+        return sorted(row["shot"].split("/", 1)[1] for row in rows)
+
+
+def _by_root(file_paths):
+    by_root = {}
+    for file_path in file_paths:
+        fields = describe_file(file_path)
+        if fields:
+            by_root.setdefault(fields["root"], []).append(file_path)
+    return by_root
+
+
+def record_files(file_paths, author=None, log=print):
+    """
+    Record saved or published files in the catalog of their project root. A catalog that cannot be
+    written is reported, not raised, so it never fails a save or publish. Returns the files recorded.
+    """
+    recorded = 0
+    for root_dir, root_files in _by_root(file_paths).items():
+        try:
+            recorded += AssetCatalog.for_root(root_dir).record(root_files, author)
+        except (sqlite3.Error, OSError) as error:
+            log("WARNING: Could not update the asset catalog of {0}: {1}".format(root_dir, error))
+    return recorded
+
+
+def remove_files(file_paths, log=print):
+    """
+    Drop archived or deleted files from the catalog of their project root, reporting failures like record_files.
+    """
+    for root_dir, root_files in _by_root(file_paths).items():
+        try:
+            AssetCatalog.for_root(root_dir).remove(root_files)
+        except (sqlite3.Error, OSError) as error:
+            log("WARNING: Could not update the asset catalog of {0}: {1}".format(root_dir, error))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Crawl and query the asset catalog of a project.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    crawl_parser = commands.add_parser("crawl", help="reconcile the catalog with the saved and published folders")
+    crawl_parser.add_argument("root")
+    crawl_parser.add_argument("--full", action="store_true", help="stat every file, not only those in changed folders")
+    query_parser = commands.add_parser("query", help="list catalogued files")
+    query_parser.add_argument("root")
+    query_parser.add_argument("--search")
+    query_parser.add_argument("--stage", choices=sorted(stage_dirs))
+    query_parser.add_argument("--type")
+    query_parser.add_argument("--step")
+    query_parser.add_argument("--format")
+    query_parser.add_argument("--shot")
+    query_parser.add_argument("--author")
+    query_parser.add_argument("--days", type=float, help="published within the last days")
+    query_parser.add_argument("--min-mb", type=float)
+    query_parser.add_argument("--latest", action="store_true", help="only the newest version of each file")
+    query_parser.add_argument("--sort", choices=sort_columns, default="published")
+    query_parser.add_argument("--page", type=int, default=1)
+    query_parser.add_argument("--page-size", type=int, default=default_page_size)
+    options = parser.parse_args(argv)
+
+    catalog = AssetCatalog.for_root(options.root)
+    if options.command == "crawl":
+        result = catalog.crawl(options.root, options.full)
+        print("{0} added, {1} updated, {2} removed; {3} folders read, {4} unchanged in {5:.2f}s".format(
+            result["added"], result["updated"], result["removed"], result["folders_read"], result["folders_skipped"], result["seconds"]))
+    elif options.command == "query":
+        result = catalog.page(options.page, options.page_size, options.sort, search=options.search, stage=options.stage,
+                              asset_type=options.type, step=options.step, file_format=options.format, shot=options.shot,
+                              author=options.author, min_size=options.min_mb * 1048576 if options.min_mb else None,
+                              since=time.time() - options.days * 86400.0 if options.days else None, latest=options.latest)
+        for row in result["rows"]:
+            print("{0:<10} {1:<10} v{2} {3:>9.1f} MB  {4:<10} {5}  {6}".format(
+                row["stage"], row["type"], str(row["version"]).zfill(3), row["size"] / 1048576.0, row["author"],
+                time.strftime("%Y-%m-%d %H:%M", time.localtime(row["published"])), row["path"]))
+        print("Page {0} of {1}, {2} files".format(result["page"], result["pages"], result["total"]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+# Script Name: Asset Tree
+# Description: Folder listings behind the Save/Publish Tool's asset browser. Folders are read with
+#os.scandir only when the artist expands them, and each listing is kept with the folder's mtime: expanding
+#the folder again re-reads it only when an entry was added, removed or renamed since (publishes commit
+#files by renaming them into place, so a new version always changes the folder's mtime).
+#
+#Expanding an asset folder also reads its cache/alembic/fbx folders to label it with its latest version
+#and size; nothing outside the expanded folders is ever scanned.
+
+import os
+import sys
+
+library_dir = os.path.dirname(os.path.abspath(__file__))
+if library_dir not in sys.path:
+    sys.path.append(library_dir)
+import scene_references
+
+
+class DirectoryCache(object):
+    """Listings of the folders read so far, keyed by path and checked against the folder's mtime."""
+
+    def __init__(self):
+        self._listings = {}
+        self.scans = 0
+
+    def entries(self, directory):
+        """
+        Visible entries of directory as dicts with name, path, is_dir, size and mtime, folders first.
+        """
+        mtime = os.stat(directory).st_mtime_ns
+        cached = self._listings.get(directory)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        entries = []
+        with os.scandir(directory) as scanner:
+            for entry in scanner:
+                if entry.name.startswith("."):
+                    continue
+                try:
+                    is_dir = entry.is_dir()
+                    stat = entry.stat()
+                except OSError:
+                    #Removed while listing
+                    continue
+                entries.append({"name": entry.name, "path": entry.path.replace(os.sep, "/"), "is_dir": is_dir,
+                                "size": 0 if is_dir else stat.st_size, "mtime": stat.st_mtime})
+        entries.sort(key=lambda entry: (not entry["is_dir"], entry["name"].lower()))
+        self._listings[directory] = (mtime, entries)
+        self.scans += 1
+        return entries
+
+    def invalidate(self, directory=None):
+        """
+        Forget one listing, or all of them, e.g. when a share reports coarse mtimes.
+        """
+        if directory is None:
+            self._listings.clear()
+        else:
+            self._listings.pop(directory, None)
+
+
+def version_summary(cache, directory):
+    """
+    Latest version of each versioned file prefix in directory and its cache/alembic/fbx folders, as
+    {prefix: (version, bytes of that version's files)}.
+    """
+    entries = cache.entries(directory)
+    files = [entry for entry in entries if not entry["is_dir"]]
+    for entry in entries:
+        if entry["is_dir"] and entry["name"] in scene_references.format_dir_names:
+            files.extend(child for child in cache.entries(entry["path"]) if not child["is_dir"])
+    summary = {}
+    for entry in files:
+        match = scene_references.version_file_pattern.match(entry["name"])
+        if match:
+            prefix, version = match.group("prefix"), int(match.group("version"))
+            latest = summary.get(prefix)
+            if latest is None or version > latest[0]:
+                summary[prefix] = (version, entry["size"])
+            elif version == latest[0]:
+                summary[prefix] = (version, latest[1] + entry["size"])
+    return summary
+
+
+def format_size(size):
+    if size < 1024:
+        return "{0} B".format(size)
+    for unit in ["KB", "MB", "GB"]:
+        size /= 1024.0
+        if size < 1024.0 or unit == "GB":
+            return "{0:.1f} {1}".format(size, unit)
+
+
+def folder_label(name, summary):
+    """
+    Tree label of a folder: its latest version and size for one asset, the number of caches and the size
+    of their latest versions for a shot.
+    """
+    if not summary:
+        return name
+    if len(summary) == 1:
+        version, size = list(summary.values())[0]
+        return "{0}   v{1}  {2}".format(name, str(version).zfill(3), format_size(size))
+    return "{0}   {1} caches  {2}".format(name, len(summary), format_size(sum(size for version, size in summary.values())))
+
+
+def entry_label(entry):
+    return entry["name"] if entry["is_dir"] else "{0}   {1}".format(entry["name"], format_size(entry["size"]))
@@ -0,0 +1,150 @@
+# Script Name: Cache Proxies
+# Description: Lightweight stand-ins for shot caches. In proxy mode each cache comes in as a transform
+#under |cache_proxies holding a gpuCache of the Alembic file (drawn from the GPU, no DG nodes, animation
+#or shaders), or an unloaded reference for formats gpuCache cannot read. Stand-ins carry their cache path,
+#namespace, reference node and proxy/full state as string attributes, so the state survives save and
+#reopen and bulk swaps only touch what changes.
+#
+#Swapping to full loads a reference of the cache next to the stand-in and hides it; swapping back unloads
+#the reference (keeping its edits) and shows the stand-in again.
+
+import time
+
+proxy_root = "cache_proxies"
+state_attr = "vfxCacheState"
+path_attr = "vfxCachePath"
+namespace_attr = "vfxNamespace"
+reference_attr = "vfxReferenceNode"
+proxy_states = ["proxy", "full"]
+full_reference_options = ";readAnimData=1;useAsAnimationCache=1"
+
+
+def load_plugin(cmds):
+    if not cmds.pluginInfo("gpuCache", query=True, loaded=True):
+        cmds.loadPlugin("gpuCache", quiet=True)
+
+
+def _set_string(cmds, node, attr, value):
+    if not cmds.attributeQuery(attr, node=node, exists=True):
+        cmds.addAttr(node, longName=attr, dataType="string")
+    cmds.setAttr(node + "." + attr, value or "", type="string")
+
+
+def stand_in_info(cmds, stand_in):
+    """
+    {"node", "path", "namespace", "reference", "state"} of a stand-in, or None when the node is not one.
+    """
+    if not cmds.objExists(stand_in) or not cmds.attributeQuery(state_attr, node=stand_in, exists=True):
+        return None
+    return {
+        "node": stand_in,
+        "path": cmds.getAttr(stand_in + "." + path_attr),
+        "namespace": cmds.getAttr(stand_in + "." + namespace_attr),
+        "reference": cmds.getAttr(stand_in + "." + reference_attr) or None,
+        "state": cmds.getAttr(stand_in + "." + state_attr),
+    }
+
+
+def stand_ins(cmds):
+    """
+    Info of every stand-in in the scene, see stand_in_info.
+    """
+    if not cmds.objExists("|" + proxy_root):
+        return []
+    found = []
+    for node in cmds.listRelatives("|" + proxy_root, children=True, fullPath=True) or []:
+        info = stand_in_info(cmds, node)
+        if info:
+            found.append(info)
+    return found
+
+
+def import_proxy(cmds, cache_path, namespace):
+    """
+    Bring a cache in as a stand-in: a gpuCache for .abc files, an unloaded reference for other formats.
+    Returns the stand-in transform.
+    """
+    if not cmds.objExists("|" + proxy_root):
+        cmds.createNode("transform", name=proxy_root)
+    stand_in = cmds.createNode("transform", name=namespace + "_proxy", parent="|" + proxy_root)
+    reference_node = None
+    if cache_path.lower().endswith(".abc"):
+        shape = cmds.createNode("gpuCache", name=namespace + "_proxyShape", parent=stand_in)
+        cmds.setAttr(shape + ".cacheFileName", cache_path, type="string")
+    else:
+        cmds.file(cache_path, reference=True, deferReference=True, namespace=namespace, options=full_reference_options)
+        reference_node = cmds.referenceQuery(cache_path, referenceNode=True)
+    _set_string(cmds, stand_in, path_attr, cache_path)
+    _set_string(cmds, stand_in, namespace_attr, namespace)
+    _set_string(cmds, stand_in, reference_attr, reference_node)
+    _set_string(cmds, stand_in, state_attr, "proxy")
+    return stand_in
+
+
+def swap_to_full(cmds, stand_in):
+    """
+    Load the full reference of a stand-in and hide the stand-in. Returns True when it was swapped.
+    """
+    info = stand_in_info(cmds, stand_in)
+    if info is None or info["state"] == "full":
+        return False
+    if info["reference"]:
+        cmds.file(loadReference=info["reference"], loadReferenceDepth="all")
+    else:
+        cmds.file(info["path"], reference=True, namespace=info["namespace"], options=full_reference_options,
+                  lockReference=False, loadReferenceDepth="all", returnNewNodes=False)
+        _set_string(cmds, stand_in, reference_attr, cmds.referenceQuery(info["path"], referenceNode=True))
+    cmds.setAttr(stand_in + ".visibility", False)
+    _set_string(cmds, stand_in, state_attr, "full")
+    return True
+
+
+def swap_to_proxy(cmds, stand_in):
+    """
+    Unload the full reference of a stand-in (its edits are kept) and show the stand-in again.
+    """
+    info = stand_in_info(cmds, stand_in)
+    if info is None or info["state"] == "proxy":
+        return False
+    if info["reference"]:
+        cmds.file(unloadReference=info["reference"])
+    cmds.setAttr(stand_in + ".visibility", True)
+    _set_string(cmds, stand_in, state_attr, "proxy")
+    return True
+
+
+def swap(cmds, stand_in_nodes, state, log=print):
+    """
+    Swap many stand-ins to "full" or "proxy" with viewport refresh suspended. Returns (swapped, seconds).
+    """
+    if state not in proxy_states:
+        raise ValueError("Unknown proxy state {0}, expected one of {1}".format(state, proxy_states))
+    swap_function = swap_to_full if state == "full" else swap_to_proxy
+    start_time = time.perf_counter()
+    swapped = 0
+    cmds.refresh(suspend=True)
+    try:
+        for stand_in in stand_in_nodes:
+            if swap_function(cmds, stand_in):
+                swapped += 1
+    finally:
+        cmds.refresh(suspend=False)
+    seconds = time.perf_counter() - start_time
+    log("Swapped {0} caches to {1} in {2:.2f}s".format(swapped, state, seconds))
+    return swapped, seconds
+
+
+def retarget(cmds, stand_in, cache_path):
+    """
+    Point a stand-in (and its reference, if any) at another version of its cache, keeping its state.
+    """
+    info = stand_in_info(cmds, stand_in)
+    shapes = cmds.listRelatives(stand_in, children=True, fullPath=True, type="gpuCache") or []
+    for shape in shapes:
+        cmds.setAttr(shape + ".cacheFileName", cache_path, type="string")
+    if info["reference"]:
+        #Replacing the file of a reference loads it, so a proxy's reference is unloaded again afterwards
+        cmds.file(cache_path, loadReference=info["reference"], loadReferenceDepth="all")
+        if info["state"] == "proxy":
+            cmds.file(unloadReference=info["reference"])
+    _set_string(cmds, stand_in, path_attr, cache_path)
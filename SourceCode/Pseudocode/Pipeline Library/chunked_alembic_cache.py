@@ -0,0 +1,261 @@
+# Script Name: Chunked Alembic Cache
+# Description: Caches long sequence shots by splitting the playback range into segments, exporting every
+#segment in its own headless worker process and stitching the segments back into one Alembic per asset.
+#
+#Workers are started as <exporter command> <job spec json>. The default exporter is mayapy running
+#alembic_chunk_worker.py; stub_alembic_exporter.py writes JSON stand-ins with the same interface so the
+#split/merge/verify path can run without Maya. Real Alembic segments are merged with abcstitcher
+#(ships with Alembic), stub segments in Python. Comparing real caches with a single-process export reads
+#them back with PyAlembic and is skipped with a warning where it is not installed.
+#
+#Usage:
+#   python chunked_alembic_cache.py --scene shot.mb --root "|character|hero" --output hero.abc --range 1 480 --chunks 4
+#   python chunked_alembic_cache.py ... --exporter stub --verify
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import importlib.util
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import version_reservation
+
+library_dir = os.path.dirname(os.path.abspath(__file__))
+default_alembic_flags = ["-uvWrite", "-writeFaceSets", "-worldSpace", "-writeVisibility", "-dataFormat ogawa"]
+#Shots shorter than this are not worth starting extra Maya sessions for
+min_frames_per_chunk = 50
+
+
+def mayapy_exporter_command():
+    return [os.environ.get("MAYAPY", "mayapy"), os.path.join(library_dir, "alembic_chunk_worker.py")]
+
+
+def stub_exporter_command():
+    return [sys.executable, os.path.join(library_dir, "stub_alembic_exporter.py")]
+
+
+def split_frame_range(start, end, chunk_count):
+    """
+    Split the inclusive whole-frame range into at most chunk_count contiguous, non-overlapping segments.
+    """
+    start, end = int(start), int(end)
+    frame_count = end - start + 1
+    chunk_count = max(1, min(chunk_count, frame_count // min_frames_per_chunk or 1))
+    segments = []
+    segment_start = start
+    for chunk_index in range(chunk_count):
+        segment_frames = frame_count // chunk_count + (1 if chunk_index < frame_count % chunk_count else 0)
+        segments.append((segment_start, segment_start + segment_frames - 1))
+        segment_start += segment_frames
+    return segments
+
+
+def run_exporter(exporter_command, scene_file, jobs, frame_range, spec_path):
+    """
+    Export every job over frame_range in one worker process. Raises RuntimeError when the worker fails.
+    """
+    spec = {"scene": scene_file, "frame_range": list(frame_range), "jobs": jobs}
+    with open(spec_path, "w") as spec_file:
+        json.dump(spec, spec_file, indent=2)
+    completed = subprocess.run(list(exporter_command) + [spec_path], stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                               universal_newlines=True)
+    if completed.returncode != 0:
+        raise RuntimeError("Alembic worker failed for frames {0}-{1}:\n{2}".format(frame_range[0], frame_range[1], completed.stdout))
+    return completed.stdout
+
+
+def is_stub_cache(file_path):
+    with open(file_path, "rb") as cache_file:
+        return cache_file.read(1) == b"{"
+
+
+def merge_segments(segment_files, output_file):
+    """
+    Stitch time-ordered segment caches of one asset into output_file.
+    """
+    if is_stub_cache(segment_files[0]):
+        merged = None
+        for segment_file in segment_files:
+            with open(segment_file) as stub_file:
+                segment = json.load(stub_file)
+            if merged is None:
+                merged = segment
+            else:
+                if segment["samples"] and merged["samples"] and segment["samples"][0][0] <= merged["samples"][-1][0]:
+                    raise ValueError("Segment {0} overlaps the previous segment".format(segment_file))
+                merged["samples"].extend(segment["samples"])
+        with open(output_file, "w") as stub_file:
+            json.dump(merged, stub_file)
+        return output_file
+
+    stitcher = os.environ.get("ABCSTITCHER", "abcstitcher")
+    completed = subprocess.run([stitcher, output_file] + list(segment_files), stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT, universal_newlines=True)
+    if completed.returncode != 0:
+        raise RuntimeError("abcstitcher failed for {0}:\n{1}".format(output_file, completed.stdout))
+    return output_file
+
+
+def read_sample_times(file_path):
+    """
+    Sorted sample times of every time sampling in the cache.
+    """
+    if is_stub_cache(file_path):
+        with open(file_path) as stub_file:
+            return [sample[0] for sample in json.load(stub_file)["samples"]]
+
+    import alembic
+    archive = alembic.Abc.IArchive(file_path)
+    sample_times = set()
+    for sampling_index in range(archive.getNumTimeSamplings()):
+        time_sampling = archive.getTimeSampling(sampling_index)
+        for sample_index in range(archive.getMaxNumSamplesForTimeSamplingIndex(sampling_index)):
+            sample_times.add(round(time_sampling.getSampleTime(sample_index), 6))
+    return sorted(sample_times)
+
+
+def can_read_cache(file_path):
+    """
+    Whether read_sample_times can read the cache: stub caches always, real ones with PyAlembic, which
+    Maya does not ship.
+    """
+    return is_stub_cache(file_path) or importlib.util.find_spec("alembic") is not None
+
+
+def verify_against_single_export(merged_file, reference_file):
+    """
+    Compare a stitched cache against a single-process export of the same range.
+    Returns a list of differences, empty when they match.
+    """
+    differences = []
+    merged_times = read_sample_times(merged_file)
+    reference_times = read_sample_times(reference_file)
+    if merged_times != reference_times:
+        missing = sorted(set(reference_times) - set(merged_times))
+        extra = sorted(set(merged_times) - set(reference_times))
+        differences.append("sample times differ, missing {0}, extra {1}".format(missing[:10], extra[:10]))
+    if is_stub_cache(merged_file) and not differences:
+        with open(merged_file) as merged_stub, open(reference_file) as reference_stub:
+            if json.load(merged_stub)["samples"] != json.load(reference_stub)["samples"]:
+                differences.append("sample values differ")
+    return differences
+
+
+def export_chunked(scene_file, jobs, frame_range, chunk_count=None, workers=None, exporter_command=None,
+                   work_dir=None, verify=False, log=print):
+    """
+    Cache every job ({"name", "root", "file", "flags"}) over frame_range with one worker process per segment,
+    then stitch each asset's segments into its "file". Returns one report dict per job.
+    verify=True compares every stitched cache with a single-process export of the same range, a number
+    compares that many jobs spread over the list; compared jobs get "differences" in their report. Without
+    PyAlembic real caches are not compared, with a warning. The caches are stitched in work_dir and only copied to their files when no compared cache differs, otherwise none
+    of the files are written ("committed" in the reports).
+    """
+    exporter_command = exporter_command or mayapy_exporter_command()
+    workers = workers or os.cpu_count() or 1
+    segments = split_frame_range(frame_range[0], frame_range[1], chunk_count or workers)
+    own_work_dir = work_dir is None
+    work_dir = work_dir or tempfile.mkdtemp(prefix="chunked_alembic_")
+    log("Chunked cache: {0} assets, frames {1}-{2} in {3} segments on {4} workers".format(
+        len(jobs), frame_range[0], frame_range[1], len(segments), min(workers, len(segments))))
+
+    segment_jobs = [
+        [dict(job, file=os.path.join(work_dir, "{0}_seg{1:03d}.abc".format(job["name"], segment_index)),
+              flags=job.get("flags", default_alembic_flags)) for job in jobs]
+        for segment_index in range(len(segments))
+    ]
+
+    def export_segment(segment_index):
+        segment_start = time.perf_counter()
+        spec_path = os.path.join(work_dir, "segment_{0:03d}.json".format(segment_index))
+        run_exporter(exporter_command, scene_file, segment_jobs[segment_index], segments[segment_index], spec_path)
+        return time.perf_counter() - segment_start
+
+    try:
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=min(workers, len(segments))) as pool:
+            segment_seconds = list(pool.map(export_segment, range(len(segments))))
+        export_time = time.perf_counter() - start_time
+
+        reports = []
+        stitched_files = []
+        for job_index, job in enumerate(jobs):
+            merge_start = time.perf_counter()
+            segment_files = [segment_jobs[segment_index][job_index]["file"] for segment_index in range(len(segments))]
+            stitched_files.append(os.path.join(work_dir, job["name"] + "_stitched.abc"))
+            merge_segments(segment_files, stitched_files[-1])
+            reports.append({
+                "name": job["name"],
+                "file": job["file"],
+                "size": os.path.getsize(stitched_files[-1]),
+                "segments": segments,
+                "export_seconds": export_time,
+                "merge_seconds": time.perf_counter() - merge_start,
+                "committed": False,
+            })
+
+        if verify and stitched_files and not can_read_cache(stitched_files[0]):
+            log("Chunked cache: WARNING PyAlembic is not installed, writing the caches without comparing them to a single-process export")
+            verify = False
+        if verify:
+            verified = range(len(jobs)) if verify is True else range(0, len(jobs), max(1, len(jobs) // int(verify)))[:int(verify)]
+            reference_jobs = [dict(jobs[job_index], file=os.path.join(work_dir, jobs[job_index]["name"] + "_single.abc"),
+                                   flags=jobs[job_index].get("flags", default_alembic_flags)) for job_index in verified]
+            run_exporter(exporter_command, scene_file, reference_jobs, frame_range, os.path.join(work_dir, "single.json"))
+            for job_index, reference_job in zip(verified, reference_jobs):
+                reports[job_index]["differences"] = verify_against_single_export(stitched_files[job_index], reference_job["file"])
+                if reports[job_index]["differences"]:
+                    log("Chunked cache: {0} does NOT match the single-process export: {1}".format(
+                        reports[job_index]["name"], reports[job_index]["differences"]))
+
+        if any(report.get("differences") for report in reports):
+            log("Chunked cache: not writing the {0} caches, a stitched cache differs from the single-process export".format(len(jobs)))
+        else:
+            #Folder scans only ever see verified caches
+            for report, stitched_file in zip(reports, stitched_files):
+                output_dir = os.path.dirname(report["file"])
+                if output_dir and not os.path.isdir(output_dir):
+                    os.makedirs(output_dir)
+                with version_reservation.atomic_output(report["file"]) as temp_file:
+                    shutil.copyfile(stitched_file, temp_file)
+                report["committed"] = True
+
+        log("Chunked cache: exported in {0:.2f}s (slowest segment {1:.2f}s)".format(export_time, max(segment_seconds)))
+        return reports
+    finally:
+        if own_work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export one Alembic per root in parallel frame-range segments.")
+    parser.add_argument("--scene", required=True)
+    parser.add_argument("--root", action="append", required=True, help="DAG root, repeat for several assets")
+    parser.add_argument("--output", action="append", required=True, help="output .abc per --root, in the same order")
+    parser.add_argument("--range", nargs=2, type=int, required=True, metavar=("START", "END"))
+    parser.add_argument("--chunks", type=int)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--exporter", choices=["mayapy", "stub"], default="mayapy")
+    parser.add_argument("--verify", action="store_true", help="compare with a single-process export")
+    options = parser.parse_args(argv)
+    if len(options.root) != len(options.output):
+        parser.error("give one --output per --root")
+
+    jobs = [{"name": os.path.splitext(os.path.basename(output))[0], "root": root, "file": output}
+            for root, output in zip(options.root, options.output)]
+    exporter_command = stub_exporter_command() if options.exporter == "stub" else mayapy_exporter_command()
+    reports = export_chunked(options.scene, jobs, options.range, options.chunks, options.workers, exporter_command,
+                             verify=options.verify)
+    for report in reports:
+        print("{0}: {1} bytes, {2} segments{3}".format(report["file"], report["size"], len(report["segments"]),
+                                                       "" if report["committed"] else ", not written"))
+    return 1 if any(report.get("differences") for report in reports) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+# Script Name: Dependency Index
+# Description: Reverse dependency index of the lighting scenes: which scenes (and shots) reference which
+#asset and cache versions. It is built from the reference paths stored in the scenes under
+#asset_wips/saved/sequence (scene_references) and kept in a SQLite file next to them, so "who uses
+#chair_layout v004?" is one query instead of opening every shot.
+#
+#Updates are incremental: a scene is only read again when its size or mtime changed, scenes that were
+#deleted drop out, and a single scene can be re-indexed right after it is saved.
+#
+#   VFX_DEPENDENCY_INDEX=<file>   index database (default <first lighting scene dir>/.dependency_index.db)
+#
+#Usage:
+#   python dependency_index.py --scene-dir <root>/asset_wips/saved/sequence update
+#   python dependency_index.py uses chair_layout [--version 4]
+#   python dependency_index.py outdated chair_layout 5
+#   python dependency_index.py scene <scene file>
+
+import os
+import sys
+import time
+import sqlite3
+import argparse
+from contextlib import contextmanager
+
+library_dir = os.path.dirname(os.path.abspath(__file__))
+if library_dir not in sys.path:
+    sys.path.append(library_dir)
+import scene_references
+
+index_file_name = ".dependency_index.db"
+
+_schema = """
+CREATE TABLE IF NOT EXISTS scenes (
+    path TEXT PRIMARY KEY,
+    shot TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    indexed REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS refs (
+    scene TEXT NOT NULL,
+    asset_dir TEXT NOT NULL,
+    prefix TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    file TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS refs_prefix ON refs (prefix, version);
+CREATE INDEX IF NOT EXISTS refs_scene ON refs (scene);
+"""
+
+
+def default_index_path(scene_dirs):
+    configured = os.environ.get("VFX_DEPENDENCY_INDEX")
+    if configured:
+        return configured
+    if not scene_dirs:
+        raise ValueError("No lighting scene folder to keep the dependency index in, set VFX_DEPENDENCY_INDEX.")
+    return os.path.join(scene_dirs[0], index_file_name)
+
+
+class DependencyIndex(object):
+
+    def __init__(self, scene_dirs=None, index_path=None):
+        self.scene_dirs = list(scene_dirs if scene_dirs is not None else scene_references.lighting_scene_dirs())
+        self.index_path = index_path or default_index_path(self.scene_dirs)
+        index_dir = os.path.dirname(os.path.abspath(self.index_path))
+        if not os.path.isdir(index_dir):
+            os.makedirs(index_dir, exist_ok=True)
+        #The index usually sits on the project share, where WAL is not safe; keep the default rollback journal
+        connection = sqlite3.connect(self.index_path, timeout=30.0)
+        try:
+            connection.executescript(_schema)
+        finally:
+            connection.close()
+
+    @contextmanager
+    def _transaction(self):
+        connection = sqlite3.connect(self.index_path, timeout=30.0, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+        finally:
+            connection.close()
+
+    def _shot(self, scene_file):
+        """
+        Shot of a scene: its folder relative to the lighting scene folder holding it.
+        """
+        scene_dir = os.path.dirname(os.path.abspath(scene_file))
+        for root_dir in self.scene_dirs:
+            relative = os.path.relpath(scene_dir, os.path.abspath(root_dir))
+            if not relative.startswith(".."):
+                return relative.replace(os.sep, "/")
+        return os.path.basename(scene_dir)
+
+    def _index_scene(self, connection, scene_file, stat):
+        scene_key = scene_references.normalize_path(os.path.abspath(scene_file))
+        rows = []
+        for file_path in scene_references.scene_references(scene_file):
+            parsed = scene_references.parse_version_file(file_path)
+            if parsed:
+                rows.append((scene_key, parsed[0], parsed[1], parsed[2], file_path))
+        connection.execute("DELETE FROM refs WHERE scene = ?", (scene_key,))
+        connection.executemany("INSERT INTO refs (scene, asset_dir, prefix, version, file) VALUES (?, ?, ?, ?, ?)", rows)
+        connection.execute("INSERT OR REPLACE INTO scenes (path, shot, size, mtime, indexed) VALUES (?, ?, ?, ?, ?)",
+                           (scene_key, self._shot(scene_file), stat.st_size, stat.st_mtime, time.time()))
+        return len(rows)
+
+    def update_scene(self, scene_file):
+        """
+        Re-index one scene, e.g. right after it was saved. Returns the number of references found.
+        """
+        stat = os.stat(scene_file)
+        with self._transaction() as connection:
+            return self._index_scene(connection, scene_file, stat)
+
+    def update(self):
+        """
+        Bring the index up to date with the scene folders, reading only new and changed scenes.
+        Returns {"scanned", "unchanged", "removed", "seconds"}.
+        """
+        start_time = time.perf_counter()
+        found = {}
+        for scene_file in scene_references.find_scenes(self.scene_dirs):
+            try:
+                found[scene_references.normalize_path(os.path.abspath(scene_file))] = (scene_file, os.stat(scene_file))
+            except OSError:
+                pass
+
+        with self._transaction() as connection:
+            known = dict((row["path"], (row["size"], row["mtime"])) for row in connection.execute("SELECT path, size, mtime FROM scenes"))
+            removed = [scene_key for scene_key in known if scene_key not in found]
+            for scene_key in removed:
+                connection.execute("DELETE FROM refs WHERE scene = ?", (scene_key,))
+                connection.execute("DELETE FROM scenes WHERE path = ?", (scene_key,))
+        scanned = 0
+        for scene_key, (scene_file, stat) in found.items():
+            if known.get(scene_key) == (stat.st_size, stat.st_mtime):
+                continue
+            #One transaction per scene keeps the share lock short while other artists query
+            with self._transaction() as connection:
+                self._index_scene(connection, scene_file, stat)
+            scanned += 1
+        return {"scanned": scanned, "unchanged": len(found) - scanned, "removed": len(removed),
+                "seconds": time.perf_counter() - start_time}
+
+    def _query(self, sql, arguments=()):
+        connection = sqlite3.connect(self.index_path, timeout=30.0)
+        connection.row_factory = sqlite3.Row
+        try:
+            return [dict(row) for row in connection.execute(sql, arguments)]
+        finally:
+            connection.close()
+
+    def scenes_using(self, prefix, version=None, asset_dir=None):
+        """
+        References to prefix (optionally one version, optionally only from asset_dir) as dicts with
+        scene, shot, version and file, sorted by shot.
+        """
+        sql = "SELECT refs.scene, scenes.shot, refs.version, refs.file FROM refs JOIN scenes ON scenes.path = refs.scene WHERE refs.prefix = ?"
+        arguments = [prefix]
+        if version is not None:
+            sql += " AND refs.version = ?"
+            arguments.append(int(version))
+        if asset_dir is not None:
+            sql += " AND refs.asset_dir = ?"
+            arguments.append(scene_references.normalize_path(os.path.abspath(asset_dir)))
+        return self._query(sql + " ORDER BY scenes.shot, refs.scene", arguments)
+
+    def outdated_scenes(self, prefix, latest_version, asset_dir=None):
+        """
+        References to versions of prefix older than latest_version: the scenes a new publish affects.
+        """
+        return [row for row in self.scenes_using(prefix, asset_dir=asset_dir) if row["version"] < latest_version]
+
+    def references(self, scene_file):
+        """
+        Versioned files referenced by one scene as dicts with asset_dir, prefix, version and file.
+        """
+        scene_key = scene_references.normalize_path(os.path.abspath(scene_file))
+        return self._query("SELECT asset_dir, prefix, version, file FROM refs WHERE scene = ? ORDER BY prefix", (scene_key,))
+
+    def referenced_files(self):
+        """
+        Every versioned file referenced by an indexed scene.
+        """
+        return set(row["file"] for row in self._query("SELECT DISTINCT file FROM refs"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find the lighting scenes that use an asset or cache version.")
+    parser.add_argument("--scene-dir", action="append", help="lighting scene folder (default VFX_LIGHTING_SCENE_DIRS)")
+    parser.add_argument("--index", help="index database (default VFX_DEPENDENCY_INDEX or <scene dir>/" + index_file_name + ")")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("update", help="index new and changed scenes")
+    uses_parser = commands.add_parser("uses", help="scenes referencing an asset or cache")
+    uses_parser.add_argument("prefix", help="file name before _vNNN, e.g. chair_layout")
+    uses_parser.add_argument("--version", type=int)
+    outdated_parser = commands.add_parser("outdated", help="scenes referencing versions older than the given one")
+    outdated_parser.add_argument("prefix")
+    outdated_parser.add_argument("version", type=int)
+    scene_parser = commands.add_parser("scene", help="versions referenced by one scene")
+    scene_parser.add_argument("scene_file")
+    options = parser.parse_args(argv)
+
+    index = DependencyIndex(options.scene_dir, options.index)
+    if options.command == "update":
+        result = index.update()
+        print("{0} scenes indexed, {1} unchanged, {2} removed in {3:.2f}s".format(
+            result["scanned"], result["unchanged"], result["removed"], result["seconds"]))
+    elif options.command in ("uses", "outdated"):
+        rows = index.scenes_using(options.prefix, options.version) if options.command == "uses" else \
+            index.outdated_scenes(options.prefix, options.version)
+        for row in rows:
+            print("{0:<24} v{1}  {2}".format(row["shot"], str(row["version"]).zfill(3), row["scene"]))
+        print("{0} references in {1} scenes".format(len(rows), len(set(row["scene"] for row in rows))))
+    elif options.command == "scene":
+        for row in index.references(options.scene_file):
+            print("{0} v{1}  {2}".format(row["prefix"], str(row["version"]).zfill(3), row["file"]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+# Script Name: Duplicate Geometry
+# Description: Finds meshes that are identical copies of each other and turns the copies into instances
+#of one shape, so sets and set pieces built from repeated props export every shape once. Two meshes are
+#duplicates when they have the same topology (face vertex counts and vertex order), the same vertex
+#positions in object space (rounded to position_decimals) and UVs, and the same shading engines. Object
+#space makes the comparison independent of each copy's transform; copies whose transforms were frozen
+#into the vertices differ in object space and are not matched.
+#
+#Meshes are first bucketed by shading and rounded vertex positions, read with one bulk query per mesh,
+#and the topology and UVs are only read for meshes whose positions match another's, so most unique
+#meshes cost a single query. With numpy the values are rounded as arrays, without it in one string
+#format per mesh. Meshes shaded per face are left out, an instance shares one assignment per shape.
+
+import os
+import sys
+import hashlib
+from array import array
+from itertools import chain
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+library_dir = os.path.dirname(os.path.abspath(__file__))
+if library_dir not in sys.path:
+    sys.path.append(library_dir)
+import asset_tree
+import performance_budget
+
+#Vertex positions and UVs are compared after rounding to this many decimals
+position_decimals = 4
+#In-memory bytes of a mesh: float xyz per vertex, an int per face vertex and face, float uv per UV
+memory_bytes = {"vertex": 12, "face_vertex": 4, "face": 4, "uv": 8}
+
+
+def mesh_shapes(cmds, roots=None):
+    """
+    Long names of the non-intermediate mesh shapes under roots, or in the whole scene.
+    """
+    if roots is None:
+        return cmds.ls(type="mesh", long=True, noIntermediate=True) or []
+    meshes = []
+    for root in roots:
+        meshes.extend(cmds.listRelatives(root, allDescendents=True, type="mesh", fullPath=True) or [])
+    return (cmds.ls(meshes, long=True, noIntermediate=True) or []) if meshes else []
+
+
+def shading_engines(cmds, meshes):
+    """
+    ({mesh: sorted shading engines}, set of meshes shaded per face) from one query per shading engine.
+    """
+    #Members are shapes, or transforms standing for their shapes
+    shapes_of = {}
+    for mesh in meshes:
+        shapes_of.setdefault(mesh, []).append(mesh)
+        shapes_of.setdefault(mesh.rsplit("|", 1)[0], []).append(mesh)
+    assigned, per_face = {}, set()
+    for shading_engine in cmds.ls(type="shadingEngine") or []:
+        members = cmds.sets(shading_engine, query=True) or []
+        nodes = list(dict.fromkeys(member.split(".")[0] for member in members))
+        long_names = dict(zip(nodes, cmds.ls(nodes, long=True) or [])) if nodes else {}
+        for member in members:
+            for shape in shapes_of.get(long_names.get(member.split(".")[0]), []):
+                assigned.setdefault(shape, set()).add(shading_engine)
+                if "." in member:
+                    per_face.add(shape)
+    return dict((mesh, tuple(sorted(engines))) for mesh, engines in assigned.items()), per_face
+
+
+def read_points(cmds, mesh, om=None):
+    """
+    Flat object space xyz of a mesh's vertices.
+    """
+    if om is not None:
+        mesh_fn = om.MFnMesh(om.MSelectionList().add(mesh).getDagPath(0))
+        return [value for point in mesh_fn.getPoints(om.MSpace.kObject) for value in (point.x, point.y, point.z)]
+    return cmds.xform(mesh + ".vtx[*]", query=True, objectSpace=True, translation=True) or []
+
+
+def read_topology(cmds, mesh, om=None):
+    """
+    (face vertex counts, face vertex indices, flat uv) of a mesh.
+    """
+    if om is not None:
+        mesh_fn = om.MFnMesh(om.MSelectionList().add(mesh).getDagPath(0))
+        face_counts, face_connects = mesh_fn.getVertices()
+        us, vs = mesh_fn.getUVs()
+        return list(face_counts), list(face_connects), [value for uv in zip(us, vs) for value in uv]
+    #"FACE      0:      0      1      3      2 \n"
+    faces = [line.split(":", 1)[1].split() for line in cmds.polyInfo(mesh, faceToVertex=True) or []]
+    uvs = cmds.polyEditUV(mesh + ".map[*]", query=True) or []
+    return list(map(len, faces)), list(map(int, chain.from_iterable(faces))), uvs
+
+
+def read_mesh(cmds, mesh, om=None):
+    """
+    (face vertex counts, face vertex indices, flat object space xyz, flat uv) of a mesh.
+    """
+    face_counts, face_connects, uvs = read_topology(cmds, mesh, om)
+    return face_counts, face_connects, read_points(cmds, mesh, om), uvs
+
+
+def rounded_bytes(values, decimals=None):
+    """
+    Values rounded to decimals as bytes, equal for values that round the same.
+    """
+    decimals = position_decimals if decimals is None else decimals
+    if np is not None:
+        #Adding 0.0 turns -0.0 into 0.0
+        return (np.round(np.asarray(values, dtype=np.float64), decimals) + 0.0).tobytes()
+    negative_zero = "-{0:.{1}f} ".format(0.0, decimals)
+    return (("%.{0}f ".format(decimals) * len(values)) % tuple(values)).replace(negative_zero, negative_zero[1:]).encode()
+
+
+def topology_hash(face_counts, face_connects, uvs, decimals=None):
+    """
+    SHA-1 of a mesh's face vertex counts, face vertex indices and rounded UVs.
+    """
+    digest = hashlib.sha1()
+    if np is not None:
+        digest.update(np.asarray(face_counts, dtype=np.int32).tobytes())
+        digest.update(np.asarray(face_connects, dtype=np.int32).tobytes())
+    else:
+        digest.update(array("i", face_counts).tobytes())
+        digest.update(array("i", face_connects).tobytes())
+    digest.update(rounded_bytes(uvs, decimals))
+    return digest.hexdigest()
+
+
+def geometry_hash(face_counts, face_connects, points, uvs, decimals=None):
+    """
+    SHA-1 of a mesh's topology, rounded positions and rounded UVs.
+    """
+    return hashlib.sha1(topology_hash(face_counts, face_connects, uvs, decimals).encode() + rounded_bytes(points, decimals)).hexdigest()
+
+
+def find_duplicates(cmds, roots=None, om=None, decimals=None):
+    """
+    Groups of identical meshes under roots (the whole scene by default), largest saving first:
+    [{"meshes": [long names, the first is kept], "vertices", "faces", "face_vertices", "uvs",
+    "shading_engines", "memory_bytes", "export_bytes"}]. The bytes are what instancing the copies saves.
+    """
+    meshes = mesh_shapes(cmds, roots)
+    #Instances of one shape are listed once per path, only the first path counts
+    first_paths = {}
+    for uuid, mesh in zip((cmds.ls(meshes, uuid=True) or []) if meshes else [], meshes):
+        first_paths.setdefault(uuid, mesh)
+    meshes = list(first_paths.values())
+    assigned, per_face = shading_engines(cmds, meshes)
+
+    buckets = {}
+    for mesh in meshes:
+        if mesh not in per_face:
+            points = read_points(cmds, mesh, om)
+            buckets.setdefault((assigned.get(mesh, ()), len(points) // 3, rounded_bytes(points, decimals)), []).append(mesh)
+
+    groups = []
+    for (engines, vertices, point_key), bucket in buckets.items():
+        if len(bucket) < 2:
+            continue
+        by_hash = {}
+        for mesh in bucket:
+            face_counts, face_connects, uvs = read_topology(cmds, mesh, om)
+            by_hash.setdefault(topology_hash(face_counts, face_connects, uvs, decimals),
+                               {"meshes": [], "faces": len(face_counts), "face_vertices": len(face_connects), "uvs": len(uvs) // 2})["meshes"].append(mesh)
+        for found in by_hash.values():
+            copies = len(found["meshes"]) - 1
+            if not copies:
+                continue
+            mesh_bytes = (vertices * memory_bytes["vertex"] + found["face_vertices"] * memory_bytes["face_vertex"] +
+                          found["faces"] * memory_bytes["face"] + found["uvs"] * memory_bytes["uv"])
+            groups.append(dict(found, vertices=vertices, shading_engines=list(engines), memory_bytes=copies * mesh_bytes,
+                               export_bytes=copies * found["faces"] * sum(performance_budget.bytes_per_face.values())))
+    return sorted(groups, key=lambda group: (-group["memory_bytes"], group["meshes"][0]))
+
+
+def savings(groups):
+    """
+    {"groups", "copies", "memory_bytes", "export_bytes"} of instancing every group.
+    """
+    return {"groups": len(groups), "copies": sum(len(group["meshes"]) - 1 for group in groups),
+            "memory_bytes": sum(group["memory_bytes"] for group in groups), "export_bytes": sum(group["export_bytes"] for group in groups)}
+
+
+def format_groups(groups, limit=20):
+    """
+    Log lines of the largest groups and the total saving, none without groups.
+    """
+    if not groups:
+        return []
+    lines = ["{0} copies of {1} ({2:,} faces): {3} in memory, ~{4} per publish".format(
+        len(group["meshes"]) - 1, group["meshes"][0], group["faces"], asset_tree.format_size(group["memory_bytes"]),
+        asset_tree.format_size(group["export_bytes"])) for group in groups[:limit]]
+    if len(groups) > limit:
+        lines.append("... and {0} more groups".format(len(groups) - limit))
+    total = savings(groups)
+    lines.append("Instancing {0} duplicate meshes in {1} groups saves {2} in memory and ~{3} per publish".format(
+        total["copies"], total["groups"], asset_tree.format_size(total["memory_bytes"]), asset_tree.format_size(total["export_bytes"])))
+    return lines
+
+
+def instance_duplicates(cmds, groups, log=print):
+    """
+    Replace every copy in groups by an instance of the group's first mesh under the copy's transform, with
+    the same shading engines. Returns the number of meshes instanced.
+    """
+    instanced = 0
+    for group in groups:
+        master = group["meshes"][0]
+        for copy in group["meshes"][1:]:
+            transform = cmds.listRelatives(copy, parent=True, fullPath=True)[0]
+            cmds.delete(copy)
+            instance_path = cmds.parent(master, transform, add=True, shape=True)[0]
+            for shading_engine in group["shading_engines"]:
+                cmds.sets(instance_path, edit=True, forceElement=shading_engine)
+            instanced += 1
+    if instanced:
+        total = savings(groups)
+        log("Instanced {0} duplicate meshes of {1} shapes, saving {2} in memory and ~{3} per publish.".format(
+            instanced, total["groups"], asset_tree.format_size(total["memory_bytes"]), asset_tree.format_size(total["export_bytes"])))
+    return instanced
@@ -0,0 +1,218 @@
+# Script Name: File Dependencies
+# Description: Finds the external files a scene depends on (textures, Alembic and gpu caches, image planes,
+#audio, stand-ins and references) and checks that they resolve. The paths are collected in one pass over
+#the scene and deduplicated, so a texture shared by a thousand file nodes is checked once, then stat'ed
+#concurrently on a thread pool: on network storage each stat waits on the file server, and the waits
+#overlap instead of adding up. Results are kept for cache_seconds in a cache shared by every check in the
+#session, so re-running the check only stats paths that expired or are new.
+#
+#Every path is reported with the time its stat took, so slow storage shows up, and flagged when it is
+#missing, unreadable (permissions, stale handles) or off the project shares (VFX_SHARE_ROOTS, separated
+#by os.pathsep), where render farm machines cannot see it. UDIM/UV tile paths check every tile.
+#
+#Usage:
+#   python file_dependencies.py <file> [...] [--share <root> ...] [--workers 16]
+
+import os
+import sys
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+library_dir = os.path.dirname(os.path.abspath(__file__))
+if library_dir not in sys.path:
+    sys.path.append(library_dir)
+import performance_budget
+import scene_references
+
+#Node type -> attributes holding an external file path
+path_attributes = {
+    "file": ["fileTextureName"],
+    "AlembicNode": ["abc_File"],
+    "gpuCache": ["cacheFileName"],
+    "imagePlane": ["imageName"],
+    "audio": ["filename"],
+    "aiStandIn": ["dso"],
+    "aiImage": ["filename"],
+}
+#Stats in flight at once, mostly waiting on the file server rather than using the CPU
+default_workers = 16
+#Seconds a stat result is reused before the path is checked again
+cache_seconds = 60.0
+#Paths taking longer than this to stat are reported as slow
+slow_seconds = 0.5
+
+
+def default_share_roots():
+    configured = os.environ.get("VFX_SHARE_ROOTS")
+    return [directory for directory in configured.split(os.pathsep) if directory] if configured else []
+
+
+def scene_paths(cmds, workspace_dir=None):
+    """
+    {normalized path: {"path", "plugs"}} of every external file the scene uses, plugs being the node.attr
+    (or reference file) using it. Relative paths are resolved against workspace_dir.
+    """
+    found = {}
+    #Many nodes hold the same string, each is resolved once
+    keys = {}
+
+    def add(file_path, plug):
+        if not file_path:
+            return
+        if file_path not in keys:
+            resolved_path = os.path.expandvars(file_path)
+            if workspace_dir and not os.path.isabs(resolved_path):
+                resolved_path = os.path.join(workspace_dir, resolved_path)
+            keys[file_path] = scene_references.normalize_path(resolved_path)
+            found.setdefault(keys[file_path], {"path": resolved_path, "plugs": []})
+        found[keys[file_path]]["plugs"].append(plug)
+
+    try:
+        #One query for every node type: [node, type, node, type, ...]
+        listed = cmds.ls(type=list(path_attributes), showType=True) or []
+        typed_nodes = list(zip(listed[0::2], listed[1::2]))
+    except RuntimeError:
+        #A node type of a plug-in that is not loaded, ask per type
+        typed_nodes = []
+        for node_type in path_attributes:
+            try:
+                typed_nodes.extend((node, node_type) for node in cmds.ls(type=node_type) or [])
+            except RuntimeError:
+                continue
+    for node, node_type in typed_nodes:
+        for attribute in path_attributes[node_type]:
+            add(cmds.getAttr(node + "." + attribute), node + "." + attribute)
+    for reference_file in cmds.file(q=True, reference=True) or []:
+        #Repeated references carry a copy number: chair_v001.mb{2}
+        add(reference_file.split("{")[0], reference_file)
+    return found
+
+
+class StatCache(object):
+    """Stat results by normalized path, reused until they are ttl seconds old."""
+
+    def __init__(self, ttl=None):
+        self.ttl = cache_seconds if ttl is None else ttl
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, now=None):
+        with self._lock:
+            cached = self._results.get(key)
+        if cached is None or (now or time.time()) - cached[0] > self.ttl:
+            return None
+        return cached[1]
+
+    def put(self, key, result, now=None):
+        with self._lock:
+            self._results[key] = (now or time.time(), result)
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+
+#Shared by every check of the session
+shared_cache = StatCache()
+
+
+def stat_path(file_path):
+    """
+    {"status": "ok"/"missing"/"unreadable", "size", "files", "error", "seconds"} of one path, every tile of a
+    UDIM path counting.
+    """
+    start_time = time.perf_counter()
+    result = {"status": "ok", "size": 0, "files": 0, "error": ""}
+    tiles = performance_budget.texture_files(file_path)
+    if not tiles:
+        result.update(status="missing", error="no tiles found")
+    for tile in tiles:
+        try:
+            result["size"] += os.stat(tile).st_size
+            result["files"] += 1
+            if not os.access(tile, os.R_OK):
+                result.update(status="unreadable", error="permission denied: " + tile)
+        except (FileNotFoundError, NotADirectoryError):
+            result.update(status="missing", error="not found: " + tile)
+        except OSError as error:
+            #Permissions, stale handles and unreachable servers
+            result.update(status="unreadable", error=str(error))
+        if result["status"] != "ok":
+            break
+    result["seconds"] = time.perf_counter() - start_time
+    return result
+
+
+def on_share(key, share_roots):
+    return any(key == root or key.startswith(root.rstrip(os.sep) + os.sep) for root in share_roots)
+
+
+def check_paths(paths, share_roots=None, workers=None, cache=None):
+    """
+    Stat paths ({normalized path: {"path", "plugs"}} from scene_paths, or plain paths) on a thread pool,
+    reusing cached results. Returns one dict per unique path: the stat_path fields plus "path", "plugs",
+    "off_share" (False without share roots) and "cached".
+    """
+    if not isinstance(paths, dict):
+        paths = dict((scene_references.normalize_path(file_path), {"path": file_path, "plugs": []}) for file_path in paths)
+    share_roots = [scene_references.normalize_path(root) for root in (default_share_roots() if share_roots is None else share_roots)]
+    cache = shared_cache if cache is None else cache
+    now = time.time()
+    results = {}
+    to_stat = []
+    for key, found in paths.items():
+        cached = cache.get(key, now)
+        if cached is None:
+            to_stat.append(key)
+        else:
+            results[key] = dict(cached, cached=True)
+
+    if to_stat:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers or default_workers, len(to_stat)))) as pool:
+            for key, result in zip(to_stat, pool.map(lambda key: stat_path(paths[key]["path"]), to_stat)):
+                cache.put(key, result, now)
+                results[key] = dict(result, cached=False)
+
+    for key, result in results.items():
+        result.update(path=paths[key]["path"], plugs=paths[key]["plugs"], off_share=bool(share_roots) and not on_share(key, share_roots))
+    return sorted(results.values(), key=lambda result: result["path"])
+
+
+def report_lines(results, slow=None):
+    """
+    Problem lines of check_paths results: missing, unreadable and off-share paths, then the slow ones, slowest
+    first. Returns (failures, warnings).
+    """
+    slow = slow_seconds if slow is None else slow
+    failures = []
+    for result in results:
+        users = ", ".join(result["plugs"][:3]) + (" and {0} more".format(len(result["plugs"]) - 3) if len(result["plugs"]) > 3 else "")
+        if result["status"] != "ok":
+            failures.append("{0} {1} ({2}) used by {3}".format(result["status"], result["path"], result["error"], users or "-"))
+        if result["off_share"]:
+            failures.append("off share {0} used by {1}".format(result["path"], users or "-"))
+    warnings = ["slow {0} took {1:.2f}s".format(result["path"], result["seconds"])
+                for result in sorted(results, key=lambda result: -result["seconds"]) if not result["cached"] and result["seconds"] > slow]
+    return failures, warnings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check that files resolve, with the time each stat takes.")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--share", action="append", help="project share root (default: VFX_SHARE_ROOTS)")
+    parser.add_argument("--workers", type=int, default=default_workers)
+    options = parser.parse_args(argv)
+
+    start_time = time.perf_counter()
+    results = check_paths(options.paths, options.share, options.workers)
+    for result in results:
+        print("{0:>8.3f}s  {1:<10} {2}{3}".format(result["seconds"], result["status"], result["path"], "  (off share)" if result["off_share"] else ""))
+    failures, warnings = report_lines(results)
+    print("{0} paths in {1:.2f}s, {2} problems.".format(len(results), time.perf_counter() - start_time, len(failures)))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
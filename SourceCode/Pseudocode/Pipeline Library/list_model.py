@@ -0,0 +1,61 @@
+# Script Name: List Model
+# Description: In-memory model behind the tools' long lists (Lighting Tool cache lists, Save/Publish Tool
+#file lists). Entries are set in one call and filtered as the artist types: every space separated word
+#must appear in the entry, case-insensitive. Typing more characters only narrows the current matches
+#instead of scanning all entries again.
+#
+#Views read only the rows they show (row, rows), so a Qt view over it renders just the visible part, and
+#the Maya list shows the first display_limit matches.
+
+
+class FilterListModel(object):
+    """Entries plus the indices of the entries matching the current filter."""
+
+    def __init__(self, entries=None):
+        self.set_entries(entries or [])
+
+    def set_entries(self, entries):
+        """
+        Replace every entry at once. Keeps the current filter.
+        """
+        self.entries = list(entries)
+        self._folded = [entry.lower() for entry in self.entries]
+        self._filter_words = []
+        self.matches = range(len(self.entries))
+        filter_text = getattr(self, "filter_text", "")
+        self.filter_text = ""
+        if filter_text:
+            self.set_filter(filter_text)
+
+    def set_filter(self, text):
+        """
+        Show only entries containing every word of text. Returns the number of matches.
+        """
+        words = text.lower().split()
+        previous = self._filter_words
+        #Each new word, or a longer version of the previous one, only narrows the matches
+        narrows = len(words) >= len(previous) and all(
+            word.startswith(old_word) if index == len(previous) - 1 else word == old_word
+            for index, (word, old_word) in enumerate(zip(words, previous)))
+        candidates = self.matches if narrows and previous else range(len(self.entries))
+        folded = self._folded
+        if words:
+            self.matches = [index for index in candidates if all(word in folded[index] for word in words)]
+        else:
+            self.matches = range(len(self.entries))
+        self._filter_words = words
+        self.filter_text = text
+        return len(self.matches)
+
+    def row_count(self):
+        return len(self.matches)
+
+    def row(self, row):
+        return self.entries[self.matches[row]]
+
+    def rows(self, start=0, count=None):
+        """
+        Matching entries from row start, count of them or all the rest.
+        """
+        stop = len(self.matches) if count is None else min(len(self.matches), start + count)
+        return [self.entries[index] for index in self.matches[start:stop]]
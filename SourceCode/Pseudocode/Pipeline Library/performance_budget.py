@@ -0,0 +1,276 @@
+# Script Name: Performance Budget
+# Description: Per asset type performance budgets and the scene measurements they are checked against:
+#faces and vertices of every asset, the resolution and on-disk size of the file textures its meshes are
+#shaded with, and the estimated size of its publish (.mb, Alembic and FBX). The Integrity Check Tool's
+#"Performance Budget" checks report the assets over budget, the most expensive first.
+#
+#The scene is read in bulk: with maya.api.OpenMaya one walk over the DAG counts every mesh, otherwise one
+#polyEvaluate per asset and counter. Textures are read once per file node and each file is stat'ed once
+#however many nodes share it. Export sizes come from the project's publish history (publish_estimates.py)
+#and fall back to rough bytes per face for assets and formats without any.
+#
+#Budgets are default_budgets, overridden per type by <root>/performance_budgets.json and then by the JSON
+#file at VFX_PERFORMANCE_BUDGETS, e.g. {"prop": {"faces": 300000, "texture_size": 4096}}.
+#
+#Usage:
+#   python performance_budget.py [<root>]      budgets in effect for a project
+
+import os
+import sys
+import glob
+import json
+import argparse
+
+library_dir = os.path.dirname(os.path.abspath(__file__))
+if library_dir not in sys.path:
+    sys.path.append(library_dir)
+import asset_catalog
+import asset_tree
+import publish_estimates
+
+budget_file_name = "performance_budgets.json"
+#faces/vertices per asset, texture_size is the longest side of any texture in pixels, texture_mb the
+#unique texture files on disk and export_mb the estimated .mb + Alembic + FBX of one publish
+default_budgets = {
+    "setPiece": {"faces": 2000000, "vertices": 2000000, "texture_size": 8192, "texture_mb": 1024, "export_mb": 2048},
+    "set": {"faces": 10000000, "vertices": 10000000, "texture_size": 8192, "texture_mb": 4096, "export_mb": 8192},
+    "prop": {"faces": 250000, "vertices": 250000, "texture_size": 4096, "texture_mb": 256, "export_mb": 512},
+    "character": {"faces": 1000000, "vertices": 1000000, "texture_size": 8192, "texture_mb": 1024, "export_mb": 2048},
+}
+metric_labels = {"faces": "faces", "vertices": "vertices", "texture_size": "px texture", "texture_mb": "MB of textures",
+                 "export_mb": "MB estimated export"}
+#Rough bytes written per face until a project has publish history (Alembic writes unanimated meshes once)
+bytes_per_face = {"cache": 120, "alembic": 80, "fbx": 100}
+_udim_tokens = ["<UDIM>", "<udim>", "<UVTILE>", "<uvtile>", "u<U>_v<V>"]
+
+
+def load_budgets(root_dir=None):
+    """
+    {asset type: {metric: limit}} in effect: the defaults, then the project's and VFX_PERFORMANCE_BUDGETS
+    overrides. Raises ValueError for a budget file that is not valid JSON.
+    """
+    budgets = dict((asset_type, dict(limits)) for asset_type, limits in default_budgets.items())
+    budget_files = [os.path.join(root_dir, budget_file_name)] if root_dir else []
+    budget_files.append(os.environ.get("VFX_PERFORMANCE_BUDGETS", ""))
+    for budget_file in budget_files:
+        if not budget_file or not os.path.isfile(budget_file):
+            continue
+        with open(budget_file) as json_file:
+            try:
+                overrides = json.load(json_file)
+            except ValueError as error:
+                raise ValueError("{0} is not a valid budget file: {1}".format(budget_file, error))
+        for asset_type, limits in overrides.items():
+            budgets.setdefault(asset_type, {}).update(limits)
+    return budgets
+
+
+def project_root(folder):
+    """
+    Project root of a folder inside asset_final/published (or asset_wips/saved), None for other folders.
+    """
+    parts = os.path.normpath(os.path.abspath(folder)).split(os.sep)
+    for stage_dir, stage_sub_dir in asset_catalog.stage_dirs.values():
+        for index in range(len(parts) - 1):
+            if parts[index].lower() == stage_dir and parts[index + 1].lower() == stage_sub_dir:
+                return os.sep.join(parts[:index]) or os.sep
+    return None
+
+
+def project_history(root_dir):
+    """
+    Publish history of a project root, None when the project has not recorded any publishes yet.
+    """
+    history_path = publish_estimates.default_history_path(root_dir) if root_dir else None
+    if not history_path or not os.path.isfile(history_path):
+        return None
+    return publish_estimates.PublishHistory(history_path)
+
+
+def asset_of(dag_path, asset_groups):
+    """
+    (asset type, asset name) of a long DAG path under |<asset group>|<asset>|, None outside the groups.
+    """
+    parts = dag_path.split("|")
+    if len(parts) > 3 and parts[1] in asset_groups:
+        return parts[1], parts[2]
+    return None
+
+
+def mesh_counts(cmds, asset_groups, om=None):
+    """
+    {(asset type, asset): {"faces", "vertices", "meshes", "heaviest"}} of the meshes under the asset groups.
+    With om (maya.api.OpenMaya) every mesh is counted in one DAG walk, without it each asset's meshes
+    are counted by one polyEvaluate per counter.
+    """
+    counts = {}
+    if om is not None:
+        iterator = om.MItDag(om.MItDag.kDepthFirst, om.MFn.kMesh)
+        while not iterator.isDone():
+            dag_path = iterator.getPath()
+            iterator.next()
+            mesh_fn = om.MFnMesh(dag_path)
+            asset = asset_of(dag_path.fullPathName(), asset_groups)
+            if asset is None or mesh_fn.isIntermediateObject:
+                continue
+            asset_counts = counts.setdefault(asset, {"faces": 0, "vertices": 0, "meshes": 0, "heaviest": (0, "")})
+            asset_counts["faces"] += mesh_fn.numPolygons
+            asset_counts["vertices"] += mesh_fn.numVertices
+            asset_counts["meshes"] += 1
+            asset_counts["heaviest"] = max(asset_counts["heaviest"], (mesh_fn.numPolygons, dag_path.fullPathName()))
+        return counts
+
+    meshes_by_asset = {}
+    for mesh in cmds.ls(type="mesh", long=True, noIntermediate=True) or []:
+        asset = asset_of(mesh, asset_groups)
+        if asset is not None:
+            meshes_by_asset.setdefault(asset, []).append(mesh)
+    for asset, meshes in meshes_by_asset.items():
+        counts[asset] = {"faces": int(cmds.polyEvaluate(meshes, face=True) or 0),
+                         "vertices": int(cmds.polyEvaluate(meshes, vertex=True) or 0), "meshes": len(meshes), "heaviest": None}
+    return counts
+
+
+def texture_files(file_path):
+    """
+    Files behind a texture path, every tile of a UDIM/UV tile path.
+    """
+    for token in _udim_tokens:
+        if token in file_path:
+            return sorted(glob.glob(glob.escape(file_path).replace(glob.escape(token), "*")))
+    return [file_path]
+
+
+def texture_stats(cmds, asset_groups):
+    """
+    {(asset type, asset): {"texture_size", "texture_bytes", "textures": {path: (width, height, bytes)},
+    "missing": [paths]}} of the file textures in the shading networks of each asset's meshes.
+    """
+    file_sizes = {}
+
+    def file_size(file_path):
+        if file_path not in file_sizes:
+            try:
+                file_sizes[file_path] = os.stat(file_path).st_size
+            except OSError:
+                file_sizes[file_path] = None
+        return file_sizes[file_path]
+
+    textures = {}
+    for file_node in cmds.ls(type="file") or []:
+        file_path = cmds.getAttr(file_node + ".fileTextureName") or ""
+        tile_sizes = [file_size(tile) for tile in texture_files(file_path)] if file_path else []
+        textures[file_node] = {"path": file_path, "width": int(cmds.getAttr(file_node + ".outSizeX") or 0),
+                               "height": int(cmds.getAttr(file_node + ".outSizeY") or 0),
+                               "bytes": None if not tile_sizes or None in tile_sizes else sum(tile_sizes)}
+
+    stats = {}
+    for shading_engine in cmds.ls(type="shadingEngine") or []:
+        upstream_files = cmds.ls(cmds.listHistory(shading_engine) or [], type="file") or []
+        if not upstream_files:
+            continue
+        members = cmds.ls(cmds.sets(shading_engine, query=True) or [], long=True, objectsOnly=True) or []
+        for asset in set(asset_of(member, asset_groups) for member in members):
+            if asset is None:
+                continue
+            asset_stats = stats.setdefault(asset, {"texture_size": 0, "texture_bytes": 0, "textures": {}, "missing": []})
+            for file_node in upstream_files:
+                texture = textures[file_node]
+                if texture["bytes"] is None:
+                    if texture["path"] not in asset_stats["missing"]:
+                        asset_stats["missing"].append(texture["path"])
+                    continue
+                asset_stats["texture_size"] = max(asset_stats["texture_size"], texture["width"], texture["height"])
+                if texture["path"] not in asset_stats["textures"]:
+                    asset_stats["textures"][texture["path"]] = (texture["width"], texture["height"], texture["bytes"])
+                    asset_stats["texture_bytes"] += texture["bytes"]
+    return stats
+
+
+def export_estimates(assets, frames, history=None):
+    """
+    {(asset type, asset): (bytes, basis)} of publishing each asset, assets being {(type, name): faces}.
+    """
+    latest = history.latest_samples(name for asset_type, name in assets) if history else {}
+    estimates = {}
+    for (asset_type, name), faces in assets.items():
+        total, bases = 0, set()
+        for file_format in sorted(bytes_per_face):
+            estimate = history.estimate(name, file_format, faces, frames, latest.get((name, file_format), False)) if history else None
+            if estimate:
+                total += estimate["bytes"]
+                bases.add(estimate["basis"])
+            else:
+                total += bytes_per_face[file_format] * faces
+                bases.add("bytes per face")
+        estimates[(asset_type, name)] = (total, ", ".join(sorted(bases)))
+    return estimates
+
+
+def scene_stats(cmds, asset_groups, om=None, history=None, frames=1):
+    """
+    Measurements of every asset under the asset groups: {(asset type, asset): {"faces", "vertices",
+    "meshes", "heaviest", "texture_size", "texture_mb", "textures", "missing", "export_mb", "export_basis"}}.
+    """
+    counts = mesh_counts(cmds, asset_groups, om)
+    textures = texture_stats(cmds, asset_groups)
+    estimates = export_estimates(dict((asset, asset_counts["faces"]) for asset, asset_counts in counts.items()), frames, history)
+    stats = {}
+    for asset in set(counts) | set(textures):
+        asset_counts = counts.get(asset, {"faces": 0, "vertices": 0, "meshes": 0, "heaviest": None})
+        asset_textures = textures.get(asset, {"texture_size": 0, "texture_bytes": 0, "textures": {}, "missing": []})
+        export_bytes, export_basis = estimates.get(asset, (0, ""))
+        stats[asset] = dict(asset_counts, texture_size=asset_textures["texture_size"], texture_mb=asset_textures["texture_bytes"] / 1048576.0,
+                            textures=asset_textures["textures"], missing=asset_textures["missing"],
+                            export_mb=export_bytes / 1048576.0, export_basis=export_basis)
+    return stats
+
+
+def over_budget(stats, budgets, metrics):
+    """
+    Assets over their type's budget in any of metrics, most expensive first: dicts with "asset",
+    "asset_type", "metric", "value", "budget" and "ratio" (value / budget).
+    """
+    offenders = []
+    for (asset_type, name), asset_stats in stats.items():
+        limits = budgets.get(asset_type, {})
+        for metric in metrics:
+            if limits.get(metric) and asset_stats[metric] > limits[metric]:
+                offenders.append({"asset": name, "asset_type": asset_type, "metric": metric, "value": asset_stats[metric],
+                                  "budget": limits[metric], "ratio": asset_stats[metric] / float(limits[metric])})
+    return sorted(offenders, key=lambda offender: (-offender["ratio"], offender["asset"], offender["metric"]))
+
+
+def format_offender(offender, asset_stats):
+    """
+    One log line per offender, with the heaviest mesh, largest texture or estimate basis behind it.
+    """
+    value_format = "{0:,.1f}" if offender["metric"].endswith("_mb") else "{0:,}"
+    line = "{0} ({1}): {2} {3} over the budget of {4:,g} ({5:.1f}x)".format(
+        offender["asset"], offender["asset_type"], value_format.format(offender["value"]), metric_labels[offender["metric"]],
+        offender["budget"], offender["ratio"])
+    if offender["metric"] in ("faces", "vertices") and asset_stats["heaviest"]:
+        line += ", heaviest mesh {0} ({1:,} faces)".format(asset_stats["heaviest"][1], asset_stats["heaviest"][0])
+    elif offender["metric"] in ("texture_size", "texture_mb") and asset_stats["textures"]:
+        path, (width, height, size) = max(asset_stats["textures"].items(), key=lambda item: (max(item[1][:2]), item[1][2]))
+        line += ", largest {0} ({1}x{2}, {3})".format(path, width, height, asset_tree.format_size(size))
+    elif offender["metric"] == "export_mb":
+        line += ", from {0}".format(asset_stats["export_basis"])
+    return line
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show the performance budgets in effect for a project.")
+    parser.add_argument("root", nargs="?", help="project root holding performance_budgets.json")
+    options = parser.parse_args(argv)
+
+    budgets = load_budgets(options.root)
+    metrics = sorted(metric_labels)
+    print("{0:<12}".format("type") + "".join("{0:>14}".format(metric) for metric in metrics))
+    for asset_type in sorted(budgets):
+        print("{0:<12}".format(asset_type) + "".join("{0:>14}".format(budgets[asset_type].get(metric, "-")) for metric in metrics))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
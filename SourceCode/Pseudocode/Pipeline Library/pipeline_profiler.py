@@ -0,0 +1,227 @@
+# Script Name: Pipeline Profiler
+# Description: Lightweight span/timer instrumentation shared by the Save/Publish, Integrity Check and
+#Lighting tools. Spans are aggregated into per-session histograms and can be exported as JSON,
+#Chrome trace (chrome://tracing, Perfetto) or cProfile stats.
+#
+#Profiling is off unless enabled from a tool's menu or with the environment:
+#   VFX_PROFILE=1            record spans for this session
+#   VFX_PROFILE_CPROFILE=1   also run cProfile while enabled
+#   VFX_PROFILE_DIR=<dir>    export everything to this folder when Maya exits
+
+import os
+import json
+import time
+import atexit
+import cProfile
+import tempfile
+import threading
+from functools import wraps
+
+enabled = False
+spans = []
+session_start = time.perf_counter()
+profile = None
+_lock = threading.Lock()
+
+#Histogram bucket upper bounds in milliseconds, the last bucket is open ended
+histogram_bounds_ms = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, 60000]
+
+
+class _NullSpan(object):
+    """Returned while profiling is disabled so an instrumented block costs one flag check."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_null_span = _NullSpan()
+
+
+class _Span(object):
+
+    def __init__(self, name, category, args):
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        duration = time.perf_counter() - self.start
+        with _lock:
+            spans.append((self.name, self.category, self.start, duration, threading.get_ident(), self.args))
+        return False
+
+
+def span(name, category="", **args):
+    """
+    Context manager timing the enclosed block as one span.
+    """
+    if not enabled:
+        return _null_span
+    return _Span(name, category, args)
+
+
+def timed(name=None, category=""):
+    """
+    Decorator recording every call of the wrapped function as a span.
+    """
+    def decorator(function):
+        span_name = name or function.__name__
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            with _Span(span_name, category, {}):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def enable(with_cprofile=False):
+    global enabled, profile
+    enabled = True
+    if with_cprofile:
+        #Turning profiling back on resumes the existing profile, its samples keep accumulating
+        if profile is None:
+            profile = cProfile.Profile()
+        profile.enable()
+
+
+def disable():
+    global enabled
+    enabled = False
+    if profile is not None:
+        profile.disable()
+
+
+def reset():
+    global session_start, profile
+    with _lock:
+        del spans[:]
+    session_start = time.perf_counter()
+    if profile is not None:
+        profile.disable()
+        profile = cProfile.Profile()
+        if enabled:
+            profile.enable()
+
+
+def _percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def histograms():
+    """
+    Aggregate the recorded spans into {span name: statistics} with durations in milliseconds.
+    """
+    with _lock:
+        recorded = list(spans)
+
+    durations = {}
+    categories = {}
+    for name, category, start, duration, thread_id, args in recorded:
+        durations.setdefault(name, []).append(duration * 1000.0)
+        categories[name] = category
+
+    summary = {}
+    for name, values in durations.items():
+        values.sort()
+        buckets = [0] * (len(histogram_bounds_ms) + 1)
+        for value in values:
+            bucket = 0
+            while bucket < len(histogram_bounds_ms) and value > histogram_bounds_ms[bucket]:
+                bucket += 1
+            buckets[bucket] += 1
+        summary[name] = {
+            "category": categories[name],
+            "count": len(values),
+            "total_ms": sum(values),
+            "min_ms": values[0],
+            "max_ms": values[-1],
+            "mean_ms": sum(values) / len(values),
+            "p50_ms": _percentile(values, 0.5),
+            "p95_ms": _percentile(values, 0.95),
+            "bucket_bounds_ms": histogram_bounds_ms,
+            "buckets": buckets,
+        }
+    return summary
+
+
+def summary_lines():
+    """
+    One readable line per span name, slowest total first.
+    """
+    lines = []
+    for name, stats in sorted(histograms().items(), key=lambda item: -item[1]["total_ms"]):
+        lines.append("{0}: {1} calls, total {2:.1f} ms, mean {3:.2f} ms, p95 {4:.2f} ms, max {5:.2f} ms".format(
+            name, stats["count"], stats["total_ms"], stats["mean_ms"], stats["p95_ms"], stats["max_ms"]))
+    return lines
+
+
+def export_json(file_path):
+    with _lock:
+        recorded = list(spans)
+    data = {
+        "histograms": histograms(),
+        "spans": [
+            {"name": name, "category": category, "start_ms": (start - session_start) * 1000.0,
+             "duration_ms": duration * 1000.0, "thread": thread_id, "args": args}
+            for name, category, start, duration, thread_id, args in recorded
+        ],
+    }
+    with open(file_path, "w") as json_file:
+        json.dump(data, json_file, indent=2, default=str)
+    return file_path
+
+
+def export_chrome_trace(file_path):
+    with _lock:
+        recorded = list(spans)
+    events = [
+        {"name": name, "cat": category or "pipeline", "ph": "X", "pid": os.getpid(), "tid": thread_id,
+         "ts": (start - session_start) * 1e6, "dur": duration * 1e6, "args": args}
+        for name, category, start, duration, thread_id, args in recorded
+    ]
+    with open(file_path, "w") as trace_file:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, trace_file, default=str)
+    return file_path
+
+
+def export_cprofile(file_path):
+    if profile is None:
+        return None
+    profile.dump_stats(file_path)
+    return file_path
+
+
+def export_session(directory, prefix="pipeline_profile"):
+    """
+    Write the JSON histograms, the Chrome trace and (when recorded) the cProfile stats into directory.
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    stamp = time.strftime("%Y%m%d_%H%M%S")
+    base_path = os.path.join(directory, "{0}_{1}_{2}".format(prefix, stamp, os.getpid()))
+    exported = [export_json(base_path + ".json"), export_chrome_trace(base_path + ".trace.json")]
+    cprofile_path = export_cprofile(base_path + ".prof")
+    if cprofile_path:
+        exported.append(cprofile_path)
+    return exported
+
+
+def _export_at_exit():
+    if spans:
+        export_session(os.environ.get("VFX_PROFILE_DIR", tempfile.gettempdir()))
+
+
+if os.environ.get("VFX_PROFILE", "") not in ("", "0"):
+    enable(with_cprofile=os.environ.get("VFX_PROFILE_CPROFILE", "") not in ("", "0"))
+    atexit.register(_export_at_exit)
@@ -0,0 +1,42 @@
+# Script Name: Promote Convert Worker
+# Description: Headless mayapy worker for publish_promote.py. Opens one saved asset .mb and writes its
+#Alembic and FBX to the paths named in the spec, exporting every top-level node of the file except the
+#startup cameras.
+#
+#Usage: mayapy promote_convert_worker.py <spec json>
+
+import sys
+import json
+
+import maya.standalone
+
+startup_cameras = ["|persp", "|top", "|front", "|side"]
+
+
+def main(spec_path):
+    with open(spec_path) as spec_file:
+        spec = json.load(spec_file)
+
+    maya.standalone.initialize(name="python")
+    try:
+        import maya.cmds as cmds
+        cmds.loadPlugin("AbcExport", quiet=True)
+        cmds.loadPlugin("fbxmaya", quiet=True)
+        cmds.file(spec["scene"], open=True, force=True)
+
+        roots = [node for node in cmds.ls(assemblies=True, long=True) if node not in startup_cameras]
+        if not roots:
+            raise RuntimeError("{0} holds no asset".format(spec["scene"]))
+        start, end = spec["frame_range"] or (cmds.playbackOptions(q=True, min=True), cmds.playbackOptions(q=True, max=True))
+        alembic_job = " ".join(list(spec["flags"]) + ["-fr %d %d" % (start, end)] + ["-root " + root for root in roots] +
+                               ["-file " + spec["outputs"]["alembic"]])
+        cmds.AbcExport(j=[alembic_job])
+
+        cmds.select(roots, replace=True)
+        cmds.file(spec["outputs"]["fbx"], force=True, options="v=0;", type="FBX export", preserveReferences=True, exportSelected=True)
+    finally:
+        maya.standalone.uninitialize()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1])
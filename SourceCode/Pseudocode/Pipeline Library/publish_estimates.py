@@ -0,0 +1,324 @@
+# Script Name: Publish Estimates
+# Description: Export time and size history of asset publishes, and the dry-run plans built from it. Every
+#publish records one sample per asset and format (.mb, Alembic, FBX): polycount, frame range, export
+#seconds and bytes written. A dry run lists the exact files and versions a publish would write and
+#estimates each one from that history, so a long publish can be sent to the queue before it starts.
+#
+#An asset published before is estimated from its own latest sample, scaled by its polycount (and frame
+#count for Alembic) now. Other assets use a least-squares fit of seconds and bytes against polycount over
+#the recent samples of the same format. Formats without any history are reported as unknown.
+#
+#The history is <root>/.publish_history.db (or VFX_PUBLISH_HISTORY) on the project share, with the default
+#rollback journal like the asset catalog.
+#
+#Usage:
+#   python publish_estimates.py <root>                 fitted rates per format
+#   python publish_estimates.py <root> --asset chair   samples of one asset
+
+import os
+import re
+import sys
+import time
+import socket
+import sqlite3
+import getpass
+import argparse
+from contextlib import contextmanager
+
+library_dir = os.path.dirname(os.path.abspath(__file__))
+if library_dir not in sys.path:
+    sys.path.append(library_dir)
+import asset_catalog
+import asset_tree
+import publish_queue
+
+history_file_name = ".publish_history.db"
+#Samples per format the rates are fitted over, recent publishes reflect the current machines and exporters
+history_window = 200
+_frame_range_pattern = re.compile(r"-fr\s+(-?[\d.]+)\s+(-?[\d.]+)")
+
+_schema = """
+CREATE TABLE IF NOT EXISTS samples (
+    id INTEGER PRIMARY KEY,
+    recorded REAL NOT NULL,
+    asset_type TEXT NOT NULL,
+    name TEXT NOT NULL,
+    format TEXT NOT NULL,
+    polycount INTEGER NOT NULL,
+    frames INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    bytes INTEGER NOT NULL,
+    host TEXT NOT NULL,
+    user TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS samples_format ON samples (format, recorded);
+CREATE INDEX IF NOT EXISTS samples_asset ON samples (name, format, recorded);
+"""
+
+
+def default_history_path(root_dir):
+    return os.environ.get("VFX_PUBLISH_HISTORY") or os.path.join(root_dir, history_file_name)
+
+
+def asset_polycount(cmds, root):
+    """
+    Faces of every mesh under an asset root.
+    """
+    meshes = cmds.listRelatives(root, allDescendents=True, type="mesh", fullPath=True) or []
+    if not meshes:
+        return 0
+    return int(cmds.polyEvaluate(meshes, face=True) or 0)
+
+
+def job_frames(alembic_job):
+    """
+    Frames sampled by an AbcExport job string, 1 without a frame range.
+    """
+    match = _frame_range_pattern.search(alembic_job or "")
+    if not match:
+        return 1
+    return int(float(match.group(2)) - float(match.group(1))) + 1
+
+
+def work_units(file_format, polycount, frames):
+    #Alembic writes every frame, the .mb and FBX one static copy
+    return max(1, polycount) * (frames if file_format == "alembic" else 1)
+
+
+def _fit(samples, file_format, field):
+    """
+    (intercept, rate per work unit) of field over samples, least squares with a ratio fallback.
+    """
+    points = [(work_units(file_format, sample["polycount"], sample["frames"]), sample[field]) for sample in samples]
+    count = len(points)
+    mean_x = sum(x for x, y in points) / float(count)
+    mean_y = sum(y for x, y in points) / float(count)
+    variance = sum((x - mean_x) ** 2 for x, y in points)
+    if count > 1 and variance > 0:
+        rate = sum((x - mean_x) * (y - mean_y) for x, y in points) / variance
+        intercept = mean_y - rate * mean_x
+        if rate >= 0 and intercept >= 0:
+            return intercept, rate
+    #Too few or too alike samples, or a fit with a negative part: the average rate per work unit
+    return 0.0, sum(y for x, y in points) / float(sum(x for x, y in points))
+
+
+class PublishHistory(object):
+    """Export samples of a project's publishes and estimates drawn from them."""
+
+    def __init__(self, history_path):
+        self.history_path = history_path
+        self._fits = {}
+        connection = sqlite3.connect(history_path, timeout=30.0)
+        try:
+            connection.executescript(_schema)
+        finally:
+            connection.close()
+
+    @classmethod
+    def for_root(cls, root_dir):
+        return cls(default_history_path(root_dir))
+
+    @contextmanager
+    def _transaction(self):
+        connection = sqlite3.connect(self.history_path, timeout=30.0, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+        finally:
+            connection.close()
+
+    def _query(self, sql, arguments=()):
+        connection = sqlite3.connect(self.history_path, timeout=30.0)
+        connection.row_factory = sqlite3.Row
+        try:
+            return [dict(row) for row in connection.execute(sql, arguments)]
+        finally:
+            connection.close()
+
+    def record(self, samples):
+        """
+        Add samples, dicts with asset_type, name, format, polycount, frames, seconds and bytes.
+        """
+        now = time.time()
+        host, user = socket.gethostname(), getpass.getuser()
+        with self._transaction() as connection:
+            connection.executemany(
+                "INSERT INTO samples (recorded, asset_type, name, format, polycount, frames, seconds, bytes, host, user) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(now, sample["asset_type"], sample["name"], sample["format"], sample["polycount"], sample["frames"],
+                  sample["seconds"], sample["bytes"], host, user) for sample in samples])
+        self._fits.clear()
+        return len(samples)
+
+    def samples(self, name=None, file_format=None, limit=history_window):
+        conditions, arguments = [], []
+        if name:
+            conditions.append("name = ?")
+            arguments.append(name)
+        if file_format:
+            conditions.append("format = ?")
+            arguments.append(file_format)
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        return self._query("SELECT * FROM samples{0} ORDER BY recorded DESC, id DESC LIMIT ?".format(where), arguments + [limit])
+
+    def rates(self, file_format):
+        """
+        {"seconds": (intercept, rate), "bytes": (intercept, rate), "samples": count} of a format, None
+        without history. Fitted once per history object until new samples are recorded.
+        """
+        if file_format not in self._fits:
+            samples = self.samples(file_format=file_format)
+            self._fits[file_format] = {"seconds": _fit(samples, file_format, "seconds"), "bytes": _fit(samples, file_format, "bytes"),
+                                       "samples": len(samples)} if samples else None
+        return self._fits[file_format]
+
+    def estimate(self, name, file_format, polycount, frames, previous=None):
+        """
+        {"seconds", "bytes", "basis"} of exporting one file, None without any history of the format.
+        previous is the asset's latest sample of the format when the caller already fetched it.
+        """
+        work = work_units(file_format, polycount, frames)
+        if previous is None:
+            previous = (self.samples(name=name, file_format=file_format, limit=1) or [None])[0]
+        if previous:
+            scale = work / float(work_units(file_format, previous["polycount"], previous["frames"]))
+            return {"seconds": previous["seconds"] * scale, "bytes": int(previous["bytes"] * scale), "basis": "previous version"}
+        rates = self.rates(file_format)
+        if rates is None:
+            return None
+        return {"seconds": rates["seconds"][0] + rates["seconds"][1] * work, "bytes": int(rates["bytes"][0] + rates["bytes"][1] * work),
+                "basis": "{0} {1} publishes".format(rates["samples"], file_format)}
+
+    def latest_samples(self, names):
+        """
+        {(name, format): latest sample} of the named assets in one query.
+        """
+        latest = {}
+        names = list(set(names))
+        for start in range(0, len(names), 500):
+            batch = names[start:start + 500]
+            for sample in self._query(
+                    "SELECT * FROM samples WHERE id IN (SELECT MAX(id) FROM samples WHERE name IN ({0}) GROUP BY name, format)".format(
+                        ", ".join("?" * len(batch))), batch):
+                latest[(sample["name"], sample["format"])] = sample
+        return latest
+
+
+def measure_entries(cmds, entries):
+    """
+    {asset name: {"polycount", "frames"}} of publish entries (see publish_steps) in the open scene.
+    """
+    return dict((entry["name"], {"polycount": asset_polycount(cmds, entry["root"]), "frames": job_frames(entry.get("alembic_job"))})
+                for entry in entries)
+
+
+def plan_publish(history, entries, measures):
+    """
+    Dry-run plan of publish entries: every planned file with its estimate, per asset and in total, as
+    {"assets": [{"name", "version", "polycount", "frames", "files": {format: {"path", "seconds", "bytes",
+    "basis"}}, "seconds", "bytes"}], "seconds", "bytes", "files", "unknown"}. "unknown" counts the files
+    without history, their time and size are left out of the totals.
+    """
+    latest = history.latest_samples(entry["name"] for entry in entries) if history else {}
+    plan = {"assets": [], "seconds": 0.0, "bytes": 0, "files": 0, "unknown": 0}
+    for entry in entries:
+        measure = measures[entry["name"]]
+        asset = {"name": entry["name"], "asset_type": entry.get("asset_type", ""), "version": entry["version"],
+                 "polycount": measure["polycount"], "frames": measure["frames"], "files": {}, "seconds": 0.0, "bytes": 0}
+        for file_format in sorted(entry["files"]):
+            #False: looked up already, the asset has no sample of this format
+            estimate = history.estimate(entry["name"], file_format, measure["polycount"], measure["frames"],
+                                        latest.get((entry["name"], file_format), False)) if history else None
+            asset["files"][file_format] = dict(estimate or {"seconds": None, "bytes": None, "basis": "no history"},
+                                               path=entry["files"][file_format])
+            if estimate:
+                asset["seconds"] += estimate["seconds"]
+                asset["bytes"] += estimate["bytes"]
+            else:
+                plan["unknown"] += 1
+        plan["assets"].append(asset)
+        plan["seconds"] += asset["seconds"]
+        plan["bytes"] += asset["bytes"]
+        plan["files"] += len(entry["files"])
+    return plan
+
+
+def record_publish(entries, measures, seconds, log=print):
+    """
+    Record the samples of a finished publish in the history of its project root. seconds is
+    {asset name: {format: export seconds}}. A history that cannot be written is reported, not raised,
+    so it never fails a publish. Returns the samples recorded.
+    """
+    by_root = {}
+    for entry in entries:
+        for file_format, file_path in entry["files"].items():
+            fields = asset_catalog.describe_file(entry.get("publish_files", entry["files"])[file_format])
+            if not fields or not os.path.isfile(file_path):
+                continue
+            by_root.setdefault(fields["root"], []).append({
+                "asset_type": entry.get("asset_type", ""), "name": entry["name"], "format": file_format,
+                "polycount": measures[entry["name"]]["polycount"], "frames": measures[entry["name"]]["frames"],
+                "seconds": seconds[entry["name"]][file_format], "bytes": os.path.getsize(file_path)})
+    recorded = 0
+    for root_dir, samples in by_root.items():
+        try:
+            recorded += PublishHistory.for_root(root_dir).record(samples)
+        except (sqlite3.Error, OSError) as error:
+            log("WARNING: Could not update the publish history of {0}: {1}".format(root_dir, error))
+    return recorded
+
+
+def format_plan_lines(plan):
+    """
+    Log lines of a plan: one per planned file, then the total.
+    """
+    lines = []
+    for asset in plan["assets"]:
+        lines.append("{0} v{1}: {2:,} faces, {3} frames, ~{4} {5}".format(
+            asset["name"], str(asset["version"]).zfill(3), asset["polycount"], asset["frames"],
+            publish_queue.format_duration(asset["seconds"]), asset_tree.format_size(asset["bytes"])))
+        for file_format, planned in sorted(asset["files"].items()):
+            if planned["seconds"] is None:
+                lines.append("    {0}  (no history)".format(planned["path"]))
+            else:
+                lines.append("    {0}  ~{1} {2} ({3})".format(planned["path"], publish_queue.format_duration(planned["seconds"]),
+                                                             asset_tree.format_size(planned["bytes"]), planned["basis"]))
+    lines.append("Planned: {0} assets, {1} files, ~{2}, ~{3}{4}".format(
+        len(plan["assets"]), plan["files"], publish_queue.format_duration(plan["seconds"]), asset_tree.format_size(plan["bytes"]),
+        ", {0} files without history".format(plan["unknown"]) if plan["unknown"] else ""))
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show the publish history export estimates are drawn from.")
+    parser.add_argument("root", help="project root holding the history")
+    parser.add_argument("--asset", help="list the samples of one asset")
+    options = parser.parse_args(argv)
+
+    history = PublishHistory.for_root(options.root)
+    if options.asset:
+        for sample in history.samples(name=options.asset, limit=1000):
+            print("{0}  {1:<8} {2:>10,} faces {3:>5} frames  {4:>8.2f}s  {5}  {6}@{7}".format(
+                time.strftime("%Y-%m-%d %H:%M", time.localtime(sample["recorded"])), sample["format"], sample["polycount"],
+                sample["frames"], sample["seconds"], asset_tree.format_size(sample["bytes"]), sample["user"], sample["host"]))
+        return 0
+    for file_format in ["cache", "alembic", "fbx"]:
+        rates = history.rates(file_format)
+        if rates is None:
+            print("{0:<8} no history".format(file_format))
+            continue
+        print("{0:<8} {1} samples: {2:.2f}s + {3:.3g}s per unit, {4} + {5:.3g} B per unit (unit: face{6})".format(
+            file_format, rates["samples"], rates["seconds"][0], rates["seconds"][1], asset_tree.format_size(int(rates["bytes"][0])),
+            rates["bytes"][1], " x frame" if file_format == "alembic" else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
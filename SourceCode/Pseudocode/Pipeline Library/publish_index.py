@@ -0,0 +1,104 @@
+# Script Name: Publish Index
+# Description: Per-asset version index. Every complete version gets one record,
+#<asset dir>/.index/<prefix>_vNNN.json, listing its files (relative to the asset folder) with size, mtime
+#and, when known, SHA-256. A version is only indexed once all of its files are in place (and, for
+#staged publishes, copied and verified), so readers can trust the index over a directory listing.
+#
+#One file per version keeps concurrent publishers of the same asset from rewriting a shared index.
+#The records double as the checksum manifest that publish_verify.py checks the published tree against.
+
+import os
+import re
+import json
+import time
+import mmap
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+import version_reservation
+
+index_dir_name = ".index"
+#hashlib releases the interpreter lock for large updates, so files hash in parallel threads
+hash_slice_size = 8 * 1048576
+
+
+def version_record_path(asset_dir, prefix, version):
+    return os.path.join(asset_dir, index_dir_name, "{0}_v{1}.json".format(prefix, str(version).zfill(3)))
+
+
+def file_sha256(file_path):
+    """
+    SHA-256 of a file read through a memory map.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as read_file:
+        if os.fstat(read_file.fileno()).st_size == 0:
+            return digest.hexdigest()
+        with mmap.mmap(read_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                for offset in range(0, len(view), hash_slice_size):
+                    digest.update(view[offset:offset + hash_slice_size])
+            finally:
+                view.release()
+    return digest.hexdigest()
+
+
+def hash_files(file_paths, workers=None):
+    """
+    {file path: SHA-256} hashed in parallel.
+    """
+    file_paths = list(file_paths)
+    with ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 1) * 2)) as pool:
+        return dict(zip(file_paths, pool.map(file_sha256, file_paths)))
+
+
+def file_record(asset_dir, file_path, sha256=None):
+    stat = os.stat(file_path)
+    return {
+        "path": os.path.relpath(file_path, asset_dir).replace(os.sep, "/"),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "sha256": sha256,
+    }
+
+
+def write_version(asset_dir, prefix, version, files, extra=None):
+    """
+    Index a complete version. files is {format: file_record(...)}. Raises FileExistsError when the
+    version is already indexed.
+    """
+    record_path = version_record_path(asset_dir, prefix, version)
+    index_dir = os.path.dirname(record_path)
+    if not os.path.isdir(index_dir):
+        os.makedirs(index_dir, exist_ok=True)
+    record = dict(extra or {}, prefix=prefix, version=version, indexed=time.time(), files=files)
+    with version_reservation.atomic_output(record_path) as temp_file:
+        with open(temp_file, "w") as record_file:
+            json.dump(record, record_file, indent=2)
+    return record_path
+
+
+def read_version(asset_dir, prefix, version):
+    record_path = version_record_path(asset_dir, prefix, version)
+    if not os.path.isfile(record_path):
+        return None
+    with open(record_path) as record_file:
+        return json.load(record_file)
+
+
+def indexed_versions(asset_dir, prefix):
+    """
+    Sorted versions of prefix that are indexed in asset_dir.
+    """
+    version_pattern = re.compile(re.escape(prefix) + r"_v(\d+)\.json$")
+    try:
+        file_names = os.listdir(os.path.join(asset_dir, index_dir_name))
+    except OSError:
+        return []
+    return sorted(int(match.group(1)) for match in map(version_pattern.match, file_names) if match)
+
+
+def latest_indexed_version(asset_dir, prefix):
+    versions = indexed_versions(asset_dir, prefix)
+    return versions[-1] if versions else 0
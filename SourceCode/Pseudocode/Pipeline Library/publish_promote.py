@@ -0,0 +1,226 @@
+# Script Name: Publish Promote
+# Description: Publishes saved asset versions (asset_wips/saved/assets/<type>/<asset>/<asset>_layout_vNNN.mb)
+#as they are, instead of exporting the assets from the artist's scene again. Each promoted file gets the
+#next published version of its asset: the .mb is hardlinked into the published cache folder (copied when
+#the two folders are on different filesystems), and the Alembic and FBX are converted from the saved file
+#by headless worker processes, several assets at once. The versions are then indexed like any publish.
+#
+#Converters are started as <converter command> <spec json>. The default converter is mayapy running
+#promote_convert_worker.py; stub_promote_converter.py writes stand-ins with the same interface so
+#promotion can run without Maya.
+#
+#Usage:
+#   python publish_promote.py <saved .mb or folder> [...] [--workers 4] [--range 1 120] [--copy]
+#   python publish_promote.py <root>/asset_wips/saved/assets/prop --converter stub
+
+import os
+import sys
+import json
+import time
+import errno
+import shutil
+import getpass
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+library_dir = os.path.dirname(os.path.abspath(__file__))
+if library_dir not in sys.path:
+    sys.path.append(library_dir)
+import asset_catalog
+import chunked_alembic_cache
+import publish_steps
+import scene_references
+import version_reservation
+
+
+def mayapy_converter_command():
+    return [os.environ.get("MAYAPY", "mayapy"), os.path.join(library_dir, "promote_convert_worker.py")]
+
+
+def stub_converter_command():
+    return [sys.executable, os.path.join(library_dir, "stub_promote_converter.py")]
+
+
+converter_commands = {"mayapy": mayapy_converter_command, "stub": stub_converter_command}
+
+
+def latest_saved_files(directory):
+    """
+    Latest saved .mb of every asset under directory.
+    """
+    latest = {}
+    for folder, folder_names, file_names in os.walk(directory):
+        folder_names[:] = [folder_name for folder_name in folder_names if not folder_name.startswith(".")]
+        for file_name in file_names:
+            match = scene_references.version_file_pattern.match(file_name)
+            if match and file_name.lower().endswith(".mb") and not file_name.startswith("."):
+                key = (folder, match.group("prefix"))
+                version = int(match.group("version"))
+                if key not in latest or version > latest[key][0]:
+                    latest[key] = (version, os.path.join(folder, file_name))
+    return sorted(file_path for version, file_path in latest.values())
+
+
+def promotion_entry(saved_file, owner=None):
+    """
+    Publish entry (see publish_steps) of a saved asset version with its published version reserved, plus
+    its "source". Raises ValueError for files that are not saved asset versions.
+    """
+    fields = asset_catalog.describe_file(saved_file)
+    if not fields or fields["stage"] != "saved" or fields["shot"] or fields["format"] != "mb":
+        raise ValueError("{0} is not a saved asset .mb version".format(saved_file))
+    published_dir = os.path.join(fields["root"], *asset_catalog.stage_dirs["published"])
+    asset_dir = os.path.join(published_dir, "assets", fields["type"], fields["name"])
+    prefix = fields["prefix"]
+    version_number = version_reservation.reserve_version(asset_dir, prefix, dict(owner or {}, promoted_from=os.path.abspath(saved_file)))
+    version = str(version_number).zfill(3)
+    return {
+        "asset_type": fields["type"], "name": fields["name"], "asset_dir": asset_dir, "prefix": prefix, "version": version_number,
+        "source": os.path.abspath(saved_file),
+        "files": {
+            "cache": os.path.join(asset_dir, "cache", "{0}_v{1}.mb".format(prefix, version)),
+            "alembic": os.path.join(asset_dir, "alembic", "{0}_v{1}.abc".format(prefix, version)),
+            "fbx": os.path.join(asset_dir, "fbx", "{0}_v{1}.fbx".format(prefix, version)),
+        },
+    }
+
+
+def link_or_copy(source, final_path, link=True):
+    """
+    Hardlink source to final_path, or copy it when links are not possible. Returns "link" or "copy".
+    """
+    output_dir = os.path.dirname(final_path)
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir, exist_ok=True)
+    temp_file = version_reservation.temp_path(final_path)
+    try:
+        if link:
+            try:
+                os.link(source, temp_file)
+                version_reservation.commit_file(temp_file, final_path)
+                return "link"
+            except OSError as error:
+                #Other filesystem, or a share without hard links
+                if isinstance(error, FileExistsError) or error.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+                    raise
+        shutil.copy2(source, temp_file)
+        version_reservation.commit_file(temp_file, final_path)
+        return "copy"
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+
+def run_converter(converter_command, spec, spec_path):
+    """
+    Convert one saved file in a worker process. Raises RuntimeError when the worker fails.
+    """
+    with open(spec_path, "w") as spec_file:
+        json.dump(spec, spec_file, indent=2)
+    completed = subprocess.run(list(converter_command) + [spec_path], stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                               universal_newlines=True)
+    if completed.returncode != 0:
+        raise RuntimeError("Converting {0} failed:\n{1}".format(spec["scene"], completed.stdout))
+    return completed.stdout
+
+
+def convert_entry(entry, converter_command, work_dir, frame_range=None, flags=None):
+    """
+    Write the Alembic and FBX of one promoted entry from its saved file, committing both only when the
+    worker succeeded. Returns the seconds taken.
+    """
+    start_time = time.perf_counter()
+    outputs = dict((file_format, version_reservation.temp_path(entry["files"][file_format])) for file_format in ["alembic", "fbx"])
+    for temp_file in outputs.values():
+        if not os.path.isdir(os.path.dirname(temp_file)):
+            os.makedirs(os.path.dirname(temp_file), exist_ok=True)
+    spec = {"scene": entry["source"], "frame_range": list(frame_range) if frame_range else None,
+            "flags": list(flags or chunked_alembic_cache.default_alembic_flags), "outputs": outputs}
+    try:
+        run_converter(converter_command, spec, os.path.join(work_dir, "{0}_v{1}.json".format(entry["prefix"], entry["version"])))
+        for file_format, temp_file in outputs.items():
+            version_reservation.commit_file(temp_file, entry["files"][file_format])
+    finally:
+        for temp_file in outputs.values():
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+    return time.perf_counter() - start_time
+
+
+def promote_saved(saved_files, workers=None, converter_command=None, frame_range=None, flags=None, link=True, log=print):
+    """
+    Publish saved asset versions without exporting from a scene: reserve a published version per file,
+    link or copy the .mb, convert the Alembic and FBX in up to workers processes at once and index the
+    versions that converted. frame_range of None samples the range saved in each file. Returns one report
+    dict per file with "name", "version", "files", "mb" (link/copy), "seconds" and "error".
+    """
+    converter_command = converter_command or mayapy_converter_command()
+    workers = workers or os.cpu_count() or 1
+    owner = {"user": getpass.getuser()}
+    reports = []
+    entries = []
+    for saved_file in saved_files:
+        try:
+            entry = promotion_entry(saved_file, owner)
+            mode = link_or_copy(entry["source"], entry["files"]["cache"], link)
+        except (ValueError, OSError) as error:
+            log("Promote: skipped {0}: {1}".format(saved_file, error))
+            reports.append({"name": os.path.basename(saved_file), "version": None, "files": {}, "mb": None, "seconds": 0.0, "error": str(error)})
+            continue
+        entries.append(entry)
+        reports.append({"name": entry["name"], "version": entry["version"], "files": entry["files"], "mb": mode, "seconds": 0.0, "error": None})
+    converted_reports = [report for report in reports if report["error"] is None]
+
+    def convert(index):
+        try:
+            converted_reports[index]["seconds"] = convert_entry(entries[index], converter_command, work_dir, frame_range, flags)
+        except (RuntimeError, OSError) as error:
+            converted_reports[index]["error"] = str(error)
+
+    work_dir = tempfile.mkdtemp(prefix="promote_")
+    try:
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(entries)))) as pool:
+            list(pool.map(convert, range(len(entries))))
+        log("Promote: converted {0} assets on {1} workers in {2:.2f}s".format(len(entries), min(workers, len(entries)),
+                                                                             time.perf_counter() - start_time))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    promoted = []
+    for entry, report in zip(entries, converted_reports):
+        if report["error"]:
+            log("Promote: {0} v{1} FAILED: {2}".format(entry["name"], str(entry["version"]).zfill(3), report["error"].splitlines()[0]))
+            #The linked .mb alone is not a complete version
+            if os.path.isfile(entry["files"]["cache"]):
+                os.remove(entry["files"]["cache"])
+            continue
+        promoted.append(entry)
+        log("Promote: {0} v{1} ({2} .mb, {3:.2f}s)".format(entry["name"], str(entry["version"]).zfill(3), report["mb"], report["seconds"]))
+    if promoted:
+        publish_steps.index_versions(promoted)
+    return reports
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Publish saved asset versions without exporting them from a scene again.")
+    parser.add_argument("paths", nargs="+", help="saved .mb files, or folders to promote the latest saved version of every asset from")
+    parser.add_argument("--workers", type=int, help="conversions run at once (default: CPU count)")
+    parser.add_argument("--range", nargs=2, type=int, metavar=("START", "END"), help="Alembic frame range (default: the range saved in each file)")
+    parser.add_argument("--converter", choices=sorted(converter_commands), default="mayapy")
+    parser.add_argument("--copy", action="store_true", help="copy the .mb instead of hardlinking it")
+    options = parser.parse_args(argv)
+
+    saved_files = []
+    for path in options.paths:
+        saved_files.extend(latest_saved_files(path) if os.path.isdir(path) else [path])
+    reports = promote_saved(saved_files, options.workers, converter_commands[options.converter](), options.range, link=not options.copy)
+    failed = [report for report in reports if report["error"]]
+    print("Promoted {0} of {1} saved versions.".format(len(reports) - len(failed), len(reports)))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
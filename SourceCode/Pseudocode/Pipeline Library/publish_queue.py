@@ -0,0 +1,387 @@
+# Script Name: Publish Queue
+# Description: Local SQLite job store for publishes that run outside the artist's Maya session.
+#The Save/Publish tool snapshots the scene, submits a job with the asset list and starts a worker;
+#publish_queue_worker.py processes drain the queue and run the export steps headless.
+#
+#Jobs and scene snapshots live on disk, so queued work survives a Maya crash or restart. Workers
+#heartbeat while they run; a running job whose worker stopped heartbeating is queued again (up to
+#max_attempts) the next time any worker or the UI looks at the queue.
+#
+#   VFX_PUBLISH_QUEUE_DIR=<dir>   queue database, snapshots and worker logs (default ~/.vfx_pipeline/publish_queue)
+#
+#Usage:
+#   python publish_queue.py list
+#   python publish_queue.py workers --start 2
+
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import argparse
+import threading
+import traceback
+import subprocess
+from contextlib import contextmanager
+
+library_dir = os.path.dirname(os.path.abspath(__file__))
+default_queue_dir = os.environ.get("VFX_PUBLISH_QUEUE_DIR", os.path.join(os.path.expanduser("~"), ".vfx_pipeline", "publish_queue"))
+#A worker that has not heartbeated for this long is considered dead. Long single Maya commands can hold
+#the interpreter lock and delay the heartbeat thread, so keep this well above heartbeat_seconds.
+stale_seconds = 300.0
+heartbeat_seconds = 10.0
+max_attempts = 3
+
+job_states = ["queued", "running", "done", "failed", "cancelled"]
+
+_schema = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    label TEXT NOT NULL,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    submitted REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    heartbeat REAL,
+    worker TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+CREATE TABLE IF NOT EXISTS workers (
+    id TEXT PRIMARY KEY,
+    host TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    started REAL NOT NULL,
+    heartbeat REAL NOT NULL,
+    job_id INTEGER
+);
+"""
+
+
+def mayapy_worker_command():
+    return [os.environ.get("MAYAPY", "mayapy"), os.path.join(library_dir, "publish_queue_worker.py")]
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return "-"
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return "{0}h {1:02d}m".format(hours, minutes)
+    if minutes:
+        return "{0}m {1:02d}s".format(minutes, seconds)
+    return "{0}s".format(seconds)
+
+
+def format_job(job, now=None):
+    """
+    One line for the queue list: id, state, label, time waited in the queue and time running.
+    """
+    now = now or time.time()
+    waited = (job["started"] or now) - job["submitted"] if job["status"] != "cancelled" else None
+    ran = (job["finished"] or now) - job["started"] if job["started"] else None
+    line = "#{0} {1:<9} {2}  waited {3}  ran {4}".format(
+        job["id"], job["status"], job["label"], format_duration(waited), format_duration(ran))
+    if job["attempts"] > 1:
+        line += "  attempt {0}".format(job["attempts"])
+    if job["status"] == "failed" and job["error"]:
+        line += "  " + job["error"].strip().splitlines()[-1]
+    return line
+
+
+class PublishQueue(object):
+
+    def __init__(self, queue_dir=None, stale_after=None):
+        self.queue_dir = queue_dir or default_queue_dir
+        self.stale_seconds = stale_after or stale_seconds
+        self.snapshot_dir = os.path.join(self.queue_dir, "snapshots")
+        self.log_dir = os.path.join(self.queue_dir, "logs")
+        for directory in [self.queue_dir, self.snapshot_dir, self.log_dir]:
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+        self.db_path = os.path.join(self.queue_dir, "queue.db")
+        connection = sqlite3.connect(self.db_path, timeout=30.0)
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_schema)
+        finally:
+            connection.close()
+
+    @contextmanager
+    def _transaction(self):
+        #One short connection per operation keeps the UI, workers and heartbeat threads independent
+        connection = sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _job(row):
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def new_snapshot_path(self, extension=".mb"):
+        return os.path.join(self.snapshot_dir, "snapshot_{0}{1}".format(uuid.uuid4().hex, extension))
+
+    def submit(self, kind, label, payload):
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                "INSERT INTO jobs (kind, label, status, payload, submitted) VALUES (?, ?, 'queued', ?, ?)",
+                (kind, label, json.dumps(payload), time.time()))
+            return cursor.lastrowid
+
+    def _requeue_stale(self, connection, now):
+        limit = now - self.stale_seconds
+        connection.execute("DELETE FROM workers WHERE heartbeat < ?", (limit,))
+        connection.execute(
+            "UPDATE jobs SET status = 'failed', finished = ?, error = 'Worker stopped responding ' || attempts || ' times.' "
+            "WHERE status = 'running' AND heartbeat < ? AND attempts >= ?", (now, limit, max_attempts))
+        connection.execute(
+            "UPDATE jobs SET status = 'queued', started = NULL, worker = NULL "
+            "WHERE status = 'running' AND heartbeat < ?", (limit,))
+
+    def recover(self):
+        """
+        Requeue running jobs whose worker died and forget dead workers.
+        """
+        with self._transaction() as connection:
+            self._requeue_stale(connection, time.time())
+
+    def claim(self, worker_id):
+        """
+        Atomically take the oldest queued job for worker_id, or return None when the queue is empty.
+        """
+        now = time.time()
+        with self._transaction() as connection:
+            self._requeue_stale(connection, now)
+            row = connection.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+            if row is None:
+                return None
+            connection.execute(
+                "UPDATE jobs SET status = 'running', started = ?, heartbeat = ?, worker = ?, attempts = attempts + 1 WHERE id = ?",
+                (now, now, worker_id, row["id"]))
+            connection.execute("UPDATE workers SET job_id = ?, heartbeat = ? WHERE id = ?", (row["id"], now, worker_id))
+            return self._job(connection.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone())
+
+    def register_worker(self, worker_id):
+        now = time.time()
+        with self._transaction() as connection:
+            connection.execute("INSERT OR REPLACE INTO workers (id, host, pid, started, heartbeat) VALUES (?, ?, ?, ?, ?)",
+                               (worker_id, socket.gethostname(), os.getpid(), now, now))
+
+    def unregister_worker(self, worker_id):
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM workers WHERE id = ?", (worker_id,))
+
+    def heartbeat(self, worker_id, job_id=None):
+        now = time.time()
+        with self._transaction() as connection:
+            connection.execute("UPDATE workers SET heartbeat = ?, job_id = ? WHERE id = ?", (now, job_id, worker_id))
+            if job_id is not None:
+                connection.execute("UPDATE jobs SET heartbeat = ? WHERE id = ? AND worker = ?", (now, job_id, worker_id))
+
+    def finish(self, job_id, result):
+        with self._transaction() as connection:
+            connection.execute("UPDATE jobs SET status = 'done', finished = ?, result = ?, error = NULL WHERE id = ?",
+                               (time.time(), json.dumps(result), job_id))
+
+    def fail(self, job_id, error):
+        with self._transaction() as connection:
+            connection.execute("UPDATE jobs SET status = 'failed', finished = ?, error = ? WHERE id = ?",
+                               (time.time(), error, job_id))
+
+    def retry(self, job_id, error):
+        """
+        Queue a failed job again until it has used max_attempts, then mark it failed. Returns True when requeued.
+        """
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET status = 'queued', started = NULL, worker = NULL, error = ? WHERE id = ? AND attempts < ?",
+                (error, job_id, max_attempts))
+            if cursor.rowcount == 1:
+                return True
+            connection.execute("UPDATE jobs SET status = 'failed', finished = ?, error = ? WHERE id = ?", (time.time(), error, job_id))
+            return False
+
+    def cancel(self, job_id):
+        """
+        Cancel a job that no worker has started yet. Returns True when it was cancelled.
+        """
+        with self._transaction() as connection:
+            cursor = connection.execute("UPDATE jobs SET status = 'cancelled', finished = ? WHERE id = ? AND status = 'queued'",
+                                        (time.time(), job_id))
+            return cursor.rowcount == 1
+
+    def get(self, job_id):
+        with self._transaction() as connection:
+            row = connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row) if row else None
+
+    def jobs(self, limit=50):
+        """
+        Queued and running jobs first, then the most recently finished ones.
+        """
+        with self._transaction() as connection:
+            rows = connection.execute(
+                "SELECT * FROM jobs ORDER BY status NOT IN ('queued', 'running'), "
+                "CASE WHEN status IN ('queued', 'running') THEN id ELSE -id END LIMIT ?", (limit,)).fetchall()
+        return [self._job(row) for row in rows]
+
+    def counts(self):
+        with self._transaction() as connection:
+            rows = connection.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = dict((status, 0) for status in job_states)
+        counts.update((row[0], row[1]) for row in rows)
+        return counts
+
+    def live_workers(self):
+        with self._transaction() as connection:
+            self._requeue_stale(connection, time.time())
+            return [dict(row) for row in connection.execute("SELECT * FROM workers ORDER BY started")]
+
+    def clear_finished(self):
+        """
+        Forget done, failed and cancelled jobs and delete their scene snapshots. Returns the number removed.
+        """
+        with self._transaction() as connection:
+            rows = connection.execute("SELECT id, payload FROM jobs WHERE status IN ('done', 'failed', 'cancelled')").fetchall()
+            connection.executemany("DELETE FROM jobs WHERE id = ?", [(row["id"],) for row in rows])
+        for row in rows:
+            snapshot = json.loads(row["payload"]).get("scene")
+            if snapshot and os.path.isfile(snapshot) and os.path.dirname(os.path.abspath(snapshot)) == os.path.abspath(self.snapshot_dir):
+                os.remove(snapshot)
+        return len(rows)
+
+    def start_worker(self, command=None, idle_exit_seconds=300):
+        """
+        Start one detached worker process that keeps running if Maya is closed.
+        """
+        command = list(command or mayapy_worker_command()) + ["--queue-dir", self.queue_dir, "--idle-exit", str(idle_exit_seconds)]
+        log_path = os.path.join(self.log_dir, "worker_{0}.log".format(time.strftime("%Y%m%d_%H%M%S")))
+        with open(log_path, "a") as log_file:
+            if os.name == "nt":
+                process = subprocess.Popen(command, stdout=log_file, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                                           creationflags=subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP)
+            else:
+                process = subprocess.Popen(command, stdout=log_file, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                                           start_new_session=True)
+        return process.pid
+
+    def ensure_workers(self, count=1, command=None):
+        """
+        Start workers until count are alive. Returns the pids of the started ones.
+        """
+        missing = count - len(self.live_workers())
+        return [self.start_worker(command) for worker_index in range(max(0, missing))]
+
+
+class Heartbeat(threading.Thread):
+    """Keeps a worker (and the job it is running) alive in the queue while the main thread works."""
+
+    def __init__(self, queue, worker_id):
+        threading.Thread.__init__(self, name="publish-queue-heartbeat")
+        self.daemon = True
+        self.queue = queue
+        self.worker_id = worker_id
+        self.job_id = None
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(heartbeat_seconds):
+            try:
+                self.queue.heartbeat(self.worker_id, self.job_id)
+            except Exception:
+                traceback.print_exc()
+
+
+def work(queue, worker_id, run_job, idle_exit_seconds=300, poll_seconds=2.0, retry_failures=False, on_done=None):
+    """
+    Claim and run jobs with run_job(job) -> JSON result until the queue has been empty for idle_exit_seconds.
+    Failed jobs are marked failed, or queued again up to max_attempts with retry_failures.
+    Returns the number of jobs run.
+    """
+    queue.register_worker(worker_id)
+    heartbeat = Heartbeat(queue, worker_id)
+    heartbeat.start()
+    jobs_run = 0
+    idle_since = time.time()
+    try:
+        while time.time() - idle_since < idle_exit_seconds:
+            job = queue.claim(worker_id)
+            if job is None:
+                time.sleep(poll_seconds)
+                continue
+
+            heartbeat.job_id = job["id"]
+            print("Job #{0} ({1}): {2}".format(job["id"], job["kind"], job["label"]))
+            try:
+                result = run_job(job)
+            except Exception:
+                traceback.print_exc()
+                if retry_failures:
+                    queue.retry(job["id"], traceback.format_exc())
+                else:
+                    queue.fail(job["id"], traceback.format_exc())
+            else:
+                queue.finish(job["id"], result)
+                if on_done:
+                    on_done(job)
+            heartbeat.job_id = None
+            jobs_run += 1
+            idle_since = time.time()
+    finally:
+        heartbeat.stopped.set()
+        queue.unregister_worker(worker_id)
+    return jobs_run
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect and drive the local publish queue.")
+    parser.add_argument("--queue-dir", default=default_queue_dir)
+    commands = parser.add_subparsers(dest="command", required=True)
+    list_parser = commands.add_parser("list", help="show queued, running and recent jobs")
+    list_parser.add_argument("--limit", type=int, default=50)
+    workers_parser = commands.add_parser("workers", help="show live workers")
+    workers_parser.add_argument("--start", type=int, default=0, help="start workers until this many are alive")
+    cancel_parser = commands.add_parser("cancel", help="cancel a queued job")
+    cancel_parser.add_argument("job_id", type=int)
+    commands.add_parser("clear", help="remove finished jobs and their snapshots")
+    options = parser.parse_args(argv)
+
+    queue = PublishQueue(options.queue_dir)
+    if options.command == "list":
+        for job in queue.jobs(options.limit):
+            print(format_job(job))
+    elif options.command == "workers":
+        if options.start:
+            queue.ensure_workers(options.start)
+        for worker in queue.live_workers():
+            print("{0} on {1}, job {2}".format(worker["id"], worker["host"], worker["job_id"] or "-"))
+    elif options.command == "cancel":
+        if not queue.cancel(options.job_id):
+            print("Job {0} is not queued.".format(options.job_id))
+            return 1
+    elif options.command == "clear":
+        print("Removed {0} finished jobs.".format(queue.clear_finished()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+# Script Name: Publish Queue Worker
+# Description: Headless mayapy worker draining the local publish queue (publish_queue.py). Each job opens
+#its scene snapshot and runs the export steps from publish_steps.py; promotion jobs convert saved
+#versions through publish_promote.py. The worker heartbeats from a background thread so a crashed
+#worker's job is picked up again, and exits after idling.
+#
+#Usage: mayapy publish_queue_worker.py [--queue-dir <dir>] [--idle-exit 300]
+
+import os
+import sys
+import socket
+import argparse
+
+library_dir = os.path.dirname(os.path.abspath(__file__))
+if library_dir not in sys.path:
+    sys.path.append(library_dir)
+import publish_promote
+import publish_queue
+import publish_steps
+import publish_transfer
+
+
+def run_publish_assets(cmds, job):
+    cmds.file(job["payload"]["scene"], open=True, force=True)
+    #Instancing duplicate meshes for the export is undone afterwards, which needs the undo queue
+    cmds.undoInfo(state=True)
+    entries = job["payload"]["entries"]
+    if job["attempts"] > 1:
+        #A worker died or the job failed partway: versions it already wrote to move on to fresh ones
+        entries = publish_steps.reserve_fresh_versions(
+            entries, lambda file_path: os.path.exists(file_path) or os.path.exists(publish_transfer.stage_path(file_path)), {"job": job["id"]})
+    if not job["payload"].get("staging"):
+        return publish_steps.run_publish_steps(cmds, entries)
+
+    #Export to local staging and leave the copy to the publish share to the transfer workers
+    staged = publish_transfer.staged_entries(entries)
+    result = publish_steps.run_publish_steps(cmds, staged, write_index=False)
+    result["transfer_jobs"] = publish_transfer.submit_staged(staged)
+    publish_transfer.ensure_transfer_workers()
+    return result
+
+
+def run_promote_assets(cmds, job):
+    #Conversions run in their own mayapy processes, this session only schedules them
+    payload = job["payload"]
+    return {"reports": publish_promote.promote_saved(payload["files"], frame_range=payload.get("frame_range"), flags=payload.get("flags"))}
+
+
+#Job kind -> function(cmds, job) returning the JSON result stored with the job
+job_handlers = {
+    "publish_assets": run_publish_assets,
+    "promote_assets": run_promote_assets,
+}
+
+
+def drain(queue, cmds, worker_id, idle_exit_seconds=300, poll_seconds=2.0):
+    """
+    Run jobs until the queue has been empty for idle_exit_seconds. Returns the number of jobs run.
+    """
+    def remove_snapshot(job):
+        snapshot = job["payload"].get("scene")
+        if snapshot and os.path.dirname(os.path.abspath(snapshot)) == os.path.abspath(queue.snapshot_dir) and os.path.isfile(snapshot):
+            os.remove(snapshot)
+
+    return publish_queue.work(queue, worker_id, lambda job: job_handlers[job["kind"]](cmds, job),
+                              idle_exit_seconds, poll_seconds, on_done=remove_snapshot)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drain the local publish queue in a headless Maya session.")
+    parser.add_argument("--queue-dir", default=publish_queue.default_queue_dir)
+    parser.add_argument("--idle-exit", type=float, default=300.0, help="exit after this many seconds without jobs")
+    options = parser.parse_args(argv)
+
+    import maya.standalone
+    maya.standalone.initialize(name="python")
+    try:
+        import maya.cmds as cmds
+        cmds.loadPlugin("AbcExport", quiet=True)
+        cmds.loadPlugin("fbxmaya", quiet=True)
+
+        queue = publish_queue.PublishQueue(options.queue_dir)
+        worker_id = "{0}:{1}".format(socket.gethostname(), os.getpid())
+        jobs_run = drain(queue, cmds, worker_id, options.idle_exit)
+        print("Worker {0} ran {1} jobs.".format(worker_id, jobs_run))
+    finally:
+        maya.standalone.uninitialize()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+# Script Name: Publish Retention
+# Description: Keeps the saved and published folders small. Per asset (and per shot cache) the newest
+#keep_last versions stay, as does every version a lighting scene references and anything younger than
+#min_age_days. Older versions are moved into compressed archive bundles next to the asset,
+#<asset dir>/.archive/<prefix>_<stamp>.zip, each with a JSON index listing its versions, files and
+#checksums, and can be restored from there.
+#
+#Bundles are written to a temp name and committed before any original is removed. The claim file of the
+#newest archived version stays behind (and is written for versions published before claims existed), so
+#archived numbers are never handed out again; older claims are dropped with their files.
+#
+#Usage:
+#   python publish_retention.py plan <root>/asset_final/published --keep-last 5
+#   python publish_retention.py apply <root>/asset_final/published <root>/asset_wips/saved --keep-last 5 --lighting-scenes <dir>
+#   python publish_retention.py list <asset dir>
+#   python publish_retention.py restore <asset dir> <prefix> <version>
+
+import os
+import sys
+import json
+import time
+import zipfile
+import argparse
+
+library_dir = os.path.dirname(os.path.abspath(__file__))
+if library_dir not in sys.path:
+    sys.path.append(library_dir)
+import asset_catalog
+import publish_index
+import scene_references
+import shot_manifest
+import version_reservation
+
+archive_dir_name = ".archive"
+default_keep_last = 5
+compression_level = 6
+
+
+def collect_versions(root_dir):
+    """
+    {(asset dir, prefix): {version: [files]}} for every versioned file under root_dir.
+    """
+    versions = {}
+    for directory, directory_names, file_names in os.walk(root_dir):
+        directory_names[:] = [name for name in directory_names if not name.startswith(".")]
+        for file_name in file_names:
+            parsed = scene_references.parse_version_file(os.path.join(directory, file_name))
+            if parsed:
+                asset_dir, prefix, version = parsed
+                versions.setdefault((asset_dir, prefix), {}).setdefault(version, []).append(os.path.join(directory, file_name))
+    return versions
+
+
+def plan_retention(root_dirs, keep_last=default_keep_last, referenced=(), min_age_days=0.0, now=None):
+    """
+    Versions to archive under root_dirs, oldest first per asset, as dicts with asset_dir, prefix, version,
+    files and bytes. referenced holds normalized paths (scene_references) whose versions are kept, as are
+    versions a shot manifest pins.
+    """
+    now = now or time.time()
+    protected = set()
+    for file_path in referenced:
+        parsed = scene_references.parse_version_file(file_path)
+        if parsed:
+            protected.add((scene_references.normalize_path(os.path.abspath(parsed[0])), parsed[1], parsed[2]))
+
+    #Versions shots are pinned to in their build manifests are kept as well
+    pins = {}
+    plan = []
+    for root_dir in root_dirs:
+        for (asset_dir, prefix), asset_versions in sorted(collect_versions(root_dir).items()):
+            normalized_dir = scene_references.normalize_path(os.path.abspath(asset_dir))
+            if asset_dir not in pins:
+                pins[asset_dir] = shot_manifest.pinned_versions(asset_dir)
+            if prefix in pins[asset_dir]:
+                protected.add((normalized_dir, prefix, pins[asset_dir][prefix]))
+            for version in sorted(asset_versions)[:-keep_last or None] if keep_last else sorted(asset_versions):
+                files = asset_versions[version]
+                stats = [os.stat(file_path) for file_path in files]
+                if (normalized_dir, prefix, version) in protected:
+                    continue
+                if min_age_days and now - max(stat.st_mtime for stat in stats) < min_age_days * 86400.0:
+                    continue
+                plan.append({"asset_dir": asset_dir, "prefix": prefix, "version": version, "files": sorted(files),
+                             "bytes": sum(stat.st_size for stat in stats)})
+    return plan
+
+
+def _group_plan(plan):
+    groups = {}
+    for item in plan:
+        groups.setdefault((item["asset_dir"], item["prefix"]), []).append(item)
+    return groups
+
+
+def _retire_claims(asset_dir, prefix, versions):
+    """
+    Keep one claim at the newest archived version so version_reservation never reuses a number, and
+    remove the claims of the older archived versions.
+    """
+    claim_dir = os.path.join(asset_dir, version_reservation.claim_dir_name)
+    newest = max(versions)
+    for version in versions:
+        claim_path = os.path.join(claim_dir, "{0}_v{1}.claim".format(prefix, str(version).zfill(3)))
+        if version != newest:
+            if os.path.isfile(claim_path):
+                os.remove(claim_path)
+        elif not os.path.isfile(claim_path):
+            if not os.path.isdir(claim_dir):
+                os.makedirs(claim_dir, exist_ok=True)
+            with open(claim_path, "w") as claim_file:
+                json.dump({"archived": time.time()}, claim_file)
+
+
+def archive_versions(plan, log=print):
+    """
+    Move the planned versions into one new bundle per asset and prefix. Returns a list of
+    (bundle path, versions, original bytes, bundle bytes).
+    """
+    archived = []
+    for (asset_dir, prefix), items in sorted(_group_plan(plan).items()):
+        archive_dir = os.path.join(asset_dir, archive_dir_name)
+        if not os.path.isdir(archive_dir):
+            os.makedirs(archive_dir, exist_ok=True)
+        bundle_path = os.path.join(archive_dir, "{0}_{1}.zip".format(prefix, time.strftime("%Y%m%d_%H%M%S")))
+        while os.path.exists(bundle_path):
+            bundle_path = bundle_path[:-4] + "_1.zip"
+
+        checksums = publish_index.hash_files([file_path for item in items for file_path in item["files"]])
+        bundle_index = {"prefix": prefix, "created": time.time(), "bundle": os.path.basename(bundle_path), "versions": {}}
+        with version_reservation.atomic_output(bundle_path) as temp_bundle:
+            with zipfile.ZipFile(temp_bundle, "w", zipfile.ZIP_DEFLATED, compresslevel=compression_level) as bundle:
+                for item in items:
+                    members = []
+                    for file_path in item["files"]:
+                        member = os.path.relpath(file_path, asset_dir).replace(os.sep, "/")
+                        bundle.write(file_path, member)
+                        members.append({"member": member, "size": os.path.getsize(file_path), "mtime": os.path.getmtime(file_path),
+                                        "sha256": checksums[file_path]})
+                    bundle_index["versions"][str(item["version"])] = {
+                        "files": members,
+                        "record": publish_index.read_version(asset_dir, prefix, item["version"]),
+                    }
+            #Read every member back before anything is deleted
+            with zipfile.ZipFile(temp_bundle) as bundle:
+                damaged = bundle.testzip()
+                if damaged:
+                    raise IOError("Archive bundle {0} is damaged at {1}".format(bundle_path, damaged))
+        with version_reservation.atomic_output(bundle_path[:-4] + ".json") as temp_index:
+            with open(temp_index, "w") as index_file:
+                json.dump(bundle_index, index_file, indent=2)
+
+        for item in items:
+            for file_path in item["files"]:
+                os.remove(file_path)
+            record_path = publish_index.version_record_path(asset_dir, prefix, item["version"])
+            if os.path.isfile(record_path):
+                os.remove(record_path)
+        _retire_claims(asset_dir, prefix, [item["version"] for item in items])
+        asset_catalog.remove_files([file_path for item in items for file_path in item["files"]], log)
+        original_bytes = sum(item["bytes"] for item in items)
+        bundle_bytes = os.path.getsize(bundle_path)
+        log("Archived {0} versions of {1} into {2} ({3:.1f} MB -> {4:.1f} MB)".format(
+            len(items), prefix, bundle_path, original_bytes / 1048576.0, bundle_bytes / 1048576.0))
+        archived.append((bundle_path, [item["version"] for item in items], original_bytes, bundle_bytes))
+    return archived
+
+
+def archived_versions(asset_dir):
+    """
+    {(prefix, version): (bundle path, bundle index entry)}, the newest bundle winning.
+    """
+    archive_dir = os.path.join(asset_dir, archive_dir_name)
+    found = {}
+    if not os.path.isdir(archive_dir):
+        return found
+    for index_name in sorted(os.listdir(archive_dir)):
+        if index_name.endswith(".json") and not index_name.startswith("."):
+            with open(os.path.join(archive_dir, index_name)) as index_file:
+                bundle_index = json.load(index_file)
+            bundle_path = os.path.join(archive_dir, bundle_index["bundle"])
+            for version, entry in bundle_index["versions"].items():
+                found[(bundle_index["prefix"], int(version))] = (bundle_path, entry)
+    return found
+
+
+def restore_version(asset_dir, prefix, version, log=print):
+    """
+    Extract an archived version back to its folders and re-index it. Returns the restored files.
+    """
+    archived = archived_versions(asset_dir).get((prefix, int(version)))
+    if archived is None:
+        raise KeyError("{0} v{1} is not archived in {2}".format(prefix, str(version).zfill(3), asset_dir))
+    bundle_path, entry = archived
+    restored = []
+    with zipfile.ZipFile(bundle_path) as bundle:
+        for file_info in entry["files"]:
+            file_path = os.path.join(asset_dir, *file_info["member"].split("/"))
+            if not os.path.isdir(os.path.dirname(file_path)):
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with version_reservation.atomic_output(file_path) as temp_file:
+                with bundle.open(file_info["member"]) as member, open(temp_file, "wb") as restored_file:
+                    for chunk in iter(lambda: member.read(4 * 1048576), b""):
+                        restored_file.write(chunk)
+                if publish_index.file_sha256(temp_file) != file_info["sha256"]:
+                    raise IOError("{0} in {1} does not match its archived checksum".format(file_info["member"], bundle_path))
+                os.utime(temp_file, (file_info["mtime"], file_info["mtime"]))
+            restored.append(file_path)
+
+    record = entry.get("record")
+    if record and publish_index.read_version(asset_dir, prefix, version) is None:
+        publish_index.write_version(asset_dir, prefix, int(version), record["files"],
+                                    dict((key, value) for key, value in record.items() if key not in ("files", "prefix", "version", "indexed")))
+    asset_catalog.record_files(restored, log=log)
+    log("Restored {0} v{1} from {2}".format(prefix, str(version).zfill(3), bundle_path))
+    return restored
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archive old versions of saved and published assets.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for command in ["plan", "apply"]:
+        command_parser = commands.add_parser(command, help="show what would be archived" if command == "plan" else "archive old versions")
+        command_parser.add_argument("roots", nargs="+", help="saved and/or published folders")
+        command_parser.add_argument("--keep-last", type=int, default=default_keep_last)
+        command_parser.add_argument("--min-age-days", type=float, default=0.0)
+        command_parser.add_argument("--lighting-scenes", action="append", help="folder of lighting scenes whose references are kept")
+    list_parser = commands.add_parser("list", help="list archived versions of an asset")
+    list_parser.add_argument("asset_dir")
+    restore_parser = commands.add_parser("restore", help="restore an archived version")
+    restore_parser.add_argument("asset_dir")
+    restore_parser.add_argument("prefix")
+    restore_parser.add_argument("version", type=int)
+    options = parser.parse_args(argv)
+
+    if options.command in ("plan", "apply"):
+        scene_dirs = options.lighting_scenes or scene_references.lighting_scene_dirs()
+        plan = plan_retention(options.roots, options.keep_last, scene_references.referenced_files(scene_dirs), options.min_age_days)
+        for item in plan:
+            print("{0} v{1} {2:.1f} MB  {3}".format(item["prefix"], str(item["version"]).zfill(3), item["bytes"] / 1048576.0, item["asset_dir"]))
+        print("{0} versions, {1:.1f} MB to archive".format(len(plan), sum(item["bytes"] for item in plan) / 1048576.0))
+        if options.command == "apply":
+            archive_versions(plan)
+    elif options.command == "list":
+        for (prefix, version), (bundle_path, entry) in sorted(archived_versions(options.asset_dir).items()):
+            print("{0} v{1}  {2}".format(prefix, str(version).zfill(3), os.path.basename(bundle_path)))
+    elif options.command == "restore":
+        restore_version(options.asset_dir, options.prefix, options.version)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
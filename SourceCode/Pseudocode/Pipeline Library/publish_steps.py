@@ -0,0 +1,203 @@
+# Script Name: Publish Steps
+# Description: The export steps of an asset publish, shared by the Save/Publish tool (running them in the
+#artist's session) and publish_queue_worker.py (running them headless on a scene snapshot).
+#
+#A publish is a list of entries, one per asset root:
+#   {"asset_type": "prop", "root": "|prop|chair", "name": "chair",
+#    "asset_dir": ".../assets/prop/chair", "prefix": "chair_layout", "version": 3,
+#    "files": {"cache": ".../chair_layout_v003.mb", "alembic": ".../chair_layout_v003.abc", "fbx": "..."},
+#    "alembic_job": "<AbcExport job string without -file>", "instance_duplicates": False}
+#
+#Entries with instance_duplicates set have identical meshes under their root turned into instances of
+#one shape (duplicate_geometry) before anything is exported, so every shape is written once. The
+#instancing is undone after the export, the artist's scene is not changed by a publish.
+#
+#Every file is written to a temp path and renamed into place, so a version appears complete or not at all,
+#and the version is indexed (publish_index) once all of its files are written.
+
+import os
+import time
+from contextlib import contextmanager
+
+import pipeline_profiler as profiler
+import asset_catalog
+import duplicate_geometry
+import publish_estimates
+import publish_index
+import thumbnails
+import version_reservation
+
+#Undo chunk of the instancing and exports, undone after the publish
+instance_chunk_name = "publish_instance_duplicates"
+
+
+def export_asset_scoped(cmds, asset, export_file, file_type, options=None):
+    """
+    Export only one asset root, its subtree and dependencies (materials, history) to export_file.
+    """
+    previous_selection = cmds.ls(selection=True, long=True)
+    cmds.select(asset, replace=True)
+    try:
+        with version_reservation.atomic_output(export_file) as temp_file:
+            if options:
+                cmds.file(temp_file, force=True, options=options, type=file_type, preserveReferences=True, exportSelected=True)
+            else:
+                cmds.file(temp_file, force=True, type=file_type, preserveReferences=True, exportSelected=True)
+    finally:
+        if previous_selection:
+            cmds.select(previous_selection, replace=True)
+        else:
+            cmds.select(clear=True)
+
+
+def export_alembic_jobs(cmds, alembic_jobs, log=print):
+    """
+    Export every (asset name, export file, job string without -file) in one AbcExport call, so the timeline
+    is evaluated once. Returns (seconds, [size per job]).
+    """
+    temp_files = [version_reservation.temp_path(export_file) for asset_name, export_file, job in alembic_jobs]
+    start_time = time.perf_counter()
+    try:
+        with profiler.span("publish_alembic", "publish", assets=len(alembic_jobs)):
+            cmds.AbcExport(j=[job + " -file " + temp_file for (asset_name, export_file, job), temp_file in zip(alembic_jobs, temp_files)])
+        for (asset_name, export_file, job), temp_file in zip(alembic_jobs, temp_files):
+            version_reservation.commit_file(temp_file, export_file)
+    finally:
+        for temp_file in temp_files:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+    export_time = time.perf_counter() - start_time
+
+    #AbcExport samples all jobs together, so each asset's time is its share of the written data
+    sizes = [os.path.getsize(export_file) if os.path.isfile(export_file) else 0 for asset_name, export_file, job in alembic_jobs]
+    total_size = sum(sizes) or 1
+    log("Alembic: {0} assets exported in one pass, {1:.2f}s, {2:.2f} MB".format(len(alembic_jobs), export_time, sum(sizes) / 1048576.0))
+    for (asset_name, export_file, job), size in zip(alembic_jobs, sizes):
+        log("Alembic: {0} {1:.2f} MB, ~{2:.2f}s".format(asset_name, size / 1048576.0, export_time * size / total_size))
+    return export_time, sizes
+
+
+def reserve_fresh_versions(entries, written=os.path.exists, owner=None, log=print):
+    """
+    Entries of a publish that is run again (a requeued or retried queue job) whose version already has
+    files committed by the earlier attempt, moved to a newly reserved version: commits never replace a
+    file, so exporting the old paths again would fail. written(file path) tells whether a file was
+    committed. The earlier attempt's files stay unindexed.
+    """
+    fresh_entries = []
+    for entry in entries:
+        if not any(written(file_path) for file_path in entry["files"].values()):
+            fresh_entries.append(entry)
+            continue
+        version = version_reservation.reserve_version(entry["asset_dir"], entry["prefix"], owner)
+        old_tag, new_tag = ["{0}_v{1}.".format(entry["prefix"], str(number).zfill(3)) for number in (entry["version"], version)]
+        files = dict((file_format, os.path.join(os.path.dirname(file_path), os.path.basename(file_path).replace(old_tag, new_tag)))
+                     for file_format, file_path in entry["files"].items())
+        log("{0} v{1} was partly written by an earlier attempt, publishing it as v{2}.".format(
+            entry["name"], str(entry["version"]).zfill(3), str(version).zfill(3)))
+        fresh_entries.append(dict(entry, version=version, files=files))
+    return fresh_entries
+
+
+def _make_parent_dir(file_path):
+    parent_dir = os.path.dirname(file_path)
+    if parent_dir and not os.path.isdir(parent_dir):
+        os.makedirs(parent_dir)
+
+
+def index_versions(entries):
+    """
+    Hash every file of the entries in parallel and write their version records, the checksum manifest of the
+    published tree, then add the files to the asset catalog and queue their previews. Returns the seconds taken.
+    """
+    start_time = time.perf_counter()
+    with profiler.span("publish_checksums", "publish", assets=len(entries)):
+        checksums = publish_index.hash_files(file_path for entry in entries for file_path in entry["files"].values())
+        for entry in entries:
+            publish_index.write_version(entry["asset_dir"], entry["prefix"], entry["version"], dict(
+                (file_format, publish_index.file_record(entry["asset_dir"], file_path, checksums[file_path]))
+                for file_format, file_path in entry["files"].items()))
+        asset_catalog.record_files(file_path for entry in entries for file_path in entry["files"].values())
+    thumbnails.queue_previews([file_path for entry in entries for file_path in entry["files"].values()])
+    return time.perf_counter() - start_time
+
+
+@contextmanager
+def duplicates_instanced(cmds, entries, log=print):
+    """
+    Instance the duplicate meshes of the entries asking for it for the duration of the block, then undo
+    it: the instancing and the exports share one undo chunk, so the open scene is left as it was. Without
+    the undo queue the meshes are exported as they are.
+    """
+    entries = [entry for entry in entries if entry.get("instance_duplicates")]
+    if not entries:
+        yield
+        return
+    if not cmds.undoInfo(query=True, state=True):
+        log("Undo is off, publishing duplicate meshes without instancing them.")
+        yield
+        return
+    cmds.undoInfo(openChunk=True, chunkName=instance_chunk_name)
+    try:
+        for entry in entries:
+            with profiler.span("publish_instance_duplicates", "publish", asset=entry["name"]):
+                duplicate_geometry.instance_duplicates(cmds, duplicate_geometry.find_duplicates(cmds, [entry["root"]]), log)
+        yield
+    finally:
+        cmds.undoInfo(closeChunk=True)
+        #Maya drops an empty chunk, undoing then would undo the artist's last action
+        if cmds.undoInfo(query=True, undoName=True) == instance_chunk_name:
+            cmds.undo()
+            log("Restored the meshes instanced for the publish.")
+
+
+def run_publish_steps(cmds, entries, log=print, write_index=True):
+    """
+    Export the .mb and FBX of every entry, then all Alembic caches in one pass, and index the versions.
+    Staged publishes pass write_index=False, their versions are indexed after the upload. Entries asking
+    for it have their duplicate meshes instanced for the export (see duplicates_instanced). Each asset's
+    export times go to the publish history the dry-run estimates are drawn from.
+    Returns {"seconds": {step: total seconds}, "assets": [{"name", "files", "sizes"}]}.
+    """
+    step_seconds = {"cache": 0.0, "fbx": 0.0, "alembic": 0.0}
+    with duplicates_instanced(cmds, entries, log):
+        measures = publish_estimates.measure_entries(cmds, entries)
+        asset_seconds = dict((entry["name"], {}) for entry in entries)
+        for entry in entries:
+            for file_path in entry["files"].values():
+                _make_parent_dir(file_path)
+
+            start_time = time.perf_counter()
+            with profiler.span("publish_maya_binary", "publish", asset=entry["name"]):
+                export_asset_scoped(cmds, entry["root"], entry["files"]["cache"], "mayaBinary")
+            asset_seconds[entry["name"]]["cache"] = time.perf_counter() - start_time
+            step_seconds["cache"] += asset_seconds[entry["name"]]["cache"]
+
+            start_time = time.perf_counter()
+            with profiler.span("publish_fbx", "publish", asset=entry["name"]):
+                export_asset_scoped(cmds, entry["root"], entry["files"]["fbx"], "FBX export", options="v=0;")
+            asset_seconds[entry["name"]]["fbx"] = time.perf_counter() - start_time
+            step_seconds["fbx"] += asset_seconds[entry["name"]]["fbx"]
+        log("Exporting Maya Binary and FBX of {0} assets done.".format(len(entries)))
+
+        if entries:
+            step_seconds["alembic"], alembic_sizes = export_alembic_jobs(
+                cmds, [(entry["name"], entry["files"]["alembic"], entry["alembic_job"]) for entry in entries], log)
+            log("Publishing Alembic Assets Done.")
+            total_size = sum(alembic_sizes) or 1
+            for entry, size in zip(entries, alembic_sizes):
+                asset_seconds[entry["name"]]["alembic"] = step_seconds["alembic"] * size / total_size
+            publish_estimates.record_publish(entries, measures, asset_seconds, log)
+
+    if write_index:
+        step_seconds["checksums"] = index_versions(entries)
+
+    return {
+        "seconds": step_seconds,
+        "assets": [
+            {"name": entry["name"], "files": entry["files"],
+             "sizes": {step: os.path.getsize(file_path) if os.path.isfile(file_path) else 0
+                       for step, file_path in entry["files"].items()}}
+            for entry in entries
+        ],
+    }
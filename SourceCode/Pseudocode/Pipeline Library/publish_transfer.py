@@ -0,0 +1,252 @@
+# Script Name: Publish Transfer
+# Description: Staged publishing. Exports are written to fast local disk under the staging folder, then
+#transfer workers copy each published version to the publish share in the background, so Maya is never
+#blocked on network writes.
+#
+#Every version is one transfer job in a publish_queue.PublishQueue kept in the staging folder. Workers
+#copy with several parallel streams under a shared bandwidth cap, resume interrupted copies from the
+#partial file left on the share, verify the copy's SHA-256 against the staged file and only then rename
+#it into place. The version is indexed (publish_index) after all of its files are verified, and the
+#staged files are removed.
+#
+#   VFX_PUBLISH_STAGING_DIR=<dir>   local staging folder (default ~/.vfx_pipeline/staging)
+#
+#Usage:
+#   python publish_transfer.py worker --streams 4 --limit-mbps 40
+#   python publish_transfer.py list
+
+import os
+import sys
+import time
+import socket
+import hashlib
+import argparse
+import threading
+
+library_dir = os.path.dirname(os.path.abspath(__file__))
+if library_dir not in sys.path:
+    sys.path.append(library_dir)
+import asset_catalog
+import publish_index
+import publish_queue
+import thumbnails
+import version_reservation
+
+default_staging_dir = os.environ.get("VFX_PUBLISH_STAGING_DIR", os.path.join(os.path.expanduser("~"), ".vfx_pipeline", "staging"))
+chunk_size = 4 * 1048576
+partial_prefix = ".partial_"
+#Copies heartbeat often, so a dead transfer worker is noticed quickly
+transfer_stale_seconds = 60.0
+default_streams = 4
+
+
+def transfer_queue(staging_dir=None):
+    return publish_queue.PublishQueue(os.path.join(staging_dir or default_staging_dir, "transfers"),
+                                      stale_after=transfer_stale_seconds)
+
+
+def worker_command(streams=default_streams, limit_mbps=None, staging_dir=None):
+    #Inside Maya sys.executable is the Maya binary, the worker needs a plain interpreter
+    command = [os.environ.get("MAYAPY", "mayapy") if "maya" in os.path.basename(sys.executable).lower() else sys.executable,
+               os.path.abspath(__file__), "--staging-dir", staging_dir or default_staging_dir,
+               "worker", "--streams", str(streams)]
+    if limit_mbps:
+        command += ["--limit-mbps", str(limit_mbps)]
+    return command
+
+
+def ensure_transfer_workers(streams=default_streams, limit_mbps=None, staging_dir=None):
+    """
+    Start a transfer worker unless one is alive. Returns the pids of started workers.
+    """
+    return transfer_queue(staging_dir).ensure_workers(1, worker_command(streams, limit_mbps, staging_dir))
+
+
+def stage_path(final_path, staging_dir=None):
+    """
+    Mirror of final_path under the staging folder.
+    """
+    drive, path = os.path.splitdrive(os.path.abspath(final_path))
+    return os.path.join(staging_dir or default_staging_dir, "files", drive.replace(":", "").strip("\\/"), path.lstrip("\\/"))
+
+
+def staged_entries(entries, staging_dir=None):
+    """
+    Copies of publish entries (see publish_steps) exporting to staging, with the share paths in "publish_files".
+    """
+    return [dict(entry, files=dict((file_format, stage_path(file_path, staging_dir)) for file_format, file_path in entry["files"].items()),
+                 publish_files=entry["files"]) for entry in entries]
+
+
+def submit_staged(staged, staging_dir=None):
+    """
+    Queue one transfer job per exported version. Returns the job ids.
+    """
+    queue = transfer_queue(staging_dir)
+    job_ids = []
+    for entry in staged:
+        payload = {
+            "asset_dir": entry["asset_dir"],
+            "prefix": entry["prefix"],
+            "version": entry["version"],
+            "files": [{"format": file_format, "source": entry["files"][file_format], "destination": entry["publish_files"][file_format]}
+                      for file_format in sorted(entry["files"])],
+        }
+        job_ids.append(queue.submit("transfer", "{0} v{1}".format(entry["name"], str(entry["version"]).zfill(3)), payload))
+    return job_ids
+
+
+class BandwidthLimiter(object):
+    """Token bucket shared by every stream of a worker; bytes_per_second of None means unlimited."""
+
+    def __init__(self, bytes_per_second=None, burst_seconds=0.25):
+        self.bytes_per_second = bytes_per_second
+        self.burst = (bytes_per_second or 0) * burst_seconds
+        self.available = 0.0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, byte_count):
+        if not self.bytes_per_second:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.available = min(self.burst, self.available + (now - self.updated) * self.bytes_per_second)
+            self.updated = now
+            self.available -= byte_count
+            wait = -self.available / self.bytes_per_second if self.available < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+
+
+def partial_path(destination):
+    directory, file_name = os.path.split(destination)
+    return os.path.join(directory, partial_prefix + file_name)
+
+
+def copy_file(source, destination, limiter=None):
+    """
+    Copy source to the partial file of destination, continuing after the bytes already there.
+    Returns (source SHA-256, bytes sent, offset resumed from).
+    """
+    destination_dir = os.path.dirname(destination)
+    if not os.path.isdir(destination_dir):
+        os.makedirs(destination_dir, exist_ok=True)
+    partial = partial_path(destination)
+    offset = os.path.getsize(partial) if os.path.isfile(partial) else 0
+    if offset > os.path.getsize(source):
+        offset = 0
+
+    digest = hashlib.sha256()
+    bytes_sent = 0
+    position = 0
+    with open(source, "rb") as source_file, open(partial, "ab" if offset else "wb") as partial_file:
+        for chunk in iter(lambda: source_file.read(chunk_size), b""):
+            digest.update(chunk)
+            if position + len(chunk) > offset:
+                remaining = chunk[max(0, offset - position):]
+                if limiter:
+                    limiter.consume(len(remaining))
+                partial_file.write(remaining)
+                bytes_sent += len(remaining)
+            position += len(chunk)
+        partial_file.flush()
+        os.fsync(partial_file.fileno())
+    return digest.hexdigest(), bytes_sent, offset
+
+
+def transfer_file(source, destination, limiter=None):
+    """
+    Copy, verify and commit one file. Returns its SHA-256 and copy statistics.
+    """
+    start_time = time.perf_counter()
+    if os.path.isfile(destination):
+        #Committed before the worker was interrupted, only the index is missing
+        source_sha256 = publish_index.file_sha256(source)
+        if publish_index.file_sha256(destination) != source_sha256:
+            raise IOError("{0} already exists and differs from the staged file".format(destination))
+        return source_sha256, {"bytes_sent": 0, "resumed_from": os.path.getsize(destination), "seconds": 0.0, "verify_seconds": 0.0}
+
+    for attempt in range(2):
+        source_sha256, bytes_sent, resumed_from = copy_file(source, destination, limiter)
+        verify_start = time.perf_counter()
+        if publish_index.file_sha256(partial_path(destination)) == source_sha256:
+            break
+        #A corrupt resumed partial gets one fresh copy before the job is retried
+        os.remove(partial_path(destination))
+    else:
+        raise IOError("Checksum mismatch copying {0} to {1}".format(source, destination))
+    version_reservation.commit_file(partial_path(destination), destination)
+    return source_sha256, {"bytes_sent": bytes_sent, "resumed_from": resumed_from,
+                           "seconds": time.perf_counter() - start_time, "verify_seconds": time.perf_counter() - verify_start}
+
+
+def transfer_version(job, limiter=None):
+    """
+    Transfer every file of one staged version, then index it and remove the staged files.
+    """
+    payload = job["payload"]
+    records = {}
+    statistics = {}
+    for file_info in payload["files"]:
+        sha256, statistics[file_info["format"]] = transfer_file(file_info["source"], file_info["destination"], limiter)
+        records[file_info["format"]] = publish_index.file_record(payload["asset_dir"], file_info["destination"], sha256=sha256)
+
+    if publish_index.read_version(payload["asset_dir"], payload["prefix"], payload["version"]) is None:
+        publish_index.write_version(payload["asset_dir"], payload["prefix"], payload["version"], records,
+                                    {"transferred_from": socket.gethostname()})
+        asset_catalog.record_files([file_info["destination"] for file_info in payload["files"]])
+        thumbnails.queue_previews([file_info["destination"] for file_info in payload["files"]])
+    for file_info in payload["files"]:
+        if os.path.isfile(file_info["source"]):
+            os.remove(file_info["source"])
+    return {"files": statistics}
+
+
+def run_worker(queue, streams=default_streams, limit_mbps=None, idle_exit_seconds=300, poll_seconds=1.0):
+    """
+    Drain the transfer queue with one thread per stream sharing the bandwidth cap. Returns the jobs run.
+    """
+    limiter = BandwidthLimiter(limit_mbps * 1048576 / 8.0 if limit_mbps else None)
+    worker_id = "{0}:{1}".format(socket.gethostname(), os.getpid())
+    jobs_run = []
+
+    def stream(stream_index):
+        jobs_run.append(publish_queue.work(queue, "{0}:stream{1}".format(worker_id, stream_index),
+                                           lambda job: transfer_version(job, limiter), idle_exit_seconds, poll_seconds,
+                                           retry_failures=True))
+
+    threads = [threading.Thread(target=stream, args=(stream_index,), name="transfer-stream-{0}".format(stream_index))
+               for stream_index in range(streams)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(jobs_run)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Copy staged publishes to the publish share.")
+    parser.add_argument("--staging-dir", default=default_staging_dir)
+    commands = parser.add_subparsers(dest="command", required=True)
+    worker_parser = commands.add_parser("worker", help="run a transfer worker")
+    worker_parser.add_argument("--streams", type=int, default=default_streams, help="parallel copies")
+    worker_parser.add_argument("--limit-mbps", type=float, help="bandwidth cap for all streams together, in megabits per second")
+    worker_parser.add_argument("--queue-dir", help="set by publish_queue when it starts the worker")
+    worker_parser.add_argument("--idle-exit", type=float, default=300.0, help="exit after this many seconds without transfers")
+    commands.add_parser("list", help="show queued, running and recent transfers")
+    options = parser.parse_args(argv)
+
+    queue = transfer_queue(options.staging_dir)
+    if options.command == "worker":
+        if options.queue_dir:
+            queue = publish_queue.PublishQueue(options.queue_dir, stale_after=transfer_stale_seconds)
+        print("Transferred {0} versions.".format(run_worker(queue, options.streams, options.limit_mbps, options.idle_exit)))
+    elif options.command == "list":
+        for job in queue.jobs():
+            print(publish_queue.format_job(job))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
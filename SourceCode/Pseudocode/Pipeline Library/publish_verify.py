@@ -0,0 +1,135 @@
+# Script Name: Publish Verify
+# Description: Checks the published tree against the checksum manifest in the version index
+#(publish_index). Files are hashed in parallel through memory-mapped reads. By default a file whose size
+#and mtime still match its record is taken as intact and skipped, so repeated runs over a large tree only
+#read what changed; --full hashes everything.
+#
+#Usage:
+#   python publish_verify.py <root>/asset_final/published
+#   python publish_verify.py <root>/asset_final/published --full --workers 16 --json report.json
+
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+library_dir = os.path.dirname(os.path.abspath(__file__))
+if library_dir not in sys.path:
+    sys.path.append(library_dir)
+import publish_index
+import version_reservation
+
+#Format folders whose files should all be covered by the manifest
+manifest_formats = ["cache", "alembic", "fbx"]
+#Result states. Problems mean damaged publishes; warnings are files the manifest cannot vouch for,
+#e.g. versions published before the index existed
+result_states = ["ok", "unchanged", "missing", "size_changed", "corrupt", "no_checksum", "unindexed"]
+problem_states = ["missing", "size_changed", "corrupt"]
+warning_states = ["no_checksum", "unindexed"]
+#mtimes are compared with this slack, some shares round them
+mtime_tolerance = 0.001
+
+
+def read_version_records(asset_dir):
+    index_dir = os.path.join(asset_dir, publish_index.index_dir_name)
+    records = []
+    for record_name in sorted(os.listdir(index_dir)):
+        if record_name.endswith(".json") and not record_name.startswith(version_reservation.temp_prefix):
+            with open(os.path.join(index_dir, record_name)) as record_file:
+                records.append(json.load(record_file))
+    return records
+
+
+def verify_tree(published_root, full=False, workers=None):
+    """
+    Verify every indexed file under published_root in one walk of the tree. Returns a report with the count
+    per state, the problems as (state, path, detail) and the bytes hashed.
+    """
+    start_time = time.perf_counter()
+    counts = dict((state, 0) for state in result_states)
+    problems = []
+    to_hash = []
+    indexed_paths = set()
+    published_files = []
+
+    for directory, directory_names, file_names in os.walk(published_root):
+        if os.path.basename(directory) in manifest_formats:
+            published_files.extend(os.path.normpath(os.path.join(directory, file_name)) for file_name in file_names if not file_name.startswith("."))
+        if publish_index.index_dir_name in directory_names:
+            for record in read_version_records(directory):
+                for file_format, file_info in record["files"].items():
+                    file_path = os.path.normpath(os.path.join(directory, file_info["path"]))
+                    indexed_paths.add(file_path)
+                    try:
+                        stat = os.stat(file_path)
+                    except OSError:
+                        counts["missing"] += 1
+                        problems.append(("missing", file_path, "indexed in {0} v{1}".format(record["prefix"], record["version"])))
+                        continue
+                    if stat.st_size != file_info["size"]:
+                        counts["size_changed"] += 1
+                        problems.append(("size_changed", file_path, "{0} bytes, manifest {1}".format(stat.st_size, file_info["size"])))
+                    elif not full and file_info.get("sha256") and abs(stat.st_mtime - file_info["mtime"]) <= mtime_tolerance:
+                        counts["unchanged"] += 1
+                    else:
+                        to_hash.append((file_path, file_info.get("sha256"), stat.st_size))
+        #Index, claim and temp folders hold no published files
+        directory_names[:] = [name for name in directory_names if not name.startswith(".")]
+
+    with ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 1) * 2)) as pool:
+        hashes = pool.map(publish_index.file_sha256, [file_path for file_path, expected, size in to_hash])
+        for (file_path, expected, size), sha256 in zip(to_hash, hashes):
+            if expected is None:
+                counts["no_checksum"] += 1
+                problems.append(("no_checksum", file_path, "sha256 " + sha256))
+            elif sha256 != expected:
+                counts["corrupt"] += 1
+                problems.append(("corrupt", file_path, "sha256 {0}, manifest {1}".format(sha256, expected)))
+            else:
+                counts["ok"] += 1
+
+    #Published files the manifest does not cover
+    for file_path in published_files:
+        if file_path not in indexed_paths:
+            counts["unindexed"] += 1
+            problems.append(("unindexed", file_path, ""))
+
+    return {
+        "root": published_root,
+        "full": full,
+        "counts": counts,
+        "problems": problems,
+        "bytes_hashed": sum(size for file_path, expected, size in to_hash),
+        "seconds": time.perf_counter() - start_time,
+    }
+
+
+def summary_line(report):
+    counts = report["counts"]
+    return "{0} files verified, {1} unchanged, {2} problems, {3} warnings, {4:.1f} MB hashed in {5:.2f}s".format(
+        counts["ok"], counts["unchanged"], sum(counts[state] for state in problem_states),
+        sum(counts[state] for state in warning_states), report["bytes_hashed"] / 1048576.0, report["seconds"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verify the published tree against its checksum manifest.")
+    parser.add_argument("published_root")
+    parser.add_argument("--full", action="store_true", help="hash every file, not only changed ones")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--json", help="write the full report to this file")
+    options = parser.parse_args(argv)
+
+    report = verify_tree(options.published_root, options.full, options.workers)
+    for state, file_path, detail in report["problems"]:
+        print("{0:<13} {1} {2}".format(state.upper(), file_path, detail))
+    print(summary_line(report))
+    if options.json:
+        with open(options.json, "w") as json_file:
+            json.dump(report, json_file, indent=2)
+    return 1 if any(report["counts"][state] for state in problem_states) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+# Script Name: Scene References
+# Description: Finds the versioned files (<name>_vNNN.abc/.fbx/.mb/.ma) a Maya scene points to without
+#opening it in Maya. Reference and cache paths are stored as plain strings in both .ma and .mb scenes, so
+#a regular expression over the memory-mapped file finds them.
+#
+#   VFX_LIGHTING_SCENE_DIRS=<dir>[<os.pathsep><dir>...]   where lighting scenes are saved
+
+import os
+import re
+import mmap
+
+scene_extensions = (".ma", ".mb")
+#Format folders below an asset folder, version files outside them belong to the folder itself
+format_dir_names = ["cache", "alembic", "fbx"]
+version_file_pattern = re.compile(r"^(?P<prefix>.+)_v(?P<version>\d+)\.\w+$")
+#Absolute (drive, UNC or POSIX) or $ENV-rooted paths ending in a versioned published file
+reference_pattern = re.compile(rb'(?:[A-Za-z]:[\\/]|[\\/]{1,2}|\$\w+[\\/])[^\x00-\x1f"<>|*?]*?_v\d+\.(?:abc|fbx|mb|ma)(?![\w.])', re.IGNORECASE)
+
+
+def lighting_scene_dirs(root_dir=None):
+    """
+    Folders searched for lighting scenes: VFX_LIGHTING_SCENE_DIRS, or the saved sequence scenes of root_dir.
+    """
+    configured = os.environ.get("VFX_LIGHTING_SCENE_DIRS")
+    if configured:
+        return [directory for directory in configured.split(os.pathsep) if directory]
+    if root_dir:
+        return [os.path.join(root_dir, "asset_wips", "saved", "sequence")]
+    return []
+
+
+def normalize_path(file_path):
+    return os.path.normcase(os.path.normpath(os.path.expandvars(file_path)))
+
+
+def parse_version_file(file_path):
+    """
+    (asset dir, prefix, version) of a versioned file, or None.
+    """
+    directory, file_name = os.path.split(file_path)
+    match = version_file_pattern.match(file_name)
+    if not match or file_name.startswith("."):
+        return None
+    asset_dir = os.path.dirname(directory) if os.path.basename(directory) in format_dir_names else directory
+    return asset_dir, match.group("prefix"), int(match.group("version"))
+
+
+def scene_references(scene_file):
+    """
+    Normalized paths of every versioned file referenced by scene_file.
+    """
+    with open(scene_file, "rb") as read_file:
+        if os.fstat(read_file.fileno()).st_size == 0:
+            return set()
+        with mmap.mmap(read_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            found = set(match.group(0) for match in reference_pattern.finditer(mapped))
+    return set(normalize_path(path.decode("utf-8", "replace")) for path in found)
+
+
+def find_scenes(scene_dirs):
+    for scene_dir in scene_dirs:
+        for directory, directory_names, file_names in os.walk(scene_dir):
+            directory_names[:] = [name for name in directory_names if not name.startswith(".")]
+            for file_name in file_names:
+                if file_name.lower().endswith(scene_extensions) and not file_name.startswith("."):
+                    yield os.path.join(directory, file_name)
+
+
+def referenced_files(scene_dirs):
+    """
+    Union of the versioned files referenced by every scene under scene_dirs.
+    """
+    referenced = set()
+    for scene_file in find_scenes(scene_dirs):
+        referenced.update(scene_references(scene_file))
+    return referenced
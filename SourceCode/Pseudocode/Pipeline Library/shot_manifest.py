@@ -0,0 +1,287 @@
+# Script Name: Shot Manifest
+# Description: Per-shot build manifest written by sequence cache publishing,
+#<shot dir>/shot_manifest.json. It lists every character, prop and camera cache of the shot with the
+#path (relative to the shot folder), version, size and publish time to build from and the namespace it is
+#imported under, so the Lighting Tool builds a shot from one small read instead of listing and parsing
+#the cache folder.
+#
+#The manifest only holds what a build needs: the latest version of each cache and the version it is
+#pinned to, if any. Every published version is kept in <shot dir>/shot_manifest_history.json, read only to
+#pin or to rebuild a shot "as of" a date (the newest version of each cache published by then). Shots
+#published before manifests existed can be backfilled from their cache folders with the rebuild command.
+#
+#Usage:
+#   python shot_manifest.py show <shot dir> [--as-of 2024-05-01T18:00]
+#   python shot_manifest.py pin <shot dir> <cache name> <version>
+#   python shot_manifest.py unpin <shot dir> <cache name>
+#   python shot_manifest.py rebuild <root>/asset_final/published/sequence
+
+import os
+import re
+import sys
+import json
+import time
+import errno
+import argparse
+from contextlib import contextmanager
+
+library_dir = os.path.dirname(os.path.abspath(__file__))
+if library_dir not in sys.path:
+    sys.path.append(library_dir)
+import version_reservation
+
+manifest_file_name = "shot_manifest.json"
+history_file_name = "shot_manifest_history.json"
+lock_file_name = ".shot_manifest.lock"
+cache_dir_name = "cache"
+#Cache names end in their kind: <shot>_<asset>_<char|prop|cam>
+cache_kinds = ["char", "prop", "cam"]
+cache_file_pattern = re.compile(r"^(?P<name>.+)_v(?P<version>\d+)\.(?:abc|fbx)$")
+#A lock older than this was left by a crashed publish
+stale_lock_seconds = 60.0
+
+
+def manifest_path(shot_dir):
+    return os.path.join(shot_dir, manifest_file_name)
+
+
+def history_path(shot_dir):
+    return os.path.join(shot_dir, history_file_name)
+
+
+def cache_kind(cache_name):
+    kind = cache_name.rsplit("_", 1)[-1]
+    return kind if kind in cache_kinds else ""
+
+
+def parse_as_of(value):
+    """
+    Seconds since the epoch of a local "YYYY-MM-DD" or "YYYY-MM-DDTHH:MM" date, the whole day when no time is given.
+    """
+    if "T" in value:
+        return time.mktime(time.strptime(value, "%Y-%m-%dT%H:%M")) + 59.999
+    return time.mktime(time.strptime(value, "%Y-%m-%d")) + 86399.999
+
+
+def _read_json(file_path):
+    try:
+        with open(file_path) as json_file:
+            return json.load(json_file)
+    except (IOError, OSError):
+        return None
+
+
+def read_manifest(shot_dir):
+    """
+    The shot's manifest, or None when the shot has none.
+    """
+    return _read_json(manifest_path(shot_dir))
+
+
+def read_history(shot_dir):
+    """
+    {cache name: [version entries, oldest first]} of every version published for the shot.
+    """
+    return _read_json(history_path(shot_dir)) or {}
+
+
+@contextmanager
+def _locked(shot_dir):
+    #Exclusive create, like version claims: publishers of the same shot update its manifest one at a time
+    lock_path = os.path.join(shot_dir, lock_file_name)
+    while True:
+        try:
+            lock_file = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            break
+        except OSError as error:
+            if error.errno != errno.EEXIST:
+                raise
+            try:
+                if time.time() - os.path.getmtime(lock_path) > stale_lock_seconds:
+                    os.remove(lock_path)
+                    continue
+            except OSError:
+                continue
+            time.sleep(0.05)
+    os.close(lock_file)
+    try:
+        yield
+    finally:
+        os.remove(lock_path)
+
+
+def _replace_json(final_path, data):
+    temp_file = version_reservation.temp_path(final_path)
+    with open(temp_file, "w") as json_file:
+        json.dump(data, json_file, indent=2, sort_keys=True)
+    #Manifests are the files here that are meant to change, so they are replaced rather than committed
+    os.replace(temp_file, final_path)
+
+
+def _write(shot_dir, history, pins):
+    """
+    Write the history, then the manifest derived from it: latest and pinned entry per cache.
+    """
+    _replace_json(history_path(shot_dir), history)
+    caches = {}
+    for cache_name, versions in history.items():
+        pinned = [entry for entry in versions if entry["version"] == pins.get(cache_name)]
+        caches[cache_name] = {
+            "kind": cache_kind(cache_name),
+            "namespace": cache_name,
+            "latest": versions[-1],
+            "pinned": pinned[0] if pinned else None,
+        }
+    _replace_json(manifest_path(shot_dir), {"shot": os.path.basename(os.path.normpath(shot_dir)), "updated": time.time(), "caches": caches})
+
+
+def _pins(manifest):
+    return dict((cache_name, cache["pinned"]["version"]) for cache_name, cache in (manifest or {"caches": {}})["caches"].items()
+                if cache.get("pinned"))
+
+
+def _add_version(history, shot_dir, cache_name, file_path, version, published):
+    versions = [entry for entry in history.get(cache_name, []) if entry["version"] != version]
+    versions.append({
+        "version": version,
+        "file": os.path.relpath(file_path, shot_dir).replace(os.sep, "/"),
+        "size": os.path.getsize(file_path),
+        "published": published,
+    })
+    history[cache_name] = sorted(versions, key=lambda entry: entry["version"])
+
+
+def record_caches(shot_dir, caches):
+    """
+    Add freshly published caches to the shot's manifest. caches holds dicts with name, file and version.
+    """
+    with _locked(shot_dir):
+        history = read_history(shot_dir)
+        published = time.time()
+        for cache in caches:
+            _add_version(history, shot_dir, cache["name"], cache["file"], cache["version"], published)
+        _write(shot_dir, history, _pins(read_manifest(shot_dir)))
+    return manifest_path(shot_dir)
+
+
+def build_from_directory(shot_dir):
+    """
+    Write the manifest of a shot from the files in its cache folder, taking their mtimes as publish times.
+    Pins already set are kept. Returns the number of cache versions found.
+    """
+    history = {}
+    for entry in os.scandir(os.path.join(shot_dir, cache_dir_name)):
+        match = cache_file_pattern.match(entry.name)
+        if match and entry.is_file():
+            _add_version(history, shot_dir, match.group("name"), entry.path, int(match.group("version")), entry.stat().st_mtime)
+    with _locked(shot_dir):
+        _write(shot_dir, history, _pins(read_manifest(shot_dir)))
+    return sum(len(versions) for versions in history.values())
+
+
+def set_pin(shot_dir, cache_name, version=None):
+    """
+    Pin a cache of the shot to version, or unpin it with None.
+    """
+    with _locked(shot_dir):
+        history = read_history(shot_dir)
+        if cache_name not in history:
+            raise KeyError("{0} has no cache {1}".format(shot_dir, cache_name))
+        if version is not None and int(version) not in [entry["version"] for entry in history[cache_name]]:
+            raise KeyError("{0} has no version {1}".format(cache_name, version))
+        pins = _pins(read_manifest(shot_dir))
+        pins[cache_name] = None if version is None else int(version)
+        _write(shot_dir, history, pins)
+
+
+def resolve(manifest, shot_dir, as_of=None, use_pins=True):
+    """
+    The caches to build the shot from: the pinned version of each cache, else the newest one (published
+    by as_of, when given, which reads the history). Returns dicts with name, kind, namespace, version, path,
+    size, published and pinned, sorted by kind and name; caches with nothing published by as_of are left out.
+    """
+    history = read_history(shot_dir) if as_of is not None else None
+    resolved = []
+    for cache_name, cache in sorted(manifest["caches"].items(), key=lambda item: (item[1]["kind"], item[0])):
+        pinned = use_pins and cache.get("pinned")
+        if pinned:
+            entry = pinned
+        elif history is not None:
+            published = [entry for entry in history.get(cache_name, []) if entry["published"] <= as_of]
+            if not published:
+                continue
+            entry = published[-1]
+        else:
+            entry = cache["latest"]
+        resolved.append({
+            "name": cache_name,
+            "kind": cache["kind"],
+            "namespace": cache["namespace"],
+            "version": entry["version"],
+            "path": os.path.join(shot_dir, *entry["file"].split("/")),
+            "size": entry["size"],
+            "published": entry["published"],
+            "pinned": bool(pinned),
+        })
+    return resolved
+
+
+def pinned_versions(shot_dir):
+    """
+    {cache name: version} of the shot's pinned caches.
+    """
+    return _pins(read_manifest(shot_dir))
+
+
+def find_shot_dirs(sequence_dir):
+    """
+    <episode>/<shot> folders below sequence_dir that hold a cache folder.
+    """
+    for episode in sorted(os.listdir(sequence_dir)):
+        episode_dir = os.path.join(sequence_dir, episode)
+        if os.path.isdir(episode_dir) and not episode.startswith("."):
+            for shot in sorted(os.listdir(episode_dir)):
+                if os.path.isdir(os.path.join(episode_dir, shot, cache_dir_name)):
+                    yield os.path.join(episode_dir, shot)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show, pin and rebuild shot build manifests.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    show_parser = commands.add_parser("show", help="caches a shot builds from")
+    show_parser.add_argument("shot_dir")
+    show_parser.add_argument("--as-of", help="newest versions published by YYYY-MM-DD or YYYY-MM-DDTHH:MM")
+    show_parser.add_argument("--ignore-pins", action="store_true")
+    pin_parser = commands.add_parser("pin", help="pin a cache to a version")
+    pin_parser.add_argument("shot_dir")
+    pin_parser.add_argument("cache_name")
+    pin_parser.add_argument("version", type=int)
+    unpin_parser = commands.add_parser("unpin", help="follow the newest version again")
+    unpin_parser.add_argument("shot_dir")
+    unpin_parser.add_argument("cache_name")
+    rebuild_parser = commands.add_parser("rebuild", help="write manifests from the cache folders of every shot")
+    rebuild_parser.add_argument("sequence_dir")
+    options = parser.parse_args(argv)
+
+    if options.command == "show":
+        manifest = read_manifest(options.shot_dir)
+        if manifest is None:
+            print("{0} has no manifest, run rebuild".format(options.shot_dir))
+            return 1
+        as_of = parse_as_of(options.as_of) if options.as_of else None
+        for cache in resolve(manifest, options.shot_dir, as_of, not options.ignore_pins):
+            print("{0:<5} {1} v{2}{3}  {4:.1f} MB  {5}".format(cache["kind"], cache["name"], str(cache["version"]).zfill(3),
+                                                             " (pinned)" if cache["pinned"] else "", cache["size"] / 1048576.0,
+                                                             time.strftime("%Y-%m-%d %H:%M", time.localtime(cache["published"]))))
+    elif options.command == "pin":
+        set_pin(options.shot_dir, options.cache_name, options.version)
+    elif options.command == "unpin":
+        set_pin(options.shot_dir, options.cache_name, None)
+    elif options.command == "rebuild":
+        for shot_dir in find_shot_dirs(options.sequence_dir):
+            print("{0}: {1} cache versions".format(shot_dir, build_from_directory(shot_dir)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
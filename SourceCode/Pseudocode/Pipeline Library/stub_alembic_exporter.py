@@ -0,0 +1,38 @@
+# Script Name: Stub Alembic Exporter
+# Description: Stand-in for alembic_chunk_worker.py that needs no Maya. Takes the same job spec and writes
+#one JSON "cache" per job with a deterministic sample per frame, so chunked exports can be merged and
+#verified against a single-process export in tests and benchmarks.
+#
+#Usage: python stub_alembic_exporter.py <job spec json>
+
+import os
+import sys
+import json
+import zlib
+
+
+def sample_value(root, frame):
+    # Deterministic per root and frame, so any two exports of the same frame agree
+    return zlib.crc32("{0}@{1}".format(root, frame).encode("utf-8")) / 4294967295.0
+
+
+def main(spec_path):
+    with open(spec_path) as spec_file:
+        spec = json.load(spec_file)
+
+    start, end = spec["frame_range"]
+    for job in spec["jobs"]:
+        output_dir = os.path.dirname(job["file"])
+        if output_dir and not os.path.isdir(output_dir):
+            os.makedirs(output_dir)
+        cache = {
+            "format": "stub_alembic",
+            "root": job["root"],
+            "samples": [[float(frame), sample_value(job["root"], frame)] for frame in range(int(start), int(end) + 1)],
+        }
+        with open(job["file"], "w") as cache_file:
+            json.dump(cache, cache_file)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1])
@@ -0,0 +1,31 @@
+# Script Name: Stub Promote Converter
+# Description: Stand-in for promote_convert_worker.py that needs no Maya. Takes the same spec and writes
+#an Alembic and FBX stand-in holding the saved file's bytes, the Alembic once per frame when a range is
+#given, so promotion can be run and verified in tests and benchmarks. VFX_STUB_CONVERT_SECONDS adds the
+#wait of a real conversion (Maya start-up, scene load) to every file.
+#
+#Usage: python stub_promote_converter.py <spec json>
+
+import os
+import sys
+import json
+import time
+
+
+def main(spec_path):
+    with open(spec_path) as spec_file:
+        spec = json.load(spec_file)
+
+    time.sleep(float(os.environ.get("VFX_STUB_CONVERT_SECONDS", "0")))
+    with open(spec["scene"], "rb") as scene_file:
+        scene = scene_file.read()
+    start, end = spec["frame_range"] or (1, 1)
+    with open(spec["outputs"]["alembic"], "wb") as alembic_file:
+        for frame in range(int(start), int(end) + 1):
+            alembic_file.write(scene)
+    with open(spec["outputs"]["fbx"], "wb") as fbx_file:
+        fbx_file.write(scene)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1])
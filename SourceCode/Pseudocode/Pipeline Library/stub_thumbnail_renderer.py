@@ -0,0 +1,34 @@
+# Script Name: Stub Thumbnail Renderer
+# Description: Stand-in for thumbnail_render_worker.py that needs no Maya. Writes a flat PNG coloured from
+#the source file's content, so the same content always gives the same image, in tests and benchmarks.
+#VFX_STUB_RENDER_SECONDS adds the wait of a real render (scene load, GPU readback) to every image.
+#
+#Usage: python stub_thumbnail_renderer.py <source file> <output png> <size>
+
+import os
+import sys
+import time
+import zlib
+import struct
+
+
+def png_chunk(chunk_type, data):
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data) & 0xffffffff)
+
+
+def main(source, output, size):
+    size = int(size)
+    time.sleep(float(os.environ.get("VFX_STUB_RENDER_SECONDS", "0")))
+    with open(source, "rb") as source_file:
+        checksum = zlib.crc32(source_file.read())
+    colour = struct.pack("BBB", checksum & 0xff, (checksum >> 8) & 0xff, (checksum >> 16) & 0xff)
+    rows = b"".join(b"\x00" + colour * size for row in range(size))
+    with open(output, "wb") as image_file:
+        image_file.write(b"\x89PNG\r\n\x1a\n")
+        image_file.write(png_chunk(b"IHDR", struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0)))
+        image_file.write(png_chunk(b"IDAT", zlib.compress(rows)))
+        image_file.write(png_chunk(b"IEND", b""))
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:4])
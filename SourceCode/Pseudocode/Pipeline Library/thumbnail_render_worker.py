@@ -0,0 +1,61 @@
+# Script Name: Thumbnail Render Worker
+# Description: Headless mayapy preview render of one scene or Alembic cache, run by the thumbnail workers
+#(thumbnails.py). Opens the scene, or imports the cache into an empty scene, frames everything with a
+#preview camera and renders one Hardware 2.0 frame at the cache's first frame to the output PNG.
+#
+#Usage: mayapy thumbnail_render_worker.py <source file> <output png> <size>
+
+import os
+import sys
+import glob
+import shutil
+import tempfile
+
+
+def render_preview(cmds, mel, source, output, size):
+    if source.lower().endswith(".abc"):
+        cmds.file(new=True, force=True)
+        cmds.loadPlugin("AbcImport", quiet=True)
+        cmds.AbcImport(source, mode="import")
+    else:
+        cmds.file(source, open=True, force=True, loadReferenceDepth="all")
+
+    camera, camera_shape = cmds.camera(name="thumbnail_camera")
+    cmds.setAttr(camera + ".rotate", -20, 35, 0, type="double3")
+    cmds.viewFit(camera_shape, all=True)
+    for other_camera in cmds.ls(type="camera"):
+        cmds.setAttr(other_camera + ".renderable", other_camera == camera_shape)
+
+    cmds.setAttr("defaultResolution.width", size)
+    cmds.setAttr("defaultResolution.height", size)
+    cmds.setAttr("defaultResolution.deviceAspectRatio", 1.0)
+    cmds.setAttr("defaultRenderGlobals.imageFormat", 32)
+    cmds.setAttr("defaultRenderGlobals.animation", 0)
+
+    #Render to a scratch folder, Maya names the image after the scene and camera
+    render_dir = tempfile.mkdtemp(prefix="thumbnail_")
+    try:
+        cmds.workspace(fileRule=["images", render_dir])
+        cmds.currentTime(cmds.playbackOptions(query=True, minTime=True))
+        mel.eval('ogsRender -camera "{0}" -width {1} -height {2}'.format(camera_shape, size, size))
+        rendered = glob.glob(os.path.join(render_dir, "**", "*.png"), recursive=True)
+        if not rendered:
+            raise RuntimeError("Hardware 2.0 render of {0} wrote no image".format(source))
+        shutil.move(rendered[0], output)
+    finally:
+        shutil.rmtree(render_dir, ignore_errors=True)
+
+
+def main(source, output, size):
+    import maya.standalone
+    maya.standalone.initialize(name="python")
+    try:
+        import maya.cmds as cmds
+        import maya.mel as mel
+        render_preview(cmds, mel, source, output, int(size))
+    finally:
+        maya.standalone.uninitialize()
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:4])
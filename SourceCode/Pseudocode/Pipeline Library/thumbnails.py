@@ -0,0 +1,394 @@
+# Script Name: Thumbnails
+# Description: Preview images of saved and published scenes and caches. Saves and publishes queue one
+#render job per file (a publish_queue.PublishQueue in <thumbnail dir>/jobs); a pool of worker threads
+#drains it, each running the renderer command in its own process, so several previews render at once
+#without blocking Maya.
+#
+#Images are keyed by content: the SHA-256 of the source file (from the publish index when the version is
+#indexed), the renderer and the image size. A file published again unchanged, or promoted as a hardlink,
+#reuses its image instead of rendering again. The cache drops the least recently shown images once it
+#grows past max_cache_mb. Tools look images up through ThumbnailLoader, which reads the cache on a
+#background thread so lists never wait on it.
+#
+#The renderer is a command run as <command> <source file> <output png> <size>:
+#   mayapy   thumbnail_render_worker.py, Maya Hardware 2.0 batch render of the file
+#   stub     stub_thumbnail_renderer.py, a flat PNG coloured from the file content, no Maya needed
+#
+#   VFX_THUMBNAIL_DIR=<dir>          jobs, worker logs and the image cache (default ~/.vfx_pipeline/thumbnails)
+#   VFX_THUMBNAIL_RENDERER=<name>    mayapy (default) or stub
+#   VFX_THUMBNAIL_WORKERS=<count>    previews rendered at once (default 2), 0 only queues them
+#
+#Usage:
+#   python thumbnails.py worker [--workers 2] [--renderer stub]
+#   python thumbnails.py render <file> [--renderer stub]
+#   python thumbnails.py list
+#   python thumbnails.py evict [--max-mb 512]
+
+import os
+import sys
+import time
+import socket
+import sqlite3
+import hashlib
+import argparse
+import tempfile
+import threading
+import subprocess
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+library_dir = os.path.dirname(os.path.abspath(__file__))
+if library_dir not in sys.path:
+    sys.path.append(library_dir)
+import publish_index
+import publish_queue
+import scene_references
+
+default_thumbnail_dir = os.environ.get("VFX_THUMBNAIL_DIR", os.path.join(os.path.expanduser("~"), ".vfx_pipeline", "thumbnails"))
+default_renderer = os.environ.get("VFX_THUMBNAIL_RENDERER", "mayapy")
+preview_extensions = (".mb", ".ma", ".abc")
+thumbnail_size = 256
+max_cache_mb = 512
+default_workers = int(os.environ.get("VFX_THUMBNAIL_WORKERS", "2"))
+#A Maya render can take minutes, the render process does not heartbeat
+render_stale_seconds = 900.0
+
+_schema = """
+CREATE TABLE IF NOT EXISTS images (
+    key TEXT PRIMARY KEY,
+    bytes INTEGER NOT NULL,
+    created REAL NOT NULL,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS images_used ON images (used);
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    key TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sources_key ON sources (key);
+"""
+
+
+def mayapy_renderer_command():
+    return [os.environ.get("MAYAPY", "mayapy"), os.path.join(library_dir, "thumbnail_render_worker.py")]
+
+
+def stub_renderer_command():
+    return [sys.executable, os.path.join(library_dir, "stub_thumbnail_renderer.py")]
+
+
+renderer_commands = {"mayapy": mayapy_renderer_command, "stub": stub_renderer_command}
+
+
+def image_key(sha256, renderer, size):
+    return hashlib.sha256("{0}:{1}:{2}".format(sha256, renderer, size).encode("utf-8")).hexdigest()
+
+
+def indexed_sha256(file_path):
+    """
+    SHA-256 of a file from its publish index record, when the record still matches the file.
+    """
+    parsed = scene_references.parse_version_file(file_path)
+    if not parsed:
+        return None
+    record = publish_index.read_version(*parsed)
+    if not record:
+        return None
+    stat = os.stat(file_path)
+    for file_record in record.get("files", {}).values():
+        if os.path.normcase(os.path.join(parsed[0], *file_record["path"].split("/"))) == os.path.normcase(file_path) \
+                and file_record.get("sha256") and file_record["size"] == stat.st_size and file_record["mtime"] == stat.st_mtime:
+            return file_record["sha256"]
+    return None
+
+
+class ThumbnailCache(object):
+    """Content-keyed preview images in <thumbnail dir>/cache with the least recently used evicted first."""
+
+    def __init__(self, thumbnail_dir=None):
+        self.cache_dir = os.path.join(thumbnail_dir or default_thumbnail_dir, "cache")
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir, exist_ok=True)
+        self.db_path = os.path.join(self.cache_dir, "thumbnails.db")
+        connection = sqlite3.connect(self.db_path, timeout=30.0)
+        try:
+            #Local like the job queue, and written by every render thread
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_schema)
+        finally:
+            connection.close()
+
+    @contextmanager
+    def _transaction(self):
+        connection = sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+        finally:
+            connection.close()
+
+    def image_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".png")
+
+    def lookup(self, source):
+        """
+        Cached image of source, or None when the file changed since it was rendered or was never rendered.
+        """
+        try:
+            stat = os.stat(source)
+        except OSError:
+            return None
+        path = scene_references.normalize_path(os.path.abspath(source))
+        with self._transaction() as connection:
+            row = connection.execute("SELECT size, mtime, key FROM sources WHERE path = ?", (path,)).fetchone()
+            if row is None or (row["size"], row["mtime"]) != (stat.st_size, stat.st_mtime):
+                return None
+            image_file = self.image_path(row["key"])
+            if not os.path.isfile(image_file):
+                return None
+            connection.execute("UPDATE images SET used = ? WHERE key = ?", (time.time(), row["key"]))
+        return image_file
+
+    def has_image(self, key):
+        return os.path.isfile(self.image_path(key))
+
+    def link(self, source, key):
+        """
+        Point source at an image already in the cache, e.g. an unchanged file published again.
+        """
+        stat = os.stat(source)
+        with self._transaction() as connection:
+            connection.execute("INSERT OR REPLACE INTO sources (path, size, mtime, key) VALUES (?, ?, ?, ?)",
+                               (scene_references.normalize_path(os.path.abspath(source)), stat.st_size, stat.st_mtime, key))
+            connection.execute("UPDATE images SET used = ? WHERE key = ?", (time.time(), key))
+
+    def store(self, source, key, image_file):
+        """
+        Move a rendered image into the cache under key and point source at it. Returns the cached path.
+        """
+        cached = self.image_path(key)
+        if not os.path.isdir(os.path.dirname(cached)):
+            os.makedirs(os.path.dirname(cached), exist_ok=True)
+        #Two workers rendering the same content write the same image, the last rename wins
+        os.replace(image_file, cached)
+        now = time.time()
+        with self._transaction() as connection:
+            connection.execute("INSERT OR REPLACE INTO images (key, bytes, created, used) VALUES (?, ?, ?, ?)",
+                               (key, os.path.getsize(cached), now, now))
+        self.link(source, key)
+        return cached
+
+    def total_bytes(self):
+        with self._transaction() as connection:
+            return connection.execute("SELECT COALESCE(SUM(bytes), 0) FROM images").fetchone()[0]
+
+    def evict(self, max_bytes=None):
+        """
+        Remove the least recently used images until the cache holds at most max_bytes.
+        Returns (images removed, bytes freed).
+        """
+        max_bytes = max_cache_mb * 1048576 if max_bytes is None else max_bytes
+        removed = []
+        with self._transaction() as connection:
+            total = connection.execute("SELECT COALESCE(SUM(bytes), 0) FROM images").fetchone()[0]
+            if total <= max_bytes:
+                return 0, 0
+            for row in connection.execute("SELECT key, bytes FROM images ORDER BY used").fetchall():
+                if total <= max_bytes:
+                    break
+                removed.append((row["key"], row["bytes"]))
+                total -= row["bytes"]
+            connection.executemany("DELETE FROM images WHERE key = ?", [(key,) for key, size in removed])
+            connection.executemany("DELETE FROM sources WHERE key = ?", [(key,) for key, size in removed])
+        for key, size in removed:
+            if os.path.isfile(self.image_path(key)):
+                os.remove(self.image_path(key))
+        return len(removed), sum(size for key, size in removed)
+
+
+def render_job(cache, job, renderer=None, max_bytes=None):
+    """
+    Render the preview of one queued file unless an image of the same content is cached already.
+    """
+    renderer = renderer or default_renderer
+    source = job["payload"]["source"]
+    size = job["payload"].get("size", thumbnail_size)
+    if cache.lookup(source):
+        return {"source": source, "rendered": False}
+    key = image_key(indexed_sha256(source) or publish_index.file_sha256(source), renderer, size)
+    if cache.has_image(key):
+        cache.link(source, key)
+        return {"source": source, "rendered": False, "key": key}
+
+    start_time = time.perf_counter()
+    temp_handle, temp_image = tempfile.mkstemp(suffix=".png", dir=cache.cache_dir)
+    os.close(temp_handle)
+    try:
+        completed = subprocess.run(renderer_commands[renderer]() + [source, temp_image, str(size)], stdout=subprocess.PIPE,
+                                   stderr=subprocess.STDOUT, universal_newlines=True)
+        if completed.returncode != 0 or not os.path.getsize(temp_image):
+            raise RuntimeError("Thumbnail renderer failed for {0}:\n{1}".format(source, completed.stdout))
+        cache.store(source, key, temp_image)
+    finally:
+        if os.path.isfile(temp_image):
+            os.remove(temp_image)
+    cache.evict(max_bytes)
+    return {"source": source, "rendered": True, "key": key, "seconds": time.perf_counter() - start_time}
+
+
+def thumbnail_queue(thumbnail_dir=None):
+    return publish_queue.PublishQueue(os.path.join(thumbnail_dir or default_thumbnail_dir, "jobs"), stale_after=render_stale_seconds)
+
+
+def worker_command(workers=default_workers, renderer=None, thumbnail_dir=None):
+    #The worker only hands files to renderer processes, a plain interpreter is enough
+    command = [os.environ.get("MAYAPY", "mayapy") if "maya" in os.path.basename(sys.executable).lower() else sys.executable,
+               os.path.abspath(__file__), "--thumbnail-dir", thumbnail_dir or default_thumbnail_dir,
+               "worker", "--workers", str(workers)]
+    if renderer:
+        command += ["--renderer", renderer]
+    return command
+
+
+def queue_previews(file_paths, workers=None, renderer=None, thumbnail_dir=None, log=print):
+    """
+    Queue a preview render for every scene or cache in file_paths and start a pool of workers (default
+    default_workers) unless one is alive; workers=0 only queues. Failures are reported, not raised, so
+    they never fail a save or publish. Returns the ids of the queued jobs.
+    """
+    sources = [file_path for file_path in file_paths if file_path.lower().endswith(preview_extensions)]
+    if not sources:
+        return []
+    try:
+        queue = thumbnail_queue(thumbnail_dir)
+        job_ids = [queue.submit("thumbnail", os.path.basename(source), {"source": os.path.abspath(source), "size": thumbnail_size})
+                   for source in sources]
+        workers = default_workers if workers is None else workers
+        if workers:
+            queue.ensure_workers(1, worker_command(workers, renderer, thumbnail_dir))
+        return job_ids
+    except (OSError, sqlite3.Error) as error:
+        log("WARNING: Could not queue previews: {0}".format(error))
+        return []
+
+
+def run_worker(queue, cache, workers=default_workers, renderer=None, idle_exit_seconds=300, poll_seconds=1.0):
+    """
+    Drain the thumbnail queue with workers threads, each running one renderer process at a time.
+    Returns the jobs run.
+    """
+    worker_id = "{0}:{1}".format(socket.gethostname(), os.getpid())
+    jobs_run = []
+
+    def render_thread(thread_index):
+        jobs_run.append(publish_queue.work(queue, "{0}:render{1}".format(worker_id, thread_index),
+                                           lambda job: render_job(cache, job, renderer), idle_exit_seconds, poll_seconds))
+
+    threads = [threading.Thread(target=render_thread, args=(thread_index,), name="thumbnail-render-{0}".format(thread_index))
+               for thread_index in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(jobs_run)
+
+
+class ThumbnailLoader(object):
+    """
+    Looks previews up on background threads. Finished lookups are handed to on_ready(source, image or None)
+    on the loader thread, or collected for take_ready() when there is no callback (e.g. polled by a Qt timer).
+    """
+
+    def __init__(self, cache=None, on_ready=None, workers=2):
+        self.cache = cache or ThumbnailCache()
+        self.on_ready = on_ready
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnail-loader")
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._ready = []
+
+    def request(self, source):
+        with self._lock:
+            if source in self._pending:
+                return
+            self._pending.add(source)
+        self._executor.submit(self._lookup, source)
+
+    def _lookup(self, source):
+        try:
+            image_file = self.cache.lookup(source)
+        except (OSError, sqlite3.Error):
+            image_file = None
+        with self._lock:
+            self._pending.discard(source)
+            if self.on_ready is None:
+                self._ready.append((source, image_file))
+        if self.on_ready is not None:
+            self.on_ready(source, image_file)
+
+    def take_ready(self):
+        """
+        [(source, image or None)] finished since the last call.
+        """
+        with self._lock:
+            ready, self._ready = self._ready, []
+        return ready
+
+    def wait(self):
+        """
+        Block until every requested lookup finished.
+        """
+        while True:
+            with self._lock:
+                if not self._pending:
+                    return
+            time.sleep(0.005)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render and manage asset preview thumbnails.")
+    parser.add_argument("--thumbnail-dir", default=default_thumbnail_dir)
+    commands = parser.add_subparsers(dest="command", required=True)
+    worker_parser = commands.add_parser("worker", help="run a thumbnail worker pool")
+    worker_parser.add_argument("--workers", type=int, default=default_workers, help="previews rendered at once")
+    worker_parser.add_argument("--renderer", choices=sorted(renderer_commands), default=default_renderer)
+    worker_parser.add_argument("--queue-dir", help="set by publish_queue when it starts the worker")
+    worker_parser.add_argument("--idle-exit", type=float, default=300.0, help="exit after this many seconds without jobs")
+    render_parser = commands.add_parser("render", help="render the preview of one file now")
+    render_parser.add_argument("file")
+    render_parser.add_argument("--renderer", choices=sorted(renderer_commands), default=default_renderer)
+    commands.add_parser("list", help="show queued, running and recent renders")
+    evict_parser = commands.add_parser("evict", help="shrink the image cache")
+    evict_parser.add_argument("--max-mb", type=float, default=max_cache_mb)
+    options = parser.parse_args(argv)
+
+    cache = ThumbnailCache(options.thumbnail_dir)
+    if options.command == "worker":
+        queue = publish_queue.PublishQueue(options.queue_dir, stale_after=render_stale_seconds) if options.queue_dir \
+            else thumbnail_queue(options.thumbnail_dir)
+        print("Rendered {0} previews.".format(run_worker(queue, cache, options.workers, options.renderer, options.idle_exit)))
+    elif options.command == "render":
+        render_job(cache, {"payload": {"source": os.path.abspath(options.file)}}, options.renderer)
+        print(cache.lookup(options.file))
+    elif options.command == "list":
+        for job in thumbnail_queue(options.thumbnail_dir).jobs():
+            print(publish_queue.format_job(job))
+    elif options.command == "evict":
+        removed, freed = cache.evict(int(options.max_mb * 1048576))
+        print("Removed {0} images, {1:.1f} MB".format(removed, freed / 1048576.0))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+# Script Name: Version Reservation
+# Description: Lock-free version numbers for concurrent publishers. A version is taken by creating
+#<asset dir>/.claims/<prefix>_vNNN.claim with an exclusive create, which exactly one process can win, so
+#artists and farm workers publishing the same asset at once never compute the same vNNN.
+#
+#Exports write to a hidden temp file next to their final path and are committed with commit_file, which
+#never replaces an existing file, so readers only ever see complete versions.
+
+import os
+import re
+import json
+import time
+import uuid
+import errno
+import socket
+from contextlib import contextmanager
+
+claim_dir_name = ".claims"
+temp_prefix = ".tmp_"
+
+
+def _version_pattern(prefix):
+    return re.compile(re.escape(prefix) + r"_v(\d+)\.")
+
+
+def _max_version(file_names, version_pattern):
+    versions = [int(match.group(1)) for match in map(version_pattern.match, file_names) if match]
+    return max(versions or [0])
+
+
+def latest_version(asset_dir, prefix):
+    """
+    Highest version of prefix_vNNN.* claimed or written in asset_dir or its format folders
+    (cache/alembic/fbx), 0 when there is none.
+    """
+    version_pattern = _version_pattern(prefix)
+    latest = 0
+    try:
+        entries = list(os.scandir(asset_dir))
+    except OSError:
+        return 0
+    for entry in entries:
+        if entry.is_dir():
+            try:
+                latest = max(latest, _max_version(os.listdir(entry.path), version_pattern))
+            except OSError:
+                pass
+        else:
+            latest = max(latest, _max_version([entry.name], version_pattern))
+    return latest
+
+
+def reserve_version(asset_dir, prefix, owner=None):
+    """
+    Claim the next free version of prefix in asset_dir and return it. Safe across processes and machines
+    sharing the directory: each candidate claim file is created with O_EXCL, and losers move on to the
+    next number.
+    """
+    claim_dir = os.path.join(asset_dir, claim_dir_name)
+    try:
+        os.makedirs(claim_dir)
+    except OSError:
+        if not os.path.isdir(claim_dir):
+            raise
+
+    version = latest_version(asset_dir, prefix) + 1
+    claim = json.dumps(dict(owner or {}, host=socket.gethostname(), pid=os.getpid(), time=time.time()))
+    while True:
+        claim_path = os.path.join(claim_dir, "{0}_v{1}.claim".format(prefix, str(version).zfill(3)))
+        try:
+            claim_file = os.open(claim_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except OSError as error:
+            if error.errno != errno.EEXIST:
+                raise
+            version += 1
+            continue
+        try:
+            os.write(claim_file, claim.encode("utf-8"))
+        finally:
+            os.close(claim_file)
+        return version
+
+
+def temp_path(final_path):
+    """
+    Hidden path in the final file's folder (same filesystem, so the commit is a rename) keeping its
+    extension for exporters that pick the format from it.
+    """
+    directory, file_name = os.path.split(final_path)
+    return os.path.join(directory, "{0}{1}_{2}".format(temp_prefix, uuid.uuid4().hex[:12], file_name))
+
+
+def commit_file(temp_file, final_path):
+    """
+    Atomically move temp_file to final_path. Raises FileExistsError instead of replacing an existing version.
+    """
+    if os.name == "nt":
+        #os.rename fails on Windows when the target exists
+        os.rename(temp_file, final_path)
+        return final_path
+    try:
+        os.link(temp_file, final_path)
+    except OSError as error:
+        if error.errno == errno.EEXIST:
+            raise FileExistsError(errno.EEXIST, "Version already published", final_path)
+        #Shares without hard links: a rename is still atomic, only the existence check is not
+        if os.path.exists(final_path):
+            raise FileExistsError(errno.EEXIST, "Version already published", final_path)
+        os.rename(temp_file, final_path)
+        return final_path
+    os.remove(temp_file)
+    return final_path
+
+
+@contextmanager
+def atomic_output(final_path):
+    """
+    Yield a temp path to write to; commit it to final_path when the block succeeds, delete it otherwise.
+    """
+    temp_file = temp_path(final_path)
+    try:
+        yield temp_file
+        commit_file(temp_file, final_path)
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)